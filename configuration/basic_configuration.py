@@ -25,6 +25,9 @@ configuration["PATHS"] = {
     # directory into which all Neo4J data will be exported
     "neo4j_dir": "./src/data/processed/neo4j",
 
+    # directory containing the snapshots of loaded datasets (see DataLoader.prepare_dataset(use_cache=True))
+    "cache_dir": "./data/interim/cache",
+
     # directory containing the odbc connection files (see README for structure)
     "odbc_file_path": "./configuration/server_connection_test.txt"
 }
@@ -39,5 +42,42 @@ configuration["PARAMETERS"] = {
     "dataset": "full",
 
     # Number of patients and cases to be loaded, either None (load all data) or any positive integer
-    "load_limit": None
+    "load_limit": None,
+
+    # Format of the interim tables, one of 'csv' (CSV only) or 'parquet' (CSV and typed Parquet files, requires pyarrow)
+    "interim_format": "csv",
+
+    # Command printing a file from HDFS, the path of the file is appended (used with DataLoader(hdfs_pipe=True))
+    "hdfs_cat_command": ["hadoop", "fs", "-cat"],
+
+    # Command printing the checksums of HDFS files, the paths are appended (identifies them in the dataset cache)
+    "hdfs_checksum_command": ["hadoop", "fs", "-checksum"],
+
+    # Number of HDFS files copied concurrently to a local spool directory before loading, 0 streams every file on use
+    "hdfs_prefetch_workers": 0,
+
+    # Number of processes parsing independent tables concurrently in DataLoader.prepare_dataset(), 1 parses in order
+    "load_workers": 1,
+
+    # Number of processes cleaning up independent raw tables concurrently in cleanup_dataset(), 1 cleans up in order
+    "preprocess_workers": 1,
+
+    # Number of raw rows held in memory at once when cleaning up the large raw tables (stays, nursing care records and
+    # employees of appointments) in cleanup_dataset(), 0 reads them whole
+    "preprocess_chunk_rows": 500000,
+
+    # Number of SQL queries executed concurrently (each on its own connection) in pull_raw_dataset(), 1 executes in order
+    "sql_workers": 1,
+
+    # Number of rows fetched from the SQL server at once and written to the raw CSV files in pull_raw_dataset()
+    "sql_fetch_rows": 10000,
+
+    # Whether Stay, Appointment, Treatment and RiskScreening objects omit the fields unused by the model to save memory
+    "compact_entities": False,
+
+    # Number of processes calculating betweenness centralities of the SurfaceModel concurrently, 1 calculates in order
+    "graph_workers": 1,
+
+    # Number of days before the latest ingested data whose interactions are kept in the StreamingSurfaceModel
+    "streaming_window_days": 14
 }
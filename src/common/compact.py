@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""This script contains helpers for the compact representation of the entities held in large numbers (``Stay``,
+``Appointment``, ``Treatment`` and ``RiskScreening``).
+
+These classes use ``__slots__`` instead of an instance dictionary. Categorical strings (ids of wards, types, statuses,
+etc.) are interned, so that all instances share a single string object per distinct value. If
+``PARAMETERS['compact_entities']`` is ``True``, the fields which are not used by the model are not stored at all.
+
+-----
+"""
+
+import sys
+
+from configuration.basic_configuration import configuration
+
+KEEP_UNUSED_FIELDS = not configuration['PARAMETERS'].get('compact_entities', False)
+
+
+def intern_string(value):
+    """Returns the interned version of value if it is a string, otherwise value itself."""
+    return sys.intern(value) if type(value) is str else value
+
+
+def unused_field(value):
+    """Returns value if unused fields are kept, otherwise ``None``."""
+    return value if KEEP_UNUSED_FIELDS else None
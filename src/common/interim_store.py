@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""This script contains the functions to write and read the interim tables.
+
+The interim tables are always written as CSV files. If ``configuration['PARAMETERS']['interim_format']`` is set to
+``"parquet"``, a typed Parquet file is written next to each CSV file (same name, ``.parquet`` suffix). The loaders
+read the interim tables via ``read_interim_table()``, which prefers the Parquet file if available and pushes column
+projections and date range filters down into the Parquet reader. Large tables can be written chunk by chunk with an
+``InterimTableWriter``.
+
+Parquet support requires the optional dependency ``pyarrow``. If it is missing, all tables are read from CSV.
+
+-----
+"""
+
+import logging
+import os
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from configuration.basic_configuration import configuration
+
+try:
+    import pyarrow  # engine of pandas.read_parquet/to_parquet, and used directly by InterimTableWriter
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+
+def get_parquet_path(csv_path):
+    """Returns the path of the Parquet file belonging to the interim CSV file at ``csv_path``.
+
+    Args:
+        csv_path (str): path to the interim CSV file
+
+    Returns:
+        str: path to the Parquet file, i.e. ``csv_path`` with the suffix ``.parquet``
+    """
+    return str(pathlib.Path(csv_path).with_suffix(".parquet"))
+
+
+def write_interim_table(df, csv_path, date_columns=None, interim_format=None):
+    """Writes an interim table to CSV, and additionally to Parquet if configured.
+
+    The CSV file contains the index as leading column(s). The Parquet file is written with the same column layout
+    as ``pd.read_csv(csv_path)`` would return, so positional object construction works on both formats. Columns in
+    ``date_columns`` are stored as timestamps, all other columns as strings. If no Parquet file is written, the one of
+    an earlier run is removed.
+
+    Args:
+        df (pd.DataFrame):      table to write
+        csv_path (str):         path of the interim CSV file
+        date_columns (list):    columns to store as timestamps in the Parquet file
+        interim_format (str):   one of ``"csv"`` or ``"parquet"``, defaults to
+                                ``configuration['PARAMETERS']['interim_format']``
+    """
+    df.to_csv(csv_path)
+
+    if interim_format is None:
+        interim_format = configuration['PARAMETERS'].get('interim_format', 'csv')
+
+    if interim_format == 'parquet' and not PARQUET_AVAILABLE:
+        logging.warning(f"pyarrow is not installed, skipping Parquet output for {csv_path}")
+
+    if interim_format != 'parquet' or not PARQUET_AVAILABLE:
+        remove_stale_parquet(csv_path)
+        return
+
+    get_parquet_frame(df, date_columns).to_parquet(get_parquet_path(csv_path), index=False)
+
+
+def remove_stale_parquet(csv_path):
+    """Removes the Parquet file of an earlier run next to an interim CSV file which was written without it.
+
+    ``read_interim_table()`` prefers the Parquet file, which would otherwise hide the new CSV file.
+
+    Args:
+        csv_path (str): path of the interim CSV file
+    """
+    parquet_path = get_parquet_path(csv_path)
+    if os.path.exists(parquet_path):
+        logging.info(f"Removing outdated {parquet_path}")
+        os.remove(parquet_path)
+
+
+def get_parquet_frame(df, date_columns=None):
+    """Converts an interim table to the column layout and types of its Parquet file.
+
+    Args:
+        df (pd.DataFrame):      table to convert
+        date_columns (list):    columns to convert to timestamps, all other columns are converted to strings
+
+    Returns:
+        pd.DataFrame: table with the index as leading column(s), as ``pd.read_csv()`` of the CSV file would return it
+    """
+    parquet_df = df.reset_index()
+    if df.index.names == [None]:
+        # pd.read_csv names the unnamed index column like this
+        parquet_df = parquet_df.rename(columns={"index": "Unnamed: 0"})
+
+    date_columns = [] if date_columns is None else date_columns
+    for column in parquet_df.columns:
+        if column in date_columns:
+            parquet_df[column] = pd.to_datetime(parquet_df[column], errors='coerce')
+        else:
+            parquet_df[column] = parquet_df[column].where(parquet_df[column].isna(), parquet_df[column].astype(str))
+    return parquet_df
+
+
+class InterimTableWriter:
+    """Writes an interim table chunk by chunk, so only the current chunk has to be held in memory.
+
+    The files written are the same as those of ``write_interim_table()`` on the concatenated chunks, except that the
+    timestamps in the CSV file are always written with their time of day (``write_interim_table()`` omits it if all
+    timestamps of a column are at midnight).
+
+    The chunks are written to temporary files (suffix ``.part``), which replace the interim files once the table is
+    complete. If writing a chunk fails within the ``with`` block, the temporary files are removed and the interim files
+    of an earlier run are left untouched.
+
+    Usage::
+
+        with InterimTableWriter(csv_path, date_columns=["Begin Datetime"]) as writer:
+            for chunk in pd.read_csv(raw_path, chunksize=100000):
+                writer.write(clean(chunk))
+    """
+
+    def __init__(self, csv_path, date_columns=None, interim_format=None):
+        """Initiates the writer, the files are created with the first chunk.
+
+        Args:
+            csv_path (str):         path of the interim CSV file
+            date_columns (list):    columns to store as timestamps in the Parquet file
+            interim_format (str):   one of ``"csv"`` or ``"parquet"``, defaults to
+                                    ``configuration['PARAMETERS']['interim_format']``
+        """
+        self.csv_path = csv_path
+        self.date_columns = [] if date_columns is None else date_columns
+        if interim_format is None:
+            interim_format = configuration['PARAMETERS'].get('interim_format', 'csv')
+        if interim_format == 'parquet' and not PARQUET_AVAILABLE:
+            logging.warning(f"pyarrow is not installed, skipping Parquet output for {csv_path}")
+            interim_format = 'csv'
+        self.interim_format = interim_format
+        self.tmp_csv_path = csv_path + ".part"
+        self.tmp_parquet_path = get_parquet_path(csv_path) + ".part"
+        self.parquet_writer = None
+        self.nbr_chunks = 0
+        self.nbr_rows = 0
+
+    def write(self, df):
+        """Appends a chunk to the interim table.
+
+        Args:
+            df (pd.DataFrame):  next rows of the table, with the same columns and index levels as the first chunk
+        """
+        df.to_csv(self.tmp_csv_path, mode="w" if self.nbr_chunks == 0 else "a", header=self.nbr_chunks == 0,
+                  date_format="%Y-%m-%d %H:%M:%S")
+
+        if self.interim_format == 'parquet':
+            import pyarrow.parquet as pq
+
+            parquet_df = get_parquet_frame(df, self.date_columns)
+            if self.parquet_writer is None:
+                # the types are fixed, as a chunk where a column is empty would otherwise infer another type
+                schema = pyarrow.schema([(column, pyarrow.timestamp("ns") if column in self.date_columns
+                                          else pyarrow.string()) for column in parquet_df.columns])
+                self.parquet_writer = pq.ParquetWriter(self.tmp_parquet_path, schema)
+            self.parquet_writer.write_table(pyarrow.Table.from_pandas(parquet_df, schema=self.parquet_writer.schema,
+                                                                      preserve_index=False))
+
+        self.nbr_chunks += 1
+        self.nbr_rows += len(df)
+
+    def close(self):
+        """Finishes the Parquet file and replaces the interim files by the written ones."""
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+            os.replace(self.tmp_parquet_path, get_parquet_path(self.csv_path))
+        elif self.nbr_chunks != 0:
+            remove_stale_parquet(self.csv_path)
+        if self.nbr_chunks != 0:
+            os.replace(self.tmp_csv_path, self.csv_path)
+
+    def discard(self):
+        """Removes the files written so far, leaving the interim files untouched."""
+        if self.parquet_writer is not None:
+            self.parquet_writer.close()
+            self.parquet_writer = None
+        for path in [self.tmp_csv_path, self.tmp_parquet_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+def date_range_filters(begin_column, end_column, from_range=None, to_range=None):
+    """Creates the Parquet row filters for a time range restriction.
+
+    The filters correspond to the pandas restrictions applied by the loaders, i.e.
+    ``df[begin_column] > from_range`` and ``df[end_column] <= to_range``.
+
+    Args:
+        begin_column (str):     column compared against ``from_range``
+        end_column (str):       column compared against ``to_range``
+        from_range (datetime):  lower bound (exclusive) or ``None``
+        to_range (datetime):    upper bound (inclusive) or ``None``
+
+    Returns:
+        list: filters in the format of ``pd.read_parquet(filters=...)`` or ``None`` if no restriction is set
+    """
+    filters = []
+    if from_range is not None:
+        filters.append((begin_column, '>', pd.Timestamp(from_range)))
+    if to_range is not None:
+        filters.append((end_column, '<=', pd.Timestamp(to_range)))
+    return filters if len(filters) != 0 else None
+
+
+def read_interim_table(csv_path, encoding, parse_dates=None, columns=None, filters=None, index_col=None, dtype=str):
+    """Reads an interim table, preferring the Parquet file if it exists.
+
+    For Parquet files only the ``columns`` are read and rows not matching ``filters`` are skipped while reading. For
+    CSV files ``filters`` is ignored, the caller is expected to restrict the rows as before.
+
+    Args:
+        csv_path (str):     path of the interim CSV file
+        encoding (str):     encoding of the CSV file
+        parse_dates (list): date columns to parse
+        columns (list):     columns to read, all if ``None``
+        filters (list):     row filters for the Parquet reader, see ``date_range_filters()``
+        index_col (int):    column to use as index
+        dtype:              dtype of the CSV columns
+
+    Returns:
+        pd.DataFrame: the interim table
+    """
+    parquet_path = get_parquet_path(csv_path)
+    if not PARQUET_AVAILABLE or not os.path.exists(parquet_path):
+        return pd.read_csv(csv_path, encoding=encoding, parse_dates=parse_dates, usecols=columns, dtype=dtype,
+                           index_col=index_col)
+
+    logging.debug(f"reading {parquet_path}")
+    df = pd.read_parquet(parquet_path, columns=columns, filters=filters)
+
+    parse_dates = [] if parse_dates is None else parse_dates
+    for column in df.columns:
+        if column in parse_dates:
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], errors='coerce')
+        elif df[column].dtype == object:
+            # Parquet nulls are read as None, the loaders expect NaN like in the CSV case
+            df[column] = df[column].where(df[column].notna(), np.nan)
+
+    if index_col is not None:
+        df = df.set_index(df.columns[index_col])
+    return df
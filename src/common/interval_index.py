@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""This script contains a static index answering interval overlap queries, used for the stays of rooms and wards.
+
+The intervals are grouped by their duration class (durations within a factor of 2, i.e. the bit length of the duration
+in nanoseconds), and the intervals of each class are stored as nanosecond timestamps in NumPy arrays sorted by their
+begin. An overlap query with ``[start, end]`` binary searches the intervals of each class beginning at most ``end`` and
+no earlier than ``start`` minus the longest duration of the class, and filters this window for intervals ending at
+``start`` or later. As the window of a class only reaches back by the durations of that class, a few very long
+intervals (i.e. stays ending 9999-12-31) do not widen the windows of the other classes. There are at most 64 classes,
+so a query takes :math:`O(\\log n)` plus the number of overlapping intervals and of the intervals of the same class
+just before ``start``.
+
+Intervals without end (i.e. ongoing stays) are kept separately and compared to the current time on every query.
+
+-----
+"""
+
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+_MIN_NS = np.iinfo(np.int64).min + 1  # the minimum itself is NaT
+_MAX_NS = np.iinfo(np.int64).max
+
+
+def to_ns(value):
+    """Returns a datetime-like value as nanoseconds since the epoch, clipped to the range of ``pd.Timestamp``.
+
+    Args:
+        value:  datetime.datetime(), pd.Timestamp() or np.datetime64() value
+
+    Returns:
+        int: nanoseconds, or ``None`` for missing values (``None``, ``NaT``)
+    """
+    if value is None or pd.isna(value):
+        return None
+    try:
+        return pd.Timestamp(value).value
+    except (OverflowError, ValueError):  # out of bounds, i.e. 9999-12-31
+        return _MIN_NS if value.year < 1970 else _MAX_NS
+
+
+class IntervalIndex:
+    """Index of closed intervals ``[begin, end]`` answering which intervals overlap a query interval.
+    """
+
+    def __init__(self, intervals):
+        """Builds the index.
+
+        Args:
+            intervals (list):   list of (begin, end) tuples of datetime-like values. Intervals with a missing begin
+                                or a ``NaT`` end never overlap anything, intervals with end ``None`` are open and end
+                                at the time of the query.
+        """
+        classes = dict()  # duration class -> (positions, begins, ends)
+        self.open_positions, self.open_begins = [], []
+        for position, (begin, end) in enumerate(intervals):
+            begin_ns = to_ns(begin)
+            if begin_ns is None:
+                continue
+            if end is None:
+                self.open_positions.append(position)
+                self.open_begins.append(begin_ns)
+                continue
+            end_ns = to_ns(end)
+            if end_ns is None:
+                continue
+            duration_class = max(end_ns - begin_ns, 0).bit_length()
+            for values, value in zip(classes.setdefault(duration_class, ([], [], [])), (position, begin_ns, end_ns)):
+                values.append(value)
+
+        # (longest duration, positions, begins, ends) of each duration class, sorted by begin
+        self.classes = []
+        for duration_class, (positions, begins, ends) in sorted(classes.items()):
+            max_duration = max(end_ns - begin_ns for begin_ns, end_ns in zip(begins, ends))
+            order = np.argsort(np.asarray(begins, dtype=np.int64), kind="stable")
+            self.classes.append((max_duration, np.asarray(positions, dtype=np.int64)[order],
+                                 np.asarray(begins, dtype=np.int64)[order], np.asarray(ends, dtype=np.int64)[order]))
+        self.nbr_closed = sum(len(positions) for _, positions, _, _ in self.classes)
+        self.open_positions = np.asarray(self.open_positions, dtype=np.int64)
+        self.open_begins = np.asarray(self.open_begins, dtype=np.int64)
+
+    def __len__(self):
+        return self.nbr_closed + len(self.open_positions)
+
+    def query(self, start, end):
+        """Returns the positions of the intervals overlapping ``[start, end]``, in ascending order.
+
+        Args:
+            start:  datetime-like begin of the query interval
+            end:    datetime-like end of the query interval
+
+        Returns:
+            np.ndarray: positions of the overlapping intervals in the list the index was built from
+        """
+        start_ns, end_ns = to_ns(start), to_ns(end)
+        if start_ns is None or end_ns is None:
+            return np.array([], dtype=np.int64)
+
+        class_matches = [np.array([], dtype=np.int64)]
+        for max_duration, positions, begins, ends in self.classes:
+            # the earliest begin of an interval of the class overlapping [start, end] is start - max_duration
+            first = np.searchsorted(begins, max(start_ns - max_duration, _MIN_NS), side="left")
+            last = np.searchsorted(begins, end_ns, side="right")
+            if first < last:
+                class_matches.append(positions[first:last][ends[first:last] >= start_ns])
+        matches = np.concatenate(class_matches)
+
+        if len(self.open_positions) != 0 and to_ns(datetime.now()) >= start_ns:
+            matches = np.concatenate([matches, self.open_positions[self.open_begins <= end_ns]])
+        return np.sort(matches)
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""This script contains the streaming readers used by the line-based loaders.
+
+The readers are iterated once like a ``csv.reader()`` (without the header line) and never buffer the file. Progress
+bars get their total from ``get_row_count()``, which is answered from a small sidecar index next to the file instead
+of reading all rows a second time. Files on HDFS are streamed from the stdout of ``hadoop fs -cat`` (or any other
+command printing the file) and decoded incrementally.
+
+-----
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+
+ROW_COUNT_SUFFIX = ".rows"
+
+
+def count_lines(file_path, block_size=1 << 20):
+    """Counts the lines of a file by scanning its bytes in blocks, without decoding or splitting it.
+
+    Args:
+        file_path (str):    path of the file
+        block_size (int):   number of bytes read at once
+
+    Returns:
+        int: number of lines, a last line without trailing newline is counted as well
+    """
+    lines = 0
+    last_block = b""
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            lines += block.count(b"\n")
+            last_block = block
+    if last_block != b"" and not last_block.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
+def get_row_count(lines, is_verbose=True):
+    """Returns the number of rows of a reader if it is cheaply available.
+
+    Args:
+        lines (iterator() object):  reader returned by ``DataLoader.get_csv_file()``/``get_hdfs_pipe()`` or any other
+                                    csv iterator
+        is_verbose (bool):          whether the progress bar is shown at all, no rows are counted otherwise
+
+    Returns:
+        int: number of rows, or ``None`` if unknown (the progress bar then shows the processed rows only)
+    """
+    if not is_verbose or not hasattr(lines, "get_row_count"):
+        return None
+    return lines.get_row_count()
+
+
+class CsvLineReader:
+    """Streams the rows of a CSV file, **without header**.
+
+    The file is opened when the iteration starts and closed as soon as it is exhausted.
+    """
+
+    def __init__(self, csv_path, delimiter=",", encoding="iso-8859-1"):
+        self.csv_path = csv_path
+        self.delimiter = delimiter
+        self.encoding = encoding
+
+    def __iter__(self):
+        with open(self.csv_path, "r", encoding=self.encoding, newline="") as csv_file:
+            lines = csv.reader(csv_file, delimiter=self.delimiter)
+            next(lines, None)  # ignore the header line
+            yield from lines
+
+    def get_row_count(self):
+        """Returns the number of rows without header.
+
+        The count is stored in a sidecar file (``<csv_path>.rows``) together with the size and modification time of
+        the CSV file and recomputed only if the CSV file changed. Rows containing quoted line breaks are counted once
+        per line, which is fine for progress bars.
+
+        Returns:
+            int: number of rows
+        """
+        stat = os.stat(self.csv_path)
+        index_path = self.csv_path + ROW_COUNT_SUFFIX
+        try:
+            with open(index_path, "r") as index_file:
+                index = json.load(index_file)
+            if index["size"] == stat.st_size and index["mtime_ns"] == stat.st_mtime_ns:
+                return index["rows"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+        rows = max(count_lines(self.csv_path) - 1, 0)
+        try:
+            with open(index_path, "w") as index_file:
+                json.dump({"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "rows": rows}, index_file)
+        except OSError as e:
+            logging.debug(f"Could not write row count index {index_path}: {e}")
+        return rows
+
+
+class PipeLineReader:
+    """Streams the rows of a CSV file printed to stdout by a command (i.e. ``hadoop fs -cat <path>``), **without
+    header**.
+
+    The output is decoded incrementally in chunks of ``chunk_size`` bytes while the rows are consumed, so the file is
+    never held in memory as a whole. The command is started when the iteration starts.
+    """
+
+    def __init__(self, command, delimiter=",", encoding="iso-8859-1", chunk_size=1 << 20):
+        self.command = command
+        self.delimiter = delimiter
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        process = subprocess.Popen(self.command, stdout=subprocess.PIPE, bufsize=self.chunk_size)
+        is_exhausted = False
+        try:
+            output = io.TextIOWrapper(process.stdout, encoding=self.encoding, newline="")
+            lines = csv.reader(output, delimiter=self.delimiter)
+            next(lines, None)  # ignore the header line
+            yield from lines
+            is_exhausted = True
+        finally:
+            if not is_exhausted:
+                process.kill()  # the consumer stopped early
+            process.stdout.close()
+            return_code = process.wait()
+        if return_code != 0:
+            raise subprocess.CalledProcessError(return_code, self.command)
+
+    def get_row_count(self):
+        """The number of rows of a pipe is unknown before it has been read."""
+        return None
+
+
+def spool_command_output(command, target_path, chunk_size=1 << 20):
+    """Writes the stdout of a command to a local file in chunks.
+
+    Args:
+        command (list):     command printing the file, i.e. ``["hadoop", "fs", "-cat", path]``
+        target_path (str):  local file to write
+        chunk_size (int):   number of bytes copied at once
+
+    Returns:
+        str: target_path
+    """
+    with open(target_path, "wb") as target_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, bufsize=chunk_size)
+        try:
+            shutil.copyfileobj(process.stdout, target_file, chunk_size)
+        finally:
+            process.stdout.close()
+            return_code = process.wait()
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, command)
+    return target_path
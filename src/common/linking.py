@@ -0,0 +1,66 @@
+"""This script contains helpers to resolve the foreign keys of a table in bulk before objects are linked.
+
+The loaders first drop all rows whose foreign keys cannot be resolved (counting the orphans per key), and only then
+create and link objects for the remaining rows.
+
+-----
+"""
+
+import pandas as pd
+
+
+def get_line_frame(lines, columns):
+    """Creates a DataFrame from the rows of a csv reader.
+
+    Args:
+        lines (iterator):   csv iterator from which data will be read
+        columns (dict):     mapping of column names to positions in the rows
+
+                            --> ``{"Appointment ID": 0, "Case ID": 2}``
+
+    Returns:
+        pd.DataFrame: DataFrame with the requested columns
+    """
+    positions = list(columns.values())
+    return pd.DataFrame.from_records((tuple(line[p] for p in positions) for line in lines), columns=list(columns.keys()))
+
+
+def is_present(series):
+    """Returns a mask of the values which are neither missing nor empty strings."""
+    return series.notna() & (series != "")
+
+
+def resolve_foreign_keys(df, foreign_keys):
+    """Drops all rows of df which reference keys not contained in the given lookup dictionaries.
+
+    The foreign keys are checked in the given order, i.e. a row missing several keys is only counted as orphan of the
+    first missing key.
+
+    Args:
+        df (pd.DataFrame):      table containing the foreign key columns
+        foreign_keys (list):    list of (column, lookup dictionary) tuples
+
+                                --> ``[("Appointment ID", appointments), ("Case ID", cases)]``
+
+    Returns:
+        tuple: the DataFrame restricted to the rows with all keys present, and the list of orphan counts per key
+    """
+    orphan_counts = []
+    for column, lookup in foreign_keys:
+        found = df[column].isin(lookup.keys())
+        orphan_counts.append(int((~found).sum()))
+        df = df[found]
+    return df, orphan_counts
+
+
+def get_missing_keys(series, lookup):
+    """Returns the unique values of series not contained in lookup, in order of their first occurrence.
+
+    Args:
+        series (pd.Series): column of keys
+        lookup (dict):      dictionary to check the keys against
+
+    Returns:
+        list: keys for which objects have to be created
+    """
+    return series[~series.isin(lookup.keys())].unique().tolist()
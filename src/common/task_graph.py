@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""This script contains a small dependency graph runner used to load independent tables concurrently.
+
+Tasks are functions whose arguments may refer to the results of other tasks via ``TaskResult("<name>")``. Tasks whose
+dependencies are finished are executed in a process pool (or one after another if only one worker is requested), and
+the time spent in each task is logged.
+
+-----
+"""
+
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+
+class TaskResult:
+    """Placeholder for the result of the task ``name`` in the arguments of another task.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+
+def _resolve(value, results):
+    return results[value.name] if isinstance(value, TaskResult) else value
+
+
+def _timed_call(function, args, kwargs):
+    """Calls function and returns its result together with the elapsed wall-clock seconds."""
+    start_time = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start_time
+
+
+class TaskGraph:
+    """Runs tasks in an order respecting their dependencies.
+    """
+
+    def __init__(self):
+        self.tasks = dict()
+
+    def add_task(self, name, function, *args, **kwargs):
+        """Adds a task to the graph.
+
+        Args:
+            name (str):             unique name of the task, the result is returned under this name
+            function (callable):    function to call, must be picklable (module level or static method) if the
+                                    graph is run with several workers
+            *args:                  positional arguments, ``TaskResult`` instances are replaced by the results
+            **kwargs:               keyword arguments, ``TaskResult`` instances are replaced by the results
+        """
+        if name in self.tasks:
+            raise ValueError(f"Task {name} already exists")
+        dependencies = {value.name for value in list(args) + list(kwargs.values()) if isinstance(value, TaskResult)}
+        self.tasks[name] = (function, args, kwargs, dependencies)
+
+    def get_ready_tasks(self, finished, started):
+        return [name for name, (_, _, _, dependencies) in self.tasks.items()
+                if name not in started and dependencies <= finished]
+
+    def run(self, max_workers=1, on_result=None):
+        """Executes all tasks.
+
+        Args:
+            max_workers (int):      number of processes, tasks are run in the calling process if ``max_workers <= 1``
+            on_result (callable):   called in the calling process with the name and result of every task as soon as
+                                    it finished, i.e. also for the tasks finished before another task failed
+
+        Returns:
+            dict: mapping of task names to their results
+        """
+        for name, (_, _, _, dependencies) in self.tasks.items():
+            unknown = dependencies - self.tasks.keys()
+            if len(unknown) != 0:
+                raise ValueError(f"Task {name} depends on unknown tasks {unknown}")
+
+        results = dict()
+        start_time = time.perf_counter()
+        if max_workers is None or max_workers <= 1:
+            self._run_sequential(results, on_result)
+        else:
+            self._run_parallel(results, max_workers, on_result)
+        logging.info(f"{len(self.tasks)} tasks finished in {time.perf_counter() - start_time:.1f}s (max_workers={max_workers})")
+        return results
+
+    def _call_arguments(self, name, results):
+        function, args, kwargs, _ = self.tasks[name]
+        return function, [_resolve(a, results) for a in args], {k: _resolve(v, results) for k, v in kwargs.items()}
+
+    def _run_sequential(self, results, on_result=None):
+        while len(results) != len(self.tasks):
+            ready_tasks = self.get_ready_tasks(set(results.keys()), set(results.keys()))
+            if len(ready_tasks) == 0:
+                raise ValueError(f"Cyclic dependencies between tasks {set(self.tasks.keys()) - set(results.keys())}")
+            for name in ready_tasks:
+                results[name], duration = _timed_call(*self._call_arguments(name, results))
+                logging.info(f"Task {name} finished in {duration:.1f}s")
+                if on_result is not None:
+                    on_result(name, results[name])
+
+    def _run_parallel(self, results, max_workers, on_result=None):
+        futures = dict()
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            while len(results) != len(self.tasks):
+                for name in self.get_ready_tasks(set(results.keys()), set(results.keys()) | set(futures.values())):
+                    futures[executor.submit(_timed_call, *self._call_arguments(name, results))] = name
+                if len(futures) == 0:
+                    raise ValueError(f"Cyclic dependencies between tasks {set(self.tasks.keys()) - set(results.keys())}")
+                done, _ = wait(futures.keys(), return_when=FIRST_COMPLETED)
+                failed = [future for future in done if future.exception() is not None]
+                for future in done:
+                    name = futures.pop(future)
+                    if future in failed:
+                        continue
+                    results[name], duration = future.result()
+                    logging.info(f"Task {name} finished in {duration:.1f}s")
+                    if on_result is not None:
+                        on_result(name, results[name])
+                if len(failed) != 0:
+                    # the tasks finished together with the failed one are reported before raising
+                    raise failed[0].exception()
+
+
+class StageTimer:
+    """Logs the wall-clock time spent between consecutive stages.
+    """
+
+    def __init__(self):
+        self.lap_time = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        logging.info(f"Stage {stage} finished in {now - self.lap_time:.1f}s")
+        self.lap_time = now
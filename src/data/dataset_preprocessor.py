@@ -1,377 +1,551 @@
 import pathlib
 import pandas as pd
 import os
-import re
+import sys
+import time
 
 import requests
 
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
 from configuration.basic_configuration import configuration
+from src.common.interim_store import write_interim_table, InterimTableWriter
+from src.common.task_graph import TaskGraph
+
+# columns stored as timestamps in the typed interim tables (see src.common.interim_store)
+INTERIM_DATE_COLUMNS = {
+    "DIM_PATIENT.csv": ["Birth Date"],
+    "DIM_FALL.csv": ["Start Date", "End Date"],
+    "DIM_TERMIN.csv": ["Date"],
+    "FAKT_MEDIKAMENTE.csv": ["Submission Date"],
+    "LA_ISH_NBEW.csv": ["Begin Datetime", "End Datetime"],
+    "TACS_DATEN.csv": ["Date of Care"],
+    "VRE_SCREENING_DATA.csv": ["Record Date"],
+}
+
+# fallback patterns extracting (SAP building abbreviation, Waveware floor id, Waveware room id) from the SAP room ids of
+# the stays, tried in order until one matches
+NBEW_ROOM_PATTERNS = ['([A-Za-z]{2,3}[0-9]*)[\\.\\s]+([A-Za-z]*[0-9]*)[\\.N\\s-]+([0-9]+[A-Za-z]*)$',
+                      '([A-Za-z]+)[\\.\\s]*([0-9]*)[\\.N\\s-]+([0-9]+[A-Za-z]*)$',
+                      '([A-Za-z]+[0-9]*)[\\s]+([A-Za-z]*)[\\.N\\s-]*([0-9]+[A-Za-z]*)']
+# pattern extracting (Waveware building id, floor id, room id) from the SAP room id 2 of the building units
+NBAU_ROOM_PATTERN = '([A-Za-z]+[0-9]*)[\\s]+([A-Za-z]*[0-9]*)[\\.N\\s-]+([0-9]+[A-Za-z]*)'
+# pattern extracting the SAP building abbreviation from the SAP room ids of the building units
+NBAU_ABBREVIATION_PATTERN = '([A-Za-z]+[0-9]*)[\\s]+'
+# hints in the unit name of building units without campus, later hints take precedence
+NBAU_CAMPUS_HINTS = [("Aarberg", "AARB"), ("Riggisberg", "RIGG"), ("R_", "RIGG"), ("Tiefenau", "TIEF"),
+                     ("Münsigen", "MUEN"), ("Belp", "BELP")]
+OTHER_CAMPI = ['Aarberg', 'Riggisberg', 'Tiefenau', 'Münsigen']
+
+# interim files read and written by improve_dataset()
+IMPROVE_INPUT_FILES = ["LA_ISH_NBAU.csv", "LA_ISH_NBEW.csv", "Waveware_Auszug Gebaeudeinformation Stand 03.12.2020.csv"]
+IMPROVE_OUTPUT_FILES = ["room_identifiers.csv", "building_identifiers.csv"]
+# position of the "SAP Room ID" column in the raw LA_ISH_NBEW.csv
+NBEW_SAP_ROOM_ID_POSITION = 14
+
+
+def extract_tokens(values, patterns, columns):
+    """Extracts the groups of the first matching pattern from each value.
+
+    The patterns are only searched in the unique values, and each pattern only in the values none of the previous
+    patterns matched. The extracted groups are then mapped back to all values.
+
+    Args:
+        values (pd.Series):     strings to search, missing values are skipped
+        patterns (list):        regular expressions with one group per column, tried in order
+        columns (list):         names of the extracted columns
+
+    Returns:
+        pd.DataFrame: extracted columns with the index of values, missing where no pattern matched
+    """
+    remaining = pd.Series(pd.unique(values.dropna()), dtype=object)
+    extracted = []
+    for pattern in patterns:
+        if len(remaining) == 0:
+            break
+        matches = remaining.astype(str).str.extract(pattern, expand=True)
+        is_match = matches.notna().all(axis=1)
+        matches = matches[is_match].astype(object)
+        matches.index = remaining[is_match]
+        extracted.append(matches)
+        remaining = remaining[~is_match]
+
+    token_df = pd.concat(extracted) if len(extracted) != 0 else pd.DataFrame(columns=range(len(columns)))
+    token_df.columns = columns
+    token_df = token_df.reindex(values.to_numpy())
+    token_df.index = values.index
+    return token_df
+
+
+def extract_nbew_room_ids(sap_room_ids):
+    """Extracts the Waveware tokens from the SAP room ids of the stays (``LA_ISH_NBEW.csv``) of Insel Hospital rooms.
+
+    Args:
+        sap_room_ids (pd.Series):   SAP room ids
+
+    Returns:
+        pd.DataFrame: columns "SAP Building Abbreviation", "Waveware Floor ID" and "Waveware Room ID" with the index of
+        sap_room_ids
+    """
+    is_named = sap_room_ids.notna() & ~sap_room_ids.astype(str).str.isdecimal()
+    return extract_tokens(sap_room_ids.where(is_named), NBEW_ROOM_PATTERNS,
+                          ["SAP Building Abbreviation", "Waveware Floor ID", "Waveware Room ID"])
+
+
+def fix_nbau_room_ids(df):
+    """Completes the campus, Waveware and SAP ids of the building units (``LA_ISH_NBAU.csv``).
+
+    - The campus of units without campus is derived from hints in their unit name
+    - Missing Waveware ids are extracted from "SAP Room ID 2"
+    - "SAP Room ID 1" is replaced by "SAP Room ID" for Aarberg and unknown rooms, to make it possible to identify them
+      in the stays
+    - The SAP building abbreviations are extracted from "SAP Room ID 1" and "SAP Room ID 2"
+
+    Args:
+        df (pd.DataFrame):  building units with the columns of ``LA_ISH_NBAU.csv``
+
+    Returns:
+        pd.DataFrame: the building units, with the fixed columns moved to the end
+    """
+    df = df.copy()
+    waveware_columns = ['Waveware Building ID', 'Waveware Floor ID', 'Waveware Room ID']
+
+    # extract the campus of the building and room based on hints in the Unit Name
+    has_no_campus = df['Waveware Campus'].isna()
+    for hint, campus in NBAU_CAMPUS_HINTS:
+        df.loc[has_no_campus & df['Unit Name'].str.contains(hint, regex=False, na=False), 'Waveware Campus'] = campus
+
+    # extract Waveware tokens from SAP Room IDs for Insel Hospital rooms
+    is_insel = ~df['Waveware Campus'].isin(OTHER_CAMPI)
+    waveware_df = extract_tokens(df['SAP Room ID 2'].where(is_insel & df['Waveware Room ID'].isna()),
+                                 [NBAU_ROOM_PATTERN], waveware_columns)
+    is_extracted = waveware_df.notna().all(axis=1)
+    df.loc[is_extracted, waveware_columns] = waveware_df[is_extracted]
+    df = df[[column for column in df.columns if column not in ['Waveware Campus', 'SAP Building Abbreviation 2'] + waveware_columns]
+            + ['Waveware Campus', 'SAP Building Abbreviation 2'] + waveware_columns]
+
+    # fix the Aarberg SAP Room IDs to make it possible to identify them in the SAP NBEW table data
+    is_unknown_room = df["SAP Room ID"].str.contains('[0-9]+', na=False) & \
+        ((df["Waveware Campus"] != "ISB") | df["Waveware Campus"].isna())
+    df.loc[is_unknown_room, "SAP Room ID 1"] = df.loc[is_unknown_room, "SAP Room ID"]
+    df = df[[column for column in df.columns if column != "SAP Room ID 1"] + ["SAP Room ID 1"]]
+
+    # extract the building abbreviations from the SAP Room IDs
+    has_sap_room_id = is_insel & df['SAP Room ID 1'].notna()
+    for abbreviation_column, room_id_column in [('SAP Building Abbreviation 1', 'SAP Room ID 1'),
+                                                ('SAP Building Abbreviation 2', 'SAP Room ID 2')]:
+        abbreviations = extract_tokens(df[room_id_column].where(has_sap_room_id), [NBAU_ABBREVIATION_PATTERN],
+                                       [abbreviation_column])[abbreviation_column]
+        df[abbreviation_column] = abbreviations.where(abbreviations.notna(), df[abbreviation_column])
+        df = df[[column for column in df.columns if column != abbreviation_column] + [abbreviation_column]]
+    return df
+
+
+def get_nbew_room_lookup(sap_room_ids):
+    """
+    Extract the Waveware tokens of each distinct SAP room id of the stays once, to look them up for every stay.
+
+    :param sap_room_ids: SAP room ids, e.g. the distinct "SAP Room ID" of all chunks of ``LA_ISH_NBEW.csv``
+    :return: DataFrame with the columns of extract_nbew_room_ids(), indexed by the SAP room id
+    """
+    sap_room_ids = pd.Series(pd.unique(pd.Series(sap_room_ids, dtype=object).dropna()), dtype=object)
+    return extract_nbew_room_ids(sap_room_ids).set_axis(pd.Index(sap_room_ids, dtype=object), axis=0)
 
 
-def cleanup_dataset(overwrite_files=False):
+def cleanup_stays(df, room_lookup=None, first_row=0):
+    """
+    Clean up (a chunk of) the raw stays (``LA_ISH_NBEW.csv``).
+
+    :param df: raw rows, read with dtype=str
+    :param room_lookup: Waveware tokens by SAP room id (see get_nbew_room_lookup()), extracted from df if None
+    :param first_row: position of the first row of df in the raw table
+    :return: cleaned rows with the Waveware tokens, indexed by their position in the raw table
+    """
+    # the db designer of that source syname was just a troll
+    df.columns = ["Case ID", "Serial Number", "Stay Type ID", "Stay Type", "Begin Date", "Begin Time", "Status", "End Date", "End Time", "Serial Reference", "Description",
+                  "Department",  # "fachliche Organisationseinheit" (https://help.sap.com/saphelp_ewm70/helpdata/de/40/f39a3916f07e00e10000000a11402f/frameset.htm)
+                  "Ward",  #  Nursing Organisational Unit/ "pflegerische Organisationseinheit = Abteilungen/Station"
+                  "Organisational Unit of Entry",  # "Aufnahme-Organisationseinheit"
+                  "SAP Room ID", "Bed ID", "Is Cancelled", "Partner ID"]
+
+    df["Begin Time"] = df["Begin Time"].str[:8]
+    df["End Time"] = df["End Time"].str[:8]
+
+    df["Begin Datetime"] = (df["Begin Date"] + " " + df["Begin Time"])
+    df["End Datetime"] = (df["End Date"] + " " + df["End Time"])
+    df = df.drop(labels=["Begin Date", "Begin Time", "End Date", "End Time"], axis=1)
+
+    df["Begin Datetime"] = pd.to_datetime(df["Begin Datetime"], format="%Y-%m-%d %H:%M:%S", errors='coerce')
+    df["End Datetime"] = pd.to_datetime(df["End Datetime"], format="%Y-%m-%d %H:%M:%S", errors='coerce')
+
+    # the Serial Number is dropped and the rows are numbered, as by the former merge of the tokens
+    df = df.drop(labels=["Serial Number"], axis=1)
+    df.index = pd.RangeIndex(first_row, first_row + len(df))
+    if room_lookup is None:
+        room_lookup = get_nbew_room_lookup(df["SAP Room ID"])
+    room_tokens = room_lookup.reindex(df["SAP Room ID"].astype(object)).set_axis(df.index, axis=0)
+    return pd.concat([df, room_tokens], axis=1)
+
+
+def cleanup_care(df):
+    """
+    Clean up (a chunk of) the raw nursing care records (``TACS_DATEN.csv``).
+
+    :param df: raw rows, read with dtype=str
+    :return: cleaned rows
+    """
+    df.columns = ["Patient ID", "Patient Type", "Patient Status", "Case ID", "Case Type", "Case Status", "Date of Care", "Duration of Care in Mins", "Employee Staff Number", "Employee Employment Number", "Employee Login", "Batch Run ID"]
+    return df.set_index(["Patient ID", "Employee Staff Number", "Date of Care"])
+
+
+def cleanup_employee_appointments(df):
+    """
+    Clean up (a chunk of) the raw employees of the appointments (``FAKT_TERMIN_MITARBEITER.csv``).
+
+    :param df: raw rows, read with dtype=str
+    :return: cleaned rows
+    """
+    df.columns = ["Appointment ID", "Employee ID", "Begin", "End", "Duration in Minutes"]
+    return df.set_index(["Appointment ID", "Employee ID", "Begin"])
+
+
+# large raw tables which are cleaned up chunk by chunk if PARAMETERS['preprocess_chunk_rows'] is set, with the function
+# cleaning up a chunk
+CHUNKED_CLEANUP_FUNCTIONS = {
+    "FAKT_TERMIN_MITARBEITER.csv": cleanup_employee_appointments,
+    "LA_ISH_NBEW.csv": cleanup_stays,
+    "TACS_DATEN.csv": cleanup_care,
+}
+
+
+def cleanup_file_in_chunks(path, interim_data_path, chunk_rows):
+    """
+    Clean up one of the CHUNKED_CLEANUP_FUNCTIONS tables chunk by chunk, appending each chunk to the interim table.
+
+    Only chunk_rows raw rows are held in memory at once. The Waveware tokens of the stays are looked up in a table of the
+    distinct SAP room ids, which is extracted in a first pass reading only the "SAP Room ID" column.
+
+    :param path: pathlib.Path of the raw CSV file
+    :param interim_data_path: interim directory
+    :param chunk_rows: number of raw rows per chunk
+    :return: number of rows written
+    """
+    cleanup_function = CHUNKED_CLEANUP_FUNCTIONS[path.name]
+    room_lookup = None
+    if path.name == "LA_ISH_NBEW.csv":
+        sap_room_ids = set()
+        for chunk in pd.read_csv(path, encoding="ISO-8859-1", dtype=str, usecols=[NBEW_SAP_ROOM_ID_POSITION],
+                                 chunksize=chunk_rows):
+            sap_room_ids.update(chunk.iloc[:, 0].dropna())
+        room_lookup = get_nbew_room_lookup(sorted(sap_room_ids))
+
+    with InterimTableWriter(interim_data_path + path.name, date_columns=INTERIM_DATE_COLUMNS.get(path.name)) as writer:
+        for chunk in pd.read_csv(path, encoding="ISO-8859-1", dtype=str, chunksize=chunk_rows):
+            if room_lookup is not None:
+                chunk = cleanup_function(chunk, room_lookup=room_lookup, first_row=writer.nbr_rows)
+            else:
+                chunk = cleanup_function(chunk)
+            writer.write(chunk)
+    return writer.nbr_rows
+
+
+def get_interim_data_path():
+    """Returns the interim directory of the configured dataset."""
+    return configuration['PATHS']['interim_data_dir'].format("test") if configuration['PARAMETERS']['dataset'] == 'test' \
+        else configuration['PATHS']['interim_data_dir'].format("model")  # absolute or relative path to directory where data is stored
+
+
+def get_peak_memory_mb():
+    """Returns the peak resident memory of the current process in MB, or None if it is not available (Windows)."""
+    if resource is None:
+        return None
+    peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return peak_memory / 1024 ** 2 if sys.platform == "darwin" else peak_memory / 1024
+
+
+def cleanup_file(path, interim_data_path):
+    """
+    Clean up a single raw table and write it to the interim directory.
+
+    The tables are independent of each other, so this function can be run for several files in parallel. The
+    CHUNKED_CLEANUP_FUNCTIONS tables are cleaned up chunk by chunk if PARAMETERS['preprocess_chunk_rows'] is set.
+
+    :param path: pathlib.Path of the raw CSV file
+    :param interim_data_path: interim directory
+    :return: number of rows written (None if no fix is proposed for the file)
+    """
+    # encoding = "ISO-8859-1"
+    encoding = None
+    start_time = time.perf_counter()
+    start_peak_memory = get_peak_memory_mb()
+
+    chunk_rows = configuration['PARAMETERS'].get('preprocess_chunk_rows', 0)
+    if path.name in CHUNKED_CLEANUP_FUNCTIONS and chunk_rows:
+        nbr_rows = cleanup_file_in_chunks(path, interim_data_path, chunk_rows)
+        report_fixed_file(path.name, nbr_rows, start_time, start_peak_memory)
+        return nbr_rows
+
+    if path.name == "DIM_FALL.csv":
+        df = pd.read_csv(path, encoding=encoding, dtype=str)
+        df.columns = ["Patient ID", "Case ID", "Case Type ID", "Case Status", "Case Type", "Start Date", "End Date",
+                      "Patient Type", "Patient Status"]
+
+        df.loc[df["Case Status"] == "Fall ist abgeschlossen", "Case Status"] = "closed"
+        df.loc[df["Case Status"] == "Fall ist aktuell", "Case Status"] = "open"
+
+        df.loc[df["Case Type"] == "ambulanter Fall", "Case Type"] = "ambulatory"
+        df.loc[df["Case Type"] == "stationärer Fall", "Case Type"] = "in-patient"
+        df.loc[df["Case Type"] == "teilstationärer Fall", "Case Type"] = "partially in-patient"
+
+        df.loc[df["Patient Status"] == "aktiv", "Patient Status"] = "active"
+        df.loc[df["Patient Status"] == "storniert", "Patient Status"] = "cancelled"
+        df = df.set_index("Case ID")
+    elif path.name == "DIM_GERAET.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Device ID", "Device Name"]
+        df = df.set_index("Device ID")
+    elif path.name == "DIM_PATIENT.csv":
+        df = pd.read_csv(path, encoding=encoding, dtype=str)
+        df.columns = ["Patient ID", "Gender", "Birth Date", "Zip Code", "Place of Residence", "Canton", "Language"]
+        # TODO: Recreate dataset excluding patients
+        # TODO: WHERE [dim_patient_status]='aktiv' AND [is_early_arrived]=0 AND [is_deleted]=0 AND dim_patient_geburtsdatum!='1753-01-01' AND [dim_patient_typ]='Standard Patient'
+        # df = df[df["Birth Date"] != "1753-01-01"]  # drop all patients without valid birth date
+        df.loc[df["Gender"] == "männlich", "Gender"] = "male"
+        df.loc[df["Gender"] == "weiblich", "Gender"] = "female"
+        df = df.set_index("Patient ID")
+    elif path.name == "DIM_RAUM.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Room ID", "Room Common Name"]
+        df = df.set_index("Room ID")
+    elif path.name == "DIM_TERMIN.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Appointment ID", "Deleted On Source", "Description", "Type", "Type 2", "Date", "Duration in Minutes"]
+        df = df.set_index("Appointment ID")
+    elif path.name == "FAKT_MEDIKAMENTE.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Patient ID", "Case ID", "Drug Name",
+                      "Drug ATC ID",  # Anatomical Therapeutic Chemical Classification Syname ID
+                      "Quantity",
+                      "Unit",
+                      "Disposition Form",
+                      "Submission Date"]
+        df = df.set_index(["Patient ID", "Case ID", "Submission Date"])
+    elif path.name == "FAKT_TERMIN_GERAET.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Appointment ID", "Device ID", "Begin", "End", "Duration in Minutes"]
+        df = df.set_index(["Appointment ID", "Device ID", "Begin"])
+    elif path.name == "FAKT_TERMIN_MITARBEITER.csv":
+        df = cleanup_employee_appointments(pd.read_csv(path, encoding="ISO-8859-1", dtype=str))
+    elif path.name == "FAKT_TERMIN_PATIENT.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Appointment ID", "Patient ID", "Case ID"]
+        df = df.set_index(["Appointment ID", "Patient ID", "Case ID"])
+    elif path.name == "FAKT_TERMIN_RAUM.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Appointment ID", "Room ID", "Room Common Name", "Begin", "End", "Duration in Minutes"]
+        df = df.set_index(["Appointment ID", "Room ID", "Begin"])
+    elif path.name == "LA_CHOP_FLAT.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Chop Code", "Usage Year", "Chop Description",
+                      "Code Level 1", "Code Level 1 Description",
+                      "Code Level 2", "Code Level 2 Description",
+                      "Code Level 3", "Code Level 3 Description",
+                      "Code Level 4", "Code Level 4 Description",
+                      "Code Level 5", "Code Level 5 Description",
+                      "Code Level 6", "Code Level 6 Description",
+                      "Chop Status",
+                      "Chop Catalog ID"]
+
+        # Fix encoding error: Replace \x96 with - (\x96 is a dash in latin1: https://stackoverflow.com/a/35731443/4563947)
+        df["Chop Description"] = df["Chop Description"].str.replace("\\x96", "-")
+        df["Code Level 1 Description"] = df["Code Level 1 Description"].str.replace("\\x96", "-")
+        df["Code Level 2 Description"] = df["Code Level 2 Description"].str.replace("\\x96", "-")
+        df["Code Level 3 Description"] = df["Code Level 3 Description"].str.replace("\\x96", "-")
+        df["Code Level 4 Description"] = df["Code Level 4 Description"].str.replace("\\x96", "-")
+        df["Code Level 5 Description"] = df["Code Level 5 Description"].str.replace("\\x96", "-")
+        df["Code Level 6 Description"] = df["Code Level 6 Description"].str.replace("\\x96", "-")
+
+        df = df.set_index(["Chop Catalog ID"])
+    elif path.name == "LA_ISH_NBEW.csv":
+        df = cleanup_stays(pd.read_csv(path, encoding="ISO-8859-1", dtype=str))
+    elif path.name == "LA_ISH_NDIA.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Case ID", "Diagnosis Key 1", "Diagnosis Category 1", "Date of Diagnosis", "DRG Category"] # FALNR,DKEY1,DKAT1,DIADT,DRG_CATEGORY
+        df = df.set_index("Case ID", "Diagnosis Key 1")
+    elif path.name == "LA_ISH_NDRG.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Case ID", "Cost Weight"]
+        df = df.set_index("Case ID")
+    elif path.name == "LA_ISH_NFPZ.csv":  # https://www.se80.co.uk/saptables/n/nfpz/nfpz.htm
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["EARZT", "FARZT", "Case ID", "Serial Number", "Partner ID", "Cancelled"] # EARZT,FARZT,FALNR,LFDNR,PERNR,STORN]
+        df = df.set_index("Serial Number")
+    elif path.name == "LA_ISH_NGPA.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Partner ID", "Name 1", "Name 2", "Name 3", "Country", "Zip Code", "Place of Residence", "Place of Residence", "Street", "Hospital"]
+        df = df.set_index("Partner ID")
+    elif path.name == "LA_ISH_NICP.csv":  # https://help.sap.com/doc/saphelp_crm60/6.0.0.14/en-US/d9/6f2fcf772644fe8e10cc3c3cca6039/frameset.htm
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Stay ID", "Catalog ID", "Chop Code", "Surgeries Quantity", "Beginning", "Location Surgery Information", "Cancelled", "Case ID", "Ward"]
+        df = df.set_index(["Stay ID", "Catalog ID", "Case ID"])
+    elif path.name == "TACS_DATEN.csv":
+        df = cleanup_care(pd.read_csv(path, encoding="ISO-8859-1", dtype=str))
+    elif path.name == "V_LA_ISH_NDIA_NORM.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Case ID", "Diagnosis Key 1", "Diagnosis Category 1", "Date of Diagnosis", "DRG Category"]
+        df = df.set_index(["Case ID", "Diagnosis Key 1"])
+    elif path.name == "V_LA_ISH_NRSF_NORM.csv":  # https://www.se80.co.uk/saptables/n/nrsf/nrsf.htm
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Patient ID", "Risk Factor ID", "Description", "Creation Date", "Creation Time"]
+        df = df.set_index(["Patient ID", "Risk Factor ID", "Creation Time"])
+    elif path.name == "VRE_SCREENING_DATA.csv":
+        df = pd.read_csv(path, parse_dates=["Birth Date", "Record Date"], dtype=str, index_col=0)
+        df.columns = ['Order ID', 'Record Date', 'Measurement Date',
+                      'First Name', 'Last Name', 'Birth Date', 'Patient ID', 'Pathogen Result']
+        df = df.set_index(["Order ID"])
+    elif path.name == "SAP_ISH_ZHC_RB_STANDORT":  # Raumbuch Standort Data (apparently Waveware)
+        df = pd.read_csv(path, dtype=str)
+        df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
+        df.columns = ["Waveware Campus", "Common Name"]
+    elif path.name == "SAP_ISH_ZHC_RB_BUILDING":
+        df = pd.read_csv(path, dtype=str)
+        df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
+        df.columns = ["Waveware Campus", "Waveware Building ID", "Building Common Name"]
+        df.set_index("Waveware Building ID", inplace=True)
+    elif path.name == "SAP_ISH_ZHC_RB_STOCKWERK":
+        df = pd.read_csv(path, dtype=str)
+        df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
+        df.columns = ["Waveware Campus", "Waveware Building ID", "Waveware Floor ID", "Floor Common Name"]
+        # df = pd.merge(df, sap_building_df, on="Waveware Building ID")
+    elif path.name == "SAP_ISH_ZHC_RB_RAUM":
+        df = pd.read_csv(path, dtype=str)
+        df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
+        df.columns = ["Waveware Campus", "Waveware Building ID", "Waveware Floor ID", "Waveware Room ID", "Room Common Name", "Waveware Room Full ID"]
+        df.set_index("Waveware Room Full ID", inplace=True)
+        # df = pd.merge(df, sap_building_df, on="Waveware Building ID")
+    elif path.name == "LA_ISH_NBAU.csv":
+        df = pd.read_csv(path, dtype=str)
+        # SAP klingon translation: https://www.tcodesearch.com/sap-tables/detail?id=NBAU
+        df.drop(["MANDT", "TELNR", "TELFX", "TELTX", "LOEKZ", "LOUSR", "LODAT",
+                                   "ERDAT", "ERUSR", "UPDAT", "UPUSR", "BEGDT", "ENDDT", "FREIG",
+                                   "TALST", "ADDIN","XKOOR", "YKOOR", "BREIT", "LAENG", "ARCHV",
+                                   "MIGRATED_OBJID", "BATCH_RUN_ID", "ZZBEMK", "ZZVERLEGUNG", "ZZVORHALTE",
+                                   "ZZPRIVAT", "EANNR", "BETTST_TYP"], axis=1, inplace=True)
+
+        df.columns = ["SAP Room ID", "Unit Type", "Unit Name", "SAP Room ID 1", "SAP Room ID 2",
+                                        "Short Text", "Long Text", "Address Information", "Address Object",
+                                        "Waveware Campus", "Waveware Building ID", "Waveware Floor ID", "Waveware Room ID"]
+
+        df.loc[df["Unit Type"] == "Z", "Unit Type"] = "Room"
+        df.loc[df["Unit Type"] == "B", "Unit Type"] = "Bettstellplatz"
+        df = df[df["Unit Type"] == "Room"]
+
+        df['SAP Building Abbreviation 1'] = pd.NA
+        df['SAP Building Abbreviation 2'] = pd.NA
+
+        df = fix_nbau_room_ids(df)
+    elif path.name == "Waveware_Auszug Gebaeudeinformation Stand 03.12.2020.csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df = df.drop(["Standort", "Parzellennummer", "Zonenplan", "Denkmalpflege", "Anlage-ID", "Bemerkung", "Eigentümer (SAP)", "Vermietung (SAP)", "Portfolio (SAP)", "Baujahr", "Gebäudetyp", "GVB-Nummer", "Amtlicher Wert", "Gebäudeversicherungswert", "Gebäudezustand", "Technologiestand HLKSE", "Techn. Ausb.standard", "Zustand Technik", "Klimatisierung", "Aufzug", "Gebäudezustand Bem.", "Status"], axis=1)
+        df.columns = ["Waveware Building Full ID", "Building Code", "Waveware Building ID", "Building abbreviation", "Building Common Name", "Street", "Zip Code", "Location", "SAP-Anlage Nr."]
+        df.drop(["Zip Code", "Location","SAP-Anlage Nr.", "Building Code"], axis=1, inplace=True)
+        df = df[df["Building Common Name"] != "Grundstück Inselareal"]
+        df = df[~pd.isna(df["Building abbreviation"])]
+        # df.sort_values(by=["Building abbreviation"], inplace=True)
+        # df.set_index("Waveware Building ID", inplace=True)
+    elif path.name == "Waveware_Auszug Flaechenmanagement IDSC (Stand 02.07.20).csv":
+        df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
+        df.columns = ["Waveware Building ID", "Building Common Name", "Waveware Floor ID", "Waveware Room ID", "Waveware Room Full ID", "Room Common Name", "Room Area", "PC Group ID", "Sub-EC(PC) Nr", "Profitcenter"]
+        df = df.drop(["Room Area", "PC Group ID", "Sub-EC(PC) Nr", "Profitcenter"], axis=1)
+        # df.set_index("Waveware Room Full ID", inplace=True)
+    else:
+        print(f"No fix proposed for {path.name}")
+        return None
+
+    write_interim_table(df, interim_data_path + path.name, date_columns=INTERIM_DATE_COLUMNS.get(path.name))
+    report_fixed_file(path.name, len(df), start_time, start_peak_memory)
+    return len(df)
+
+
+def report_fixed_file(name, nbr_rows, start_time, start_peak_memory):
+    # the peak memory of a process cannot be reset, so the increase of the peak is reported for the file (which is 0
+    # if the file needed less memory than an earlier one in the same process)
+    peak_memory = get_peak_memory_mb()
+    print(f"--> Fixed {name}: {nbr_rows} rows in {time.perf_counter() - start_time:.1f}s"
+          + (f", process peak memory {peak_memory:.0f} MB (+{peak_memory - start_peak_memory:.0f} MB)"
+             if peak_memory is not None else ""))
+
+
+def cleanup_dataset(overwrite_files=False, manifest=None, max_workers=None):
     """
     Remove all the horribleness from the dataset.
 
     - Column names are weirdly shortened and partly english and german.
     - States of everything are horrible strings.
+
+    Without a manifest, files whose interim file exists are skipped. With a manifest, files are skipped if the raw
+    file did not change since the interim file was written.
+
+    :param overwrite_files: process all files
+    :param manifest: PreprocessingManifest recording the processed files
+    :param max_workers: number of processes cleaning up files concurrently, PARAMETERS['preprocess_workers'] if None
     :return:
     """
     raw_data_path = configuration['PATHS']['raw_data_dir'].format("test") if configuration['PARAMETERS']['dataset'] == 'test' \
         else configuration['PATHS']['raw_data_dir'].format("model")  # absolute or relative path to directory where data is stored
 
-    interim_data_path = configuration['PATHS']['interim_data_dir'].format("test") if configuration['PARAMETERS']['dataset'] == 'test' \
-        else configuration['PATHS']['interim_data_dir'].format("model")  # absolute or relative path to directory where data is stored
+    interim_data_path = get_interim_data_path()
 
     # make the interim path if not available
     pathlib.Path(interim_data_path).mkdir(parents=True, exist_ok=True)
 
-    # encoding = "ISO-8859-1"
-    encoding = None
-    csv_files = [each_file for each_file in os.listdir(raw_data_path) if each_file.endswith('.csv')]
+    csv_files = sorted(each_file for each_file in os.listdir(raw_data_path) if each_file.endswith('.csv'))
 
+    graph = TaskGraph()
     for each_file in csv_files:
         print(f"--> Fixing modelling in file {each_file} ...")
 
         path = pathlib.Path(raw_data_path + "/" + each_file)
 
-        if not overwrite_files and pathlib.Path(interim_data_path + path.name).exists():
+        if manifest is not None:
+            if not overwrite_files and manifest.is_up_to_date(path.name, [str(path)], [interim_data_path + path.name]):
+                print(f"Skip cleanup as file is unchanged")
+                continue
+        elif not overwrite_files and pathlib.Path(interim_data_path + path.name).exists():
             print(f"Skip cleanup as file exists")
             continue
 
-        if path.name == "DIM_FALL.csv":
-            df = pd.read_csv(path, encoding=encoding, dtype=str)
-            df.columns = ["Patient ID", "Case ID", "Case Type ID", "Case Status", "Case Type", "Start Date", "End Date",
-                          "Patient Type", "Patient Status"]
-
-            df.loc[df["Case Status"] == "Fall ist abgeschlossen", "Case Status"] = "closed"
-            df.loc[df["Case Status"] == "Fall ist aktuell", "Case Status"] = "open"
-
-            df.loc[df["Case Type"] == "ambulanter Fall", "Case Type"] = "ambulatory"
-            df.loc[df["Case Type"] == "stationärer Fall", "Case Type"] = "in-patient"
-            df.loc[df["Case Type"] == "teilstationärer Fall", "Case Type"] = "partially in-patient"
-
-            df.loc[df["Patient Status"] == "aktiv", "Patient Status"] = "active"
-            df.loc[df["Patient Status"] == "storniert", "Patient Status"] = "cancelled"
-            df = df.set_index("Case ID")
-        elif path.name == "DIM_GERAET.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Device ID", "Device Name"]
-            df = df.set_index("Device ID")
-        elif path.name == "DIM_PATIENT.csv":
-            df = pd.read_csv(path, encoding=encoding, dtype=str)
-            df.columns = ["Patient ID", "Gender", "Birth Date", "Zip Code", "Place of Residence", "Canton", "Language"]
-            # TODO: Recreate dataset excluding patients
-            # TODO: WHERE [dim_patient_status]='aktiv' AND [is_early_arrived]=0 AND [is_deleted]=0 AND dim_patient_geburtsdatum!='1753-01-01' AND [dim_patient_typ]='Standard Patient'
-            # df = df[df["Birth Date"] != "1753-01-01"]  # drop all patients without valid birth date
-            df.loc[df["Gender"] == "männlich", "Gender"] = "male"
-            df.loc[df["Gender"] == "weiblich", "Gender"] = "female"
-            df = df.set_index("Patient ID")
-        elif path.name == "DIM_RAUM.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Room ID", "Room Common Name"]
-            df = df.set_index("Room ID")
-        elif path.name == "DIM_TERMIN.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Appointment ID", "Deleted On Source", "Description", "Type", "Type 2", "Date", "Duration in Minutes"]
-            df = df.set_index("Appointment ID")
-        elif path.name == "FAKT_MEDIKAMENTE.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Patient ID", "Case ID", "Drug Name",
-                          "Drug ATC ID",  # Anatomical Therapeutic Chemical Classification Syname ID
-                          "Quantity",
-                          "Unit",
-                          "Disposition Form",
-                          "Submission Date"]
-            df = df.set_index(["Patient ID", "Case ID", "Submission Date"])
-        elif path.name == "FAKT_TERMIN_GERAET.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Appointment ID", "Device ID", "Begin", "End", "Duration in Minutes"]
-            df = df.set_index(["Appointment ID", "Device ID", "Begin"])
-        elif path.name == "FAKT_TERMIN_MITARBEITER.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Appointment ID", "Employee ID", "Begin", "End", "Duration in Minutes"]
-            df = df.set_index(["Appointment ID", "Employee ID", "Begin"])
-        elif path.name == "FAKT_TERMIN_PATIENT.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Appointment ID", "Patient ID", "Case ID"]
-            df = df.set_index(["Appointment ID", "Patient ID", "Case ID"])
-        elif path.name == "FAKT_TERMIN_RAUM.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Appointment ID", "Room ID", "Room Common Name", "Begin", "End", "Duration in Minutes"]
-            df = df.set_index(["Appointment ID", "Room ID", "Begin"])
-        elif path.name == "LA_CHOP_FLAT.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Chop Code", "Usage Year", "Chop Description",
-                          "Code Level 1", "Code Level 1 Description",
-                          "Code Level 2", "Code Level 2 Description",
-                          "Code Level 3", "Code Level 3 Description",
-                          "Code Level 4", "Code Level 4 Description",
-                          "Code Level 5", "Code Level 5 Description",
-                          "Code Level 6", "Code Level 6 Description",
-                          "Chop Status",
-                          "Chop Catalog ID"]
-
-            # Fix encoding error: Replace \x96 with - (\x96 is a dash in latin1: https://stackoverflow.com/a/35731443/4563947)
-            df["Chop Description"] = df["Chop Description"].str.replace("\\x96", "-")
-            df["Code Level 1 Description"] = df["Code Level 1 Description"].str.replace("\\x96", "-")
-            df["Code Level 2 Description"] = df["Code Level 2 Description"].str.replace("\\x96", "-")
-            df["Code Level 3 Description"] = df["Code Level 3 Description"].str.replace("\\x96", "-")
-            df["Code Level 4 Description"] = df["Code Level 4 Description"].str.replace("\\x96", "-")
-            df["Code Level 5 Description"] = df["Code Level 5 Description"].str.replace("\\x96", "-")
-            df["Code Level 6 Description"] = df["Code Level 6 Description"].str.replace("\\x96", "-")
-
-            df = df.set_index(["Chop Catalog ID"])
-        elif path.name == "LA_ISH_NBEW.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            # the db designer of that source syname was just a troll
-            df.columns = ["Case ID", "Serial Number", "Stay Type ID", "Stay Type", "Begin Date", "Begin Time", "Status", "End Date", "End Time", "Serial Reference", "Description",
-                          "Department",  # "fachliche Organisationseinheit" (https://help.sap.com/saphelp_ewm70/helpdata/de/40/f39a3916f07e00e10000000a11402f/frameset.htm)
-                          "Ward",  #  Nursing Organisational Unit/ "pflegerische Organisationseinheit = Abteilungen/Station"
-                          "Organisational Unit of Entry",  # "Aufnahme-Organisationseinheit"
-                          "SAP Room ID", "Bed ID", "Is Cancelled", "Partner ID"]
-
-            df["Begin Time"] = df["Begin Time"].str[:8]
-            df["End Time"] = df["End Time"].str[:8]
-
-            df["Begin Datetime"] = (df["Begin Date"] + " " + df["Begin Time"])
-            df["End Datetime"] = (df["End Date"] + " " + df["End Time"])
-            df = df.drop(labels=["Begin Date", "Begin Time", "End Date", "End Time"], axis=1)
-
-            df["Begin Datetime"] = pd.to_datetime(df["Begin Datetime"], format="%Y-%m-%d %H:%M:%S", errors='coerce')
-            df["End Datetime"] = pd.to_datetime(df["End Datetime"], format="%Y-%m-%d %H:%M:%S", errors='coerce')
-            df = df.set_index(["Serial Number"])
-
-            sap_nbew_rooms_df = df[["Department", "Ward", "SAP Room ID"]] #, "Bed ID"]]
-
-            sap_nbew_rooms_df = sap_nbew_rooms_df.groupby(sap_nbew_rooms_df.columns.tolist()).size().reset_index().rename(columns={0: 'count'})
-
-            sap_nbew_rooms_df = sap_nbew_rooms_df.fillna(value={"Room ID": "-"})
-
-            # sap_nbew_rooms_df.rename(columns={"Room ID": "SAP Room ID"}, inplace=True)
-
-            # sap_nbew_rooms_df = sap_nbew_rooms_df.sort_values(by="count", ascending=False)
-
-            def extract_waveware_ids(row):
-                """
-                Extract waveware tokens from SAP Room IDs for Insel Hospital rooms.
-                """
-                row['SAP Building Abbreviation'] = pd.NA
-                row['Waveware Floor ID'] = pd.NA
-                row['Waveware Room ID'] = pd.NA
-
-                if not pd.isna(row["SAP Room ID"]) and not row["SAP Room ID"].isdecimal():
-                    pattern = '([A-Za-z]{2,3}[0-9]*)[\\.\\s]+([A-Za-z]*[0-9]*)[\\.N\\s-]+([0-9]+[A-Za-z]*)$'
-                    match = re.search(pattern, row['SAP Room ID'])
-
-                    if match is not None:
-                        # if extraction was successful, read metric df and compose tuple
-                        row['SAP Building Abbreviation'], row['Waveware Floor ID'], row['Waveware Room ID'] = match.groups()
-                    else:
-                        pattern = '([A-Za-z]+)[\\.\\s]*([0-9]*)[\\.N\\s-]+([0-9]+[A-Za-z]*)$'
-                        match = re.search(pattern, row['SAP Room ID'])
-
-                        if match is not None:
-                            # if extraction was successful, read metric df and compose tuple
-                            row['SAP Building Abbreviation'], row['Waveware Floor ID'], row['Waveware Room ID'] = match.groups()
-                        else:
-                            pattern = '([A-Za-z]+[0-9]*)[\\s]+([A-Za-z]*)[\\.N\\s-]*([0-9]+[A-Za-z]*)'
-                            match = re.search(pattern, row['SAP Room ID'])
-
-                            if match is not None:
-                                # if extraction was successful, read metric df and compose tuple
-                                row['SAP Building Abbreviation'], row['Waveware Floor ID'], row['Waveware Room ID'] = match.groups()
-
-                return pd.Series({'SAP Building Abbreviation': row['SAP Building Abbreviation'], 'Waveware Floor ID': row['Waveware Floor ID'], 'Waveware Room ID': row['Waveware Room ID']})
-
-            sap_nbew_rooms_df = pd.concat([sap_nbew_rooms_df, sap_nbew_rooms_df.apply(extract_waveware_ids, axis=1)], axis=1)
-
-            df = pd.merge(df, sap_nbew_rooms_df[["SAP Room ID", "SAP Building Abbreviation", "Waveware Floor ID", "Waveware Room ID"]], on="SAP Room ID", how="left")
-        elif path.name == "LA_ISH_NDIA.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Case ID", "Diagnosis Key 1", "Diagnosis Category 1", "Date of Diagnosis", "DRG Category"] # FALNR,DKEY1,DKAT1,DIADT,DRG_CATEGORY
-            df = df.set_index("Case ID", "Diagnosis Key 1")
-        elif path.name == "LA_ISH_NDRG.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Case ID", "Cost Weight"]
-            df = df.set_index("Case ID")
-        elif path.name == "LA_ISH_NFPZ.csv":  # https://www.se80.co.uk/saptables/n/nfpz/nfpz.htm
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["EARZT", "FARZT", "Case ID", "Serial Number", "Partner ID", "Cancelled"] # EARZT,FARZT,FALNR,LFDNR,PERNR,STORN]
-            df = df.set_index("Serial Number")
-        elif path.name == "LA_ISH_NGPA.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Partner ID", "Name 1", "Name 2", "Name 3", "Country", "Zip Code", "Place of Residence", "Place of Residence", "Street", "Hospital"]
-            df = df.set_index("Partner ID")
-        elif path.name == "LA_ISH_NICP.csv":  # https://help.sap.com/doc/saphelp_crm60/6.0.0.14/en-US/d9/6f2fcf772644fe8e10cc3c3cca6039/frameset.htm
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Stay ID", "Catalog ID", "Chop Code", "Surgeries Quantity", "Beginning", "Location Surgery Information", "Cancelled", "Case ID", "Ward"]
-            df = df.set_index(["Stay ID", "Catalog ID", "Case ID"])
-        elif path.name == "TACS_DATEN.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Patient ID", "Patient Type", "Patient Status", "Case ID", "Case Type", "Case Status", "Date of Care", "Duration of Care in Mins", "Employee Staff Number", "Employee Employment Number", "Employee Login", "Batch Run ID"]
-            df = df.set_index(["Patient ID", "Employee Staff Number", "Date of Care"])
-        elif path.name == "V_LA_ISH_NDIA_NORM.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Case ID", "Diagnosis Key 1", "Diagnosis Category 1", "Date of Diagnosis", "DRG Category"]
-            df = df.set_index(["Case ID", "Diagnosis Key 1"])
-        elif path.name == "V_LA_ISH_NRSF_NORM.csv":  # https://www.se80.co.uk/saptables/n/nrsf/nrsf.htm
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Patient ID", "Risk Factor ID", "Description", "Creation Date", "Creation Time"]
-            df = df.set_index(["Patient ID", "Risk Factor ID", "Creation Time"])
-        elif path.name == "VRE_SCREENING_DATA.csv":
-            df = pd.read_csv(path, parse_dates=["Birth Date", "Record Date"], dtype=str, index_col=0)
-            df.columns = ['Order ID', 'Record Date', 'Measurement Date',
-                          'First Name', 'Last Name', 'Birth Date', 'Patient ID', 'Pathogen Result']
-            df = df.set_index(["Order ID"])
-        elif path.name == "SAP_ISH_ZHC_RB_STANDORT":  # Raumbuch Standort Data (apparently Waveware)
-            df = pd.read_csv(path, dtype=str)
-            df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
-            df.columns = ["Waveware Campus", "Common Name"]
-        elif path.name == "SAP_ISH_ZHC_RB_BUILDING":
-            df = pd.read_csv(path, dtype=str)
-            df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
-            df.columns = ["Waveware Campus", "Waveware Building ID", "Building Common Name"]
-            df.set_index("Waveware Building ID", inplace=True)
-        elif path.name == "SAP_ISH_ZHC_RB_STOCKWERK":
-            df = pd.read_csv(path, dtype=str)
-            df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
-            df.columns = ["Waveware Campus", "Waveware Building ID", "Waveware Floor ID", "Floor Common Name"]
-            # df = pd.merge(df, sap_building_df, on="Waveware Building ID")
-        elif path.name == "SAP_ISH_ZHC_RB_RAUM":
-            df = pd.read_csv(path, dtype=str)
-            df.drop(["MANDT", "ERDAT", "ERNAM", "AEDAT", "AENAM", "BATCH_RUN_ID"], axis=1, inplace=True)
-            df.columns = ["Waveware Campus", "Waveware Building ID", "Waveware Floor ID", "Waveware Room ID", "Room Common Name", "Waveware Room Full ID"]
-            df.set_index("Waveware Room Full ID", inplace=True)
-            # df = pd.merge(df, sap_building_df, on="Waveware Building ID")
-        elif path.name == "LA_ISH_NBAU.csv":
-            df = pd.read_csv(path, dtype=str)
-            # SAP klingon translation: https://www.tcodesearch.com/sap-tables/detail?id=NBAU
-            df.drop(["MANDT", "TELNR", "TELFX", "TELTX", "LOEKZ", "LOUSR", "LODAT",
-                                       "ERDAT", "ERUSR", "UPDAT", "UPUSR", "BEGDT", "ENDDT", "FREIG",
-                                       "TALST", "ADDIN","XKOOR", "YKOOR", "BREIT", "LAENG", "ARCHV",
-                                       "MIGRATED_OBJID", "BATCH_RUN_ID", "ZZBEMK", "ZZVERLEGUNG", "ZZVORHALTE",
-                                       "ZZPRIVAT", "EANNR", "BETTST_TYP"], axis=1, inplace=True)
-
-            df.columns = ["SAP Room ID", "Unit Type", "Unit Name", "SAP Room ID 1", "SAP Room ID 2",
-                                            "Short Text", "Long Text", "Address Information", "Address Object",
-                                            "Waveware Campus", "Waveware Building ID", "Waveware Floor ID", "Waveware Room ID"]
-
-            df.loc[df["Unit Type"] == "Z", "Unit Type"] = "Room"
-            df.loc[df["Unit Type"] == "B", "Unit Type"] = "Bettstellplatz"
-            df = df[df["Unit Type"] == "Room"]
-
-            df['SAP Building Abbreviation 1'] = pd.NA
-            df['SAP Building Abbreviation 2'] = pd.NA
-
-            def extract_campi(row):
-                """
-                Extract the campus of the building and room based on hints in the Unit Name.
-                """
-                if pd.isna(row['Waveware Campus']):
-                    if row['Unit Name'].find("Aarberg") != -1:
-                        row['Waveware Campus'] = 'AARB'
-                    if row['Unit Name'].find("Riggisberg") != -1:
-                        row['Waveware Campus'] = 'RIGG'
-                    if row['Unit Name'].find("R_") != -1:
-                        row['Waveware Campus'] = 'RIGG'
-                    if row['Unit Name'].find("Tiefenau") != -1:
-                        row['Waveware Campus'] = 'TIEF'
-                    if row['Unit Name'].find("Münsigen") != -1:
-                        row['Waveware Campus'] = 'MUEN'
-                    if row['Unit Name'].find("Belp") != -1:
-                        row['Waveware Campus'] = 'BELP'
-
-                return row
-
-            def extract_ids(row):
-                """
-                Extract waveware tokens from SAP Room IDs for Insel Hospital rooms.
-                """
-                if row['Waveware Campus'] not in ['Aarberg', 'Riggisberg', 'Tiefenau', 'Münsigen'] and not pd.isna(row['SAP Room ID 2']):
-                    if pd.isna(row["Waveware Room ID"]):
-                        pattern = '([A-Za-z]+[0-9]*)[\s]+([A-Za-z]*[0-9]*)[\.N\s-]+([0-9]+[A-Za-z]*)'
-                        match = re.search(pattern, row['SAP Room ID 2'])
-                        if match is not None:
-                            # if extraction was successful, read metric df and compose tuple
-                            row['Waveware Building ID'], row['Waveware Floor ID'], row['Waveware Room ID'] = match.groups()
-                return row
-
-            def extract_waveware_ids(row):
-                """
-                Run all above methods on the same row.
-                """
-                row = extract_campi(row)
-                row = extract_ids(row)
-
-                return pd.Series({'Waveware Campus': row['Waveware Campus'], 'SAP Building Abbreviation 2': row['SAP Building Abbreviation 2'], 'Waveware Building ID': row['Waveware Building ID'], 'Waveware Floor ID': row['Waveware Floor ID'], 'Waveware Room ID': row['Waveware Room ID']})
-
-            df = pd.concat([df.drop(["Waveware Campus", "Waveware Building ID", "SAP Building Abbreviation 2", "Waveware Floor ID", "Waveware Room ID"], axis=1), df.apply(extract_waveware_ids, axis=1)], axis=1)
-
-            def fix_SAP_ID_1(row):
-                """
-                Fix SAP ID 1 for Aarberg or unknown rooms.
-                """
-                if re.search('[0-9]+', row["SAP Room ID"]) is not None and (row["Waveware Campus"] != "ISB" or pd.isna(row["Waveware Campus"])):
-                    row["SAP Room ID 1"] = row['SAP Room ID']
-
-                return pd.Series({'SAP Room ID 1': row["SAP Room ID 1"]})
-
-            # fix the Aarberg SAP Room IDs to make it possible to identify them in the SAP NBEW table data
-            df = pd.concat([df.drop(["SAP Room ID 1"], axis=1), df.apply(fix_SAP_ID_1, axis=1)], axis=1)
-
-            def extract_sap_1_ids(row):
-                """
-                Extract SAP abbreviations from SAP Room IDs for Insel Hospital rooms.
-                """
-                if row['Waveware Campus'] not in ['Aarberg', 'Riggisberg', 'Tiefenau', 'Münsigen'] and not pd.isna(row['SAP Room ID 1']):
-                    pattern = '([A-Za-z]+[0-9]*)[\s]+'
-                    match = re.search(pattern, row['SAP Room ID 1'])
-                    if match is not None:
-                        # if extraction was successful, read metric df and compose tuple
-                        row['SAP Building Abbreviation 1'] = match.groups()[0]
-                return pd.Series({'SAP Building Abbreviation 1': row['SAP Building Abbreviation 1']})
-
-            # extract building abbreviation 1 from SAP Room ID 1
-            df = pd.concat([df.drop(['SAP Building Abbreviation 1'], axis=1), df.apply(extract_sap_1_ids, axis=1)], axis=1)
-
-            def extract_sap_2_ids(row):
-                """
-                Extract SAP abbreviations from SAP Room IDs for Insel Hospital rooms.
-                """
-                if row['Waveware Campus'] not in ['Aarberg', 'Riggisberg', 'Tiefenau', 'Münsigen'] and not pd.isna(row['SAP Room ID 1']):
-                    pattern = '([A-Za-z]+[0-9]*)[\s]+'
-                    match = re.search(pattern, row['SAP Room ID 2'])
-                    if match is not None:
-                        # if extraction was successful, read metric df and compose tuple
-                        row['SAP Building Abbreviation 2'] = match.groups()[0]
-                return pd.Series({'SAP Building Abbreviation 2': row['SAP Building Abbreviation 2']})
-
-            # extract building abbreviation 1 from SAP Room ID 1
-            df = pd.concat([df.drop(['SAP Building Abbreviation 2'], axis=1), df.apply(extract_sap_2_ids, axis=1)], axis=1)
-        elif path.name == "Waveware_Auszug Gebaeudeinformation Stand 03.12.2020.csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df = df.drop(["Standort", "Parzellennummer", "Zonenplan", "Denkmalpflege", "Anlage-ID", "Bemerkung", "Eigentümer (SAP)", "Vermietung (SAP)", "Portfolio (SAP)", "Baujahr", "Gebäudetyp", "GVB-Nummer", "Amtlicher Wert", "Gebäudeversicherungswert", "Gebäudezustand", "Technologiestand HLKSE", "Techn. Ausb.standard", "Zustand Technik", "Klimatisierung", "Aufzug", "Gebäudezustand Bem.", "Status"], axis=1)
-            df.columns = ["Waveware Building Full ID", "Building Code", "Waveware Building ID", "Building abbreviation", "Building Common Name", "Street", "Zip Code", "Location", "SAP-Anlage Nr."]
-            df.drop(["Zip Code", "Location","SAP-Anlage Nr.", "Building Code"], axis=1, inplace=True)
-            df = df[df["Building Common Name"] != "Grundstück Inselareal"]
-            df = df[~pd.isna(df["Building abbreviation"])]
-            # df.sort_values(by=["Building abbreviation"], inplace=True)
-            # df.set_index("Waveware Building ID", inplace=True)
-        elif path.name == "Waveware_Auszug Flaechenmanagement IDSC (Stand 02.07.20).csv":
-            df = pd.read_csv(path, encoding="ISO-8859-1", dtype=str)
-            df.columns = ["Waveware Building ID", "Building Common Name", "Waveware Floor ID", "Waveware Room ID", "Waveware Room Full ID", "Room Common Name", "Room Area", "PC Group ID", "Sub-EC(PC) Nr", "Profitcenter"]
-            df = df.drop(["Room Area", "PC Group ID", "Sub-EC(PC) Nr", "Profitcenter"], axis=1)
-            # df.set_index("Waveware Room Full ID", inplace=True)
-        else:
-            print(f"No fix proposed for {each_file}")
-            continue
+        graph.add_task(each_file, cleanup_file, path, interim_data_path)
 
-        df.to_csv(interim_data_path + path.name)
+    # every file is written by its own task, the output does not depend on the number of workers
+    if max_workers is None:
+        max_workers = configuration['PARAMETERS'].get('preprocess_workers', 1)
 
+    def record_file(each_file, nbr_rows):
+        # recorded as soon as the file is written, so a failing file does not discard the others
+        if nbr_rows is not None and manifest is not None:
+            manifest.record(each_file, [str(pathlib.Path(raw_data_path + "/" + each_file))], [interim_data_path + each_file])
 
-def improve_dataset():
-    interim_data_path = configuration['PATHS']['interim_data_dir'].format("test") if configuration['PARAMETERS']['dataset'] == 'test' \
-        else configuration['PATHS']['interim_data_dir'].format("model")  # absolute or relative path to directory where data is stored
+    graph.run(max_workers=min(max_workers, max(len(graph.tasks), 1)), on_result=record_file)
+
+
+def improve_dataset(manifest=None):
+    """
+    Create the room and building identifiers from the interim building units, stays and Waveware buildings.
+
+    :param manifest: PreprocessingManifest, the identifiers are only recreated if their input files changed
+    :return:
+    """
+    interim_data_path = get_interim_data_path()
+    input_paths = [interim_data_path + name for name in IMPROVE_INPUT_FILES]
+    output_paths = [interim_data_path + name for name in IMPROVE_OUTPUT_FILES]
+    if manifest is not None and manifest.is_up_to_date("improve_dataset", input_paths, output_paths):
+        print(f"Skip improvement as input files are unchanged")
+        return
 
     sap_building_unit_fix_df = pd.read_csv(interim_data_path + "LA_ISH_NBAU.csv", dtype=str)
 
@@ -410,7 +584,7 @@ def improve_dataset():
     mergable["SAP Building Abbreviation 2"] = mergable["SAP Building Abbreviation 1"]
     mergable["SAP Room ID 2"] = mergable["SAP Room ID 1"]
     room_identifiers_df = pd.concat([room_identifiers_df, mergable])
-    room_identifiers_df.to_csv(interim_data_path + "room_identifiers.csv")
+    write_interim_table(room_identifiers_df, interim_data_path + "room_identifiers.csv")
 
     # floor_identifiers_df = room_identifiers_df[["Waveware Campus", "Waveware Building ID", "SAP Building Abbreviation 1", "SAP Building Abbreviation 2", "Waveware Floor ID"]]
     # floor_identifiers_df = floor_identifiers_df.drop_duplicates()
@@ -440,7 +614,9 @@ def improve_dataset():
     # TODO:several buildings are gone here (PH7, HausX)
     building_identifiers_df = pd.merge(building_identifiers_df, waveware_buildings_coords_df, on="Waveware Building ID")
     building_identifiers_df.drop(["Building abbreviation", "Type", "Unnamed: 0"], axis=1, inplace=True)
-    building_identifiers_df.to_csv(interim_data_path + "building_identifiers.csv")
+    write_interim_table(building_identifiers_df, interim_data_path + "building_identifiers.csv")
+    if manifest is not None:
+        manifest.record("improve_dataset", input_paths, output_paths)
 
 
 if __name__ == '__main__':
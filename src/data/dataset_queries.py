@@ -7,16 +7,151 @@ CSV and SQL files will be named identically, e.g.:
 
 The Atelier_DataScience is queried directly via the `pyodbc` module, and requires an additional connection file
 containing details on the ODBC connection to the Atelier (see VRE Model Overview for more information).
+
+Several queries are executed at once (``PARAMETERS['sql_workers']``), each on a connection borrowed from a
+``ConnectionPool`` of that size. The rows are fetched in batches of ``PARAMETERS['sql_fetch_rows']`` and written
+to the CSV file (optionally gzip compressed) as they arrive, so no result set is held in memory. Any DB-API 2.0
+connection can be pooled, e.g. ``sqlite3`` connections as a local stand-in for the Atelier.
 """
 
 import csv
 import datetime
+import gzip
 import os
+import pathlib
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 
-import pyodbc
-from configuration.basic_configuration import configuration
 import pandas as pd
-import pathlib
+
+from configuration.basic_configuration import configuration
+
+# register special dialect to control csv delimiter and proper newline formatting
+csv.register_dialect('sql_special', delimiter=',', lineterminator='\n')
+
+
+def connect_odbc(connection_file, trusted_connection=True):
+    """Opens a connection to the Atelier_DataScience.
+
+    Args:
+        connection_file (str):      path to file containing information used for server connection and authentication,
+                                    as well as database selection (read and passed to ``pyodbc.connect()`` )
+                                    This information is read from an external file so as to avoid hard-coding usernames
+                                    and passwords
+        trusted_connection (bool):  additional argument passed to pyodbc.connect(), converted to "yes" if ``True`` and
+                                    "no" otherwise (defaults to ``True``)
+
+    Returns:
+        pyodbc.Connection: the opened connection
+    """
+    import pyodbc  # only required to pull the dataset, not to process it
+
+    connection_string = ';'.join([line.replace('\n', '') for line in open(connection_file, 'r')])
+    return pyodbc.connect(connection_string, trusted_connection='yes' if trusted_connection else 'no')
+
+
+class ConnectionPool:
+    """Bounded pool of database connections shared by the threads executing the queries.
+
+    Connections are opened on demand, at most ``size`` at once, and reused by the following queries.
+    """
+
+    def __init__(self, connect, size):
+        """Initiates an empty pool.
+
+        Args:
+            connect (function):     opens a new DB-API 2.0 connection, e.g. ``partial(connect_odbc, connection_file)``
+            size (int):             maximum number of open connections
+        """
+        self.connect = connect
+        self.size = size
+        self.idle_connections = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)  # one per connection in use
+
+    @contextmanager
+    def connection(self):
+        """Borrows a connection, waiting for one to be returned if ``size`` connections are in use.
+
+        A connection on which an error was raised is closed instead of being returned to the pool.
+        """
+        self.slots.acquire()
+        try:
+            try:
+                conn = self.idle_connections.get_nowait()
+            except queue.Empty:
+                conn = self.connect()
+            try:
+                yield conn
+            except BaseException:
+                self._close(conn)
+                raise
+            self.idle_connections.put(conn)
+        finally:
+            self.slots.release()
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Closes all idle connections."""
+        while not self.idle_connections.empty():
+            self._close(self.idle_connections.get_nowait())
+
+
+def write_sql_query_results(path_to_sql, path_to_output, conn, csv_sep=',', fetch_rows=10000):
+    """Executes an SQL query and streams the results to path_to_output in batches.
+
+    The rows are written to a temporary file which is renamed once all rows are written, and removed if the query
+    fails, so an interrupted pull does not leave an incomplete file behind (which would be skipped by the next pull).
+
+    Args:
+        path_to_sql (str):      Path to .sql file containing the query to be executed
+        path_to_output (str):   Path to .csv file destination, which is gzip compressed if it ends with ``.gz``
+        conn:                   DB-API 2.0 connection on which the query is executed
+        csv_sep (str):          Delimiter used in the csv file
+        fetch_rows (int):       number of rows fetched from the server at once
+
+    Returns:
+        dict: "Rows", "Seconds" and "Bytes" (size of the written file) of the table
+    """
+    start_time = time.perf_counter()
+
+    # Read the SQL file
+    query = ' '.join([line.replace('\n', '') for line in open(path_to_sql, 'r')])
+
+    tmp_path = path_to_output + ".part"
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query)
+
+        nbr_rows = 0
+        open_output = partial(gzip.open, compresslevel=6) if path_to_output.endswith(".gz") else open
+        with open_output(tmp_path, 'wt', newline='') as writefile:
+            csv_writer = csv.writer(writefile, dialect='sql_special', delimiter=csv_sep)
+            csv_writer.writerow([i[0] for i in cursor.description])  # write headers
+            while True:
+                rows = cursor.fetchmany(fetch_rows)
+                if len(rows) == 0:
+                    break
+                csv_writer.writerows(rows)
+                nbr_rows += len(rows)
+        os.replace(tmp_path, path_to_output)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    finally:
+        cursor.close()
+
+    return {"Rows": nbr_rows, "Seconds": time.perf_counter() - start_time, "Bytes": os.path.getsize(path_to_output)}
 
 
 def write_sql_query_results_to_csv(path_to_sql, path_to_csv, csv_sep, connection_file, trusted_connection=True,
@@ -45,32 +180,76 @@ def write_sql_query_results_to_csv(path_to_sql, path_to_csv, csv_sep, connection
     # create path to store the csvs
     pathlib.Path(path_to_csv).parent.mkdir(parents=True, exist_ok=True)
 
-    connection_string = ';'.join([line.replace('\n', '') for line in open(connection_file, 'r')])
-
-    # print(connection_string)
-    conn = pyodbc.connect(connection_string, trusted_connection='yes' if trusted_connection else 'no')
-    cursor = conn.cursor()
-
-    # Read the SQL file
-    query = ' '.join([line.replace('\n', '') for line in open(path_to_sql, 'r')])
-
-    # execute query
+    conn = connect_odbc(connection_file, trusted_connection=trusted_connection)
     try:
-        cursor.execute(query)
-    except pyodbc.ProgrammingError as e:
+        write_sql_query_results(path_to_sql, path_to_csv, conn, csv_sep=csv_sep)
+    except Exception as e:  # e.g. pyodbc.ProgrammingError
         print(e)
         return e
+    finally:
+        # close connection
+        conn.close()
 
-    # Then write results to SQL
-    # --> register special dialect to control csv delimiter and proper newline formatting
-    csv.register_dialect('sql_special', delimiter=csv_sep, lineterminator='\n')
-    with open(path_to_csv, 'w') as writefile:
-        csv_writer = csv.writer(writefile, dialect='sql_special')
-        csv_writer.writerow([i[0] for i in cursor.description])  # write headers
-        csv_writer.writerows(cursor)
 
-    # close connection
-    conn.close()
+def extract_queries(sql_files, output_dir, connect, csv_sep=',', max_workers=None, fetch_rows=None,
+                    compression=None, force_overwrite=False):
+    """Executes several SQL queries concurrently and writes their results to output_dir.
+
+    Args:
+        sql_files (list):           paths to the .sql files, the output files are named identically
+        output_dir (str):           directory to write the output files to
+        connect (function):         opens a new DB-API 2.0 connection (see ``ConnectionPool``)
+        csv_sep (str):              Delimiter used in the csv files
+        max_workers (int):          number of queries executed at once, i.e. the size of the connection pool, defaults
+                                    to ``PARAMETERS['sql_workers']``
+        fetch_rows (int):           number of rows fetched from the server at once, defaults to
+                                    ``PARAMETERS['sql_fetch_rows']``
+        compression (str):          ``None`` for .csv files or ``"gzip"`` for .csv.gz files
+        force_overwrite (bool):     whether existing output files are replaced, otherwise their query is skipped
+
+    Returns:
+        tuple: per table metrics (pd.DataFrame with the columns "Table", "Rows", "Seconds", "Rows per Second" and
+        "Bytes", in the order of sql_files) and the exceptions raised by the failed queries
+    """
+    if max_workers is None:
+        max_workers = configuration['PARAMETERS'].get('sql_workers', 1)
+    if fetch_rows is None:
+        fetch_rows = configuration['PARAMETERS'].get('sql_fetch_rows', 10000)
+    pathlib.Path(output_dir).mkdir(parents=True, exist_ok=True)
+    pool = ConnectionPool(connect, max(max_workers, 1))
+
+    def extract(path_to_sql):
+        table = os.path.basename(path_to_sql).replace('.sql', '')
+        path_to_output = os.path.join(output_dir, table + ('.csv.gz' if compression == 'gzip' else '.csv'))
+        if os.path.exists(path_to_output) and not force_overwrite:
+            print(f"{path_to_output} exists. force_overwrite is disabled, not overwriting.")
+            return table, None
+        with pool.connection() as conn:
+            metrics = write_sql_query_results(path_to_sql, path_to_output, conn, csv_sep=csv_sep, fetch_rows=fetch_rows)
+        print(f'--> Loaded {table}: {metrics["Rows"]} rows in {str(datetime.timedelta(seconds=int(metrics["Seconds"])))}'
+              f' ({metrics["Rows"] / max(metrics["Seconds"], 1e-6):.0f} rows/s)', flush=True)
+        return table, metrics
+
+    table_metrics = []
+    exceptions = []
+    try:
+        with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as executor:
+            futures = [executor.submit(extract, path_to_sql) for path_to_sql in sql_files]
+            for path_to_sql, future in zip(sql_files, futures):
+                try:
+                    table, metrics = future.result()
+                except Exception as e:  # e.g. pyodbc.ProgrammingError
+                    print(f'--> Failed {os.path.basename(path_to_sql)}: {e}')
+                    exceptions.append(e)
+                    continue
+                if metrics is not None:
+                    table_metrics.append({"Table": table, **metrics})
+    finally:
+        pool.close()
+
+    metrics_df = pd.DataFrame(table_metrics, columns=["Table", "Rows", "Seconds", "Bytes"])
+    metrics_df.insert(3, "Rows per Second", metrics_df["Rows"] / metrics_df["Seconds"].clip(lower=1e-6))
+    return metrics_df, exceptions
 
 
 def pull_raw_dataset():
@@ -96,23 +275,16 @@ def pull_raw_dataset():
     # --> Use this line instead for loading only specific files:
     # sql_files = [each_file for each_file in os.listdir(SQL_DIR) if each_file in ['OE_PFLEGE_MAP.sql']]
 
-    exceptions = []
-
-    for each_file in sql_files:
-        print('--> Loading file: ' + each_file + '... ', end='', flush=True)
-        start_dt = datetime.datetime.now()
-
-        # execute query and write results
-        potential_exception = write_sql_query_results_to_csv(path_to_sql=os.path.join(SQL_DIR, each_file),
-                                                             path_to_csv=os.path.join(CSV_DIR, each_file.replace('.sql', '.csv')),
-                                                             csv_sep=CSV_DELIM,
+    start_dt = datetime.datetime.now()
+    metrics_df, exceptions = extract_queries(sql_files=[os.path.join(SQL_DIR, each_file) for each_file in sql_files],
+                                             output_dir=CSV_DIR,
+                                             connect=partial(connect_odbc,
                                                              connection_file=configuration['PATHS']['odbc_file_path'],
-                                                             trusted_connection=False)
-        if potential_exception is not None:
-            exceptions.append(potential_exception)
-        else:
-            print(f'\tDone!\t Query execution time: {str(datetime.datetime.now() - start_dt).split(".")[0]}')
-        # --> print timedelta without fractional seconds (original string would be printed as 0:00:13.4567)
+                                                             trusted_connection=False),
+                                             csv_sep=CSV_DELIM)
+    # --> print timedelta without fractional seconds (original string would be printed as 0:00:13.4567)
+    print(f'\nLoaded {metrics_df["Rows"].sum()} rows of {len(metrics_df)} tables in '
+          f'{str(datetime.datetime.now() - start_dt).split(".")[0]}:\n{metrics_df.to_string(index=False)}')
 
     if len(exceptions) != 0:
         raise Exception("\n Not all files loaded successfully, check above.")
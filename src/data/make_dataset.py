@@ -11,7 +11,8 @@ from pathlib import Path
 
 # from src.data.dataset_queries import pull_raw_dataset
 from src.data.merge_data import merge_data
-from src.data.dataset_preprocessor import cleanup_dataset, improve_dataset
+from src.data.dataset_preprocessor import cleanup_dataset, improve_dataset, get_interim_data_path
+from src.data.preprocessing_manifest import PreprocessingManifest, MANIFEST_NAME
 
 
 @click.command()
@@ -30,11 +31,15 @@ def main():
     logger.info('Pulling dataset from database if not available yet...')
 #    pull_raw_dataset()
 
+    # only the files whose inputs changed since the last run are processed
+    Path(get_interim_data_path()).mkdir(parents=True, exist_ok=True)
+    manifest = PreprocessingManifest(get_interim_data_path() + MANIFEST_NAME)
+
     logger.info('Cleaning up dataset...')
-    cleanup_dataset()
+    cleanup_dataset(manifest=manifest)
 
     logger.info('Improve dataset...')
-    improve_dataset()
+    improve_dataset(manifest=manifest)
 
 
 if __name__ == '__main__':
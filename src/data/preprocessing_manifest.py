@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""This script contains the manifest used to preprocess only the files whose inputs changed.
+
+Every preprocessing step (e.g. the cleanup of ``LA_ISH_NBEW.csv`` or the room identifiers of ``improve_dataset()``) is
+recorded in a JSON file in the interim directory with the content checksum, size, header columns and number of rows of
+its input and output files. A step is up to date if all its inputs still have the recorded checksums and its outputs
+were not modified since. As the outputs of one step are the inputs of the next, a step whose input was reprocessed
+with a different result is reprocessed as well (e.g. ``LA_ISH_NBEW.csv`` :math:`\\longrightarrow`
+``room_identifiers.csv``).
+
+Files whose size and modification time match the manifest are not hashed again.
+
+-----
+"""
+
+import csv
+import hashlib
+import json
+import logging
+import os
+
+MANIFEST_FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def get_file_entry(path, block_size=1 << 20):
+    """Describes the file at path.
+
+    Args:
+        path (str):         path of the file
+        block_size (int):   number of bytes read at once
+
+    Returns:
+        dict: ``checksum`` (SHA-256 hex digest of the content), ``size``, ``mtime_ns``, ``columns`` (header of a CSV
+        file, ``None`` for other files) and ``rows`` (number of lines after the header)
+    """
+    checksum = hashlib.sha256()
+    nbr_lines = 0
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            checksum.update(block)
+            nbr_lines += block.count(b"\n")
+
+    columns = None
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="ISO-8859-1") as f:
+            columns = next(csv.reader(f), [])
+    stat = os.stat(path)
+    return {"checksum": checksum.hexdigest(), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "columns": columns, "rows": max(nbr_lines - 1, 0)}
+
+
+class PreprocessingManifest:
+    """Checksums of the input and output files of all preprocessing steps (see module docstring).
+    """
+
+    def __init__(self, path):
+        """Loads the manifest at path, or starts an empty one if there is none.
+
+        Args:
+            path (str): path of the manifest JSON file
+        """
+        self.path = path
+        self.steps = dict()  # step name -> {"inputs": {path: file entry}, "outputs": {path: file entry}}
+        if os.path.exists(path):
+            try:
+                with open(path) as manifest_file:
+                    manifest = json.load(manifest_file)
+                if manifest.get("version", None) == MANIFEST_FORMAT_VERSION:
+                    self.steps = manifest["steps"]
+                else:
+                    logging.warning(f"Ignoring manifest {path} of format version {manifest.get('version', None)}")
+            except (ValueError, KeyError) as e:
+                logging.warning(f"Ignoring unreadable manifest {path}: {e}")
+
+    def get_entry(self, path, recorded_entry=None):
+        """Returns the entry of the file at path, reusing the checksum of recorded_entry if the file was not modified.
+
+        Args:
+            path (str):             path of the file
+            recorded_entry (dict):  entry of the file recorded in the manifest
+
+        Returns:
+            dict: file entry (see ``get_file_entry()``), or ``None`` if the file does not exist
+        """
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        if recorded_entry is not None and recorded_entry["size"] == stat.st_size \
+                and recorded_entry["mtime_ns"] == stat.st_mtime_ns:
+            return recorded_entry
+        return get_file_entry(path)
+
+    def is_up_to_date(self, step, input_paths, output_paths):
+        """Checks whether the outputs of a step were created from the current inputs.
+
+        Args:
+            step (str):             name of the step
+            input_paths (list):     paths of the files read by the step
+            output_paths (list):    paths of the files written by the step
+
+        Returns:
+            bool: ``True`` if the step was recorded with the same input and output files, all inputs have the recorded
+            checksums and all outputs exist with the recorded checksums
+        """
+        recorded = self.steps.get(step, None)
+        if recorded is None or set(recorded["inputs"].keys()) != set(input_paths) \
+                or set(recorded["outputs"].keys()) != set(output_paths):
+            return False
+        for kind, paths in [("inputs", input_paths), ("outputs", output_paths)]:
+            for path in paths:
+                recorded_entry = recorded[kind][path]
+                entry = self.get_entry(path, recorded_entry)
+                if entry is None or entry["checksum"] != recorded_entry["checksum"]:
+                    if entry is not None and kind == "inputs":
+                        logging.info(f"{path} changed: {recorded_entry['rows']} -> {entry['rows']} rows"
+                                     + ("" if entry["columns"] == recorded_entry["columns"] else ", columns changed"))
+                    return False
+        return True
+
+    def record(self, step, input_paths, output_paths):
+        """Records the current input and output files of a step and saves the manifest.
+
+        Args:
+            step (str):             name of the step
+            input_paths (list):     paths of the files read by the step
+            output_paths (list):    paths of the files written by the step
+        """
+        recorded = self.steps.get(step, {"inputs": dict(), "outputs": dict()})
+        self.steps[step] = {kind: {path: self.get_entry(path, recorded[kind].get(path, None)) for path in paths}
+                            for kind, paths in [("inputs", input_paths), ("outputs", output_paths)]}
+        self.save()
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as manifest_file:
+            json.dump({"version": MANIFEST_FORMAT_VERSION, "steps": self.steps}, manifest_file, indent=1)
+        os.replace(tmp_path, self.path)  # never leave a half written manifest behind
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""This script contains the sweep-line engine computing the room and ward contacts of risk patients.
+
+For every room and ward visited by a risk patient, the stays of the risk patients and the stays of potential contacts
+are sorted by their begin and swept once. Every stay starting during the sweep is paired with all stays of the other
+kind which are still active (i.e. have not ended before it began), so each overlapping pair is emitted exactly once
+in ``O(n log n + contacts)`` per location.
+
+The contacts are the same as those of the former nested-loop ``Patient.get_contact_patients()``, in the same order:
+for each stay of a risk patient, the room contacts followed by the ward contacts, each in the order in which the
+stays were added to the room or ward.
+
+-----
+"""
+
+import heapq
+import logging
+
+import pandas as pd
+from tqdm import tqdm
+
+from src.common.interval_index import to_ns
+
+CONTACT_COLUMNS = ["Risk Patient ID", "Contact Patient ID", "Overlap Start", "Overlap End", "Location", "Contact Type"]
+CONTACT_ROOM = "contact_room"
+CONTACT_WARD = "contact_ward"
+
+
+def sweep_overlaps(risk_intervals, contact_intervals):
+    """Returns all pairs of overlapping closed intervals.
+
+    Args:
+        risk_intervals (list):      list of (begin, end) tuples of integers
+        contact_intervals (list):   list of (begin, end) tuples of integers
+
+    Returns:
+        list: (risk index, contact index) tuples of all pairs with ``contact_end >= risk_begin`` and
+        ``contact_begin <= risk_end``, in no particular order
+    """
+    events = [(begin, end, 0, index) for index, (begin, end) in enumerate(risk_intervals)] \
+        + [(begin, end, 1, index) for index, (begin, end) in enumerate(contact_intervals)]
+    events.sort(key=lambda event: event[0])
+    active = ([], [])  # heaps of (end, index) of the risk and contact intervals begun so far
+    pairs = []
+    for begin, end, kind, index in events:
+        others = active[1 - kind]
+        while len(others) != 0 and others[0][0] < begin:
+            heapq.heappop(others)  # ended before this interval began, cannot overlap any later interval
+        if kind == 0:
+            pairs.extend((index, other_index) for _, other_index in others)
+        else:
+            pairs.extend((other_index, index) for _, other_index in others)
+        heapq.heappush(active[kind], (end, index))
+    return pairs
+
+
+def _get_interval(stay):
+    """Returns the stay as (begin, end) in nanoseconds, or ``None`` if it has no complete interval."""
+    if stay.to_datetime is None:
+        return None
+    begin, end = to_ns(stay.from_datetime), to_ns(stay.to_datetime)
+    return (begin, end) if begin is not None and end is not None else None
+
+
+def get_contact_frame(patients, with_details=True, case_type_ids=("1",), stay_type_ids=("1", "2", "3"), is_verbose=True):
+    """Computes the room and ward contacts of all risk patients.
+
+    The risk patients are the patients with a positive screening. Their stays in cases of ``case_type_ids`` are
+    compared with all stays in the same room or ward that belong to a case of ``case_type_ids`` and are of a stay type in
+    ``stay_type_ids``. Ward contacts in the same room are only reported as room contacts. The risk patient is reported
+    as a contact of itself.
+
+    Args:
+        patients (dict):        Dictionary mapping patient ids to Patient() objects
+        with_details (bool):    return every overlap, or only the first contact per contact patient
+        case_type_ids (tuple):  case types of the considered cases (``"1"`` are in-patient cases)
+        stay_type_ids (tuple):  stay types of the contact stays
+        is_verbose (bool):      show a progress bar
+
+    Returns:
+        pd.DataFrame: one row per contact with the columns ``CONTACT_COLUMNS`` if with_details is ``True``, otherwise
+        one row per contact patient with the columns "Risk Patient ID", "Contact Patient ID" and "Contact Type"
+    """
+    case_type_ids = set(case_type_ids)
+    stay_type_ids = set(stay_type_ids)
+
+    # collect the stays of risk patients per location, in the order of the former per-case traversal
+    risk_stays = []
+    locations = dict()  # id of room or ward -> (location, contact type, list of risk stay numbers)
+    for patient in tqdm(patients.values(), disable=not is_verbose):
+        if not patient.has_risk():
+            continue
+        for case in patient.cases.values():
+            if case.case_type_id not in case_type_ids or case.stays_end is None:
+                continue
+            for stay in case.stays.values():
+                interval = _get_interval(stay)
+                if interval is None:
+                    continue
+                risk_stays.append((stay, interval))
+                for location, contact_type in [(stay.room, CONTACT_ROOM), (stay.ward, CONTACT_WARD)]:
+                    if location is not None:
+                        locations.setdefault(id(location), (location, contact_type, []))[2].append(len(risk_stays) - 1)
+
+    rows = []
+    for location, contact_type, risk_numbers in tqdm(locations.values(), disable=not is_verbose):
+        contact_positions = []
+        contact_intervals = []
+        for position, contact_stay in enumerate(location.stays):
+            if contact_stay.case is None or contact_stay.case.case_type_id not in case_type_ids \
+                    or contact_stay.type_id not in stay_type_ids:
+                continue
+            interval = _get_interval(contact_stay)
+            if interval is not None:
+                contact_positions.append(position)
+                contact_intervals.append(interval)
+
+        for risk_index, contact_index in sweep_overlaps([risk_stays[number][1] for number in risk_numbers], contact_intervals):
+            risk_number = risk_numbers[risk_index]
+            stay = risk_stays[risk_number][0]
+            position = contact_positions[contact_index]
+            contact_stay = location.stays[position]
+            if contact_type == CONTACT_WARD and contact_stay.room_id is not None and stay.room_id is not None \
+                    and contact_stay.room_id == stay.room_id:
+                continue  # reported as room contact
+            rows.append(((risk_number, contact_type == CONTACT_WARD, position),
+                         (stay.case.patient_id,
+                          contact_stay.case.patient_id,
+                          max(stay.from_datetime, contact_stay.from_datetime),
+                          min(stay.to_datetime, contact_stay.to_datetime),
+                          location.room_id if contact_type == CONTACT_ROOM else location.name,
+                          contact_type)))
+
+    rows.sort(key=lambda row: row[0])
+    contact_df = pd.DataFrame.from_records([row for _, row in rows], columns=CONTACT_COLUMNS)
+    logging.info(f"{len(contact_df)} contacts of {len(set(contact_df['Risk Patient ID']))} risk patients in {len(locations)} rooms and wards")
+
+    if not with_details:
+        contact_df = contact_df.drop_duplicates(subset=["Contact Patient ID"], keep="first")
+        contact_df = contact_df[["Risk Patient ID", "Contact Patient ID", "Contact Type"]].reset_index(drop=True)
+    return contact_df
@@ -2,9 +2,12 @@ import logging
 import os
 import pathlib
 import sys
+import numpy as np
 import pandas as pd
 
 from src.features.dataloader import DataLoader
+from src.features.interaction_table import InteractionTable, NODE_TYPES, DEVICE_PATIENT, DEVICE_EMPLOYEE, DEVICE_ROOM, \
+    EMPLOYEE_ROOM, APPOINTMENT, STAY
 from src.features.model import Patient
 from datetime import datetime
 from configuration.basic_configuration import configuration
@@ -30,57 +33,34 @@ def get_patient_risks(patients):
     return df
 
 
-def get_entity_interactions(patients):
+def get_entity_interactions(patients, interaction_table=None):
     """Return entity interactions.
     :param patients:
+    :param interaction_table: InteractionTable of the patients, built from the patients if not provided
     :return:
     """
-    interactions = []
+    if interaction_table is None:
+        interaction_table = InteractionTable.from_patients(patients, include_treatments=False)
+    table = interaction_table
+
+    # TODO: Patient-Employee interactions missing (check vre stats data script)
+    is_appointment = table["origin"] == APPOINTMENT
+    mask = ((table["origin"] == STAY)
+            | (is_appointment & np.isin(table["edge_type"], [DEVICE_PATIENT, DEVICE_EMPLOYEE, DEVICE_ROOM, EMPLOYEE_ROOM])))
+    # rooms are the first node of their interactions with devices and employees
+    is_swapped = is_appointment & np.isin(table["edge_type"], [DEVICE_ROOM, EMPLOYEE_ROOM])
+    nodes_0 = np.where(is_swapped, table["target"], table["source"])[mask]
+    nodes_1 = np.where(is_swapped, table["source"], table["target"])[mask]
+    node_prefixes = np.asarray([node_type.upper() + "_" for node_type in NODE_TYPES], dtype=object)
+
+    df = pd.DataFrame({"node_0": node_prefixes[table.node_types[nodes_0]] + table.export_ids[nodes_0],
+                       "node_1": node_prefixes[table.node_types[nodes_1]] + table.export_ids[nodes_1],
+                       "timestamp_begin": table["begin_ts"][mask],
+                       "timestamp_end": table["end_ts"][mask]})
+
+    patients_without_stays = len(patients) - len(np.unique(table["patient"][table["origin"] == STAY]))
+    logging.info(f"Exported {len(df)} GNN interactions for {len(patients.values())} patients, {patients_without_stays} without stays")
 
-    # patient-device-employee interactions
-    appointments_per_patient = {}
-    for patient in patients.values():
-        appointments_per_patient[patient.patient_id] = patient.get_appointments()
-
-    for (patient_id, patient_appointments) in appointments_per_patient.items():
-        for patient_appointment in patient_appointments:
-            for device in patient_appointment.devices:
-
-                # TODO: Patient-Employee interactions missing (check vre stats data script)
-                interactions.append({"node_0": "PATIENT_" + str(patient_id), "node_1": "DEVICE_" + str(device.id),
-                                     "timestamp_begin": patient_appointment.start_datetime, "timestamp_end": patient_appointment.end_datetime})
-
-                for employee in patient_appointment.employees:
-                    interactions.append({"node_0": "EMPLOYEE_" + str(employee.id), "node_1": "DEVICE_" + str(device.id),
-                                         "timestamp_begin": patient_appointment.start_datetime, "timestamp_end": patient_appointment.end_datetime})
-
-                for room in patient_appointment.rooms:
-                    interactions.append({"node_0": "ROOM_" + str(room.room_id), "node_1": "DEVICE_" + str(device.id),
-                                         "timestamp_begin": patient_appointment.start_datetime, "timestamp_end": patient_appointment.end_datetime})
-
-            for employee in patient_appointment.employees:
-                for room in patient_appointment.rooms:
-                    interactions.append({"node_0": "ROOM_" + str(room.room_id), "node_1": "EMPLOYEE_" + str(employee.id),
-                                         "timestamp_begin": patient_appointment.start_datetime, "timestamp_end": patient_appointment.end_datetime})
-
-    # patient-room interactions
-    stays_per_patient = {}
-    patients_without_stays = 0
-    for patient in patients.values():
-        stays_per_patient[patient.patient_id] = patient.get_stays()
-
-    for (patient_id, patient_stays) in stays_per_patient.items():
-        patient_stays_count = 0
-        for patient_stay in patient_stays:
-            interactions.append({"node_0": "PATIENT_" + str(patient_id), "node_1": "ROOM_" + str(patient_stay.room.room_id), "timestamp_begin": patient_stay.from_datetime, "timestamp_end" :patient_stay.to_datetime})
-            patient_stays_count += 1
-
-        if patient_stays_count == 0:
-            patients_without_stays += 1
-
-    logging.info(f"Exported {len(interactions)} GNN interactions for {len(patients.values())} patients, {patients_without_stays} without stays")
-
-    df = pd.DataFrame.from_records(interactions)
     return df
 
 
@@ -10,9 +10,11 @@ import logging
 import pathlib
 import sys
 
+import numpy as np
 import pandas as pd
 
 from src.features.dataloader import DataLoader
+from src.features.interaction_table import InteractionTable, NODE_TYPES, EMPLOYEE_ROOM, DEVICE_EMPLOYEE, APPOINTMENT, STAY
 from src.features.model import Patient, patient
 from datetime import datetime, date, timedelta
 from configuration.basic_configuration import configuration
@@ -123,94 +125,41 @@ def get_node_features(entities, interactions_df):
     node_features_df.reindex()
     return node_features_df
 
-def get_node_interactions(patients):
+def get_node_interactions(patients, interaction_table=None):
     """Gather entity interactions.
 
     each interaction consists of [timestamp_begin, timestamp_end, source, destination, edge_idx].
 
     :param patients:
+    :param interaction_table: InteractionTable of the patients, built from the patients if not provided
     :return:
     """
-    interactions = []
-
-    source = "source"
-    source_type = "source type"
-    patient_type = "PATIENT"
-    device_type = "DEVICE"
-    room_type = "ROOM"
-    employee_type = "EMPLOYEE"
-    destination = "destination"
-    destination_type = "destination type"
-    timestamp_begin = "timestamp_begin"
-    timestamp_end = "timestamp_end"
-
     # TODO: invert every edge (is the model assuming the directionality?)
     # TODO: Add node type as feature
     # TODO: Timestamps seem to be date only, can we improve this?
-
-    # patient appoinments => patient-device-employee-room interaction
-    patients_without_appointments = 0
-    for patient in tqdm(patients.values()):
-        patient_id = patient.patient_id
-        for patient_appointment in patient.get_appointments():
-            for device in patient_appointment.devices: # relate all devices to the patient
-                interactions.append({source: str(patient_id), source_type: patient_type, destination: str(device.id), destination_type: device_type,
-                                    timestamp_begin: patient_appointment.start_datetime, timestamp_end: patient_appointment.end_datetime})
-                
-
-            for employee in patient_appointment.employees: # relate all employees to the patient
-                interactions.append({source: str(patient_id), source_type: patient_type, destination: str(employee.id), destination_type: employee_type,
-                                    timestamp_begin: patient_appointment.start_datetime, timestamp_end: patient_appointment.end_datetime})
-
-            for room in patient_appointment.rooms: # relate all rooms to the patient
-                interactions.append({source: str(patient_id), source_type: patient_type, destination: str(room.room_id), destination_type: room_type,
-                                    timestamp_begin: patient_appointment.start_datetime, timestamp_end: patient_appointment.end_datetime})
-
-            # relate employees to rooms and devices
-            for employee in patient_appointment.employees:
-                for room in patient_appointment.rooms:
-                    interactions.append({source: str(room.room_id), source_type: room_type, destination: str(employee.id), destination_type: employee_type,
-                                        timestamp_begin: patient_appointment.start_datetime, timestamp_end: patient_appointment.end_datetime})
-
-                for device in patient_appointment.devices:
-                    interactions.append({source: str(device.id), source_type: device_type, destination: str(employee.id), destination_type: employee_type,
-                                        timestamp_begin: patient_appointment.start_datetime, timestamp_end: patient_appointment.end_datetime})
-
-            # relate devices to rooms
-            for device in patient_appointment.devices:
-                for room in patient_appointment.rooms:
-                    interactions.append({source: str(device.id), source_type: device_type, destination: str(room.room_id), destination_type: room_type,
-                                        timestamp_begin: patient_appointment.start_datetime, timestamp_end: patient_appointment.end_datetime})
-
-            if len(patient.get_appointments()) == 0:
-                patients_without_appointments += 1
-
-    # patient stays => patient-room interactions
-    patients_without_stays = 0
-    for patient in patients.values():
-        patient_id = patient.patient_id
-        for patient_stay in patient.get_stays():
-            interactions.append({source: str(patient_id), source_type: patient_type, destination: str(patient_stay.room.room_id), destination_type: room_type,
-                                timestamp_begin: patient_stay.from_datetime, timestamp_end: patient_stay.to_datetime})
-
-            if len(patient.get_stays()) == 0:
-                patients_without_stays += 1
-
     # TODO: Timestamps for treatments are imprecise (date and duration in minutes), maybe they can be clarified using the room stay of the patient
     # TODO: With treatments, the employee is at every patient at the same time. This might degrade the prediction.
-    patients_without_care = 0
-    for patient in patients.values():
-        patient_id = patient.patient_id
-        for treatment in patient.get_treatments():
-            interactions.append({source: str(patient_id), source_type: patient_type, destination: str(treatment.employee_id), destination_type: employee_type,
-                                timestamp_begin: treatment.date, timestamp_end: treatment.date + timedelta(minutes=treatment.duration_in_minutes)})
-
-            # TODO: Here is also an interaction with the room the patient is staying during that time
-        
-
-    logging.info(f"Exported {len(interactions)} node interactions for {len(patients.values())} patients, {patients_without_appointments} without appointments, {patients_without_stays} without stays")
+    if interaction_table is None:
+        interaction_table = InteractionTable.from_patients(patients)
+    table = interaction_table
+
+    # employees are the destination of their interactions with rooms and devices
+    is_swapped = np.isin(table["edge_type"], [EMPLOYEE_ROOM, DEVICE_EMPLOYEE])
+    sources = np.where(is_swapped, table["target"], table["source"])
+    destinations = np.where(is_swapped, table["source"], table["target"])
+    node_type_names = np.asarray([node_type.upper() for node_type in NODE_TYPES], dtype=object)
+
+    interactions_df = pd.DataFrame({"source": table.export_ids[sources],
+                                    "source type": node_type_names[table.node_types[sources]],
+                                    "destination": table.export_ids[destinations],
+                                    "destination type": node_type_names[table.node_types[destinations]],
+                                    "timestamp_begin": table["begin_ts"],
+                                    "timestamp_end": table["end_ts"]})
+
+    patients_without_appointments = len(patients) - len(np.unique(table["patient"][table["origin"] == APPOINTMENT]))
+    patients_without_stays = len(patients) - len(np.unique(table["patient"][table["origin"] == STAY]))
+    logging.info(f"Exported {len(interactions_df)} node interactions for {len(patients.values())} patients, {patients_without_appointments} without appointments, {patients_without_stays} without stays")
 
-    interactions_df = pd.DataFrame.from_records(interactions)
     interactions_df["timestamp_begin"] = pd.to_datetime(interactions_df["timestamp_begin"])
     return interactions_df
 
@@ -290,12 +239,14 @@ if __name__ == '__main__':
         load_care_data=True,  # treatment data relates patients to employees
         load_rooms=True,  # room node
         load_icd_codes=False,  # NO RELATION: potential node feature?
+        use_cache=True,  # reuse the snapshot of the last run if the data did not change
         )
 
 # %%
 
     # produce a csv with contains all edges in descriptive form (ml_vre_graph_verbose.csv)
-    node_interactions_df = get_node_interactions(patient_data["patients"])
+    interaction_table = InteractionTable.from_patients(patient_data["patients"], patient_data["rooms"])
+    node_interactions_df = get_node_interactions(patient_data["patients"], interaction_table)
 
 # %%
     # add all node labels
@@ -243,7 +243,8 @@ if __name__ == '__main__':
         load_care_data=False,
         load_rooms=False,
         load_icd_codes=True,
-        load_buildings=False)
+        load_buildings=False,
+        use_cache=True)
 
     logger.info("...Done.\nGetting risk patients...")
 
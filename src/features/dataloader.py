@@ -5,12 +5,16 @@ objects required for the VRE model.
 -----
 """
 
-import subprocess
-import csv
 import os
 import logging
+import shutil
+import subprocess
 import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from configuration.basic_configuration import configuration
+from src.common.interim_store import get_parquet_path
+from src.common.line_reader import CsvLineReader, PipeLineReader, spool_command_output
 
 # make sure to append the correct path regardless where script is called from
 from src.features.model.building import Building
@@ -33,10 +37,27 @@ from src.features.model import Surgery
 from src.features.model import Partner
 from src.features.model import Treatment
 from src.features.model import ICDCode
+from src.features.dataset_cache import DatasetCache
+from src.common.task_graph import TaskGraph, TaskResult, StageTimer
 
 ###############################################################################################################
 
 
+def parse_lines(data_loader, path, create_map, **kwargs):
+    """Opens the reader of a line-based table and passes it to create_map, used to parse tables in worker processes.
+
+    Args:
+        data_loader (DataLoader):   loader providing the reader
+        path (str):                 path of the table
+        create_map (callable):      function creating the objects from the reader, i.e. ``Device.create_device_map``
+        **kwargs:                   further arguments of create_map
+
+    Returns:
+        the result of create_map
+    """
+    return create_map(data_loader.get_lines(path), **kwargs)
+
+
 class DataLoader:
     """Loads all the csv files and creates the data model.
     """
@@ -80,6 +101,12 @@ class DataLoader:
         #self.oe_pflege_map_path = os.path.join(self.base_path, "OE_PFLEGE_MAP.csv")
 
         self.hdfs_pipe = hdfs_pipe  # binary attribute specifying whether to read data Hadoop (True) or CSV (False)
+        self.hdfs_command = list(configuration['PARAMETERS'].get('hdfs_cat_command', ["hadoop", "fs", "-cat"]))
+        self.hdfs_checksum_command = list(configuration['PARAMETERS'].get('hdfs_checksum_command',
+                                                                          ["hadoop", "fs", "-checksum"]))
+        self.hdfs_prefetch_workers = configuration['PARAMETERS'].get('hdfs_prefetch_workers', 0)
+        self.prefetched_files = dict()  # maps HDFS paths to local copies
+        self.spool_dir = None
 
         self.file_delim = configuration['DELIMITERS']['csv_sep']  # delimiter character for reading CSV files
 
@@ -91,47 +118,220 @@ class DataLoader:
     def get_hdfs_pipe(self, path):
         """Loads a datafile from HDFS.
 
-        Loads the datafile specified in path from the Hadoop file system, and returns the file **without header** as a
-        csv.reader() instance. This function is used in the method patient_data() if hdfs_pipe is ``True``
-        (the default).
+        Returns a streaming reader over the datafile specified in path on the Hadoop file system, which yields the
+        rows **without header** like a csv.reader() instance. The file is decoded incrementally from the output of
+        ``self.hdfs_command`` (``hadoop fs -cat`` by default) while it is read. If the file was fetched before by
+        ``prefetch_hdfs_files()``, the local copy is read instead. This function is used in the method patient_data()
+        if hdfs_pipe is ``True``.
 
         Args:
             path (str): full path to file in HDFS to be loaded.
 
         Returns:
-            ``csv.reader()`` instance **not** containing the header of the file.
+            ``PipeLineReader()`` or ``CsvLineReader()`` instance **not** containing the header of the file.
         """
         logging.debug(f"get_hdfs_pipe: {path}")
-        encoding = "iso-8859-1"
-        cat = subprocess.Popen(["hadoop", "fs", "-cat", path], stdout=subprocess.PIPE)
-        output = cat.communicate()[0].decode(encoding)
-        lines = csv.reader(output.splitlines(), delimiter=self.file_delim)
-        next(lines, None)  # skip header
-        return lines
+        if path in self.prefetched_files:
+            return CsvLineReader(self.prefetched_files[path], delimiter=self.file_delim, encoding="iso-8859-1")
+        return PipeLineReader(self.hdfs_command + [path], delimiter=self.file_delim, encoding="iso-8859-1")
+
+    def prefetch_hdfs_files(self, paths, max_workers=4):
+        """Copies several files from HDFS concurrently to a local spool directory.
+
+        Subsequent calls of ``get_hdfs_pipe()`` for these paths read the local copies. The copies are removed by
+        ``release_prefetched_files()``.
+
+        Args:
+            paths (list):       full paths to the files in HDFS
+            max_workers (int):  number of files copied at the same time
+        """
+        if self.spool_dir is None:
+            self.spool_dir = tempfile.mkdtemp(prefix="vre_hdfs_")
+        paths = [path for path in dict.fromkeys(paths) if path not in self.prefetched_files]
+        logging.info(f"Prefetching {len(paths)} files from HDFS with {max_workers} workers")
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {path: executor.submit(spool_command_output, self.hdfs_command + [path],
+                                             os.path.join(self.spool_dir, f"{index}_{os.path.basename(path)}"))
+                       for index, path in enumerate(paths)}
+            for path, future in futures.items():
+                self.prefetched_files[path] = future.result()
+
+    def release_prefetched_files(self):
+        """Removes the local copies created by ``prefetch_hdfs_files()``."""
+        if self.spool_dir is not None:
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+        self.spool_dir = None
+        self.prefetched_files = dict()
 
     def get_csv_file(self, csv_path):
         """Loads a datafile from CSV.
 
-        Loads the datafile specified in csv_path, and returns the file **without header** as a csv.reader() instance.
-        ``csv_path`` must be an **absolute** filepath. This function is used in the method patient_data() if hdfs_pipe
-        is ``False``.
+        Returns a streaming reader over the datafile specified in csv_path, which yields the rows **without header**
+        like a csv.reader() instance. The file is read only once and closed after the last row. The number of rows
+        for progress bars is available via ``get_row_count()`` without reading the file twice. This function is used
+        in the method patient_data() if hdfs_pipe is ``False``.
 
         Args:
              csv_path (str): full path to csv file.
 
-        Important:
-            Since the csv.reader() instance is returned by this functions via ``open(csv_path, ...)``, these files may
-            not be properly closed !
-
         Returns:
-            ``csv.reader()`` instance **not** containing the header of the file.
+            ``CsvLineReader()`` instance **not** containing the header of the file.
         """
         logging.debug(f"csv_path: {csv_path}")
-        encoding = "iso-8859-1"
-        output = csv.reader(open(csv_path, 'r', encoding=encoding), delimiter=self.file_delim)
         # Note --> Test Data are ';'-delimited, but original data are ','-delimited !
-        next(output, None)  # ignore the header line
-        return output
+        return CsvLineReader(csv_path, delimiter=self.file_delim, encoding="iso-8859-1")
+
+    def get_input_paths(self):
+        """Returns the paths of all local files the dataset is loaded from, including typed Parquet interim tables.
+
+        The line-based tables are not included if hdfs_pipe is ``True``, as they are read from HDFS instead (see
+        ``get_hdfs_checksums()``).
+
+        Returns:
+            list: file paths (which may not exist)
+        """
+        hdfs_paths = set(self.get_line_based_paths()) if self.hdfs_pipe is True else set()
+        paths = [path for name, path in vars(self).items()
+                 if name.endswith("_path") and name != "base_path" and path not in hdfs_paths]
+        return paths + [get_parquet_path(path) for path in paths]
+
+    def get_line_based_paths(self, load_appointments=True, load_devices=True, load_employees=True, load_rooms=True,
+                             load_care_data=True, load_chop_codes=True, load_surgeries=True, load_icd_codes=True):
+        """Returns the paths of the line-based tables read by ``prepare_dataset()`` with the given arguments.
+
+        These tables are read via ``get_lines()`` or ``get_hdfs_pipe()``, i.e. from HDFS if hdfs_pipe is ``True``.
+
+        Returns:
+            list: file paths
+        """
+        line_based_paths = []
+        if load_appointments or load_devices or load_employees:
+            line_based_paths.append(self.appointment_patient_path)
+            if load_devices:
+                line_based_paths += [self.devices_path, self.appointment_device_path]
+            if load_rooms:
+                line_based_paths.append(self.appointment_room_path)
+            if load_care_data or load_employees:
+                line_based_paths.append(self.appointment_employee_path)
+        if load_chop_codes or load_surgeries:
+            line_based_paths += [self.chop_path, self.surgery_path]
+        if load_icd_codes:
+            line_based_paths.append(self.icd_codes_path)
+        return line_based_paths
+
+    def get_hdfs_checksums(self, paths):
+        """Returns the checksums of files on HDFS, as printed by ``self.hdfs_checksum_command``.
+
+        Args:
+            paths (list):   full paths to the files in HDFS
+
+        Returns:
+            str: output of the checksum command, or ``None`` if it failed (i.e. a file does not exist)
+        """
+        if len(paths) == 0:
+            return ""
+        try:
+            result = subprocess.run(self.hdfs_checksum_command + list(paths), stdout=subprocess.PIPE)
+        except OSError as e:
+            logging.warning(f"Cannot compute the checksums of the HDFS files: {e}")
+            return None
+        if result.returncode != 0:
+            logging.warning(f"Cannot compute the checksums of the HDFS files, {self.hdfs_checksum_command} "
+                            f"returned {result.returncode}")
+            return None
+        return result.stdout.decode("utf-8", errors="replace")
+
+    def get_lines(self, path):
+        """Returns the streaming reader of a line-based table, from HDFS if hdfs_pipe is ``True`` or else from CSV."""
+        return self.get_hdfs_pipe(path) if self.hdfs_pipe is True else self.get_csv_file(path)
+
+    def parse_tables(self,
+                     load_patients=True,
+                     load_buildings=True,
+                     load_rooms=True,
+                     load_partners=True,
+                     load_appointments=True,
+                     load_devices=True,
+                     load_employees=True,
+                     load_chop_codes=True,
+                     load_icd_codes=True,
+                     from_range=None,
+                     to_range=None,
+                     load_fraction=1.0,
+                     load_fraction_seed=7,
+                     max_workers=None,
+                     is_verbose=True):
+        """Parses the tables which do not depend on other objects of the model.
+
+        The tables are parsed as tasks of a dependency graph (rooms depend on buildings, everything else is
+        independent), concurrently in ``max_workers`` processes. The returned objects are not linked yet, this is done
+        in order by ``prepare_dataset()``.
+
+        Args:
+            load_<table> (bool):        whether to parse the table
+            from_range (datetime):      appointments are restricted to this time range
+            to_range (datetime):        appointments are restricted to this time range
+            load_fraction (float):      fraction of patients to load
+            load_fraction_seed (int):   seed of the patient selection
+            max_workers (int):          number of processes, ``PARAMETERS['load_workers']`` if ``None``, tables are
+                                        parsed in this process if ``max_workers <= 1``
+            is_verbose (bool):          be verbose during load
+
+        Returns:
+            dict: parsed objects, keyed by ``"patients"``, ``"buildings"``, ``"rooms"`` (tuple of rooms, buildings and
+            floors), ``"partners"``, ``"appointments"``, ``"devices"``, ``"employees"``, ``"chops"`` and ``"icd_codes"``
+        """
+        if max_workers is None:
+            max_workers = configuration['PARAMETERS'].get('load_workers', 1)
+
+        graph = TaskGraph()
+        if load_patients:
+            if is_verbose:
+                logging.info("[AGENT] loading patient data...")
+            graph.add_task("patients", Patient.create_patient_dict, self.patients_path, self.encoding,
+                           load_fraction=load_fraction, load_seed=load_fraction_seed, is_verbose=is_verbose)
+        if load_buildings:
+            if is_verbose:
+                logging.info("[AGENT ATTRIBUTE] loading building data..")
+            graph.add_task("buildings", Building.create_building_id_map, self.buildings_path, self.encoding, is_verbose=is_verbose)
+        elif is_verbose:
+            logging.info("[AGENT ATTRIBUTE] preloading buildings omitted.")
+        if load_rooms:
+            if is_verbose:
+                logging.info("[AGENT] loading room data...")
+            graph.add_task("rooms", Room.create_room_id_map, self.rooms_path,
+                           TaskResult("buildings") if load_buildings else dict(), self.encoding,
+                           load_limit=self.load_limit, is_verbose=is_verbose)
+        elif is_verbose:
+            logging.info("[AGENT] preloading rooms omitted.")
+        if load_partners:
+            if is_verbose:
+                logging.info("[INTERACTION ATTRIBUTE] loading partner data...")
+            graph.add_task("partners", Partner.create_partner_map, self.partner_path, encoding=self.encoding, is_verbose=is_verbose)
+        if load_appointments:
+            if is_verbose:
+                logging.info("[INTERACTON] loading appointment data")
+            graph.add_task("appointments", Appointment.create_appointment_map, self.appointments_path, self.encoding,
+                           from_range, to_range, is_verbose=is_verbose)
+        if load_devices:
+            if is_verbose:
+                logging.info("[AGENT] loading devices")
+            graph.add_task("devices", parse_lines, self, self.devices_path, Device.create_device_map, is_verbose=is_verbose)
+        if load_employees:
+            if is_verbose:
+                logging.info("[AGENT] loading employees")
+            graph.add_task("employees", Employee.create_employee_map, self.appointment_employee_path,
+                           encoding=self.encoding, is_verbose=is_verbose)
+        if load_chop_codes:
+            if is_verbose:
+                logging.info("[AGENT ATTRIBUTE] loading surgeries chop data...")
+            graph.add_task("chops", parse_lines, self, self.chop_path, Chop.create_chop_map, is_verbose=is_verbose)
+        if load_icd_codes:
+            if is_verbose:
+                logging.info("[AGENT ATTRIBUTE] loading ICD codes...")
+            graph.add_task("icd_codes", parse_lines, self, self.icd_codes_path, ICDCode.create_icd_code_map, is_verbose=is_verbose)
+
+        return graph.run(max_workers=max_workers)
 
     def prepare_dataset(self,
                         load_patients=True,
@@ -163,6 +363,7 @@ class DataLoader:
 
                         load_fraction=1.0,
                         load_fraction_seed=7,
+                        use_cache=False,
                         is_verbose=True):
         """Prepares dataset based on extracted data.
 
@@ -195,6 +396,7 @@ class DataLoader:
                     :param load_patients_in_locations: load only patients residing in indicated locations
                     :param load_fraction: load only a fraction of data (debugging purposes)
                     :param load_fraction_seed: load fraction with fixed seed (for reproducibility)
+                    :param use_cache: reuse the snapshot of a previous load with identical input files and arguments
                     :param is_verbose: be verbose during load
         Returns:
             dict:   Dictionary containing all model objects of the form
@@ -204,284 +406,319 @@ class DataLoader:
                     "wards" :math:`\\longrightarrow` *Wards*, etc. }
 
         """
-        if load_patients_in_locations is None:
-            load_patients_in_locations = []
-         
-        wards = dict()  # TODO: Preload wards if necessary in the future, they are in the rooms_identifiers.csv
-
-        if is_verbose:
-            logging.info(f"Processing data (load_test_data is {self.load_test_data}, hdfs_pipe is {self.hdfs_pipe},"
-                         f" base_path set to {self.base_path}).")
-
-        # load Patient data from table: DIM_PATIENT
-        if load_patients or load_risks or risk_only or load_medications:
-            if is_verbose:
-                logging.info("[AGENT] loading patient data...")
-            patients = Patient.create_patient_dict(self.patients_path, self.encoding,
-                                                   load_fraction=load_fraction, load_seed=load_fraction_seed, is_verbose=is_verbose)
-
-            # load Risk data
-            if load_risks:
-                if is_verbose:
-                    logging.info("[AGENT ATTRIBUTE] loading risk screening data...")
-                # add risks to patients to ensure VRE-positive patients are properly annotated
-                RiskScreening.add_annotated_screening_data_to_patients(self.vre_screenings_path,
-                                                              self.encoding,
-                                                              patient_dict=patients, from_range=from_range, to_range=to_range, is_verbose=is_verbose)
+        cache_arguments = dict(locals())
+        if use_cache:
+            for name in ["self", "use_cache", "is_verbose"]:
+                cache_arguments.pop(name)
+            cache = DatasetCache(configuration['PATHS']['cache_dir'])
+            cache_arguments.update({"hdfs_pipe": self.hdfs_pipe, "base_path": self.base_path, "load_limit": self.load_limit,
+                                    "compact_entities": configuration['PARAMETERS'].get('compact_entities', False)})
+            # the line-based tables read from HDFS are identified by their HDFS checksums
+            hdfs_checksums = ""
+            if self.hdfs_pipe is True:
+                hdfs_checksums = self.get_hdfs_checksums(self.get_line_based_paths(
+                    load_appointments, load_devices, load_employees, load_rooms, load_care_data, load_chop_codes,
+                    load_surgeries, load_icd_codes))
+            if hdfs_checksums is None:
+                logging.warning("Not using the dataset cache, the HDFS input files cannot be identified")
+                use_cache = False
             else:
-                if is_verbose:
-                    logging.info("[AGENT ATTRIBUTE] loading risk screening data omitted.")
+                cache_key = cache.get_key(self.get_input_paths(), cache_arguments, hdfs_checksums)
+                dataset = cache.load(cache_key)
+                if dataset is not None:
+                    logging.info(f"Dataset loaded from snapshot {cache.get_path(cache_key)}")
+                    return dataset
 
-            if risk_only:
-                if is_verbose:
-                    logging.info("keeping only risk patients")
-                patients_risk = dict()
-                for patient in patients.values():
-                    if patient.get_screening_label() > 0:
-                        patients_risk[patient.patient_id] = patient
-                patients = patients_risk
-                if is_verbose:
-                    logging.info(f"Keeping {len(patients)} risk patients")
-        else:
-            patients = dict()
-            if is_verbose:
-                logging.info("[AGENT] loading patients omitted.")
+        if load_patients_in_locations is None:
+            load_patients_in_locations = []
 
-        if load_buildings:
-            if is_verbose:
-                logging.info("[AGENT ATTRIBUTE] loading building data..")
-            buildings = Building.create_building_id_map(self.buildings_path, self.encoding, is_verbose=is_verbose)
-        else:
-            buildings = dict()
-            if is_verbose:
-                logging.info("[AGENT ATTRIBUTE] preloading buildings omitted.")
+        # the local HDFS copies are removed also if loading fails
+        try:
+            if self.hdfs_pipe and self.hdfs_prefetch_workers > 0:
+                line_based_paths = self.get_line_based_paths(load_appointments, load_devices, load_employees,
+                                                             load_rooms, load_care_data, load_chop_codes,
+                                                             load_surgeries, load_icd_codes)
+                self.prefetch_hdfs_files(line_based_paths, max_workers=self.hdfs_prefetch_workers)
 
-        if load_rooms:
-            if is_verbose:
-                logging.info("[AGENT] loading room data...")
-            rooms, buildings, floors = Room.create_room_id_map(self.rooms_path, buildings, self.encoding, load_limit=self.load_limit, is_verbose=is_verbose)
-        else:
-            rooms = dict()
-            floors = dict()
-            if is_verbose:
-                logging.info("[AGENT] preloading rooms omitted.")
+            wards = dict()  # TODO: Preload wards if necessary in the future, they are in the rooms_identifiers.csv
 
-        # load Case data from table: DIM_FALL
-        cases = {}
-        partners = {}
-        medications = {}
-        if load_cases or load_partners or load_stays:
             if is_verbose:
-                logging.info("[INTERACTION] loading case data...")
-            cases = Case.create_case_map(self.cases_path, self.encoding, patients,
-                                         load_fraction=load_fraction, load_seed=load_fraction_seed, is_verbose=is_verbose)
+                logging.info(f"Processing data (load_test_data is {self.load_test_data}, hdfs_pipe is {self.hdfs_pipe},"
+                             f" base_path set to {self.base_path}).")
+
+            # parse the independent tables first (concurrently if load_workers > 1), the objects are linked afterwards
+            parsed = self.parse_tables(load_patients=load_patients or load_risks or risk_only or load_medications,
+                                       load_buildings=load_buildings,
+                                       load_rooms=load_rooms,
+                                       load_partners=(load_cases or load_partners or load_stays) and load_partners,
+                                       load_appointments=load_appointments or load_devices or load_employees,
+                                       load_devices=(load_appointments or load_devices or load_employees) and load_devices,
+                                       load_employees=(load_appointments or load_devices or load_employees) and (load_care_data or load_employees),
+                                       load_chop_codes=load_chop_codes or load_surgeries,
+                                       load_icd_codes=load_icd_codes,
+                                       from_range=from_range, to_range=to_range,
+                                       load_fraction=load_fraction, load_fraction_seed=load_fraction_seed,
+                                       is_verbose=is_verbose)
+            stage_timer = StageTimer()
+
+            # load Patient data from table: DIM_PATIENT
+            if load_patients or load_risks or risk_only or load_medications:
+                patients = parsed["patients"]
+
+                # load Risk data
+                if load_risks:
+                    if is_verbose:
+                        logging.info("[AGENT ATTRIBUTE] loading risk screening data...")
+                    # add risks to patients to ensure VRE-positive patients are properly annotated
+                    RiskScreening.add_annotated_screening_data_to_patients(self.vre_screenings_path,
+                                                                  self.encoding,
+                                                                  patient_dict=patients, from_range=from_range, to_range=to_range, is_verbose=is_verbose)
+                else:
+                    if is_verbose:
+                        logging.info("[AGENT ATTRIBUTE] loading risk screening data omitted.")
 
-            # load Drug/Medication data from table: FAKT_MEDIKAMENTE
-            if load_medications:
-                if is_verbose:
-                    logging.info("[AGENT ATTRIBUTE] loading medication data...")
-                medications = Medication.create_drug_map(self.medication_path, cases, self.encoding, is_verbose=is_verbose)
+                if risk_only:
+                    if is_verbose:
+                        logging.info("keeping only risk patients")
+                    patients_risk = dict()
+                    for patient in patients.values():
+                        if patient.get_screening_label() > 0:
+                            patients_risk[patient.patient_id] = patient
+                    patients = patients_risk
+                    if is_verbose:
+                        logging.info(f"Keeping {len(patients)} risk patients")
+                stage_timer.lap("risk screenings")
             else:
+                patients = dict()
                 if is_verbose:
-                    logging.info("[AGENT ATTRIBUTE] loading medication data omitted.")
+                    logging.info("[AGENT] loading patients omitted.")
 
-            # load Partner data from table: LA_ISH_NGPA
-            if load_partners:
-                if is_verbose:
-                    logging.info("[INTERACTION ATTRIBUTE] loading partner data...")
-                partners = Partner.create_partner_map(self.partner_path, encoding=self.encoding, is_verbose=is_verbose)
-                logging.info("adding partners to cases")
-                Partner.add_partners_to_cases(  # This will update partners from table: LA_ISH_NFPZ
-                    self.case_partner_path, self.encoding, cases, partners, is_verbose=is_verbose)
+            if load_rooms:
+                rooms, buildings, floors = parsed["rooms"]
             else:
+                buildings = parsed.get("buildings", dict())
+                rooms = dict()
+                floors = dict()
+
+            # load Case data from table: DIM_FALL
+            cases = {}
+            partners = {}
+            medications = {}
+            if load_cases or load_partners or load_stays:
                 if is_verbose:
-                    logging.info("[INTERACTION ATTRIBUTE] loading partner data omitted.")
+                    logging.info("[INTERACTION] loading case data...")
+                cases = Case.create_case_map(self.cases_path, self.encoding, patients,
+                                             load_fraction=load_fraction, load_seed=load_fraction_seed, is_verbose=is_verbose)
+                stage_timer.lap("cases")
 
-            # load Stay data from table: LA_ISH_NBEW
-            if load_stays:
-                if is_verbose:
-                    logging.info("[INTERACTION] loading stay data...")
-                Stay.add_stays_to_case(self.stays_path, self.encoding, cases, rooms, wards, partners,
-                                       from_range=from_range, to_range=to_range, locations=load_patients_in_locations,
-                                       load_fraction=load_fraction, load_seed=load_fraction_seed, is_verbose=is_verbose)
-                # --> Note: Stay() objects are not part of the returned dictionary, they are only used in
-                #                           Case() objects --> Case().stays = [1 : Stay(), 2 : Stay(), ...]
-
-                if len(load_patients_in_locations) != 0:
-                    nr_non_location_patients = 0
-                    location_patients = dict()
-                    for patient in patients.values():
-                        if len(patient.get_stays()) != 0:
-                            location_patients[patient.patient_id] = patient
-                        else:
-                            nr_non_location_patients += 1
-                            # drop cases of excluded patient
-                            for case_id in patient.cases:
-                                cases.pop(case_id)
-                    patients = location_patients
-                    logging.info(f"Excluded {nr_non_location_patients} patients without stay in locations {load_patients_in_locations}")
+                # load Drug/Medication data from table: FAKT_MEDIKAMENTE
+                if load_medications:
+                    if is_verbose:
+                        logging.info("[AGENT ATTRIBUTE] loading medication data...")
+                    medications = Medication.create_drug_map(self.medication_path, cases, self.encoding, is_verbose=is_verbose)
+                    stage_timer.lap("medications")
+                else:
+                    if is_verbose:
+                        logging.info("[AGENT ATTRIBUTE] loading medication data omitted.")
+
+                # load Partner data from table: LA_ISH_NGPA
+                if load_partners:
+                    partners = parsed["partners"]
+                    logging.info("adding partners to cases")
+                    Partner.add_partners_to_cases(  # This will update partners from table: LA_ISH_NFPZ
+                        self.case_partner_path, self.encoding, cases, partners, is_verbose=is_verbose)
+                    stage_timer.lap("partners")
+                else:
+                    if is_verbose:
+                        logging.info("[INTERACTION ATTRIBUTE] loading partner data omitted.")
+
+                # load Stay data from table: LA_ISH_NBEW
+                if load_stays:
+                    if is_verbose:
+                        logging.info("[INTERACTION] loading stay data...")
+                    Stay.add_stays_to_case(self.stays_path, self.encoding, cases, rooms, wards, partners,
+                                           from_range=from_range, to_range=to_range, locations=load_patients_in_locations,
+                                           load_fraction=load_fraction, load_seed=load_fraction_seed, is_verbose=is_verbose)
+                    stage_timer.lap("stays")
+                    # --> Note: Stay() objects are not part of the returned dictionary, they are only used in
+                    #                           Case() objects --> Case().stays = [1 : Stay(), 2 : Stay(), ...]
+
+                    if len(load_patients_in_locations) != 0:
+                        nr_non_location_patients = 0
+                        location_patients = dict()
+                        for patient in patients.values():
+                            if len(patient.get_stays()) != 0:
+                                location_patients[patient.patient_id] = patient
+                            else:
+                                nr_non_location_patients += 1
+                                # drop cases of excluded patient
+                                for case_id in patient.cases:
+                                    cases.pop(case_id)
+                        patients = location_patients
+                        logging.info(f"Excluded {nr_non_location_patients} patients without stay in locations {load_patients_in_locations}")
+                else:
+                    if is_verbose:
+                        logging.info("[INTERACTION] loading stays omitted.")
             else:
                 if is_verbose:
-                    logging.info("[INTERACTION] loading stays omitted.")
-        else:
-            if is_verbose:
-                logging.info("[INTERACTION] loading cases, partners and stays omitted.")
-
-        # load Appointment data from table: DIM_TERMIN
-        appointments = {}
-        devices = {}
-        employees = {}
-        if load_appointments or load_devices or load_employees:
-            if is_verbose:
-                logging.info("[INTERACTON] loading appointment data")
-            appointments = Appointment.create_appointment_map(self.appointments_path, self.encoding, from_range, to_range, is_verbose=is_verbose)
-
-            # Add Appointments to cases from table: FAKT_TERMIN_PATIENT
-            if is_verbose:
-                logging.info('Adding appointments to cases')
-            Appointment.add_appointment_to_case(self.get_hdfs_pipe(self.appointment_patient_path) if self.hdfs_pipe is True
-                                                else self.get_csv_file(self.appointment_patient_path),
-                                                cases, appointments, is_verbose=is_verbose)
+                    logging.info("[INTERACTION] loading cases, partners and stays omitted.")
 
-            if load_devices:
-                # Load Device data from table: DIM_GERAET
-                if is_verbose:
-                    logging.info("[AGENT] loading devices")
-                devices = Device.create_device_map(self.get_hdfs_pipe(self.devices_path) if self.hdfs_pipe is True
-                                                   else self.get_csv_file(self.devices_path), is_verbose=is_verbose)
+            # load Appointment data from table: DIM_TERMIN
+            appointments = {}
+            devices = {}
+            employees = {}
+            if load_appointments or load_devices or load_employees:
+                appointments = parsed["appointments"]
 
-                # Add Device data to Appointments from table: FAKT_TERMIN_GERAET
+                # Add Appointments to cases from table: FAKT_TERMIN_PATIENT
                 if is_verbose:
-                    logging.info("[INTERACTION] adding devices to appointments")
-                Device.add_device_to_appointment(self.get_hdfs_pipe(self.appointment_device_path) if self.hdfs_pipe is True
-                                                 else self.get_csv_file(self.appointment_device_path),
-                                                 appointments, devices, is_verbose=is_verbose)
-            else:
-                if is_verbose:
-                    logging.info("[AGENT] loading devices omitted.")
+                    logging.info('Adding appointments to cases')
+                Appointment.add_appointment_to_case(self.get_hdfs_pipe(self.appointment_patient_path) if self.hdfs_pipe is True
+                                                    else self.get_csv_file(self.appointment_patient_path),
+                                                    cases, appointments, is_verbose=is_verbose)
+                stage_timer.lap("appointments")
 
-            # add Room data to Appointments from table: V_DH_FACT_TERMINRAUM
-            if load_rooms:
-                if is_verbose:
-                    logging.info('[INTERACTION] Adding rooms to appointments')
-                Room.add_rooms_to_appointment(self.get_hdfs_pipe(self.appointment_room_path) if self.hdfs_pipe is True
-                                              else self.get_csv_file(self.appointment_room_path), appointments, rooms, locations=load_patients_in_locations, is_verbose=is_verbose)
-                if is_verbose:
-                    logging.info(f"Dataset contains in total {len(rooms)} Rooms")
-            else:
-                if is_verbose:
-                    logging.info("[INTERACTION] adding rooms to appointments omitted.")
+                if load_devices:
+                    # Device data from table: DIM_GERAET
+                    devices = parsed["devices"]
 
-            # load Employee data (RAP) from table: FAKT_TERMIN_MITARBEITER
-            if load_care_data or load_employees:
-                if is_verbose:
-                    logging.info("[AGENT] loading employees")
-                employees = Employee.create_employee_map(self.appointment_employee_path, encoding=self.encoding, is_verbose=is_verbose)
+                    # Add Device data to Appointments from table: FAKT_TERMIN_GERAET
+                    if is_verbose:
+                        logging.info("[INTERACTION] adding devices to appointments")
+                    Device.add_device_to_appointment(self.get_hdfs_pipe(self.appointment_device_path) if self.hdfs_pipe is True
+                                                     else self.get_csv_file(self.appointment_device_path),
+                                                     appointments, devices, is_verbose=is_verbose)
+                    stage_timer.lap("devices")
+                else:
+                    if is_verbose:
+                        logging.info("[AGENT] loading devices omitted.")
 
-                # Add Employees to Appointments using the same table
-                if is_verbose:
-                    logging.info("[AGENT] add employees to appointments")
-                Employee.add_employees_to_appointment(self.get_hdfs_pipe(self.appointment_employee_path)
-                                                      if self.hdfs_pipe is True
-                                                      else self.get_csv_file(self.appointment_employee_path),
-                                                      appointments, employees, is_verbose=is_verbose)
-                if load_care_data:
-                    # Add Treatment/Care data to Cases from table: TACS_DATEN
+                # add Room data to Appointments from table: V_DH_FACT_TERMINRAUM
+                if load_rooms:
+                    if is_verbose:
+                        logging.info('[INTERACTION] Adding rooms to appointments')
+                    Room.add_rooms_to_appointment(self.get_hdfs_pipe(self.appointment_room_path) if self.hdfs_pipe is True
+                                                  else self.get_csv_file(self.appointment_room_path), appointments, rooms, locations=load_patients_in_locations, is_verbose=is_verbose)
                     if is_verbose:
-                        logging.info("[INTERACTION] Adding Treatment/Care data to Cases from TACS")
-                    Treatment.add_care_entries_to_case(self.tacs_care_path, self.encoding, cases, employees, from_range, to_range, is_verbose=is_verbose)
-                    # --> Note: Care() objects are not part of the returned dictionary, they are only used in
-                    #               Case() objects --> Case().cares = [Care(), Care(), ...] (list of all cares for each case)
+                        logging.info(f"Dataset contains in total {len(rooms)} Rooms")
+                    stage_timer.lap("appointment rooms")
                 else:
                     if is_verbose:
-                        logging.info("[INTERACTION] loading treatment/care data omitted.")
+                        logging.info("[INTERACTION] adding rooms to appointments omitted.")
+
+                # load Employee data (RAP) from table: FAKT_TERMIN_MITARBEITER
+                if load_care_data or load_employees:
+                    employees = parsed["employees"]
+
+                    # Add Employees to Appointments using the same table
+                    if is_verbose:
+                        logging.info("[AGENT] add employees to appointments")
+                    Employee.add_employees_to_appointment(self.get_hdfs_pipe(self.appointment_employee_path)
+                                                          if self.hdfs_pipe is True
+                                                          else self.get_csv_file(self.appointment_employee_path),
+                                                          appointments, employees, is_verbose=is_verbose)
+                    stage_timer.lap("employees")
+                    if load_care_data:
+                        # Add Treatment/Care data to Cases from table: TACS_DATEN
+                        if is_verbose:
+                            logging.info("[INTERACTION] Adding Treatment/Care data to Cases from TACS")
+                        Treatment.add_care_entries_to_case(self.tacs_care_path, self.encoding, cases, employees, from_range, to_range, is_verbose=is_verbose)
+                        stage_timer.lap("treatments")
+                        # --> Note: Care() objects are not part of the returned dictionary, they are only used in
+                        #               Case() objects --> Case().cares = [Care(), Care(), ...] (list of all cares for each case)
+                    else:
+                        if is_verbose:
+                            logging.info("[INTERACTION] loading treatment/care data omitted.")
 
+                else:
+                    if is_verbose:
+                        logging.info("[AGENT] loading employees omitted.")
             else:
                 if is_verbose:
-                    logging.info("[AGENT] loading employees omitted.")
-        else:
-            if is_verbose:
-                logging.info("[INTERACTION] loading appointments omitted.")
+                    logging.info("[INTERACTION] loading appointments omitted.")
 
-        # TODO: care map data are broken. Readd it.
-        # # Generate OE_pflege_map
-        # oe_pflege_map = Risk.generate_oe_pflege_map(self.get_hdfs_pipe(self.oe_pflege_map_path)
-        #                                             if self.hdfs_pipe is True
-        #                                             else self.get_csv_file(self.oe_pflege_map_path))
+            # TODO: care map data are broken. Readd it.
+            # # Generate OE_pflege_map
+            # oe_pflege_map = Risk.generate_oe_pflege_map(self.get_hdfs_pipe(self.oe_pflege_map_path)
+            #                                             if self.hdfs_pipe is True
+            #                                             else self.get_csv_file(self.oe_pflege_map_path))
 
-        # --> yields a dictionary mapping "inofficial" ward names to official ones found in the OE_pflege_abk column
-        #       of the dbo.INSEL_MAP table in the Atelier_DataScience. This name allows linkage to Waveware !
-        # i.e. of the form {'BEWA' : 'C WEST', 'E 121' : 'E 120-21', ...}
+            # --> yields a dictionary mapping "inofficial" ward names to official ones found in the OE_pflege_abk column
+            #       of the dbo.INSEL_MAP table in the Atelier_DataScience. This name allows linkage to Waveware !
+            # i.e. of the form {'BEWA' : 'C WEST', 'E 121' : 'E 120-21', ...}
 
-        # load CHOP surgery codes data from table: LA_CHOP_FLAT
-        chops = {}
-        if load_chop_codes or load_surgeries:
-            if is_verbose:
-                logging.info("[AGENT ATTRIBUTE] loading surgeries chop data...")
-            chops = Chop.create_chop_map(self.get_hdfs_pipe(self.chop_path) if self.hdfs_pipe is True
-                                          else self.get_csv_file(self.chop_path), is_verbose=is_verbose)
+            # load CHOP surgery codes data from table: LA_CHOP_FLAT
+            chops = {}
+            if load_chop_codes or load_surgeries:
+                chops = parsed["chops"]
 
-            # Add Surgery data to cases from table: LA_ISH_NICP
-            if is_verbose:
-                logging.info("[AGENT ATTRIBUTE] loading surgeries data...")
-            Surgery.add_surgeries_to_case(self.get_hdfs_pipe(self.surgery_path) if self.hdfs_pipe is True
-                                          else self.get_csv_file(self.surgery_path), cases, chops, is_verbose=is_verbose)
-            # Surgery() objects are not part of the returned dictionary
-        else:
-            if is_verbose:
-                logging.info("[AGENT ATTRIBUTE] loading surgeries and chop data omitted.")
+                # Add Surgery data to cases from table: LA_ISH_NICP
+                if is_verbose:
+                    logging.info("[AGENT ATTRIBUTE] loading surgeries data...")
+                Surgery.add_surgeries_to_case(self.get_hdfs_pipe(self.surgery_path) if self.hdfs_pipe is True
+                                              else self.get_csv_file(self.surgery_path), cases, chops, is_verbose=is_verbose)
+                stage_timer.lap("surgeries")
+                # Surgery() objects are not part of the returned dictionary
+            else:
+                if is_verbose:
+                    logging.info("[AGENT ATTRIBUTE] loading surgeries and chop data omitted.")
 
-        # Add ICD codes to cases from table: LA_ISH_NDIA_NORM
-        icd_codes = {}
-        if load_icd_codes:
-            if is_verbose:
-                logging.info("[AGENT ATTRIBUTE] Adding ICD codes to cases")
-            icd_codes = ICDCode.create_icd_code_map(self.get_hdfs_pipe(self.icd_codes_path) if self.hdfs_pipe is True
-                                            else self.get_csv_file(self.icd_codes_path), is_verbose=is_verbose)
-            ICDCode.add_icd_codes_to_case(self.get_hdfs_pipe(self.icd_codes_path) if self.hdfs_pipe is True
-                                else self.get_csv_file(self.icd_codes_path), cases)
-        else:
-            if is_verbose:
-                logging.info("[AGENT ATTRIBUTE] loading ICD codes omitted.")
-
-        dataset = dict(
-            {
-                "patients": patients,
-                "cases": cases,
-                "rooms": rooms,
-                "floors": floors,
-                "buildings": buildings,
-                "wards": wards,
-                "partners": partners,
-                "medications": medications,
-                "chops": chops,
-                "appointments": appointments,
-                "devices": devices,
-                "employees": employees,
-                'icd_codes': icd_codes
-            }
-        )
-
-        logging.info(f"##################################################################################")
-        logging.info(f"Dataset load finished.")
-        logging.info(f"Data overview:")
-        logging.info(f"--> Patients: {len(patients)} [AGENT]")
-        logging.info(f"--> Cases: {len(cases)} [INTERACTION]")
-        logging.info(f"--> Drugs/Medications: {len(medications)} [AGENT ATTRIBUTE]")
-        logging.info(f"--> Chop/Surgery Codes: {len(chops)} [AGENT ATTRIBUTE]")
-        logging.info(f"--> ICD Codes: {len(icd_codes)} [AGENT ATTRIBUTE]")
-
-        logging.info(f"--> Rooms: {len(rooms)} [AGENT]")
-        logging.info(f"--> Floors: {len(floors)} [AGENT ATTRIBUTE]")
-        logging.info(f"--> Buildings: {len(buildings)} [AGENT ATTRIBUTE]")
-        logging.info(f"--> Wards: {len(wards)} [AGENT ATTRIBUTE]")
-
-        logging.info(f"--> Partners: {len(partners)} [AGENT]")
-        logging.info(f"--> Devices: {len(devices)} [AGENT]")
-        logging.info(f"--> Employees: {len(employees)} [AGENT]")
-
-        logging.info(f"--> Appointments: {len(appointments)} [INTERACTION]")
-
-        logging.info(f"##################################################################################")
+            # Add ICD codes to cases from table: LA_ISH_NDIA_NORM
+            icd_codes = {}
+            if load_icd_codes:
+                if is_verbose:
+                    logging.info("[AGENT ATTRIBUTE] Adding ICD codes to cases")
+                icd_codes = parsed["icd_codes"]
+                ICDCode.add_icd_codes_to_case(self.get_hdfs_pipe(self.icd_codes_path) if self.hdfs_pipe is True
+                                    else self.get_csv_file(self.icd_codes_path), cases)
+                stage_timer.lap("icd codes")
+            else:
+                if is_verbose:
+                    logging.info("[AGENT ATTRIBUTE] loading ICD codes omitted.")
+
+            dataset = dict(
+                {
+                    "patients": patients,
+                    "cases": cases,
+                    "rooms": rooms,
+                    "floors": floors,
+                    "buildings": buildings,
+                    "wards": wards,
+                    "partners": partners,
+                    "medications": medications,
+                    "chops": chops,
+                    "appointments": appointments,
+                    "devices": devices,
+                    "employees": employees,
+                    'icd_codes': icd_codes
+                }
+            )
+
+            logging.info(f"##################################################################################")
+            logging.info(f"Dataset load finished.")
+            logging.info(f"Data overview:")
+            logging.info(f"--> Patients: {len(patients)} [AGENT]")
+            logging.info(f"--> Cases: {len(cases)} [INTERACTION]")
+            logging.info(f"--> Drugs/Medications: {len(medications)} [AGENT ATTRIBUTE]")
+            logging.info(f"--> Chop/Surgery Codes: {len(chops)} [AGENT ATTRIBUTE]")
+            logging.info(f"--> ICD Codes: {len(icd_codes)} [AGENT ATTRIBUTE]")
+
+            logging.info(f"--> Rooms: {len(rooms)} [AGENT]")
+            logging.info(f"--> Floors: {len(floors)} [AGENT ATTRIBUTE]")
+            logging.info(f"--> Buildings: {len(buildings)} [AGENT ATTRIBUTE]")
+            logging.info(f"--> Wards: {len(wards)} [AGENT ATTRIBUTE]")
+
+            logging.info(f"--> Partners: {len(partners)} [AGENT]")
+            logging.info(f"--> Devices: {len(devices)} [AGENT]")
+            logging.info(f"--> Employees: {len(employees)} [AGENT]")
+
+            logging.info(f"--> Appointments: {len(appointments)} [INTERACTION]")
+
+            logging.info(f"##################################################################################")
+        finally:
+            self.release_prefetched_files()
+
+        if use_cache:
+            cache.save(cache_key, dataset)
 
         return dataset
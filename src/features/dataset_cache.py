@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""This script contains the on-disk snapshot cache for the dataset created by ``DataLoader.prepare_dataset()``.
+
+The linked dataset dictionary is a densely cyclic object graph (Stay.case <-> Case.stays, Room.stays, ...). Instead
+of pickling it (which recurses along the references and hits the recursion limit), every model object is assigned
+an integer id and stored once in a flat object table, with references to other model objects replaced by their
+ids. The table is serialized with ``marshal`` and compressed with ``zlib``.
+
+Snapshots are keyed by the checksums of the interim input files (local or on HDFS), the ``prepare_dataset()``
+arguments and the source code of the data model and the loader, so a snapshot is only reused if neither the data, the
+load parameters nor the classes of the restored objects changed.
+
+-----
+"""
+
+import datetime
+import hashlib
+import importlib
+import logging
+import marshal
+import os
+import pathlib
+import zlib
+
+import numpy as np
+import pandas as pd
+
+SNAPSHOT_FORMAT_VERSION = 2  # 2: slotted entities and stay indexes of rooms and wards
+SNAPSHOT_MAGIC = b"VRESNAP"
+SNAPSHOT_SUFFIX = ".snapshot"
+
+# only classes of the data model can be restored from a snapshot
+MODEL_MODULE_PREFIX = "src.features.model."
+
+# sources of the classes and loaders creating the dataset, snapshots are invalidated if they change
+CODE_PATHS = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "model"),
+              os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataloader.py"),
+              os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "common")]
+
+# tags of the encoded values, all encoded tuples are tagged
+_REF = 0
+_TUPLE = 1
+_TIMESTAMP = 2
+_NAT = 3
+_DATETIME = 4
+_DATE = 5
+_TIMEDELTA = 6
+
+_PLAIN_TYPES = (type(None), bool, int, float, str, bytes)
+
+# indexes derived from other attributes, they are stored as None and rebuilt on demand
+TRANSIENT_ATTRIBUTES = {"stay_index"}
+
+
+def _get_state(obj):
+    """Returns the attributes of a model object, including attributes stored in ``__slots__``."""
+    state = dict(obj.__dict__) if hasattr(obj, "__dict__") else dict()
+    for cls in type(obj).__mro__:
+        slots = cls.__dict__.get("__slots__", ())
+        for name in [slots] if isinstance(slots, str) else slots:
+            if name not in ("__dict__", "__weakref__") and hasattr(obj, name):
+                state[name] = getattr(obj, name)
+    for name in TRANSIENT_ATTRIBUTES.intersection(state.keys()):
+        state[name] = None
+    return state
+
+
+class _SnapshotEncoder:
+    """Flattens an object graph into a table of object records."""
+
+    def __init__(self):
+        self.object_ids = dict()
+        self.objects = []
+        self.class_ids = dict()
+        self.classes = []
+
+    def get_class_id(self, cls):
+        class_id = self.class_ids.get(cls, None)
+        if class_id is None:
+            if not cls.__module__.startswith(MODEL_MODULE_PREFIX):
+                raise TypeError(f"Cannot store objects of type {cls.__module__}.{cls.__qualname__} in a snapshot")
+            class_id = len(self.classes)
+            self.class_ids[cls] = class_id
+            self.classes.append(f"{cls.__module__}:{cls.__qualname__}")
+        return class_id
+
+    def encode(self, value):
+        value_type = type(value)
+        if value_type in _PLAIN_TYPES:
+            return value
+        if value_type is list:
+            return [self.encode(v) for v in value]
+        if value_type is dict:
+            return {self.encode(k): self.encode(v) for k, v in value.items()}
+        if value_type is set:
+            return {self.encode(v) for v in value}
+        if value_type is frozenset:
+            return frozenset(self.encode(v) for v in value)
+        if value_type is tuple:
+            return (_TUPLE, tuple(self.encode(v) for v in value))
+        if value is pd.NaT:
+            return (_NAT,)
+        if value_type is pd.Timestamp:
+            return (_TIMESTAMP, value.value)
+        if value_type is np.datetime64:
+            return (_TIMESTAMP, pd.Timestamp(value).value) if not np.isnat(value) else (_NAT,)
+        if value_type is datetime.datetime:
+            return (_DATETIME, value.isoformat())
+        if value_type is datetime.date:
+            return (_DATE, value.toordinal())
+        if value_type is datetime.timedelta:
+            return (_TIMEDELTA, value.days, value.seconds, value.microseconds)
+        if isinstance(value, (np.bool_, np.integer, np.floating, np.str_)):
+            return value.item()
+        for builtin_type in (bool, int, float, str):
+            if isinstance(value, builtin_type):
+                return builtin_type(value)  # subclasses of builtins are not supported by marshal
+
+        # model objects are stored once in the object table and referenced by id
+        object_id = self.object_ids.get(id(value), None)
+        if object_id is None:
+            self.get_class_id(value_type)
+            object_id = len(self.objects)
+            self.object_ids[id(value)] = object_id
+            self.objects.append(value)
+        return (_REF, object_id)
+
+    def encode_graph(self, root):
+        encoded_root = self.encode(root)
+        records = []
+        # self.objects grows while the records are encoded, the graph is walked without recursion
+        index = 0
+        while index < len(self.objects):
+            obj = self.objects[index]
+            records.append((self.class_ids[type(obj)], self.encode(_get_state(obj))))
+            index += 1
+        return self.classes, records, encoded_root
+
+
+class _SnapshotDecoder:
+    """Restores an object graph from a table of object records."""
+
+    def __init__(self, classes, records):
+        self.classes = [self.import_class(class_name) for class_name in classes]
+        self.records = records
+        self.objects = [self.classes[class_id].__new__(self.classes[class_id]) for class_id, _ in records]
+
+    @staticmethod
+    def import_class(class_name):
+        module_name, qualname = class_name.split(":")
+        if not module_name.startswith(MODEL_MODULE_PREFIX):
+            raise ValueError(f"Snapshot refers to class {class_name} outside of the data model")
+        cls = importlib.import_module(module_name)
+        for name in qualname.split("."):
+            cls = getattr(cls, name)
+        return cls
+
+    def decode(self, value):
+        value_type = type(value)
+        if value_type is tuple:
+            tag = value[0]
+            if tag == _REF:
+                return self.objects[value[1]]
+            if tag == _TUPLE:
+                return tuple(self.decode(v) for v in value[1])
+            if tag == _TIMESTAMP:
+                return pd.Timestamp(value[1])
+            if tag == _NAT:
+                return pd.NaT
+            if tag == _DATETIME:
+                return datetime.datetime.fromisoformat(value[1])
+            if tag == _DATE:
+                return datetime.date.fromordinal(value[1])
+            if tag == _TIMEDELTA:
+                return datetime.timedelta(days=value[1], seconds=value[2], microseconds=value[3])
+            raise ValueError(f"Unknown snapshot tag {tag}")
+        if value_type is list:
+            return [self.decode(v) for v in value]
+        if value_type is dict:
+            return {self.decode(k): self.decode(v) for k, v in value.items()}
+        if value_type is set:
+            return {self.decode(v) for v in value}
+        if value_type is frozenset:
+            return frozenset(self.decode(v) for v in value)
+        return value
+
+    def decode_graph(self, encoded_root):
+        for obj, (_, encoded_state) in zip(self.objects, self.records):
+            state = self.decode(encoded_state)
+            if hasattr(obj, "__dict__"):
+                obj.__dict__.update(state)
+            else:
+                for name, value in state.items():
+                    setattr(obj, name, value)
+        return self.decode(encoded_root)
+
+
+def save_snapshot(dataset, path):
+    """Writes the linked dataset dictionary to a snapshot file.
+
+    Args:
+        dataset (dict): dictionary returned by ``DataLoader.prepare_dataset()``
+        path (str):     path of the snapshot file
+    """
+    classes, records, encoded_root = _SnapshotEncoder().encode_graph(dataset)
+    payload = zlib.compress(marshal.dumps((SNAPSHOT_FORMAT_VERSION, classes, records, encoded_root)), 1)
+    tmp_path = str(path) + ".tmp"
+    with open(tmp_path, "wb") as snapshot_file:
+        snapshot_file.write(SNAPSHOT_MAGIC)
+        snapshot_file.write(payload)
+    os.replace(tmp_path, path)  # never leave a half written snapshot behind
+    logging.info(f"Snapshot with {len(records)} objects written to {path}")
+
+
+def load_snapshot(path):
+    """Reads a linked dataset dictionary from a snapshot file.
+
+    Args:
+        path (str): path of the snapshot file
+
+    Returns:
+        dict: the dataset dictionary as returned by ``DataLoader.prepare_dataset()``
+    """
+    with open(path, "rb") as snapshot_file:
+        if snapshot_file.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a dataset snapshot")
+        version, classes, records, encoded_root = marshal.loads(zlib.decompress(snapshot_file.read()))
+    if version != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Snapshot {path} has format version {version}, expected {SNAPSHOT_FORMAT_VERSION}")
+    return _SnapshotDecoder(classes, records).decode_graph(encoded_root)
+
+
+def get_file_checksum(path, block_size=1 << 20):
+    """Returns the SHA-256 hex digest of the file content at ``path``."""
+    checksum = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            checksum.update(block)
+    return checksum.hexdigest()
+
+
+def get_code_fingerprint(paths):
+    """Returns the SHA-256 hex digest of the Python sources in ``paths`` (files or directories)."""
+    fingerprint = hashlib.sha256()
+    for path in paths:
+        if os.path.isdir(path):
+            source_paths = sorted(os.path.join(directory, name) for directory, _, names in os.walk(path)
+                                  for name in names if name.endswith(".py"))
+        else:
+            source_paths = [path]
+        for source_path in source_paths:
+            fingerprint.update(f"{os.path.relpath(source_path, path)}={get_file_checksum(source_path)}".encode())
+    return fingerprint.hexdigest()
+
+
+class DatasetCache:
+    """Content-hash keyed snapshot cache of the linked dataset dictionary.
+    """
+
+    def __init__(self, cache_dir, code_paths=None):
+        self.cache_dir = cache_dir
+        self.code_paths = CODE_PATHS if code_paths is None else code_paths
+
+    def get_key(self, input_paths, arguments, remote_checksums=""):
+        """Computes the cache key of a dataset.
+
+        Args:
+            input_paths (list):     paths of the files the dataset is loaded from, missing files (and directories) are
+                                    ignored
+            arguments (dict):       arguments the dataset is loaded with
+            remote_checksums (str): checksums of the files the dataset is loaded from which are not local (i.e. the
+                                    output of ``DataLoader.get_hdfs_checksums()``)
+
+        Returns:
+            str: hex digest identifying the dataset
+        """
+        key = hashlib.sha256()
+        key.update(f"version={SNAPSHOT_FORMAT_VERSION}".encode())
+        key.update(f"code={get_code_fingerprint(self.code_paths)}".encode())
+        key.update(f"remote={remote_checksums}".encode())
+        for name in sorted(arguments.keys()):
+            key.update(f"{name}={arguments[name]!r}".encode())
+        for path in sorted(set(input_paths)):
+            if os.path.isfile(path):
+                key.update(f"{os.path.basename(path)}={get_file_checksum(path)}".encode())
+        return key.hexdigest()
+
+    def get_path(self, key):
+        return os.path.join(self.cache_dir, key + SNAPSHOT_SUFFIX)
+
+    def load(self, key):
+        """Returns the cached dataset for ``key`` or ``None`` if it is not cached (or unreadable)."""
+        path = self.get_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            return load_snapshot(path)
+        except (ValueError, EOFError, zlib.error) as e:
+            logging.warning(f"Ignoring unreadable snapshot {path}: {e}")
+            return None
+
+    def save(self, key, dataset):
+        pathlib.Path(self.cache_dir).mkdir(parents=True, exist_ok=True)
+        save_snapshot(dataset, self.get_path(key))
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""This script contains the ``InteractionTable``, a column store of all interactions between the nodes of the model.
+
+The table is built once from the linked patient objects and used by all consumers which only need the interactions
+(``SurfaceModel.add_network_data()``, ``extract_tgn_data.get_node_interactions()`` and
+``extract_gnn_data.get_entity_interactions()``), instead of each consumer walking the object graph again.
+
+Nodes are identified by integers, which are mapped to their type and string id via ``node_types`` and ``node_ids``.
+The stays identify their room by its SAP room id, while the TGN and GNN exports identify rooms by ``Room().room_id``,
+which is mapped via ``export_ids``.
+Each interaction (row) consists of the following NumPy columns:
+
+- ``source``, ``target`` :math:`\\longrightarrow` node integers, oriented as in the ``SurfaceModel``
+  (i.e. Patient-Room, Patient-Device, Patient-Employee, Employee-Device, Employee-Room, Device-Room)
+- ``patient`` :math:`\\longrightarrow` node integer of the patient the interaction was recorded for
+- ``edge_type``, ``origin`` :math:`\\longrightarrow` codes of ``EDGE_TYPES`` and ``ORIGINS``
+- ``from_ts``, ``to_ts`` :math:`\\longrightarrow` interval of the edge in the ``SurfaceModel``
+  (appointments last ``duration_in_mins`` minutes)
+- ``begin_ts``, ``end_ts`` :math:`\\longrightarrow` interval as recorded on the objects
+  (``Appointment().start_datetime`` and ``Appointment().end_datetime``)
+
+-----
+"""
+
+import logging
+
+import numpy as np
+import pandas as pd
+from datetime import timedelta
+from tqdm import tqdm
+
+from src.common.interval_index import to_ns
+
+NODE_TYPES = ("Patient", "Room", "Device", "Employee")
+EDGE_TYPES = ("Patient-Room", "Device-Patient", "Employee-Patient", "Device-Room", "Employee-Room", "Device-Employee")
+ORIGINS = ("Stay", "Appointment", "Treatment")
+
+PATIENT, ROOM, DEVICE, EMPLOYEE = range(len(NODE_TYPES))
+PATIENT_ROOM, DEVICE_PATIENT, EMPLOYEE_PATIENT, DEVICE_ROOM, EMPLOYEE_ROOM, DEVICE_EMPLOYEE = range(len(EDGE_TYPES))
+STAY, APPOINTMENT, TREATMENT = range(len(ORIGINS))
+
+UNKNOWN_ROOM = "Room_Unknown"
+
+COLUMNS = ["source", "target", "patient", "edge_type", "origin", "from_ts", "to_ts", "begin_ts", "end_ts"]
+
+_NAT_NS = np.iinfo(np.int64).min  # integer representation of NaT
+
+
+def to_datetime64(values):
+    """Converts a sequence of datetime-like values (``None`` and ``NaT`` included) to a ``datetime64[ns]`` array.
+
+    Values outside the range of ``datetime64[ns]`` (i.e. stays ending 9999-12-31) are clipped to its bounds like in
+    ``interval_index.to_ns()``, instead of wrapping around.
+    """
+    nanoseconds = [to_ns(value) for value in values]
+    return np.array([_NAT_NS if ns is None else ns for ns in nanoseconds], dtype=np.int64).view("datetime64[ns]")
+
+
+def to_datetime64_bound(value):
+    """Converts a range bound to a ``datetime64[ns]`` scalar, clipping values outside the representable range."""
+    try:
+        return np.datetime64(pd.Timestamp(value).to_datetime64(), "ns")
+    except (OverflowError, ValueError):  # i.e. datetime.datetime.min
+        bound = pd.Timestamp.min if value < pd.Timestamp.min.to_pydatetime() else pd.Timestamp.max
+        return np.datetime64(bound.to_datetime64(), "ns")
+
+
+class InteractionTable:
+    """Struct-of-arrays representation of all interactions between patients, rooms, devices and employees.
+    """
+
+    def __init__(self):
+        self.node_ids = []  # node integer -> string id
+        self.export_ids = []  # node integer -> string id used by the TGN and GNN exports
+        self.node_types = []  # node integer -> code of NODE_TYPES
+        self.node_index = dict()  # (type code, string id) -> node integer
+        self.node_attributes = dict()  # node integer -> dict of attributes (rooms and devices)
+        self.columns = {column: [] for column in COLUMNS}
+
+    def __len__(self):
+        return len(self.columns["source"])
+
+    def get_node(self, node_type, node_id):
+        """Returns the integer of a node, which is created if it does not exist yet.
+
+        Args:
+            node_type (int):    code of the node type, i.e. ``ROOM``
+            node_id (str):      string id of the node
+
+        Returns:
+            int: node integer
+        """
+        key = (node_type, node_id)
+        node = self.node_index.get(key, None)
+        if node is None:
+            node = len(self.node_ids)
+            self.node_index[key] = node
+            self.node_ids.append(node_id)
+            self.export_ids.append(node_id)
+            self.node_types.append(node_type)
+        return node
+
+    def find_node(self, node_type, node_id):
+        """Returns the integer of a node, or ``None`` if it does not exist."""
+        return self.node_index.get((node_type, node_id), None)
+
+    def _append(self, source, target, patient, edge_type, origin, from_ts, to_ts, begin_ts, end_ts):
+        for column, value in zip(COLUMNS, (source, target, patient, edge_type, origin, from_ts, to_ts, begin_ts, end_ts)):
+            self.columns[column].append(value)
+
+    def _add_room_node(self, room_id, rooms, ward_name, room):
+        node = self.get_node(ROOM, room_id)
+        if room is not None:
+            # the exports identify rooms by Room().room_id (i.e. SAP room id 2 if present), also for stays whose SAP
+            # room id is another id of the room
+            self.export_ids[node] = room.room_id
+        room_entry = rooms.get(room_id, None) if rooms is not None else None
+        self.node_attributes[node] = {"building_id": room_entry.ww_building_id if room_entry is not None else None,
+                                      "ward_id": ward_name,
+                                      "room_id": room.get_ids() if room is not None else None,
+                                      "room_description": room.room_description if room is not None else None}
+        return node
+
+    @staticmethod
+    def from_patients(patients, rooms=None, include_treatments=True, is_verbose=True):
+        """Builds the table by walking the objects of the patients once.
+
+        The interactions of each patient are appended in the order in which ``SurfaceModel.add_network_data()`` used
+        to add them: stays, then for each appointment the edges of the types Device-Patient, Patient-Room,
+        Employee-Patient, Device-Employee, Employee-Room and Device-Room, and finally the treatments.
+
+        Args:
+            patients (dict):            Dictionary mapping patient ids to Patient() objects
+            rooms (dict):               Dictionary mapping room ids to Room() objects, used for the building ids
+            include_treatments (bool):  whether to add the Employee-Patient interactions of treatments
+            is_verbose (bool):          show a progress bar
+
+        Returns:
+            InteractionTable: the table
+        """
+        table = InteractionTable()
+        for patient in tqdm(patients.values(), total=len(patients), disable=not is_verbose):
+            patient_node = table.get_node(PATIENT, str(patient.patient_id))
+
+            for stay in patient.get_stays():
+                if stay.room_id is None:
+                    room_node = table.get_node(ROOM, UNKNOWN_ROOM)
+                    table.node_attributes.setdefault(room_node, dict())
+                else:
+                    room_node = table._add_room_node(stay.room_id, rooms, stay.ward.name if stay.ward is not None else None, stay.room)
+                table._append(patient_node, room_node, patient_node, PATIENT_ROOM, STAY,
+                              stay.from_datetime, stay.to_datetime, stay.from_datetime, stay.to_datetime)
+
+            for appointment in patient.get_appointments():
+                from_ts = appointment.date
+                to_ts = appointment.date + timedelta(hours=appointment.duration_in_mins / 60.0)
+                times = (from_ts, to_ts, appointment.start_datetime, appointment.end_datetime)
+
+                device_nodes = []
+                for device in appointment.devices:
+                    device_node = table.get_node(DEVICE, str(device.id))
+                    table.node_attributes[device_node] = {"name": str(device.name)}
+                    device_nodes.append(device_node)
+                employee_nodes = [table.get_node(EMPLOYEE, str(employee.id)) for employee in appointment.employees]
+                room_nodes = [table._add_room_node(room.room_id, rooms, room.ward_name, room) for room in appointment.rooms]
+
+                for device_node in device_nodes:
+                    table._append(patient_node, device_node, patient_node, DEVICE_PATIENT, APPOINTMENT, *times)
+                for room_node in room_nodes:
+                    table._append(patient_node, room_node, patient_node, PATIENT_ROOM, APPOINTMENT, *times)
+                for employee_node in employee_nodes:
+                    table._append(patient_node, employee_node, patient_node, EMPLOYEE_PATIENT, APPOINTMENT, *times)
+                for employee_node in employee_nodes:
+                    for device_node in device_nodes:
+                        table._append(employee_node, device_node, patient_node, DEVICE_EMPLOYEE, APPOINTMENT, *times)
+                for employee_node in employee_nodes:
+                    for room_node in room_nodes:
+                        table._append(employee_node, room_node, patient_node, EMPLOYEE_ROOM, APPOINTMENT, *times)
+                for device_node in device_nodes:
+                    for room_node in room_nodes:
+                        table._append(device_node, room_node, patient_node, DEVICE_ROOM, APPOINTMENT, *times)
+
+            if include_treatments:
+                for treatment in patient.get_treatments():
+                    employee_node = table.get_node(EMPLOYEE, str(treatment.employee_id))
+                    to_ts = treatment.date + timedelta(minutes=treatment.duration_in_minutes)
+                    table._append(patient_node, employee_node, patient_node, EMPLOYEE_PATIENT, TREATMENT,
+                                  treatment.date, to_ts, treatment.date, to_ts)
+
+        table.freeze()
+        logging.info(f"Interaction table contains {len(table)} interactions between {len(table.node_ids)} nodes")
+        return table
+
+    def freeze(self):
+        """Converts the collected columns to typed NumPy arrays."""
+        for column in ["source", "target", "patient"]:
+            self.columns[column] = np.asarray(self.columns[column], dtype=np.int64)
+        for column in ["edge_type", "origin"]:
+            self.columns[column] = np.asarray(self.columns[column], dtype=np.int8)
+        for column in ["from_ts", "to_ts", "begin_ts", "end_ts"]:
+            self.columns[column] = to_datetime64(self.columns[column])
+        self.node_ids = np.asarray(self.node_ids, dtype=object)
+        self.export_ids = np.asarray(self.export_ids, dtype=object)
+        self.node_types = np.asarray(self.node_types, dtype=np.int8)
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def get_mask(self, edge_types=None, origins=None, from_range=None, to_range=None, patients=None):
+        """Returns a boolean mask selecting interactions.
+
+        Args:
+            edge_types (iterable):  edge type names to keep, i.e. ``["Patient-Room"]`` (all if ``None``)
+            origins (iterable):     origin names to keep, i.e. ``["Stay", "Appointment"]`` (all if ``None``)
+            from_range (datetime):  keep only interactions with ``from_ts >= from_range``
+            to_range (datetime):    keep only interactions with ``to_ts < to_range``
+            patients (iterable):    string ids of the patients whose interactions are kept (all if ``None``)
+
+        Returns:
+            np.ndarray: boolean mask
+        """
+        mask = np.ones(len(self), dtype=bool)
+        if edge_types is not None:
+            mask &= np.isin(self.columns["edge_type"], [EDGE_TYPES.index(t) for t in edge_types])
+        if origins is not None:
+            mask &= np.isin(self.columns["origin"], [ORIGINS.index(o) for o in origins])
+        if from_range is not None:
+            mask &= self.columns["from_ts"] >= to_datetime64_bound(from_range)
+        if to_range is not None:
+            mask &= self.columns["to_ts"] < to_datetime64_bound(to_range)
+        if patients is not None:
+            patient_nodes = [self.find_node(PATIENT, str(p)) for p in patients]
+            mask &= np.isin(self.columns["patient"], [node for node in patient_nodes if node is not None])
+        return mask
+
+    def to_frame(self, mask=None):
+        """Returns the interactions as a DataFrame with string ids and type names.
+
+        Args:
+            mask (np.ndarray):  boolean mask of the interactions to include (all if ``None``)
+
+        Returns:
+            pd.DataFrame: columns ``source``, ``source type``, ``target``, ``target type``, ``type``, ``origin``,
+            ``from``, ``to``, ``begin``, ``end``
+        """
+        columns = {name: values if mask is None else values[mask] for name, values in self.columns.items()}
+        node_type_names = np.asarray(NODE_TYPES, dtype=object)
+        return pd.DataFrame({"source": self.node_ids[columns["source"]],
+                             "source type": node_type_names[self.node_types[columns["source"]]],
+                             "target": self.node_ids[columns["target"]],
+                             "target type": node_type_names[self.node_types[columns["target"]]],
+                             "type": np.asarray(EDGE_TYPES, dtype=object)[columns["edge_type"]],
+                             "origin": np.asarray(ORIGINS, dtype=object)[columns["origin"]],
+                             "from": columns["from_ts"],
+                             "to": columns["to_ts"],
+                             "begin": columns["begin_ts"],
+                             "end": columns["end_ts"]})
@@ -4,24 +4,27 @@
 -----
 """
 
-import itertools
 import logging
 from datetime import timedelta
 
-import pandas as pd
+from src.common.interim_store import read_interim_table, date_range_filters
+from src.common.linking import get_line_frame, resolve_foreign_keys
+from src.common.compact import intern_string
 from tqdm import tqdm
 
 
 class Appointment:
     """Models an appointment from RAP.
     """
+    __slots__ = ["id", "is_deleted", "description", "type_nr", "type", "date", "start_datetime", "end_datetime",
+                 "case", "duration_in_mins", "devices", "employees", "rooms"]
 
     def __init__(self, id, is_deleted, description, type_nr, type, date, duration_in_mins):
         self.id = id
-        self.is_deleted = is_deleted
-        self.description = description
-        self.type_nr = type_nr
-        self.type = type
+        self.is_deleted = intern_string(is_deleted)
+        self.description = intern_string(description)
+        self.type_nr = intern_string(type_nr)
+        self.type = intern_string(type)
         self.date = date
         self.start_datetime = None
         self.end_datetime = None
@@ -91,7 +94,8 @@ class Appointment:
         nr_malformed = 0
         nr_ok = 0
         appointments = dict()
-        appointment_df = pd.read_csv(csv_path, encoding=encoding, parse_dates=["Date"], dtype=str)
+        appointment_df = read_interim_table(csv_path, encoding, parse_dates=["Date"],
+                                            filters=date_range_filters("Date", "Date", from_range, to_range))
 
         if from_range is not None:
             appointment_df = appointment_df.loc[appointment_df['Date'] > from_range]
@@ -134,22 +138,13 @@ class Appointment:
                                         --> ``{ '36830543' : Appointment(), ... }``
         """
         logging.debug("add_appointment_to_case")
-        nr_appointment_not_found = 0
-        nr_case_not_found = 0
-        nr_ok = 0
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=not is_verbose):
-            appointment_id = line[0]
-            case_id = line[2]
-            if appointments.get(appointment_id, None) is None:
-                nr_appointment_not_found += 1
-                continue
-            if cases.get(case_id, None) is None:
-                nr_case_not_found += 1
-                continue
+        link_df = get_line_frame(lines, {"Appointment ID": 0, "Case ID": 2})
+        link_df, (nr_appointment_not_found, nr_case_not_found) = resolve_foreign_keys(link_df, [("Appointment ID", appointments), ("Case ID", cases)])
+
+        for appointment_id, case_id in tqdm(zip(link_df["Appointment ID"].values, link_df["Case ID"].values), total=len(link_df), disable=not is_verbose):
             cases[case_id].add_appointment(appointments[appointment_id])
             appointments[appointment_id].case = cases[case_id]
-            nr_ok += 1
+        nr_ok = len(link_df)
 
         deleted_appointments = [appointment_id for appointment_id, appointment in appointments.items() if appointment.case is None]
 
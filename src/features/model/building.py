@@ -1,4 +1,5 @@
 import pandas as pd
+from src.common.interim_store import read_interim_table
 from tqdm import tqdm
 import logging
 
@@ -57,7 +58,7 @@ class Building:
         :return:        Dictionary mapping room ids to Room() objects   --> {'127803' : Room(), ... }
         """
         logging.debug("create_room_dict")
-        buildings_df = pd.read_csv(csv_path, encoding=encoding, dtype=str, index_col=0)
+        buildings_df = read_interim_table(csv_path, encoding, index_col=0)
         buildings_objects = list(map(lambda row: Building(*row), tqdm(buildings_df.values.tolist(), disable=not is_verbose)))
         buildings = {}
         for building in buildings_objects:
@@ -2,7 +2,7 @@ import logging
 from datetime import datetime
 
 from tqdm import tqdm
-import pandas as pd
+from src.common.interim_store import read_interim_table
 import re
 
 from src.features.model.data_model_constants import CaseEnum
@@ -187,7 +187,7 @@ class Case:
         """
         logging.debug("create_case_map")
 
-        case_df = pd.read_csv(csv_path, encoding=encoding, parse_dates=["Start Date", "End Date"], dtype=str)
+        case_df = read_interim_table(csv_path, encoding, parse_dates=["Start Date", "End Date"])
 
         if load_fraction != 1.0:
             case_df = case_df.sample(frac=load_fraction, random_state=load_seed)
@@ -7,7 +7,8 @@
 import logging
 
 from tqdm import tqdm
-import itertools
+
+from src.common.line_reader import get_row_count
 
 
 class Chop:
@@ -117,8 +118,7 @@ class Chop:
         """
         logging.debug("create_chop_dict")
         chops = dict()
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=not is_verbose):
+        for line in tqdm(lines, total=get_row_count(lines, is_verbose), disable=not is_verbose):
             chop = Chop(*line)
             chops[chop.chop_code + "_" + chop.chop_sap_catalog_id] = chop
             # based on the schema in the docstring, this would yield "Z62.99.30_16" or "Z62.99.99_10"
@@ -5,10 +5,13 @@
 """
 
 import logging
-import itertools
 
 from tqdm import tqdm
 
+from src.common.line_reader import get_row_count
+
+from src.common.linking import get_line_frame, resolve_foreign_keys, get_missing_keys
+
 
 class Device:
     """
@@ -44,8 +47,7 @@ class Device:
         """
         logging.debug("create_device_map")
         devices = dict()
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=not is_verbose):
+        for line in tqdm(lines, total=get_row_count(lines, is_verbose), disable=not is_verbose):
             device = Device(*line)
             devices[device.id] = device
         logging.info(f"{len(devices)} devices created")
@@ -76,21 +78,18 @@ class Device:
                                         :math:`\\longrightarrow` ``{'64174' : Device(), ... }``
         """
         logging.debug("add_device_to_appointment")
-        nr_appointment_not_found = 0
-        nr_device_created = 0
-        nr_ok = 0
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=not is_verbose):
-            appointment_id = line[0]
-            if appointments.get(appointment_id, None) is None:
-                nr_appointment_not_found += 1
-                continue
-            device_id = line[1]
-            if devices.get(device_id, None) is None:
-                devices[device_id] = Device(device_id, device_id)
-                nr_device_created += 1
+        link_df = get_line_frame(lines, {"Appointment ID": 0, "Device ID": 1})
+        link_df, (nr_appointment_not_found,) = resolve_foreign_keys(link_df, [("Appointment ID", appointments)])
+
+        # create the devices missing in DIM_GERAET
+        new_device_ids = get_missing_keys(link_df["Device ID"], devices)
+        for device_id in new_device_ids:
+            devices[device_id] = Device(device_id, device_id)
+        nr_device_created = len(new_device_ids)
+
+        for appointment_id, device_id in tqdm(zip(link_df["Appointment ID"].values, link_df["Device ID"].values), total=len(link_df), disable=not is_verbose):
             appointments[appointment_id].add_device(devices[device_id])
-            nr_ok += 1
+        nr_ok = len(link_df)
         logging.info(f"{nr_ok} devices linked to appointments, {nr_appointment_not_found} appointments not found, "
                      f"{nr_device_created} devices created")
     # TODO: Leads to stackoverflow
@@ -5,10 +5,10 @@
 """
 
 import logging
-import itertools
 
 from tqdm import tqdm
-import pandas as pd
+from src.common.interim_store import read_interim_table
+from src.common.linking import get_line_frame, resolve_foreign_keys
 
 
 class Employee:
@@ -43,11 +43,11 @@ class Employee:
                 :math:`\\longrightarrow` ``{'0032719' : Employee(), ... }``
         """
         logging.debug("create_employee_map")
-        employee_df = pd.read_csv(csv_path, encoding=encoding, dtype=str)
+        employee_df = read_interim_table(csv_path, encoding, columns=["Employee ID"])
         if load_fraction != 1.0:
             employee_df = employee_df.sample(frac=load_fraction, random_state=load_seed)
 
-        employees_objects = list(map(lambda row: Employee(*row[1:2]), tqdm(employee_df.values.tolist(), disable=not is_verbose)))
+        employees_objects = list(map(lambda row: Employee(*row), tqdm(employee_df.values.tolist(), disable=not is_verbose)))
         del employee_df
 
         employees = dict()
@@ -75,22 +75,12 @@ class Employee:
                                         :math:`\\longrightarrow` ``{'0032719' : Employee(), ... }``
         """
         logging.debug("add_employee_to_appointment")
-        nr_employee_not_found = 0
-        nr_appointment_not_found = 0
-        nr_ok = 0
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=not is_verbose):
-            employee_id = line[1]
-            appointment_id = line[0]
-            if appointments.get(appointment_id, None) is None:
-                nr_appointment_not_found += 1
-                continue
-            if employees.get(employee_id, None) is None:
-                nr_employee_not_found += 1
-
-                continue
+        link_df = get_line_frame(lines, {"Appointment ID": 0, "Employee ID": 1})
+        link_df, (nr_appointment_not_found, nr_employee_not_found) = resolve_foreign_keys(link_df, [("Appointment ID", appointments), ("Employee ID", employees)])
+
+        for appointment_id, employee_id in tqdm(zip(link_df["Appointment ID"].values, link_df["Employee ID"].values), total=len(link_df), disable=not is_verbose):
             appointments[appointment_id].add_employee(employees[employee_id])
-            nr_ok += 1
+        nr_ok = len(link_df)
         logging.info(f"{nr_ok} employees linked to appointment, {nr_appointment_not_found} appointments not found, "
                      f"{nr_employee_not_found} employees not found")
     # TODO: Leads to stackoverflow
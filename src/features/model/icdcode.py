@@ -9,6 +9,8 @@ import logging
 
 from tqdm import tqdm
 
+from src.common.line_reader import get_row_count
+
 
 class ICDCode:
     """Models an ``ICD`` object.
@@ -57,9 +59,8 @@ class ICDCode:
         logging.debug("Creating ICD dictionary")
         icd_dict = {}
 
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=not is_verbose):
-            this_icd = ICDCode(*each_line)
+        for line in tqdm(lines, total=get_row_count(lines, is_verbose), disable=not is_verbose):
+            this_icd = ICDCode(*line)
             icd_dict[this_icd.icd_code] = this_icd
         # Write success to log and return dictionary
         logging.info(f'Successfully created {len(icd_dict.values())} ICD entries')
@@ -7,7 +7,7 @@
 import logging
 from datetime import datetime
 import concurrent.futures
-import pandas as pd
+from src.common.interim_store import read_interim_table
 
 from tqdm import tqdm
 
@@ -72,7 +72,7 @@ class Medication:
         logging.debug("create_drug_map")
         nr_cases_not_found = 0
         medications = dict()
-        medication_df = pd.read_csv(csv_path, encoding=encoding, parse_dates=["Submission Date"], dtype=str)
+        medication_df = read_interim_table(csv_path, encoding, parse_dates=["Submission Date"])
         # medication_objects = medication_df.progress_apply(lambda row: Medication(*row.to_list()), axis=1)
         medication_objects = list(map(lambda row: Medication(*row), tqdm(medication_df.values.tolist(), disable=not is_verbose)))
         del medication_df
@@ -1,7 +1,7 @@
 import logging
 
 from tqdm import tqdm
-import pandas as pd
+from src.common.interim_store import read_interim_table
 
 
 class Partner:
@@ -62,7 +62,7 @@ class Partner:
         Returns: Dictionary mapping partners to Partner() objects --> {'1001503842' : Partner(), '1001503845' : Partner(), ... }
         """
 
-        partner_df = pd.read_csv(csv_path, encoding=encoding)
+        partner_df = read_interim_table(csv_path, encoding, dtype=None)
         partner_df["Partner ID"] = partner_df["Partner ID"].astype(int)
         #partner_objects = partner_df.progress_apply(lambda row: Partner(*row.to_list()), axis=1)
         partner_objects = list(map(lambda row: Partner(*row), tqdm(partner_df.values.tolist(), disable=not is_verbose)))
@@ -87,7 +87,7 @@ class Partner:
 
         Referring physicians (EARZT = 'U') are added only to cases which are NOT cancelled, i.e. STORN != 'X'.
         """
-        case_partners_df = pd.read_csv(csv_path, encoding=encoding, dtype=str)
+        case_partners_df = read_interim_table(csv_path, encoding)
         if load_fraction != 1.0:
             case_partners_df = case_partners_df.sample(frac=load_fraction, seed=load_seed)
         # in principle they are all int, history makes them a varchar/string
@@ -4,7 +4,8 @@ import logging
 from dateutil.relativedelta import relativedelta
 from tqdm import tqdm
 # from concurrent.futures import ThreadPoolExecutor
-import pandas as pd
+from src.common.interim_store import read_interim_table
+from src.features.contact_sweep import get_contact_frame
 
 from src.features.model.data_model_constants import ICUs
 from src.features.model import Stay, Appointment
@@ -584,7 +585,7 @@ class Patient:
         logging.debug("create_patient_dict")
         import_count = 0
         patients = dict()
-        patient_df = pd.read_csv(csv_path, encoding=encoding, parse_dates=["Birth Date"], dtype=str)
+        patient_df = read_interim_table(csv_path, encoding, parse_dates=["Birth Date"])
 
         if load_fraction != 1.0:
             patient_df = patient_df.sample(frac=load_fraction, random_state=load_seed)
@@ -703,13 +704,23 @@ class Patient:
 
     @staticmethod
     def get_contact_patients(patients, with_details=True):
+        """Returns the room and ward contacts of all risk patients in stationary cases.
+
+        The contacts are computed in a single sweep per room and ward by ``get_contact_frame()``.
+
+        Returns:
+            dict: Dictionary mapping contact patient ids to lists of (risk patient id, contact patient id, overlap
+            start, overlap end, location, contact type) tuples if with_details is ``True``, otherwise to the
+            (risk patient id, contact patient id, contact type) tuple of the first contact
+        """
+        # TODO: and c.stays_end > datetime.datetime.now() - relativedelta(years=1): Think again about this
+        contact_df = get_contact_frame(patients, with_details=with_details, case_type_ids=("1",))
         contact_patients = {}
-        for p in tqdm(patients.values()):
-            if p.has_risk():
-                for c in p.cases.values():
-                    if c.case_type_id == "1":  # only stationary cases # TODO: cast to int for faster comparison
-                        if c.stays_end is not None:  # and c.stays_end > datetime.datetime.now() - relativedelta(years=1): # TODO: Think again about this
-                            Patient.get_contact_patients_for_case(c, contact_patients, with_details=with_details)
+        for row in contact_df.itertuples(index=False, name=None):
+            if with_details:
+                contact_patients.setdefault(row[1], []).append(row)
+            else:
+                contact_patients[row[1]] = row
         return contact_patients
 
     @staticmethod
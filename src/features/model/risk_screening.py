@@ -4,11 +4,15 @@ import logging
 
 from tqdm import tqdm
 import pandas as pd
+from src.common.interim_store import read_interim_table, date_range_filters
+from src.common.compact import intern_string, unused_field
 
 
 class RiskScreening:
     """Models a ``RiskScreening`` (i.e. Screening) object.
     """
+    __slots__ = ["order_id", "recording_date", "patient_id", "result", "measurement_date", "last_name", "first_name",
+                 "birth_date"]
 
     def __init__(self, order_id, recording_date, measurement_date, first_name, last_name, birth_date,
                  patient_id, result):
@@ -17,14 +21,14 @@ class RiskScreening:
         # TODO: [BE] The relevant date is recording date or measurement date? I believe it would be measurement date but they are mostly the same date.
         self.order_id = order_id
         self.recording_date = recording_date.date()
-        self.patient_id = patient_id.zfill(11) if not pd.isna(patient_id) else ""  # extend the patient id to length 11 to get a standardized representation
-        self.result = result
+        self.patient_id = intern_string(patient_id.zfill(11)) if not pd.isna(patient_id) else ""  # extend the patient id to length 11 to get a standardized representation
+        self.result = intern_string(result)
 
         # not used
-        self.measurement_date = measurement_date
-        self.last_name = last_name
-        self.first_name = first_name
-        self.birth_date = birth_date
+        self.measurement_date = unused_field(measurement_date)
+        self.last_name = unused_field(last_name)
+        self.first_name = unused_field(first_name)
+        self.birth_date = unused_field(birth_date)
 
     def is_positive(self):
         return self.result != "nn"
@@ -159,7 +163,8 @@ class RiskScreening:
             lines (iterator):       iterator object of the to-be-read file `not` containing the header line
             patient_dict (dict):    Dictionary mapping patient ids to Patient() --> {'00008301433' : Patient(), ... }
         """
-        risk_screening_df = pd.read_csv(csv_path, encoding=encoding, parse_dates=["Record Date"], dtype=str)
+        risk_screening_df = read_interim_table(csv_path, encoding, parse_dates=["Record Date"],
+                                               filters=date_range_filters("Record Date", "Record Date", from_range, to_range))
 
         # in principle they are all int, history makes them a varchar/string
         # risk_df["Patient ID"] = risk_df["Patient ID"].astype(int)
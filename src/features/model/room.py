@@ -1,10 +1,13 @@
 import logging
 from datetime import datetime
-import itertools
 
 import pandas as pd
+from src.common.interim_store import read_interim_table
 from tqdm import tqdm
 
+from src.common.line_reader import get_row_count
+from src.common.interval_index import IntervalIndex
+
 from src.features.model import Bed
 from src.features.model.building import Building
 from src.features.model.floor import Floor
@@ -39,6 +42,7 @@ class Room:
         self.add_id(self.ww_room_id, "Waveware")
 
         self.stays = []
+        self.stay_index = None  # IntervalIndex of self.stays, see get_stays_during()
         self.appointments = []
         self.beds = dict()
 
@@ -61,6 +65,7 @@ class Room:
         :return:
         """
         self.stays.append(stay)
+        self.stay_index = None
         if stay.bed is not None and stay.bed is not "":
             if self.beds.get(stay.bed, None) is None:
                 b = Bed(stay.bed)
@@ -106,17 +111,15 @@ class Room:
 
     def get_stays_during(self, start_dt, end_dt):
         """
-        List of stays that overlap with the start_dt, end_dt time interval.
+        List of stays that overlap with the start_dt, end_dt time interval, in the order they were added.
+        The stays are looked up in an interval index, which is built on the first call after stays were added.
         :param start_dt: datetime.datetime
         :param end_dt: datetime.datetime
         :return: List of Stay
         """
-        overlapping_stays = []
-        for stay in self.stays:
-            e_dt = stay.to_datetime if stay.to_datetime is not None else datetime.now()
-            if e_dt >= start_dt and stay.from_datetime <= end_dt:
-                overlapping_stays.append(stay)
-        return overlapping_stays
+        if self.stay_index is None:  # built on the first query after stays were added
+            self.stay_index = IntervalIndex([(stay.from_datetime, stay.to_datetime) for stay in self.stays])
+        return [self.stays[position] for position in self.stay_index.query(start_dt, end_dt)]
 
     @staticmethod
     def create_room_id_map(csv_path, buildings, encoding, load_limit=None, is_verbose=True):
@@ -137,7 +140,7 @@ class Room:
         import_count = 0
         rooms = dict()
         floors = dict()
-        room_df = pd.read_csv(csv_path, encoding=encoding, dtype=str, index_col=0)
+        room_df = read_interim_table(csv_path, encoding, index_col=0)
         room_objects = list(map(lambda row: Room(*row), tqdm(room_df.values.tolist(), disable=not is_verbose)))
         for room in tqdm(room_objects, disable=not is_verbose):
             building = None
@@ -202,8 +205,7 @@ class Room:
         nr_ok = 0
         nr_rooms_created = 0
         nr_none_room = 0
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=not is_verbose):
+        for line in tqdm(lines, total=get_row_count(lines, is_verbose), disable=not is_verbose):
             appointment_id = line[0]
             room_id = line[1]
             appointment_start = line[2]
@@ -3,6 +3,9 @@ from datetime import datetime
 
 from tqdm import tqdm
 import pandas as pd
+from src.common.interim_store import read_interim_table, date_range_filters
+from src.common.linking import resolve_foreign_keys, get_missing_keys, is_present
+from src.common.compact import intern_string, unused_field
 
 from src.features.model import Room
 from src.features.model import Ward
@@ -11,33 +14,37 @@ import numpy as np
 
 
 class Stay:
+    __slots__ = ["case_id", "serial_number", "type_id", "type", "from_datetime", "status", "to_datetime",
+                 "description", "ward_id", "room_id", "sap_building_abbreviation", "ww_floor_id", "ww_room_id", "bed",
+                 "cancelled", "partner_id", "room", "ward", "case", "serial_reference", "department", "unit_of_entry"]
+
     def __init__(self, serial_number, case_id, type_id, type, status, serial_reference, description, department,
                  ward_id, unit_of_entry, sap_room_id, bed, cancelled, partner_id, begin_datetime, end_datetime,
                  sap_building_abbreviation, ww_floor_id, ww_room_id):
-        self.case_id = case_id
+        self.case_id = intern_string(case_id)
         self.serial_number = serial_number
-        self.type_id = type_id
-        self.type = type
+        self.type_id = intern_string(type_id)
+        self.type = intern_string(type)
         self.from_datetime = begin_datetime
-        self.status = status
+        self.status = intern_string(status)
         self.to_datetime = end_datetime
         self.description = description
-        self.ward_id = ward_id
-        self.room_id = sap_room_id
-        self.sap_building_abbreviation = sap_building_abbreviation
-        self.ww_floor_id = ww_floor_id
-        self.ww_room_id = ww_room_id
-        self.bed = bed
-        self.cancelled = cancelled
-        self.partner_id = partner_id
+        self.ward_id = intern_string(ward_id)
+        self.room_id = intern_string(sap_room_id)
+        self.sap_building_abbreviation = intern_string(sap_building_abbreviation)
+        self.ww_floor_id = intern_string(ww_floor_id)
+        self.ww_room_id = intern_string(ww_room_id)
+        self.bed = intern_string(bed)
+        self.cancelled = intern_string(cancelled)
+        self.partner_id = intern_string(partner_id)
         self.room = None
         self.ward = None
         self.case = None
 
         # unused fields
-        self.serial_reference = serial_reference
-        self.department = department
-        self.unit_of_entry = unit_of_entry
+        self.serial_reference = unused_field(serial_reference)
+        self.department = unused_field(intern_string(department))
+        self.unit_of_entry = unused_field(intern_string(unit_of_entry))
 
     def __str__(self):
         return str({"Case ID": self.case_id,
@@ -90,7 +97,8 @@ class Stay:
         :param partners: Dictionary mapping partner ids to Partner() --> {'0010000990' : Partner(), ... }
         # TODO: Solve ward chaos
         """
-        stay_df = pd.read_csv(csv_path, encoding=encoding, parse_dates=["Begin Datetime", "End Datetime"], dtype=str)
+        stay_df = read_interim_table(csv_path, encoding, parse_dates=["Begin Datetime", "End Datetime"],
+                                     filters=date_range_filters("Begin Datetime", "End Datetime", from_range, to_range))
         if load_fraction != 1.0:
             stay_df = stay_df.sample(frac=load_fraction, random_state=load_seed)
         # in principle they are all int, history makes them a varchar/string
@@ -113,51 +121,41 @@ class Stay:
             location_stays_df = stay_df[stay_df["SAP Room ID"].str.contains('|'.join(locations))]
             stay_df = stay_df[stay_df["Case ID"].isin(location_stays_df["Case ID"])]
 
+        # drop the stays of unknown cases before creating any objects
+        stay_df, (nr_not_found,) = resolve_foreign_keys(stay_df, [("Case ID", cases)])
+
+        # create the wards and rooms missing so far
+        new_wards = dict()
+        for ward_id in get_missing_keys(stay_df.loc[is_present(stay_df["Ward"]), "Ward"], wards):
+            new_wards[ward_id] = Ward(ward_id)
+        wards.update(new_wards)
+
+        # Note that the rooms are primarily identified through their name
+        # The names in this file come from SAP (without an associated ID), so they will NOT match the names already present in the rooms dictionary !
+        new_room_ids = get_missing_keys(stay_df.loc[is_present(stay_df["SAP Room ID"]), "SAP Room ID"], rooms)
+        for room_id in new_room_ids:
+            rooms[room_id] = Room(sap_room_id1=room_id)
+        nr_rooms_created = len(new_room_ids)
+
         # stay_objects = stay_df.progress_apply(lambda row: Stay(*row.to_list()), axis=1)
         stay_objects = list(map(lambda row: Stay(*row), tqdm(stay_df.values.tolist(), disable=not is_verbose)))
         del stay_df
         logging.debug("add_stay_to_case")
-        nr_not_found = 0
         nr_not_formatted = 0
         nr_ok = 0
         nr_wards_updated = 0
-        nr_rooms_created = 0
-        # TODO: Rewrite parts of loop to pandas checks before making all objects
         for stay in tqdm(stay_objects, disable=not is_verbose):
-                if cases.get(stay.case_id, None) is not None:
-                    cases[stay.case_id].add_stay(stay)
-                    stay.add_case(cases[stay.case_id])
-                else:
-                    nr_not_found += 1
-                    continue
+                cases[stay.case_id].add_stay(stay)
+                stay.add_case(cases[stay.case_id])
                 ward = None
                 # Add ward to stay and vice versa
                 if stay.ward_id != "" and not pd.isna(stay.ward_id):
-                    if wards.get(stay.ward_id, None) is None:
-                        ward = Ward(stay.ward_id)
-                        wards[stay.ward_id] = ward
+                    # only the first stay of a newly created ward passes the ward on to its room
+                    ward = new_wards.pop(stay.ward_id, None)
                     wards[stay.ward_id].add_stay(stay)
                     stay.add_ward(wards[stay.ward_id])
                 # Add stay to room and vice versa (including an update of the Room().ward attribute)
                 if stay.room_id != "" and not pd.isna(stay.room_id):
-                    if rooms.get(stay.room_id, None) is None:
-                        # Note that the rooms are primarily identified through their name
-                        # The names in this file come from SAP (without an associated ID), so they will NOT match the names already present in the rooms dictionary !
-                        this_room = Room(sap_room_id1=stay.room_id)
-                        rooms[stay.room_id] = this_room
-                        nr_rooms_created += 1
-                        # print(stay.room_id)
-
-                        # In order to extract the Room ID, we need to 'backtrace' the key in room_ids for which room_ids[key] == stay.zimmr (this will not be available for most Rooms)
-                        # If a backtrace is not possible, the room object will be initiated without an ID
-                        # correct_room_id = [(value_tuple[0], value_tuple[1].name) for value_tuple in room_ids.items() if value_tuple[1] == stay.zimmr]
-                        # if len(correct_room_id) == 1:
-                        #     logging.info(f"Found room ID for room name {stay.zimmr} !")
-                        #     r = Room(stay.zimmr, correct_room_id[0][0] ) # correct_room_id at this point will be a list containing one tuple --> [ ('123456', 'BH O 128') ]
-                        # else:
-                        #     r = Room(stay.zimmr) # Create the Room() object without providing an ID
-                        # rooms[stay.zimmr] = r
-                    # Then add the ward to this room, and update stays with rooms and vice versa
                     rooms[stay.room_id].add_ward(ward)
                     rooms[stay.room_id].add_stay(stay)
                     stay.add_room(rooms[stay.room_id])
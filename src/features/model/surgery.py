@@ -2,7 +2,8 @@ import logging
 from datetime import datetime
 
 from tqdm import tqdm
-import itertools
+
+from src.common.line_reader import get_row_count
 
 
 class Surgery:
@@ -47,8 +48,7 @@ class Surgery:
         nr_case_not_found = 0
         nr_surgery_cancelled = 0
         nr_ok = 0
-        lines_iters = itertools.tee(lines, 2)
-        for line in tqdm(lines_iters[1], total=sum(1 for _ in lines_iters[0]), disable=is_verbose):
+        for line in tqdm(lines, total=get_row_count(lines, is_verbose), disable=not is_verbose):
             surgery = Surgery(*line)
             if surgery.cancelled == 'X':  # ignore 'cancelled' surgeries
                 nr_surgery_cancelled += 1
@@ -5,9 +5,10 @@
 """
 
 import logging
-import itertools
 from datetime import datetime
-import pandas as pd
+from src.common.interim_store import read_interim_table, date_range_filters
+from src.common.linking import resolve_foreign_keys, get_missing_keys
+from src.common.compact import intern_string
 
 from tqdm import tqdm
 
@@ -20,6 +21,7 @@ class Treatment:
 
     The source system for this information is WiCare/TACS.
     """
+    __slots__ = ["patient_id", "case_id", "date", "duration_in_minutes", "employee_id", "employee"]
 
     def __init__(
             self,
@@ -36,12 +38,12 @@ class Treatment:
             employee_login,
             batch_run_id,
     ):
-        self.patient_id = patient_id.zfill(11)  # extend the patient id to length 11 to get a standardized representation
-        self.case_id = case_id
+        self.patient_id = intern_string(patient_id.zfill(11))  # extend the patient id to length 11 to get a standardized representation
+        self.case_id = intern_string(case_id)
 
         self.date = date
         self.duration_in_minutes = int(duration_in_minutes)
-        self.employee_id = employee_id
+        self.employee_id = intern_string(employee_id)
 
         self.employee = None
 
@@ -80,10 +82,8 @@ class Treatment:
                                 --> ``{'0032719' : Employee(), ... }``
         """
         logging.debug("add_care_to_case")
-        nr_case_not_found = 0
-        nr_employee_created = 0
-        nr_employee_found = 0
-        care_df = pd.read_csv(csv_path, encoding=encoding, parse_dates=["Date of Care"], dtype=str)
+        care_df = read_interim_table(csv_path, encoding, parse_dates=["Date of Care"],
+                                     filters=date_range_filters("Date of Care", "Date of Care", from_range, to_range))
 
         if from_range is not None:
             care_df = care_df.loc[care_df['Date of Care'] > from_range]
@@ -91,28 +91,23 @@ class Treatment:
         if to_range is not None:
             care_df = care_df.loc[care_df['Date of Care'] <= to_range]
 
+        # drop the entries of unknown cases before creating any objects
+        care_df, (nr_case_not_found,) = resolve_foreign_keys(care_df, [("Case ID", cases)])
+
+        # create the employees missing in the appointment data
+        new_employee_ids = get_missing_keys(care_df["Employee Staff Number"], employees)
+        for employee_id in new_employee_ids:
+            employees[employee_id] = Employee(employee_id)
+        nr_employee_created = len(new_employee_ids)
+        nr_employee_found = len(care_df) - nr_employee_created
+
         # care_objects = care_df.progress_apply(lambda row: Treatment(*row.to_list()), axis=1)
         care_objects = list(map(lambda row: Treatment(*row), tqdm(care_df.values.tolist(), disable=not is_verbose)))
         del care_df
 
         for care in tqdm(care_objects, disable=not is_verbose):
-        # discard if we don't have the case
-            case = cases.get(care.case_id, None)
-            if case is None:
-                nr_case_not_found += 1
-                continue
-            case.add_care(care)
-
-            # create employee if not already existing
-            employee = employees.get(care.employee_id, None)
-            if employee is None:
-                employee = Employee(care.employee_id)
-                nr_employee_created += 1
-            else:
-                nr_employee_found += 1
-            employees[employee.id] = employee
-
-            care.add_employee(employee)
+            cases[care.case_id].add_care(care)
+            care.add_employee(employees[care.employee_id])
 
         logging.info(f"{nr_case_not_found} cases not found, "
                      f"{nr_employee_created} employees created, {nr_employee_found} employees found")
@@ -1,22 +1,21 @@
-from datetime import datetime
+from src.common.interval_index import IntervalIndex
 
 
 class Ward:
     def __init__(self, name):
         self.name = name
         self.stays = []
+        self.stay_index = None  # IntervalIndex of self.stays, see get_stays_during()
         self.appointments = []
 
     def add_stay(self, stay):
         self.stays.append(stay)
+        self.stay_index = None
 
     def get_stays_during(self, start_dt, end_dt):
-        overlapping_stays = []
-        for m in self.stays:
-            e_dt = m.to_datetime if m.to_datetime is not None else datetime.now()
-            if e_dt >= start_dt and m.from_datetime <= end_dt:
-                overlapping_stays.append(m)
-        return overlapping_stays
+        if self.stay_index is None:  # built on the first query after stays were added
+            self.stay_index = IntervalIndex([(m.from_datetime, m.to_datetime) for m in self.stays])
+        return [self.stays[position] for position in self.stay_index.query(start_dt, end_dt)]
     # TODO: Leads to stackoverflow
     # def __repr__(self):
     #     return str(dict((key, value) for key, value in self.__dict__.items()
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""This script contains the centrality measures of the ``SurfaceModel`` calculated on the CSR adjacency of a
+``SparseSurfaceGraph``.
+
+**Subset betweenness**: for every pair of a source and a target node, the fraction of their shortest paths which
+passes through each node, summed over all pairs (``nx.betweenness_centrality_subset()``). The focus betweenness of
+``SurfaceModel.update_shortest_path_statistics()`` is the subset betweenness with the focus nodes as sources and targets.
+Instead of enumerating the shortest paths of every pair, the fractions are accumulated with Brandes' algorithm from one
+breadth-first search per source, and the sources can be split across processes. Parallel edges of the MultiGraph do
+not add shortest paths, as paths are sequences of nodes.
+
+**Personalized PageRank**: the stationary distribution of a random walk along the edges (parallel edges increase the
+probability of a step) which restarts at a node drawn from the personalization, calculated by power iteration on the
+sparse adjacency (``nx.pagerank()``) instead of the eigenvector of the dense Google matrix (``nx.pagerank_numpy()``).
+
+-----
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+import numpy as np
+from scipy import sparse
+
+from configuration.basic_configuration import configuration
+
+
+def _accumulate_subset_betweenness(indptr, indices, sources, is_target, max_distance):
+    """Sums the dependencies of all nodes on the shortest paths from sources to the targets (Brandes' algorithm).
+
+    Args:
+        indptr (np.ndarray):    CSR row pointers of the adjacency
+        indices (np.ndarray):   CSR column indices of the adjacency
+        sources (list):         node integers from which shortest paths are searched
+        is_target (np.ndarray): boolean mask of the node integers to which shortest paths are counted
+        max_distance (int):     maximum number of edges of a shortest path to be counted (no limit if ``None``)
+
+    Returns:
+        np.ndarray: summed dependencies per node integer, counting each (source, target) pair in the given direction
+    """
+    nbr_nodes = len(indptr) - 1
+    betweenness = np.zeros(nbr_nodes, dtype=np.float64)
+    indptr, indices = indptr.tolist(), indices.tolist()
+    for source in sources:
+        distances = {source: 0}
+        path_counts = {source: 1}
+        predecessors = {source: []}
+        order = [source]  # nodes in order of increasing distance
+        position = 0
+        while position < len(order):
+            node = order[position]
+            position += 1
+            distance = distances[node]
+            if max_distance is not None and distance >= max_distance:
+                continue
+            for neighbour in indices[indptr[node]:indptr[node + 1]]:
+                if neighbour not in distances:
+                    distances[neighbour] = distance + 1
+                    path_counts[neighbour] = 0
+                    predecessors[neighbour] = []
+                    order.append(neighbour)
+                if distances[neighbour] == distance + 1:
+                    path_counts[neighbour] += path_counts[node]
+                    predecessors[neighbour].append(node)
+
+        dependencies = dict.fromkeys(order, 0.0)
+        for node in reversed(order):
+            coefficient = ((1.0 if is_target[node] else 0.0) + dependencies[node]) / path_counts[node]
+            for predecessor in predecessors[node]:
+                dependencies[predecessor] += path_counts[predecessor] * coefficient
+            if node != source:
+                betweenness[node] += dependencies[node]
+    return betweenness
+
+
+def get_subset_betweenness(adjacency, sources, targets, max_path_length=None, max_workers=None):
+    """Calculates the betweenness of all nodes with respect to the shortest paths from sources to targets.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix):    symmetric adjacency of the graph (i.e. ``SparseSurfaceGraph.adjacency[None]``)
+        sources (list):                         node integers of the source nodes
+        targets (list):                         node integers of the target nodes
+        max_path_length (int):                  maximum number of nodes (including source and target) of a shortest
+                                                path to be counted (no limit if ``None``)
+        max_workers (int):                      number of processes among which the sources are split, defaults to
+                                                ``PARAMETERS['graph_workers']``
+
+    Returns:
+        np.ndarray: betweenness per node integer, i.e. the sum over all (source, target) pairs of the fraction of their
+        shortest paths passing through the node, halved as the graph is undirected (as in
+        ``nx.betweenness_centrality_subset()``)
+    """
+    if max_workers is None:
+        max_workers = configuration['PARAMETERS'].get('graph_workers', 1)
+    sources = list(dict.fromkeys(sources))
+    is_target = np.zeros(adjacency.shape[0], dtype=bool)
+    is_target[list(targets)] = True
+    max_distance = max_path_length - 1 if max_path_length is not None else None
+    indptr, indices = adjacency.indptr, adjacency.indices
+
+    if max_workers <= 1 or len(sources) < 2:
+        betweenness = _accumulate_subset_betweenness(indptr, indices, sources, is_target, max_distance)
+    else:
+        chunks = [sources[start::max_workers] for start in range(max_workers)]
+        logging.info(f"Splitting {len(sources)} source nodes across {max_workers} processes")
+        betweenness = np.zeros(adjacency.shape[0], dtype=np.float64)
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for partial in executor.map(_accumulate_subset_betweenness, *zip(*[(indptr, indices, chunk, is_target, max_distance)
+                                                                              for chunk in chunks if len(chunk) != 0])):
+                betweenness += partial
+    return betweenness / 2
+
+
+def get_focus_betweenness(adjacency, focus_nodes, max_path_length=None, max_workers=None):
+    """Calculates the betweenness of all nodes with respect to the shortest paths between pairs of focus nodes.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix):    symmetric adjacency of the graph (i.e. ``SparseSurfaceGraph.adjacency[None]``)
+        focus_nodes (list):                     node integers of the focus nodes
+        max_path_length (int):                  maximum number of nodes (including source and target) of a shortest
+                                                path to be counted (no limit if ``None``)
+        max_workers (int):                      number of processes among which the focus nodes are split, defaults to
+                                                ``PARAMETERS['graph_workers']``
+
+    Returns:
+        np.ndarray: betweenness per node integer, i.e. the sum over all unordered pairs of focus nodes of the fraction
+        of their shortest paths passing through the node
+    """
+    # every pair is counted from both of its nodes, which the halving of the subset betweenness compensates
+    return get_subset_betweenness(adjacency, focus_nodes, focus_nodes, max_path_length=max_path_length,
+                                  max_workers=max_workers)
+
+
+def get_personalized_pagerank(adjacency, personalization, alpha=0.85, tol=1.0e-6, max_iter=100):
+    """Calculates the personalized PageRank of all nodes by power iteration.
+
+    Nodes without edges jump to a node drawn from the personalization, as in ``nx.pagerank()``.
+
+    Args:
+        adjacency (scipy.sparse.csr_matrix):    adjacency of the graph, counting parallel edges
+        personalization (np.ndarray):           non-negative restart weight per node integer (uniform if all are 0)
+        alpha (float):                          damping factor, i.e. the probability of following an edge
+        tol (float):                            the iteration stops once the L1 change of the ranks is below
+                                                ``number of nodes * tol``
+        max_iter (int):                         maximum number of iterations
+
+    Returns:
+        np.ndarray: PageRank per node integer, summing up to 1
+
+    Raises:
+        nx.PowerIterationFailedConvergence: if the ranks did not converge within max_iter iterations
+    """
+    nbr_nodes = adjacency.shape[0]
+    if nbr_nodes == 0:
+        return np.zeros(0, dtype=np.float64)
+    personalization = np.asarray(personalization, dtype=np.float64)
+    if personalization.sum() == 0:
+        logging.warning('Personalization of PageRank is 0 for all nodes, restarting uniformly instead')
+        personalization = np.ones(nbr_nodes, dtype=np.float64)
+    personalization = personalization / personalization.sum()
+
+    out_degrees = np.asarray(adjacency.sum(axis=1), dtype=np.float64).ravel()
+    is_dangling = out_degrees == 0
+    inverse_degrees = np.divide(1.0, out_degrees, out=np.zeros(nbr_nodes), where=~is_dangling)
+    transitions = sparse.diags(inverse_degrees) @ adjacency.astype(np.float64)  # row-stochastic except dangling rows
+    transitions_t = transitions.T.tocsr()
+
+    ranks = np.full(nbr_nodes, 1.0 / nbr_nodes)
+    for _ in range(max_iter):
+        previous_ranks = ranks
+        ranks = alpha * (transitions_t @ previous_ranks + previous_ranks[is_dangling].sum() * personalization) \
+            + (1 - alpha) * personalization
+        if np.abs(ranks - previous_ranks).sum() < nbr_nodes * tol:
+            return ranks
+    raise nx.PowerIterationFailedConvergence(max_iter)
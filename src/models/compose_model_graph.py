@@ -24,6 +24,7 @@ import pathlib
 import click
 
 from src.features.dataloader import DataLoader
+from src.features.interaction_table import InteractionTable
 from src.models.networkx_graph import SurfaceModel
 
 
@@ -55,7 +56,8 @@ def compose_model():
                                           to_range=end_range,
                                           load_patients_in_locations=["BH O"],
                                           load_fraction=1.0,  # 0.1,
-                                          load_fraction_seed=7)
+                                          load_fraction_seed=7,
+                                          use_cache=True)
     #####################################
 
     #####################################
@@ -67,10 +69,11 @@ def compose_model():
     #####################################
     # Create graph of the CURRENT model in networkX
     surface_graph = SurfaceModel(data_dir='./data/processed/networkx')
-    surface_graph.add_network_data(patient_dict=patient_data, case_subset='relevant_case')
+    interaction_table = InteractionTable.from_patients(patient_data['patients'], patient_data['rooms'])
+    surface_graph.add_network_data(patient_dict=patient_data, case_subset='relevant_case', interaction_table=interaction_table)
     surface_graph.remove_isolated_nodes()
     surface_graph.inspect_network()
-    surface_graph.add_edge_infection(infection_distance=2, forward_in_time=True, is_verbose=True)
+    surface_graph.add_temporal_infection(max_hops=2)
 
     patient_data = None  # free up memory before graph processing!
 
@@ -83,7 +86,7 @@ def compose_model():
     pathlib.Path("./data/processed/metrics").mkdir(parents=True, exist_ok=True)
 
     print("### Infection Degree")
-    infection_degree_df = surface_graph.calculate_infection_degree()
+    infection_degree_df = surface_graph.calculate_infection_degree(use_sparse=True)
     print("Top 50 across all nodes")
     print(infection_degree_df.head(50))
 
@@ -20,19 +20,25 @@ or employees via which two patients may have been (indirectly) in contact with e
 -----
 """
 
-import copy
 import os
 import networkx as nx
 import logging
 import datetime
 import itertools
 import json
-from collections import Counter
 import pathlib
+import numpy as np
 import pandas as pd
 
 from tqdm import tqdm
 
+from src.features.interaction_table import InteractionTable, NODE_TYPES, EDGE_TYPES, ORIGINS, PATIENT, ROOM, DEVICE, \
+    EMPLOYEE, STAY, APPOINTMENT, UNKNOWN_ROOM, to_datetime64_bound
+from src.models.snapshot_series import SnapshotSeries
+from src.models.sparse_graph import SparseSurfaceGraph
+from src.models.temporal_infection import get_earliest_infections
+from src.models.centrality import get_focus_betweenness, get_personalized_pagerank, get_subset_betweenness
+
 
 def create_model_snapshots(orig_model, snapshot_dt_list):
     """Creates model snapshots based on the datetime.datetime() values provided in snapshot_dt_list.
@@ -53,10 +59,11 @@ def create_model_snapshots(orig_model, snapshot_dt_list):
         snapshot_dt_list (list):    List of dt.dt() objects, all smaller than self.snapshot_dt
 
     Returns:
-        list: List of independent surface_model() objects corresponding to the various model snapshots in increasing
-        order (i.e. the oldest snapshot is first in the list). The last entry in the returned list contains orig_model,
-        meaning the list has length `len(snapshot_dt_list) + 1`. If no snapshot creation is possible, ``None`` is
-        returned instead.
+        list: List of surface_model() objects corresponding to the various model snapshots in increasing order (i.e.
+        the oldest snapshot is first in the list). The last entry in the returned list contains orig_model, meaning the
+        list has length `len(snapshot_dt_list) + 1`. The snapshots are independent copies (see
+        ``SnapshotSeries.get_graph()``), so modifying them does not affect orig_model. If no snapshot creation is
+        possible, ``None`` is returned instead.
     """
     if orig_model.from_range is None or orig_model.to_range is None:
         logging.error('Please add data to the model before taking snapshots !')
@@ -64,18 +71,23 @@ def create_model_snapshots(orig_model, snapshot_dt_list):
     if True in [dt_value > orig_model.to_range for dt_value in snapshot_dt_list]:
         logging.error('All snapshot values must be smaller than the snapshot time of the current model !')
         return None
-    sorted_snapshots = sorted(snapshot_dt_list, reverse=True)
-    model_list = [copy.deepcopy(orig_model)]
-    for dt_value in sorted_snapshots:
+    snapshot_series = orig_model.get_snapshot_series()
+    model_list = []
+    for dt_value in sorted(snapshot_dt_list):
         logging.info(f"Creating snapshot for {dt_value.strftime('%d.%m.%Y %H:%M:%S')}...")
-        temp_model = copy.deepcopy(orig_model)
-        temp_model.trim_model(snapshot_dt=dt_value)
-        temp_model.remove_isolated_nodes(silent=True)
+        temp_model = SurfaceModel(edge_types=orig_model.edge_types)
+        temp_model.S_GRAPH = snapshot_series.get_graph(dt_value)
+        for node, node_type in temp_model.S_GRAPH.nodes(data='type'):
+            if node_type in temp_model.nodes:
+                temp_model.register_node(node, node_type)
+        temp_model.edges_infected = orig_model.edges_infected
+        temp_model.from_range = orig_model.from_range
+        temp_model.to_range = dt_value
         model_list.append(temp_model)
         logging.info(f'--> Success ! Snapshot contains {len(temp_model.S_GRAPH.nodes())} nodes '
                      f'and {len(temp_model.S_GRAPH.edges())} edges')
-    # Reverse order of models (oldest snapshot should be the first entry) and return the list of snapshot models
-    model_list.reverse()
+    # The oldest snapshot is the first entry, the original model the last one
+    model_list.append(orig_model)
     return model_list
 
 
@@ -152,6 +164,7 @@ class SurfaceModel:
             'Device': set(),
             'Employee': set(),
         }  # Dictionary mapping to sets of respective node string identifiers
+        self.node_types = dict()  # Dictionary mapping node string identifiers to their type, i.e. 'Patient'
         # Initiate various counters:
         self.edge_add_warnings = 0  # Number of warnings encountered during the addition of edges to the network
         self.room_add_warnings = 0  # Number of warnings encountered during the addition of room nodes
@@ -161,7 +174,7 @@ class SurfaceModel:
 
         self.betweenness_centrality = None
         # Changed to a dictionary mapping nodes to betweenness centrality scores once the
-        # self.export_node_betweenness() function is called
+        # self.update_shortest_path_statistics() function is called
 
         self.shortest_path_stats = False
         # indicates whether shortest path statistics have been added to nodes via update_shortest_path_statistics()
@@ -175,6 +188,12 @@ class SurfaceModel:
                            'Device-Employee') if edge_types is None else edge_types
         # tuple containing types of edges to include in the network (or None --> includes edge types)
 
+        self.sparse_graph = None
+        # SparseSurfaceGraph() of S_GRAPH built by get_sparse_graph(), reset to None whenever the graph is modified
+
+        self.graph_summary = None
+        # tuple of node and edge DataFrames built by get_graph_summary(), reset to None whenever the graph is modified
+
     ##########################################################################
     # Class-specific Exceptions
     ##########################################################################
@@ -234,10 +253,7 @@ class SurfaceModel:
         Returns:
             str or None: The type of node of string_id, or ``None`` if string_id is not found in the network.
         """
-        for key in self.nodes.keys():
-            if string_id in self.nodes[key]:  # self.nodes[key] will be a set --> in operator performs very well
-                return key
-        return None
+        return self.node_types.get(string_id, None)
 
     def identify_node(self, node_id, node_type):
         """Checks whether node_id is found in self.nodes[node_type].
@@ -256,6 +272,77 @@ class SurfaceModel:
             return True
         return False
 
+    def register_node(self, string_id, node_type):
+        """Adds string_id to self.nodes[node_type] and to the node type registry self.node_types.
+
+        If string_id is already registered with another type, the registry keeps the first type.
+
+        Args:
+            string_id (str):    String identifier of the node.
+            node_type (str):    Type of the node (e.g. 'Patient')
+        """
+        self.nodes[node_type].add(string_id)
+        self.node_types.setdefault(string_id, node_type)
+        self.invalidate_caches()
+
+    def register_nodes(self, string_ids, node_type):
+        """Calls ``register_node()`` for all string_ids of node_type."""
+        self.nodes[node_type].update(string_ids)
+        self.invalidate_caches()
+        for string_id in string_ids:
+            self.node_types.setdefault(string_id, node_type)
+
+    def get_sparse_graph(self):
+        """Returns the graph frozen into a ``SparseSurfaceGraph``, which is built on first use after a modification.
+
+        Returns:
+            SparseSurfaceGraph: arrays and sparse matrices of the nodes and edges in self.S_GRAPH
+        """
+        if self.sparse_graph is None:
+            self.sparse_graph = SparseSurfaceGraph.from_graph(self.S_GRAPH)
+        return self.sparse_graph
+
+    def get_snapshot_series(self):
+        """Returns a ``SnapshotSeries`` providing snapshots of the model at earlier points in time without copying it.
+
+        Returns:
+            SnapshotSeries: time-indexed store of the edges in self.S_GRAPH
+        """
+        return SnapshotSeries(self)
+
+    def get_graph_summary(self):
+        """Returns the attributes of all nodes and edges as DataFrames, which are built in one pass over the graph on
+        first use after a modification.
+
+        Returns:
+            tuple: node DataFrame with one row per node in self.S_GRAPH and the columns ``node``, ``type``,
+            ``vre_status`` (``None`` if not set), ``degree`` and ``is_valid`` (node identifier is not missing), and
+            edge DataFrame with one row per edge and the columns ``source``, ``target``, ``type`` (``None`` if not
+            set), ``has_attributes`` (``type``, ``from``, ``to`` and ``origin`` are set) and ``has_infected``
+        """
+        if self.graph_summary is None:
+            node_df = pd.DataFrame.from_records(
+                [(node_id, attributes.get('type', None), attributes.get('vre_status', None))
+                 for node_id, attributes in self.S_GRAPH.nodes(data=True)],
+                columns=['node', 'type', 'vre_status'])
+            node_df['degree'] = np.fromiter((degree for _, degree in self.S_GRAPH.degree()), dtype=np.int64,
+                                            count=len(node_df))
+            node_df['is_valid'] = ~pd.isna(node_df['node'])
+
+            edge_df = pd.DataFrame.from_records(
+                [(source_id, target_id, attributes.get('type', None),
+                  'type' in attributes and 'from' in attributes and 'to' in attributes and 'origin' in attributes,
+                  'infected' in attributes)
+                 for source_id, target_id, attributes in self.S_GRAPH.edges(data=True)],
+                columns=['source', 'target', 'type', 'has_attributes', 'has_infected'])
+            self.graph_summary = (node_df, edge_df)
+        return self.graph_summary
+
+    def invalidate_caches(self):
+        """Discards the representations derived from self.S_GRAPH, to be called whenever the graph is modified."""
+        self.sparse_graph = None
+        self.graph_summary = None
+
     ##########################################################################
     # Functions for expanding or reducing the graph
     ##########################################################################
@@ -271,6 +358,41 @@ class SurfaceModel:
             attribute_dict (dict):  dictionary of key-value pairs containing additional information
         """
         self.S_GRAPH.add_node(str(string_id), **attribute_dict)
+        self.invalidate_caches()
+
+    @staticmethod
+    def get_patient_attributes(risk_dict):
+        """Returns the attributes of a patient node (see ``new_patient_node()``).
+
+        Args:
+            risk_dict (dict):   dictionary mapping dt.dt() to Risk() objects corresponding to a patient's VRE screening
+                                history.
+
+        Returns:
+            dict: attributes ``type``, ``risk``, ``infection_date`` and ``vre_status``
+        """
+        risk_codes = [each_risk.result for each_risk in risk_dict.values() if each_risk.result != "nn"]
+        infection_date = datetime.date.max
+        for date, risk in risk_dict.items():
+            if risk.result != "nn":
+                infection_date = date
+                break
+        return {'type': 'Patient', 'risk': risk_dict, 'infection_date': infection_date,
+                'vre_status': 'pos' if len(risk_codes) != 0 else 'neg'}
+
+    @staticmethod
+    def get_room_attributes(building_id=None, ward_id=None, room_id=None, room_description=None):
+        """Returns the attributes of a room node, with unknown values set to "NULL" (see ``new_room_node()``).
+
+        Returns:
+            dict: attributes ``building_id``, ``ward``, ``room_id``, ``room_description`` and ``type``
+        """
+        return {'building_id': 'NULL' if building_id is None else str(building_id),
+                'ward': 'NULL' if ward_id is None else str(ward_id),
+                'room_id': 'NULL' if room_id is None else str(room_id),
+                'room_description': 'NULL' if room_description is None else str(room_description),
+                'type': 'Room'
+                }
 
     def new_patient_node(self, string_id, risk_dict, warn_log=False):
         """Add a patient node to the network.
@@ -291,15 +413,8 @@ class SurfaceModel:
                 logging.warning('Empty patient identifier - node is skipped')
             self.patient_add_warnings += 1
             return
-        risk_codes = [each_risk.result for each_risk in risk_dict.values() if each_risk.result != "nn"]
-        infection_date = datetime.date.max
-        for date, risk in risk_dict.items():
-            if risk.result != "nn":
-                infection_date = date
-                break
-
-        self.S_GRAPH.add_node(str(string_id), type='Patient', risk=risk_dict, infection_date=infection_date, vre_status='pos' if len(risk_codes) != 0 else 'neg')
-        self.nodes['Patient'].add(string_id)
+        self.S_GRAPH.add_node(str(string_id), **self.get_patient_attributes(risk_dict))
+        self.register_node(string_id, 'Patient')
 
     def new_room_node(self, string_id, building_id=None, ward_id=None, room_id=None, room_description=None, warn_log=False):
         """Add a room node to the network.
@@ -320,14 +435,10 @@ class SurfaceModel:
                 logging.warning('Empty room identifier - node is skipped')
             self.room_add_warnings += 1
             return
-        attribute_dict = {'building_id': 'NULL' if building_id is None else str(building_id),
-                          'ward': 'NULL' if ward_id is None else str(ward_id),
-                          'room_id': 'NULL' if room_id is None else str(room_id),
-                          'room_description': 'NULL' if room_description is None else str(room_description),
-                          'type': 'Room'
-                          }
+        attribute_dict = self.get_room_attributes(building_id=building_id, ward_id=ward_id, room_id=room_id,
+                                                  room_description=room_description)
         self.S_GRAPH.add_node(str(string_id), **attribute_dict)
-        self.nodes['Room'].add(str(string_id))
+        self.register_node(str(string_id), 'Room')
 
     def new_device_node(self, string_id, name, warn_log=False):
         """Add a device node to the network.
@@ -346,7 +457,7 @@ class SurfaceModel:
             self.device_add_warnings += 1
             return
         self.S_GRAPH.add_node(str(string_id), type='Device', name=name)
-        self.nodes['Device'].add(string_id)
+        self.register_node(string_id, 'Device')
 
     def new_employee_node(self, string_id, warn_log=False):
         """Add an employee node to the network.
@@ -364,7 +475,7 @@ class SurfaceModel:
             self.employee_add_warnings += 1
             return
         self.S_GRAPH.add_node(str(string_id), type='Employee')
-        self.nodes['Employee'].add(string_id)
+        self.register_node(string_id, 'Employee')
 
     def new_edge(self, source_id, source_type, target_id, target_type, att_dict, log_warning=False):
         """Adds a new edge to the network.
@@ -381,17 +492,55 @@ class SurfaceModel:
             att_dict (dict):    dictionary containing attribute key-value pairs for the new edge.
             log_warning (bool): flag indicating whether or not to log a warning each time a faulty edge is encountered
         """
-        if self.identify_id(source_id) is None:
+        if source_id not in self.node_types:
             if log_warning:
                 logging.warning(f'Did not find node {source_id} of type {source_type} - no edge added')
             self.edge_add_warnings += 1
             return
-        if self.identify_id(target_id) is None:
+        if target_id not in self.node_types:
             if log_warning:
                 logging.warning(f'Did not find node {target_id} of type {target_type} - no edge added')
             self.edge_add_warnings += 1
             return
         self.S_GRAPH.add_edge(source_id, target_id, **att_dict)
+        self.invalidate_caches()
+
+    def new_edges(self, source_ids, target_ids, att_dicts, log_warning=False):
+        """Adds a batch of new edges to the network.
+
+        Equivalent to calling ``new_edge()`` for each edge, but the existence of the source and target nodes is checked
+        for the whole batch at once and all remaining edges are added with a single ``add_edges_from()``.
+
+        Args:
+            source_ids (list):  Strings identifying the source nodes
+            target_ids (list):  Strings identifying the target nodes
+            att_dicts (list):   Dictionaries containing the attribute key-value pairs of the new edges.
+            log_warning (bool): flag indicating whether or not to log a warning each time a faulty edge is encountered
+
+        Returns:
+            int: number of edges added
+        """
+        source_ids = np.asarray(source_ids, dtype=object)
+        target_ids = np.asarray(target_ids, dtype=object)
+        if len(source_ids) == 0:
+            return 0
+        known_nodes = pd.Index(list(self.node_types.keys()), dtype=object)
+        is_source_known = known_nodes.get_indexer(source_ids) != -1
+        is_target_known = known_nodes.get_indexer(target_ids) != -1
+        is_valid = is_source_known & is_target_known
+
+        nbr_invalid = int((~is_valid).sum())
+        if nbr_invalid != 0:
+            if log_warning:
+                for source_id, target_id, is_source in zip(source_ids[~is_valid], target_ids[~is_valid],
+                                                           is_source_known[~is_valid]):
+                    logging.warning(f'Did not find node {target_id if is_source else source_id} - no edge added')
+            self.edge_add_warnings += nbr_invalid
+
+        valid_positions = np.flatnonzero(is_valid)
+        self.S_GRAPH.add_edges_from((source_ids[i], target_ids[i], att_dicts[i]) for i in valid_positions)
+        self.invalidate_caches()
+        return len(valid_positions)
 
     def remove_isolated_nodes(self, silent=False):
         """Restays all isolated nodes from the network.
@@ -401,24 +550,20 @@ class SurfaceModel:
         Args:
             silent (bool):  Flag indicating whether or not to log progress (defaults to ``False``)
         """
-        node_degrees = [self.S_GRAPH.degree(each_node) for each_node in self.S_GRAPH.nodes]
+        node_df, _ = self.get_graph_summary()
+        is_isolated = node_df['degree'] == 0  # degree of 0 indicates an isolated node
+        nbr_isolated = int(is_isolated.sum())
         if not silent:
             logging.info(f"##################################################################################")
             logging.info('Removing isolated nodes:')
-            logging.info(f'--> Before processing, network contains {len(node_degrees)} total nodes, out of which '
-                         f'{node_degrees.count(0)} are isolated.')
-        remove_count = 0
-        delete_list = []
-        for each_node in self.S_GRAPH.nodes:
-            if self.S_GRAPH.degree(each_node) == 0:  # degree of 0 indicates an isolated node
-                delete_list.append(each_node)
-        for node in delete_list:
-            self.S_GRAPH.remove_node(node)
-            remove_count += 1
-        node_degrees_after = [self.S_GRAPH.degree(each_node) for each_node in self.S_GRAPH.nodes]
+            logging.info(f'--> Before processing, network contains {len(node_df)} total nodes, out of which '
+                         f'{nbr_isolated} are isolated.')
+        self.S_GRAPH.remove_nodes_from(node_df['node'][is_isolated].tolist())
+        self.invalidate_caches()
         if not silent:
-            logging.info(f'-->  After processing, network contains {len(node_degrees_after)} total nodes, out of which '
-                         f'{node_degrees_after.count(0)} are isolated.')
+            # removing isolated nodes does not change the degree of any other node
+            logging.info(f'-->  After processing, network contains {len(node_df) - nbr_isolated} total nodes, out of which '
+                         f'0 are isolated.')
 
     def trim_model(self, snapshot_dt_from=None, snapshot_dt_to=None):
         """Trims the current model by removing edges.
@@ -444,6 +589,7 @@ class SurfaceModel:
                               if edge_tuple[3]['from'] < snapshot_dt_from]
         # S_GRAPH.edges() returns a list of tuples of length 4 --> ('source_id', 'target_id', key, attr_dict)
         self.S_GRAPH.remove_edges_from(deleted_edges)
+        self.invalidate_caches()
         self.from_range = snapshot_dt_from
         self.to_range = snapshot_dt_to
 
@@ -464,6 +610,7 @@ class SurfaceModel:
         # to update a specific edge, the dictionary passed to set_edge_attributes() must be formatted
         # as --> { ('bla', 'doodle', 0) : {'newattr' : 'somevalue'} }
         nx.set_edge_attributes(self.S_GRAPH, attrs)
+        self.invalidate_caches()
 
     def update_node_attributes(self, node_id, attribute_dict):
         """Updates the node identified in node_id.
@@ -479,6 +626,7 @@ class SurfaceModel:
         # to update a specific edge, the dictionary passed to set_node_attributes() must be formatted
         # as --> { 'node_id' : {'newattr' : 'somevalue'} }
         nx.set_node_attributes(self.S_GRAPH, attrs)
+        self.invalidate_caches()
 
     def add_edge_infection(self, infection_distance=1, forward_in_time=False, colonialization_timedelta=datetime.timedelta(days=0), is_verbose=False):
         """Sets "infected" attribute to all edges.
@@ -486,144 +634,175 @@ class SurfaceModel:
         This function will iterate over all edges in the network and set an additional attribute ``infected``, which
         will be set to ``True`` if it connects to a patient node for which the ``vre_status`` attribute is set to
         ``pos``. For all other edges, this attribute will be set to ``False``.
+
+        The infection is propagated ``infection_distance`` times: in each pass, all edges with a positive or infected
+        node are infected, and their other node is marked as ``infected`` at the end of the pass. If forward_in_time is
+        ``True``, a node is only infected by an edge if the other node was infected (minus colonialization_timedelta)
+        before the edge ended, in which case the ``infection_date`` of the node is moved back to the end of the edge.
+
+        Each pass is evaluated on the edge arrays of the ``SparseSurfaceGraph`` against the node states at the start of
+        the pass, so that the result does not depend on the order of the edges. The ``infected`` and
+        ``infection_date`` attributes are written back to the graph once all passes are done.
+
+        Args:
+            infection_distance (int):                       number of propagation passes
+            forward_in_time (bool):                         only propagate the infection along edges that ended after
+                                                            the infection of a node
+            colonialization_timedelta (datetime.timedelta): time a node is assumed to be colonized before its
+                                                            ``infection_date``
+            is_verbose (bool):                              print the nodes infected in every pass
         """
         logging.info(f"##################################################################################")
         logging.info('Propagate infection through interaction edges...')
         s_infection_date = "infection_date"
         s_infected = "infected"
-        error_count = 0
         pos_devs, pos_emps, pos_rooms, pos_pats = set(), set(), set(), set()
+        pos_nodes = {'Device': pos_devs, 'Employee': pos_emps, 'Room': pos_rooms, 'Patient': pos_pats}
+
+        graph = self.get_sparse_graph()
+        node_data = [attributes for _, attributes in self.S_GRAPH.nodes(data=True)]
+        is_negative = np.array([attributes.get('vre_status', 'neg') == 'neg' for attributes in node_data], dtype=bool)
+        is_infected = np.array([bool(attributes.get(s_infected, False)) for attributes in node_data], dtype=bool)
+        # datetime.date.max (never infected) is out of the nanosecond range, dates are compared in microseconds
+        infection_dates = np.array([np.datetime64(attributes.get(s_infection_date, datetime.date.max), 'us')
+                                    for attributes in node_data], dtype='datetime64[us]')
+        is_date_updated = np.zeros(len(node_data), dtype=bool)
+        edge_to = graph.to_ts.astype('datetime64[us]')
+        sources, targets = graph.sources, graph.targets
+        is_edge_infected = np.zeros(graph.number_of_edges(), dtype=bool)
 
         for distance in tqdm(range(infection_distance), desc="Infection distance", position=0):
-            neg_edges_count = 0
-            pos_edges_count = 0
-            total_edges_count = 0
-            nodes_to_infect = []
-            for each_edge in tqdm(self.S_GRAPH.edges(data=True, keys=True), desc="Edge", position=1):
-                node_0_negative = self.S_GRAPH.nodes[each_edge[0]].get('vre_status', 'neg') == 'neg' and not self.S_GRAPH.nodes[each_edge[0]].get(s_infected, False)
-                node_1_negative = self.S_GRAPH.nodes[each_edge[1]].get('vre_status', 'neg') == 'neg' and not self.S_GRAPH.nodes[each_edge[1]].get(s_infected, False)
-                # infect edges based on node state (neither nodes of edge is positive or infected, then the edge is not infected)
-                if node_0_negative and node_1_negative:
-                    self.update_edge_attributes(edge_tuple=(each_edge[0], each_edge[1], each_edge[2]), attribute_dict={s_infected: False})
-                    neg_edges_count += 1
-                else:
-                    if forward_in_time:
-                        # get interaction end datetime
-                        edge_to = each_edge[3]["to"]
-
-                        # get infection dates of nodes, datetime.max means never infected
-                        node_0_infection_date = self.S_GRAPH.nodes[each_edge[0]].get(s_infection_date, datetime.date.max)
-                        node_1_infection_date = self.S_GRAPH.nodes[each_edge[1]].get(s_infection_date, datetime.date.max)
-
-                        # calculate the time of infection by assuming a colonialization prior to the official measurement
-                        node_0_infection_date -= colonialization_timedelta
-                        node_1_infection_date -= colonialization_timedelta
-
-                        if is_verbose and node_0_infection_date < datetime.date.max:
-                            print(f"{self.S_GRAPH.nodes[each_edge[0]]['type']} {each_edge[0]}, infected {node_0_infection_date}, interacted {edge_to} with {self.S_GRAPH.nodes[each_edge[1]]['type']} {each_edge[1]}")
-
-                        if is_verbose and node_1_infection_date < datetime.date.max:
-                            print(f"{self.S_GRAPH.nodes[each_edge[1]]['type']} {each_edge[1]}, infected {node_1_infection_date}, interacted {edge_to} with {self.S_GRAPH.nodes[each_edge[0]]['type']} {each_edge[0]}")
-
-                        # if node 0 was infected before the interaction ended, infect node 1 and vice versa
-                        if node_0_infection_date < edge_to:
-                            nodes_to_infect.append(each_edge[1])
-                            if node_1_infection_date > edge_to:  # update infection date if it is earlier than the prior infection date
-                                self.S_GRAPH.nodes[each_edge[1]][s_infection_date] = edge_to.date()
-                                # TODO: In principle, infection date could be set to edge_from here, but this could cause larger jumps back in time depending on length
-
-                        if node_1_infection_date < edge_to:
-                            nodes_to_infect.append(each_edge[0])
-                            if node_0_infection_date > edge_to:  # update infection date if it is earlier than the prior infection date
-                                self.S_GRAPH.nodes[each_edge[0]][s_infection_date] = edge_to.date()
-                    else:
-                        nodes_to_infect.append(each_edge[0])
-                        nodes_to_infect.append(each_edge[1])
-
-                    self.update_edge_attributes(edge_tuple=(each_edge[0], each_edge[1], each_edge[2]), attribute_dict={s_infected: True})
-
-                    pos_edges_count += 1
-                total_edges_count += 1
+            is_node_negative = is_negative & ~is_infected
+            # an edge is infected if any of its nodes is positive or infected
+            is_edge_infected = ~(is_node_negative[sources] & is_node_negative[targets])
+
+            if forward_in_time:
+                # calculate the time of infection by assuming a colonialization prior to the official measurement
+                colonialization_dates = infection_dates - np.timedelta64(colonialization_timedelta)
+                # if node 0 was infected before the interaction ended, infect node 1 and vice versa
+                infects_target = is_edge_infected & (colonialization_dates[sources] < edge_to)
+                infects_source = is_edge_infected & (colonialization_dates[targets] < edge_to)
+                infected_nodes = np.concatenate([targets[infects_target], sources[infects_source]])
+
+                # move the infection date back to the end of the earliest infecting interaction
+                update_nodes = np.concatenate([targets[infects_target], sources[infects_source]])
+                update_dates = np.concatenate([edge_to[infects_target], edge_to[infects_source]])
+                is_earlier = colonialization_dates[update_nodes] > update_dates
+                earliest_dates = np.full(len(node_data), np.datetime64(datetime.date.max, 'us'), dtype='datetime64[us]')
+                np.minimum.at(earliest_dates, update_nodes[is_earlier],
+                              update_dates[is_earlier].astype('datetime64[D]').astype('datetime64[us]'))
+                is_updated = earliest_dates < infection_dates
+                infection_dates[is_updated] = earliest_dates[is_updated]
+                is_date_updated |= is_updated
+            else:
+                infected_nodes = np.concatenate([sources[is_edge_infected], targets[is_edge_infected]])
 
             # update infected nodes (in the loop, this has runaway effects, transferring infection further that infection_distance)
-            for node_id in nodes_to_infect:
+            infected_nodes = np.unique(infected_nodes)
+            is_infected[infected_nodes] = True
+            for node in infected_nodes:
                 if is_verbose:
-                    print(f"{node_id} infected at distance {distance}")
-
-                self.S_GRAPH.nodes[node_id][s_infected] = True
+                    print(f"{graph.node_ids[node]} infected at distance {distance}")
+                if graph.node_types[node] in pos_nodes:
+                    pos_nodes[graph.node_types[node]].add(graph.node_ids[node])
 
-                # update statistics
-                if self.S_GRAPH.nodes[node_id]["type"] == "Device":
-                    pos_devs.add(node_id)
-                elif self.S_GRAPH.nodes[node_id]["type"] == "Employee":
-                    pos_emps.add(node_id)
-                elif self.S_GRAPH.nodes[node_id]["type"] == "Room":
-                    pos_rooms.add(node_id)
-                elif self.S_GRAPH.nodes[node_id]["type"] == "Patient":
-                    pos_pats.add(node_id)
-
-            logging.warning(f'Encountered {error_count} errors during the identification of infected patient nodes')
+            pos_edges_count = int(is_edge_infected.sum())
             logging.info(f"Infected network edges ({pos_edges_count} infected, "
-                         f"{neg_edges_count} uninfected edges of total {total_edges_count} edges) "
+                         f"{len(is_edge_infected) - pos_edges_count} uninfected edges of total {len(is_edge_infected)} edges) "
                          f"infecting {len(pos_pats)} patients, {len(pos_rooms)} rooms, {len(pos_emps)} employees, {len(pos_devs)} devices (total {len(pos_pats) + len(pos_rooms) + len(pos_emps) + len(pos_devs)}).")
+
+        # write the node and edge states back to the graph
+        for node in np.flatnonzero(is_infected):
+            node_data[node][s_infected] = True
+        for node in np.flatnonzero(is_date_updated):
+            node_data[node][s_infection_date] = infection_dates[node].astype('datetime64[D]').astype(datetime.date)
+        if infection_distance > 0:
+            for (_, _, attributes), infected in zip(self.S_GRAPH.edges(data=True), is_edge_infected.tolist()):
+                attributes[s_infected] = infected
         self.edges_infected = True
+        self.invalidate_caches()
 
-    def update_shortest_path_statistics(self, focus_nodes=None, max_path_length=None):
-        """Prerequisite function for calculating betweenness centrality.
+    def add_temporal_infection(self, max_hops=None, colonialization_timedelta=datetime.timedelta(days=0)):
+        """Sets the "infected" attribute of all edges and nodes based on the earliest time-respecting infection.
 
-        Adds new attributes to all nodes in focus_nodes, where each attribute is a pair of nodes (sorted alphabetically)
-        with a ``SP-`` prefix to tuples of length 2 containing (shortest_paths_through_this_node, total_shortest_paths)
-        For example:
+        Uses the same transmission rule as ``add_edge_infection(forward_in_time=True)``, but finds the earliest
+        infection of every node along any time-respecting path in a single search (see
+        ``temporal_infection.get_earliest_infections()``) instead of a fixed number of passes. Nodes infected by
+        another node get the attributes ``infected`` and ``infection_date`` (the day of their earliest infection),
+        and all infected nodes and positive patients get ``infection_hops``, the fewest number of edges to a positive
+        patient. Edges are ``infected`` if they connect to a positive patient or to a node infected in fewer than
+        max_hops hops.
 
-        ``{ 'SP-Node1-Node2': (2, 5) , 'SP-Node1-Node3': (1, 8), ... } }``
+        Args:
+            max_hops (int):                                 maximum number of edges along which the infection is
+                                                            passed on (no limit if ``None``), with the same result
+                                                            as ``add_edge_infection(infection_distance=max_hops,
+                                                            forward_in_time=True)``
+            colonialization_timedelta (datetime.timedelta): time a node is assumed to be colonized before its
+                                                            ``infection_date``
+        """
+        logging.info(f"##################################################################################")
+        logging.info(f'Propagate infection along time-respecting paths (maximum hops: {max_hops})...')
+        graph = self.get_sparse_graph()
+        node_data = [attributes for _, attributes in self.S_GRAPH.nodes(data=True)]
+        source_times = {node: int(np.datetime64(attributes.get('infection_date', datetime.date.max), 'us').astype(np.int64))
+                        for node, attributes in enumerate(node_data)
+                        if attributes.get('vre_status', 'neg') != 'neg' or attributes.get('infected', False)}
+        colonialization_us = int(np.timedelta64(colonialization_timedelta, 'us').astype(np.int64))
+        earliest_times, fewest_hops, fewest_infected_hops = get_earliest_infections(graph, source_times,
+                                                                                    colonialization_us, max_hops)
+
+        for node in np.flatnonzero(fewest_hops != -1):
+            node_data[node]['infection_hops'] = int(fewest_hops[node])
+            if node not in source_times or earliest_times[node] < source_times[node]:
+                node_data[node]['infection_date'] = np.datetime64(int(earliest_times[node]), 'us').astype('datetime64[D]').astype(datetime.date)
+        is_infected = fewest_infected_hops != -1
+        for node in np.flatnonzero(is_infected):
+            node_data[node]['infected'] = True
+
+        # an edge is infected if one of its nodes was positive or infected before the last hop
+        is_infectious = is_infected & (fewest_infected_hops < (max_hops if max_hops is not None else np.inf))
+        is_infectious[list(source_times.keys())] = True
+        is_edge_infected = is_infectious[graph.sources] | is_infectious[graph.targets]
+        for (_, _, attributes), infected in zip(self.S_GRAPH.edges(data=True), is_edge_infected.tolist()):
+            attributes['infected'] = infected
+
+        pos_edges_count = int(is_edge_infected.sum())
+        infected_types = pd.Series(graph.node_types[is_infected], dtype=object).value_counts()
+        logging.info(f"Infected network edges ({pos_edges_count} infected, "
+                     f"{len(is_edge_infected) - pos_edges_count} uninfected edges of total {len(is_edge_infected)} edges) "
+                     f"infecting {infected_types.get('Patient', 0)} patients, {infected_types.get('Room', 0)} rooms, "
+                     f"{infected_types.get('Employee', 0)} employees, {infected_types.get('Device', 0)} devices (total {int(is_infected.sum())}).")
+        self.edges_infected = True
+        self.invalidate_caches()
 
-        Note:
-             This may result in a lot of additional attributes for nodes which are integral to the network. This ap-
-            proach is chosen because the networkx module does not allow updates to a dict-of-a-dict type
-            of attributes - i.e. if these attributes were to be combined in a 1st-level key 'shortest-paths', the entire
-            content would have to be copied every time a new node-pair attribute is added, which would make the function
-            extremely inefficient.
+    def update_shortest_path_statistics(self, focus_nodes=None, max_path_length=None, max_workers=None):
+        """Prerequisite function for calculating betweenness centrality.
+
+        For every pair of nodes in focus_nodes, the fraction of their shortest paths passing through each other node is
+        calculated, and these fractions are summed per node into self.betweenness_centrality, a dictionary mapping node
+        identifiers to their betweenness. The fractions are accumulated with one breadth-first search per focus node
+        (see ``centrality.get_focus_betweenness()``), which can be split across processes.
 
         This is an important prerequisite function for the calculation of betweenness centrality.
 
         Args:
             focus_nodes (list):     list of node IDs. If set to ``None`` (the default), all nodes in the network will be
                                     considered. **WARNING: this may be extremely ressource-intensive !**
-            approximate (bool):     Flag indicating whether to consider all shortest paths in the network
-                                    (``False``, default) or approximate the betweenness statistic using the
-                                    `max_path_length` argument. Note that if this is set to `False`, attributes of all
-                                    nodes will be written **to file** so as to avoid memory overflows. This requires a
-                                    preceding call to `self.write_node_files()`.
-            max_path_length (int):  Maximum path length to consider for pairs of nodes when `approximate` == ``True``.
-                                    If set to ``None`` (default), all possible shortest paths will be considered.
+            max_path_length (int):  Maximum path length (number of nodes including both ends) to consider for pairs of
+                                    nodes. If set to ``None`` (default), all possible shortest paths will be considered.
+            max_workers (int):      Number of processes among which the focus nodes are split, defaults to
+                                    ``PARAMETERS['graph_workers']``
         """
         logging.info("Update betweenness statistics...")
-        target_nodes = focus_nodes if focus_nodes is not None else self.S_GRAPH.nodes
-        node_combinations = list(itertools.combinations(target_nodes, 2))
-        # Returns a list of tuples containing all unique pairs of nodes in target_nodes
-
-        logging.info(f'--> Adding shortest path statistics considering {len(target_nodes)} nodes yielding {len(node_combinations)} combinations.')
+        graph = self.get_sparse_graph()
+        target_nodes = list(focus_nodes) if focus_nodes is not None else list(graph.node_ids)
+        logging.info(f'--> Adding shortest path statistics considering {len(target_nodes)} nodes yielding '
+                     f'{len(target_nodes) * (len(target_nodes) - 1) // 2} combinations.')
         logging.info(f"Maximum path length set to {max_path_length}")
-        for count, combo_tuple in enumerate(tqdm(node_combinations, total=len(node_combinations))):
-            if nx.has_path(self.S_GRAPH, combo_tuple[0], combo_tuple[1]) is False:
-                continue  # indicates a node pair in disconnected network parts
-            # measure = datetime.datetime.now()
-            shortest_pair_path = nx.shortest_path(self.S_GRAPH, source=combo_tuple[0], target=combo_tuple[1])
-            if max_path_length is not None and len(shortest_pair_path) > max_path_length:
-                continue  # indicates a path too long to be considered relevant for transmission
-            # If shortest paths are "short enough", calculate the exact measure
-            all_shortest_paths = list(nx.all_shortest_paths(self.S_GRAPH, source=combo_tuple[0],
-                                                            target=combo_tuple[1]))
-            # Remove the first and last node (i.e. source and target) of all shortest paths
-            trim_short_paths = [path_list[1:(len(path_list) - 1)] for path_list in all_shortest_paths]
-            involved_nodes = [node for sublist in trim_short_paths for node in sublist]
-            node_counts = Counter(involved_nodes)
-            sorted_pair = sorted([combo_tuple[0], combo_tuple[1]])
-            update_attr_dict = {each_key: {'SP-' + sorted_pair[0] + '-' + sorted_pair[1]: (node_counts[each_key],
-                                                                                           len(all_shortest_paths))}
-                                for each_key in node_counts if each_key not in sorted_pair}
-            # Then update node attributes
-            nx.set_node_attributes(self.S_GRAPH, update_attr_dict)
+        betweenness = get_focus_betweenness(graph.adjacency[None], [graph.node_index[node] for node in target_nodes],
+                                            max_path_length=max_path_length, max_workers=max_workers)
+        self.betweenness_centrality = dict(zip(graph.node_ids.tolist(), betweenness.tolist()))
         # Write it all to log
         logging.info(f"Successfully added betweenness statistics to the network !")
         # Adjust the self.shortest_path_stats
@@ -668,72 +847,49 @@ class SurfaceModel:
         logging.info(f"###############################################################")
         logging.info(f"Running network statistics...")
 
-        all_nodes = self.S_GRAPH.nodes(data=True)  # list of tuples of ('source_id', key, {attr_dict } )
-        node_degrees = [self.S_GRAPH.degree(each_node) for each_node in self.S_GRAPH.nodes]
-        all_edges = self.S_GRAPH.edges(data=True, keys=True)  # tuple list -> ('source', 'target', key, {attr_dict } )
+        node_df, edge_df = self.get_graph_summary()
+        valid_node_df = node_df[node_df['is_valid']]
 
         # Overall network statistics
         logging.info(f'--> Model Snapshot date: from {self.from_range.strftime("%d.%m.%Y %H:%M:%S")} to {self.to_range.strftime("%d.%m.%Y %H:%M:%S")}')
-        logging.info(f"--> Total {len(all_nodes)} nodes, out of which {node_degrees.count(0)} are isolated")
-        logging.info(f"--> Total {len(all_edges)} edges")
+        logging.info(f"--> Total {len(node_df)} nodes, out of which {int((node_df['degree'] == 0).sum())} are isolated")
+        logging.info(f"--> Total {len(edge_df)} edges")
         logging.info('------------------------------')
 
         # Extract specific node statistics
-        nbr_pat_nodes = len(['_' for node_data_tuple in all_nodes if not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Patient'])
-        nbr_dev_nodes = len(['_' for node_data_tuple in all_nodes if not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Device'])
-        nbr_emp_nodes = len(['_' for node_data_tuple in all_nodes if not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Employee'])
-        nbr_room_nodes = len(['_' for node_data_tuple in all_nodes if not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Room'])
+        node_type_counts = valid_node_df['type'].value_counts()
+        nbr_pat_nodes = int(node_type_counts.get('Patient', 0))
+        nbr_dev_nodes = int(node_type_counts.get('Device', 0))
+        nbr_emp_nodes = int(node_type_counts.get('Employee', 0))
+        nbr_room_nodes = int(node_type_counts.get('Room', 0))
         accounted_for = nbr_pat_nodes + nbr_dev_nodes + nbr_emp_nodes + nbr_room_nodes
         logging.info('Node overview:')
         logging.info(f"--> {nbr_pat_nodes} Patient nodes")
         logging.info(f"--> {nbr_dev_nodes} Device nodes")
         logging.info(f"--> {nbr_emp_nodes} Employee nodes")
         logging.info(f"--> {nbr_room_nodes} Room nodes")
-        logging.info(f"--> TOTAL: {accounted_for} nodes ({len(all_nodes) - accounted_for} out of "
-                     f"{len(all_nodes)} nodes not accounted for)")
+        logging.info(f"--> TOTAL: {accounted_for} nodes ({len(node_df) - accounted_for} out of "
+                     f"{len(node_df)} nodes not accounted for)")
         logging.info('------------------------------')
 
         # Extract specific edge statistics
-        type_count_dict = {}
-
-        faulty_sourceordest_id = 0  # Counts edges for which the source or target id are wrongly formatted
-        nbr_missing_attr = 0  # Counts edges which are missing at least one of the attributes
-        nbr_ok = 0  # Counts edges passing all tests
-
-        test_attribute_keys = ['type', 'from', 'to', 'origin'] if self.edges_infected == False \
-            else ['type', 'from', 'to', 'origin', 'infected']
-
-        for each_edge in all_edges:
-            # Check source and target id
-            if each_edge[0] == '' or each_edge[1] == '':
-                faulty_sourceordest_id += 1
-                continue
-            attr_keys = each_edge[3].keys()
-            if len([entry for entry in test_attribute_keys if entry not in attr_keys]) > 0:
-                # indicates at least one missing attribute
-                nbr_missing_attr += 1
-                continue
-            # If everything is ok, update type_count_dict
-            nbr_ok += 1
-            if each_edge[3]['type'] not in type_count_dict:
-                type_count_dict[each_edge[3]['type']] = 1
-            else:
-                type_count_dict[each_edge[3]['type']] += 1
-        type_count_keys = sorted(list(type_count_dict.keys()))
+        is_faulty_id = (edge_df['source'] == '') | (edge_df['target'] == '')  # wrongly formatted source or target id
+        is_missing_attr = ~is_faulty_id & ~(edge_df['has_attributes'] & (edge_df['has_infected'] | (not self.edges_infected)))
+        is_ok = ~is_faulty_id & ~is_missing_attr  # edges passing all tests
+        type_count_dict = edge_df['type'][is_ok].value_counts().sort_index()
         # Write all remaining results to log
-        logging.info(f"--> {faulty_sourceordest_id} edges with a faulty source or target id")
-        logging.info(f"--> {nbr_missing_attr} edges missing at least one attribute")
-        logging.info(f"--> {nbr_ok} edges ok:")
-        for each_key in type_count_keys:
-            logging.info(f"    >> {type_count_dict[each_key]} edges of type {each_key}")
-        accounted_for = sum([value for value in type_count_dict.values()])
-        logging.info(f"--> TOTAL: {accounted_for} edges ({len(all_edges) - accounted_for} out of {len(all_edges)} "
+        logging.info(f"--> {int(is_faulty_id.sum())} edges with a faulty source or target id")
+        logging.info(f"--> {int(is_missing_attr.sum())} edges missing at least one attribute")
+        logging.info(f"--> {int(is_ok.sum())} edges ok:")
+        for each_key, count in type_count_dict.items():
+            logging.info(f"    >> {count} edges of type {each_key}")
+        accounted_for = int(type_count_dict.sum())
+        logging.info(f"--> TOTAL: {accounted_for} edges ({len(edge_df) - accounted_for} out of {len(edge_df)} "
                      f"edges not accounted for)")
         logging.info('------------------------------')
 
         # Number of positive patients in the network
-        nbr_pos_pat = len(['_' for node_data_tuple in all_nodes if not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Patient' and
-                           node_data_tuple[1]['vre_status'] == 'pos'])
+        nbr_pos_pat = int(((valid_node_df['type'] == 'Patient') & (valid_node_df['vre_status'] == 'pos')).sum())
         logging.info(f"--> {nbr_pos_pat} VRE-positive Patients in the network")
         logging.info('------------------------------')
 
@@ -742,7 +898,8 @@ class SurfaceModel:
         logging.info(f"###############################################################")
 
     def add_network_data(self, patient_dict, case_subset='relevant_case', patient_subset=None,
-                         from_range=datetime.datetime.min, to_range=datetime.datetime.now()):
+                         from_range=datetime.datetime.min, to_range=datetime.datetime.now(), interaction_table=None,
+                         bulk=False):
         """Adds nodes and edges data to the network.
 
         Nodes and edges are added based on the data in patient_dict according to the subset specified (see description
@@ -771,6 +928,12 @@ class SurfaceModel:
                                     since a call to this function is usually followed by a call to
                                     *remove_isolated_nodes()*, these isolated nodes will then be stripped from the
                                     network.
+            interaction_table (InteractionTable):   Interactions of the patients in patient_dict built by
+                                    ``InteractionTable.from_patients()``. If provided, the nodes and edges are added
+                                    from the table instead of walking the objects of all patients again.
+            bulk (bool):            If ``True`` and no interaction_table is provided, the interactions of the patients
+                                    are first collected in an ``InteractionTable``, and the nodes and edges are then
+                                    added in bulk from the table (only supported for ``relevant_case``).
         """
         logging.info(f"Filter set to: {case_subset}")
         logging.info(f"Snapshot created from {from_range.strftime('%d.%m.%Y %H:%M:%S')} to {to_range.strftime('%d.%m.%Y %H:%M:%S')}")
@@ -794,7 +957,18 @@ class SurfaceModel:
         nbr_device_emp = 0  # number of Device-Employee edges
         nbr_emp_room = 0  # number of Employee-Room edges
 
-        for patient in tqdm(patient_dict['patients'].values(), total=len(patient_dict['patients'].values())):
+        patients = patient_dict['patients']
+        if interaction_table is None and bulk and case_subset == 'relevant_case':
+            subset_patients = patients if patient_subset is None else \
+                {patient_id: patient for patient_id, patient in patients.items() if patient_id in patient_subset}
+            interaction_table = InteractionTable.from_patients(subset_patients, patient_dict.get('rooms', None),
+                                                               include_treatments=False)
+        if interaction_table is not None:
+            if case_subset == 'relevant_case':
+                nbr_room_no_id, nbr_room_id = self.add_interaction_table_data(patient_dict, interaction_table, patient_subset)
+            patients = dict()  # all nodes and edges are added from the interaction table
+
+        for patient in tqdm(patients.values(), total=len(patients)):
             # Apply subset filter here --> relevant_case
             if case_subset == 'relevant_case':
                 if patient_subset is not None and patient.patient_id not in patient_subset:
@@ -956,33 +1130,132 @@ class SurfaceModel:
         # Log "global" statistics
         self.inspect_network()
 
-    def get_positive_patients(self):
-        """
-        Get positive patients currently in graph.
-        :return:
-        """
-        all_nodes = self.S_GRAPH.nodes(data=True)  # list of tuples of ('source_id', key, {attr_dict } )
+    def add_interaction_table_data(self, patient_dict, interaction_table, patient_subset=None):
+        """Adds the nodes and edges of an ``InteractionTable`` to the network.
 
-        # return positive patients in the network
-        pos_pats = [node_data_tuple[0] for node_data_tuple in all_nodes if not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Patient' and
-                    node_data_tuple[1]['vre_status'] == 'pos']
+        The same nodes and edges as in ``add_network_data()`` are added: all patients, the nodes they interacted with,
+        the Patient-Room edges of stays within ``(self.from_range, self.to_range)`` and the appointment edges of the
+        types in ``self.edge_types`` within ``[self.from_range, self.to_range)``. Treatments are not added.
 
-        return pos_pats
+        The nodes are deduplicated and inserted with one ``add_nodes_from()`` for the patients and one for all other
+        nodes, the edges are filtered on the arrays of the table and inserted with a single ``add_edges_from()``.
 
-    def get_patients(self):
+        Args:
+            patient_dict (dict):                    Dictionary containing the patients (see ``add_network_data()``)
+            interaction_table (InteractionTable):   Interactions built from the patients in patient_dict
+            patient_subset (list):                  A subset of patients to model in network.
 
-        all_nodes = self.S_GRAPH.nodes(data=True)  # list of tuples of ('source_id', key, {attr_dict } )
+        Returns:
+            tuple: number of stays without and with identified room
+        """
+        table = interaction_table
+        patient_nodes = dict()
+        for patient in patient_dict['patients'].values():
+            if patient_subset is not None and patient.patient_id not in patient_subset:
+                continue
+            if patient.patient_id == '':
+                logging.warning('Encountered empty patient ID !')
+                continue
+            patient_nodes[str(patient.patient_id)] = self.get_patient_attributes(patient.risk_screenings)
+        self.S_GRAPH.add_nodes_from(patient_nodes.items())
+        self.register_nodes(list(patient_nodes.keys()), 'Patient')
+
+        patient_mask = table.get_mask(patients=patient_subset, origins=["Stay", "Appointment"])
+        # add the other nodes in order of their first interaction
+        other_nodes = pd.unique(np.column_stack((table["source"][patient_mask], table["target"][patient_mask])).ravel())
+        other_nodes = other_nodes[table.node_types[other_nodes] != PATIENT] if len(other_nodes) != 0 else other_nodes
+        node_entries = []
+        for node in other_nodes:
+            node_type = table.node_types[node]
+            node_id = table.node_ids[node]
+            if node_id == '':
+                if node_type == ROOM:
+                    self.room_add_warnings += 1
+                elif node_type == DEVICE:
+                    self.device_add_warnings += 1
+                else:
+                    self.employee_add_warnings += 1
+                continue
+            if node_type == ROOM:
+                node_entries.append((node_id, self.get_room_attributes(**table.node_attributes.get(node, dict()))))
+            elif node_type == DEVICE:
+                node_entries.append((node_id, {'type': 'Device', **table.node_attributes[node]}))
+            else:
+                node_entries.append((node_id, {'type': 'Employee'}))
+        self.S_GRAPH.add_nodes_from(node_entries)
+        for node_type in [ROOM, DEVICE, EMPLOYEE]:
+            self.register_nodes([node_id for node_id, attributes in node_entries
+                                 if attributes['type'] == NODE_TYPES[node_type]], NODE_TYPES[node_type])
+
+        is_stay = patient_mask & (table["origin"] == STAY)
+        unknown_room_node = table.find_node(ROOM, UNKNOWN_ROOM)
+        is_unknown_room = table["target"] == (unknown_room_node if unknown_room_node is not None else -1)
+        nbr_room_no_id = int((is_stay & is_unknown_room).sum())
+        nbr_room_id = int((is_stay & ~is_unknown_room).sum())
+
+        # stays are added regardless of self.edge_types, with the lower bound excluded
+        from_bound = to_datetime64_bound(self.from_range)
+        to_bound = to_datetime64_bound(self.to_range)
+        edge_mask = (is_stay & (table["from_ts"] > from_bound)) | \
+                    (patient_mask & (table["origin"] == APPOINTMENT) & (table["from_ts"] >= from_bound)
+                     & np.isin(table["edge_type"], [EDGE_TYPES.index(t) for t in self.edge_types]))
+        edge_mask &= table["to_ts"] < to_bound
+
+        edge_type_names = np.asarray(EDGE_TYPES, dtype=object)
+        origin_names = np.asarray(ORIGINS, dtype=object)
+        att_dicts = [{'from': from_ts, 'to': to_ts, 'type': edge_type, 'origin': origin}
+                     for edge_type, origin, from_ts, to_ts in zip(edge_type_names[table["edge_type"][edge_mask]],
+                                                                  origin_names[table["origin"][edge_mask]],
+                                                                  pd.DatetimeIndex(table["from_ts"][edge_mask]),
+                                                                  pd.DatetimeIndex(table["to_ts"][edge_mask]))]
+        self.new_edges(table.node_ids[table["source"][edge_mask]], table.node_ids[table["target"][edge_mask]], att_dicts)
+        return nbr_room_no_id, nbr_room_id
 
-        # return patients in the network
-        pats = [node_data_tuple[0] for node_data_tuple in all_nodes if not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Patient']
+    def get_positive_patients(self):
+        """Returns the positive patients currently in the graph.
 
-        return pats
+        Returns:
+            list: string identifiers of the patient nodes with ``vre_status`` 'pos'
+        """
+        node_df, _ = self.get_graph_summary()
+        return node_df['node'][node_df['is_valid'] & (node_df['type'] == 'Patient')
+                               & (node_df['vre_status'] == 'pos')].tolist()
 
+    def get_patients(self):
+        """Returns the patients currently in the graph.
+
+        Returns:
+            list: string identifiers of the patient nodes
+        """
+        node_df, _ = self.get_graph_summary()
+        return node_df['node'][node_df['is_valid'] & (node_df['type'] == 'Patient')].tolist()
 
     ################################################################################################################
     # Centrality Functions
     ################################################################################################################
-    def calculate_infection_degree(self):
+    @staticmethod
+    def _get_sparse_metric_frame(graph, node_columns, metric_columns):
+        """Returns the metrics calculated on a ``SparseSurfaceGraph`` as a DataFrame.
+
+        Nodes with a missing identifier are skipped, and nodes without edges get a ratio of ``NaN``.
+
+        Args:
+            graph (SparseSurfaceGraph): graph the metrics were calculated on
+            node_columns (list):        node columns, any of "Node ID", "Node Type" and "Risk Status"
+            metric_columns (dict):      column name mapped to the array of values per node integer
+
+        Returns:
+            pd.DataFrame: one row per node with the node_columns followed by the metric_columns
+        """
+        is_valid = graph.get_valid_nodes()
+        node_values = {"Node ID": graph.node_ids, "Node Type": graph.node_types, "Risk Status": graph.vre_status}
+        rows = zip(*[node_values[column][is_valid].tolist() for column in node_columns],
+                   *[values[is_valid].tolist() for values in metric_columns.values()])
+        metric_df = pd.DataFrame.from_records(list(rows))
+        metric_df.columns = list(node_columns) + list(metric_columns.keys())
+        return metric_df
+
+    def calculate_infection_degree(self, use_sparse=False):
         """Calculates infection degree for all nodes in the network.
 
         The infection degree is defined for a single node_x as the number of infected edges between node_x and patients (connection of nth degree as set by
@@ -993,6 +1266,9 @@ class SurfaceModel:
         - Degree ratio
         - Number of infected edges (always patient-related)
         - Total number of edges (i.e. degree of node_x)
+
+        Args:
+            use_sparse (bool):  calculate the degrees on the ``SparseSurfaceGraph`` (see ``get_sparse_graph()``)
         """
 
         if not self.edges_infected:
@@ -1000,6 +1276,17 @@ class SurfaceModel:
             return None
 
         logging.info('Calculating infection degrees...')
+        if use_sparse:
+            graph = self.get_sparse_graph()
+            infected_edges, total_edges = graph.get_degrees(graph.infected), graph.get_degrees()
+            infection_degree_df = self._get_sparse_metric_frame(graph, ["Node ID", "Node Type", "Risk Status"], {
+                "Degree Ratio": graph.get_ratio(infected_edges, total_edges),
+                "Number of Infected Edges": infected_edges,
+                "Total Edges": total_edges})
+            infection_degree_df.sort_values(by="Number of Infected Edges", ascending=False, inplace=True)
+            logging.info(f"Successfully calculated infection degrees for {len(infection_degree_df)} nodes.")
+            return infection_degree_df
+
         infection_degree_rows = []
 
         for each_node in tqdm(self.S_GRAPH.nodes(data=True)):  # each_node will be a tuple of length 2 --> ( 'node_id', {'att_1' : 'att_value1', ... } )
@@ -1024,7 +1311,7 @@ class SurfaceModel:
 
         return infection_degree_df
 
-    def calculate_patient_degree_ratio(self):
+    def calculate_patient_degree_ratio(self, use_sparse=False):
         """Calculates and exports patient degree ratio for all nodes in the network.
 
         This will expose non-patient nodes that have high interaction with positive patients.
@@ -1040,12 +1327,29 @@ class SurfaceModel:
         - Number of infected edges (always patient-related)
         - Total number of patient-related edges
         - Total number of edges (i.e. degree of node_x)
+
+        Args:
+            use_sparse (bool):  calculate the degrees on the ``SparseSurfaceGraph`` (see ``get_sparse_graph()``)
         """
         if not self.edges_infected:
             logging.error('This operation requires infection data on edges !')
             return None
 
         logging.info('Calculating patient degree ratio...')
+        if use_sparse:
+            graph = self.get_sparse_graph()
+            is_patient_edge = graph.get_edge_type_mask('Patient')
+            infected_pat_edges = graph.get_degrees(is_patient_edge & graph.infected)
+            pat_edges = graph.get_degrees(is_patient_edge)
+            patient_degree_df = self._get_sparse_metric_frame(graph, ["Node ID", "Node Type", "Risk Status"], {
+                "Degree Ratio": graph.get_ratio(infected_pat_edges, pat_edges),
+                "Number of Infected Edges": infected_pat_edges,
+                "Total Patient Edges": pat_edges,
+                "Total Edges": graph.get_degrees()})
+            patient_degree_df.sort_values(by="Degree Ratio", ascending=False, inplace=True)
+            logging.info(f"Successfully calculated patient degree ratios for {len(patient_degree_df)} nodes.")
+            return patient_degree_df
+
         patient_degree_rows = []
 
         for each_node in tqdm(self.S_GRAPH.nodes(data=True)):
@@ -1073,7 +1377,7 @@ class SurfaceModel:
 
         return patient_degree_df
 
-    def calculate_total_degree_ratio(self):
+    def calculate_total_degree_ratio(self, use_sparse=False):
         """Calculates total degree ratio (TDR) for all nodes in the network.
 
         Will calculate and export the total degree ratio for all nodes in the network, which is defined for a
@@ -1089,8 +1393,22 @@ class SurfaceModel:
         - Degree ratio
         - Number of infected edges (always patient-related)
         - Total number of edges for node_x (also includes non-patient-related edges)
+
+        Args:
+            use_sparse (bool):  calculate the degrees on the ``SparseSurfaceGraph`` (see ``get_sparse_graph()``)
         """
         logging.info('Calculating total degree ratio...')
+        if use_sparse:
+            graph = self.get_sparse_graph()
+            infected_edges, total_edges = graph.get_degrees(graph.infected), graph.get_degrees()
+            patient_degree_ratio_df = self._get_sparse_metric_frame(graph, ["Node ID", "Node Type"], {
+                "Total Degree Ratio": graph.get_ratio(infected_edges, total_edges),
+                "Number of Infected Edges": infected_edges,
+                "Total Edges": total_edges})
+            patient_degree_ratio_df.sort_values(by="Total Degree Ratio", ascending=False, inplace=True)
+            logging.info(f"Successfully calculated total degree ratios for {len(patient_degree_ratio_df)} nodes")
+            return patient_degree_ratio_df
+
         patient_degree_ratio_rows = []
 
         for each_node in tqdm(self.S_GRAPH.nodes(data=True)):
@@ -1157,21 +1475,19 @@ class SurfaceModel:
         """Calculate node betweenness.
 
         This function will calculate node betweenness for all nodes of the network. This is done by calculating the sum
-        of all fractions of shortest paths a particular node is in, which is found in the attribute keys starting with
-        the "SP-" prefix (e.g. "SP-Node1-Node4"). These tuples contain 2 entries, the first being the fraction of
-        shortest path this node is found in (between the given pair of nodes), and the second one being the total
-        number of shortest paths. This function can only be executed once the function update_shortest_path_statistics()
-        has been called. Nodes without an attribute key starting with the "SP-" prefix will have node betweenness of 0.
+        of all fractions of shortest paths a particular node is in, which is found in self.betweenness_centrality. This
+        function can only be executed once the function update_shortest_path_statistics() has been called. Nodes
+        without an entry in self.betweenness_centrality will have node betweenness of 0.
         """
         logging.info('Calculating node betweenness...')
         # self.update_shortest_path_statistics()
         node_betweenness_rows = []
+        betweenness_centrality = self.betweenness_centrality if self.betweenness_centrality is not None else dict()
 
         for each_node in tqdm(self.S_GRAPH.nodes(data=True)):
             # Returns tuples of length 2 --> (node_id, attribute_dict)
             risk_status = each_node[1]["vre_status"] if "vre_status" in each_node[1] else 'neg'  # get status of node
-            target_keys = [each_key for each_key in each_node[1].keys() if each_key.startswith('SP-')]
-            betweenness_score = sum([each_node[1][each_key][0] / each_node[1][each_key][1] for each_key in target_keys])
+            betweenness_score = betweenness_centrality.get(each_node[0], 0)
             write_string = [each_node[0], each_node[1]['type'], risk_status, betweenness_score]
 
             node_betweenness_rows.append(write_string)
@@ -1185,62 +1501,53 @@ class SurfaceModel:
 
         return node_betweenness_df
 
-    def calculate_subset_betweenness(self):
-        """
-        Calculate subset betweenness on the graph to find central nodes and use the initially known positive patients as personalization.
-        :return:
+    def calculate_subset_betweenness(self, max_workers=None):
         """
-        all_nodes = self.S_GRAPH.nodes(data=True)  # list of tuples of ('source_id', key, {attr_dict } )
-
-        # get positive patients in the network
-        pos_pats = {node_data_tuple[0]: 1 if (not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Patient' and node_data_tuple[1]['vre_status'] == 'pos') else 0 for node_data_tuple in all_nodes}
-
-        c = nx.betweenness_centrality_subset(self.S_GRAPH,
-                                              sources=self.get_positive_patients(),
-                                              targets=self.get_patients())
-        betweenness_rows = []
-        for each_node in tqdm(self.S_GRAPH.nodes(data=True)):
-            # each_node will be a tuple of length 2 --> ( 'node_id', {'att_1' : 'att_value1', ... } )
+        Calculate subset betweenness on the graph to find central nodes, counting the shortest paths from the initially
+        known positive patients to all patients (see ``centrality.get_subset_betweenness()``).
 
-            if pd.isna(each_node[0]):
-                continue
-
-            risk_status = each_node[1]["vre_status"] if "vre_status" in each_node[1] else 'neg'
-            betweenness_rows.append([each_node[0], each_node[1]['type'], risk_status, c[each_node[0]]])
+        Args:
+            max_workers (int):  Number of processes among which the positive patients are split, defaults to
+                                ``PARAMETERS['graph_workers']``
 
-        betweenness_df = pd.DataFrame.from_records(betweenness_rows)
-        betweenness_df.columns = ["Node ID", "Node Type", "Risk Status", "Centrality"]
+        Returns:
+            pd.DataFrame: columns "Node ID", "Node Type", "Risk Status" and "Centrality"
+        """
+        graph = self.get_sparse_graph()
+        c = get_subset_betweenness(graph.adjacency[None], [graph.node_index[node] for node in self.get_positive_patients()],
+                                   [graph.node_index[node] for node in self.get_patients()], max_workers=max_workers)
+        betweenness_df = self._get_sparse_metric_frame(graph, ["Node ID", "Node Type", "Risk Status"], {"Centrality": c})
         betweenness_df.sort_values(by="Centrality", ascending=False, inplace=True)
 
-        logging.info(f"Successfully calculated subset betweenness centrality for {len(betweenness_rows)} nodes.")
+        logging.info(f"Successfully calculated subset betweenness centrality for {len(betweenness_df)} nodes.")
 
         return betweenness_df
 
-    def calculate_pagerank_centrality(self):
+    def calculate_pagerank_centrality(self, alpha=0.85, tol=1.0e-6, max_iter=100):
         """
         Calculate pagerank on the graph to find central nodes and use the initially known positive patients as personalization.
-        :return:
-        """
-        all_nodes = self.S_GRAPH.nodes(data=True)  # list of tuples of ('source_id', key, {attr_dict } )
 
-        # get positive patients in the network
-        pos_pats = {node_data_tuple[0]: 1 if (not pd.isna(node_data_tuple[0]) and node_data_tuple[1]['type'] == 'Patient' and node_data_tuple[1]['vre_status'] == 'pos') else 0 for node_data_tuple in all_nodes}
+        The PageRank is calculated by power iteration on the sparse adjacency (see
+        ``centrality.get_personalized_pagerank()``).
 
-        pr = nx.pagerank_numpy(self.S_GRAPH, personalization=pos_pats)
-        pagerank_rows = []
-        for each_node in tqdm(self.S_GRAPH.nodes(data=True)):
-            # each_node will be a tuple of length 2 --> ( 'node_id', {'att_1' : 'att_value1', ... } )
+        Args:
+            alpha (float):  damping factor, i.e. the probability of following an edge
+            tol (float):    convergence tolerance of the power iteration
+            max_iter (int): maximum number of iterations
 
-            if pd.isna(each_node[0]):
-                continue
+        Returns:
+            pd.DataFrame: columns "Node ID", "Node Type", "Risk Status" and "Centrality"
+        """
+        graph = self.get_sparse_graph()
 
-            risk_status = each_node[1]["vre_status"] if "vre_status" in each_node[1] else 'neg'
-            pagerank_rows.append([each_node[0], each_node[1]['type'], risk_status, pr[each_node[0]]])
+        # get positive patients in the network
+        pos_pats = (graph.node_types == 'Patient') & (graph.vre_status == 'pos') & graph.get_valid_nodes()
 
-        pagerank_df = pd.DataFrame.from_records(pagerank_rows)
-        pagerank_df.columns = ["Node ID", "Node Type", "Risk Status", "Centrality"]
+        pr = get_personalized_pagerank(graph.adjacency[None], pos_pats.astype(np.float64), alpha=alpha, tol=tol,
+                                       max_iter=max_iter)
+        pagerank_df = self._get_sparse_metric_frame(graph, ["Node ID", "Node Type", "Risk Status"], {"Centrality": pr})
         pagerank_df.sort_values(by="Centrality", ascending=False, inplace=True)
 
-        logging.info(f"Successfully calculated pagerank centrality for {len(pagerank_rows)} nodes.")
+        logging.info(f"Successfully calculated pagerank centrality for {len(pagerank_df)} nodes.")
 
         return pagerank_df
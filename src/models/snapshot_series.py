@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""This script contains the ``SnapshotSeries``, which provides snapshots of a ``SurfaceModel`` at earlier points in time
+without copying the model.
+
+A snapshot at time t contains all edges of the model which ended at t or earlier (``to <= t``), and the nodes of these
+edges (i.e. the model trimmed to t with its isolated nodes removed). The edges are sorted by their end once, so that the
+edges of any snapshot are a prefix of this order found by binary search:
+
+- ``get_view(t)`` :math:`\\longrightarrow` read-only ``nx.MultiGraph`` view of the snapshot, sharing the node and edge
+  attributes of the model
+- ``get_graph(t)`` :math:`\\longrightarrow` independent ``nx.MultiGraph`` of the snapshot with copies of the attributes,
+  which can be modified without affecting the model
+- ``calculate_degree_metrics(snapshot_dts)`` :math:`\\longrightarrow` degree metrics of all nodes in all snapshots,
+  where the degrees of each snapshot are updated from those of the previous one with the edges in between
+
+The ``infected`` attribute of the edges is taken from the model, i.e. ``add_edge_infection()`` should be called on the
+model before the series is created.
+
+-----
+"""
+
+import logging
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from src.features.interaction_table import to_datetime64_bound
+
+
+class SnapshotSeries:
+    """Time-indexed store of the edges of a ``SurfaceModel``.
+    """
+
+    def __init__(self, model):
+        """Sorts the edges of model by their end.
+
+        Args:
+            model (SurfaceModel):   model of which snapshots are taken
+        """
+        self.graph = model.S_GRAPH
+        self.sparse_graph = model.get_sparse_graph()
+        self.edge_keys = list(model.S_GRAPH.edges(keys=True))
+        self.order = np.argsort(self.sparse_graph.to_ts, kind="stable")
+        self.sorted_to = self.sparse_graph.to_ts[self.order]
+
+    def __len__(self):
+        return len(self.order)
+
+    def get_edge_count(self, snapshot_dt):
+        """Returns the number of edges in the snapshot at snapshot_dt."""
+        return int(np.searchsorted(self.sorted_to, to_datetime64_bound(snapshot_dt), side="right"))
+
+    def get_edge_positions(self, snapshot_dt):
+        """Returns the positions (in the sparse graph of the model) of the edges in the snapshot at snapshot_dt."""
+        return self.order[:self.get_edge_count(snapshot_dt)]
+
+    def get_view(self, snapshot_dt):
+        """Returns the snapshot at snapshot_dt as a read-only view of the graph of the model.
+
+        Args:
+            snapshot_dt (dt.dt()):  time of the snapshot
+
+        Returns:
+            nx.MultiGraph: view containing the edges with ``to <= snapshot_dt`` and their nodes
+        """
+        return self.graph.edge_subgraph([self.edge_keys[position] for position in self.get_edge_positions(snapshot_dt)])
+
+    def get_graph(self, snapshot_dt):
+        """Returns the snapshot at snapshot_dt as a new graph, independent of the graph of the model.
+
+        The nodes keep the order of the model, and the edges their keys.
+
+        Args:
+            snapshot_dt (dt.dt()):  time of the snapshot
+
+        Returns:
+            nx.MultiGraph: graph containing copies of the edges with ``to <= snapshot_dt`` and of their nodes
+        """
+        edge_keys = [self.edge_keys[position] for position in self.get_edge_positions(snapshot_dt)]
+        snapshot_nodes = {node for source, target, _ in edge_keys for node in (source, target)}
+        graph = nx.MultiGraph()
+        graph.add_nodes_from((node, dict(attributes)) for node, attributes in self.graph.nodes(data=True)
+                             if node in snapshot_nodes)
+        graph.add_edges_from((source, target, key, dict(self.graph.edges[source, target, key]))
+                             for source, target, key in edge_keys)
+        return graph
+
+    def calculate_degree_metrics(self, snapshot_dts):
+        """Calculates the degree metrics of all nodes in the snapshots at snapshot_dts.
+
+        The metrics are the ones of ``SurfaceModel.calculate_total_degree_ratio()`` and
+        ``SurfaceModel.calculate_patient_degree_ratio()`` on the trimmed model.
+
+        Args:
+            snapshot_dts (list):    times of the snapshots, in any order
+
+        Returns:
+            pd.DataFrame: one row per snapshot and node in the snapshot, with the columns "Snapshot", "Node ID",
+            "Node Type", "Risk Status", "Total Degree Ratio", "Patient Degree Ratio", "Number of Infected Edges",
+            "Number of Infected Patient Edges", "Total Patient Edges" and "Total Edges"
+        """
+        graph = self.sparse_graph
+        is_valid = graph.get_valid_nodes()
+        is_patient_edge = graph.get_edge_type_mask('Patient')
+        counters = {"Total Edges": np.ones(len(self), dtype=np.int64),
+                    "Number of Infected Edges": graph.infected.astype(np.int64),
+                    "Total Patient Edges": is_patient_edge.astype(np.int64),
+                    "Number of Infected Patient Edges": (is_patient_edge & graph.infected).astype(np.int64)}
+        degrees = {name: np.zeros(graph.number_of_nodes(), dtype=np.int64) for name in counters}
+        is_loop = graph.sources == graph.targets
+
+        snapshot_frames = []
+        edge_count = 0
+        for snapshot_dt in sorted(snapshot_dts):
+            # add the edges which ended since the previous snapshot
+            new_edges = self.order[edge_count:self.get_edge_count(snapshot_dt)]
+            edge_count += len(new_edges)
+            other_ends = new_edges[~is_loop[new_edges]]  # the node of a self-loop is only counted once
+            for name, values in counters.items():
+                np.add.at(degrees[name], graph.sources[new_edges], values[new_edges])
+                np.add.at(degrees[name], graph.targets[other_ends], values[other_ends])
+
+            in_snapshot = (degrees["Total Edges"] > 0) & is_valid
+            snapshot_df = pd.DataFrame({"Node ID": graph.node_ids[in_snapshot],
+                                        "Node Type": graph.node_types[in_snapshot],
+                                        "Risk Status": graph.vre_status[in_snapshot]})
+            snapshot_df.insert(0, "Snapshot", snapshot_dt)
+            snapshot_df["Total Degree Ratio"] = graph.get_ratio(degrees["Number of Infected Edges"][in_snapshot],
+                                                                degrees["Total Edges"][in_snapshot])
+            snapshot_df["Patient Degree Ratio"] = graph.get_ratio(degrees["Number of Infected Patient Edges"][in_snapshot],
+                                                                  degrees["Total Patient Edges"][in_snapshot])
+            for name in ["Number of Infected Edges", "Number of Infected Patient Edges", "Total Patient Edges", "Total Edges"]:
+                snapshot_df[name] = degrees[name][in_snapshot]
+            snapshot_frames.append(snapshot_df)
+            logging.info(f"Snapshot {snapshot_dt} contains {int(in_snapshot.sum())} nodes and {edge_count} edges")
+
+        if len(snapshot_frames) == 0:
+            return pd.DataFrame(columns=["Snapshot", "Node ID", "Node Type", "Risk Status", "Total Degree Ratio",
+                                         "Patient Degree Ratio", "Number of Infected Edges",
+                                         "Number of Infected Patient Edges", "Total Patient Edges", "Total Edges"])
+        return pd.concat(snapshot_frames, ignore_index=True)
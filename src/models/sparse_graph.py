@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""This script contains the ``SparseSurfaceGraph``, a frozen array representation of a ``SurfaceModel`` graph used to
+calculate the metrics of the model.
+
+The nodes of the ``nx.MultiGraph`` are numbered in their iteration order, and every edge is stored as an entry in
+parallel NumPy arrays (``sources``, ``targets``, ``edge_types``, ``from_ts``, ``to_ts`` and ``infected``) instead of an
+attribute dictionary. The graph structure is available as SciPy CSR matrices:
+
+- ``incidence`` :math:`\\longrightarrow` node x edge matrix with a 1 for both nodes of each edge, such that the number
+  of (e.g. infected) edges of all nodes is a single product ``incidence @ edge_mask``
+- ``adjacency[edge_type]`` :math:`\\longrightarrow` symmetric node x node matrix counting the parallel edges of one
+  edge type between two nodes, and ``adjacency[None]`` for the edges of all types
+
+-----
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from src.features.interaction_table import to_datetime64
+
+
+class SparseSurfaceGraph:
+    """Compressed sparse representation of the nodes and edges of a ``SurfaceModel``.
+    """
+
+    def __init__(self, node_ids, node_types, vre_status, sources, targets, edge_types, from_ts, to_ts, infected):
+        """Initiates the graph from node and edge arrays.
+
+        Args:
+            node_ids (np.ndarray):      node identifiers
+            node_types (np.ndarray):    ``type`` attribute of the nodes, i.e. "Patient"
+            vre_status (np.ndarray):    ``vre_status`` attribute of the nodes ('neg' if not set)
+            sources (np.ndarray):       node integer of the first node of each edge
+            targets (np.ndarray):       node integer of the second node of each edge
+            edge_types (np.ndarray):    ``type`` attribute of the edges, i.e. "Patient-Room"
+            from_ts (np.ndarray):       ``from`` attribute of the edges as ``datetime64[ns]``
+            to_ts (np.ndarray):         ``to`` attribute of the edges as ``datetime64[ns]``
+            infected (np.ndarray):      ``infected`` attribute of the edges (``False`` if not set)
+        """
+        self.node_ids = node_ids
+        self.node_types = node_types
+        self.vre_status = vre_status
+        self.node_index = {node_id: node for node, node_id in enumerate(node_ids)}
+
+        self.sources = sources
+        self.targets = targets
+        self.edge_type_names, self.edge_types = self._factorize(edge_types)
+        self.from_ts = from_ts
+        self.to_ts = to_ts
+        self.infected = infected
+
+        nbr_nodes, nbr_edges = len(node_ids), len(sources)
+        edges = np.arange(nbr_edges)
+        is_loop = sources == targets
+        # the node of a self-loop is only counted once, as in nx.MultiGraph.edges(node)
+        self.incidence = sparse.csr_matrix((np.ones(2 * nbr_edges - int(is_loop.sum()), dtype=np.int64),
+                                            (np.concatenate([sources, targets[~is_loop]]),
+                                             np.concatenate([edges, edges[~is_loop]]))),
+                                           shape=(nbr_nodes, nbr_edges))
+        self.adjacency = {None: self._get_adjacency(np.ones(nbr_edges, dtype=bool))}
+        for code, edge_type in enumerate(self.edge_type_names):
+            self.adjacency[edge_type] = self._get_adjacency(self.edge_types == code)
+
+    @staticmethod
+    def _factorize(values):
+        codes, names = pd.factorize(pd.Series(values, dtype=object))
+        return tuple(names), codes.astype(np.int16)
+
+    def _get_adjacency(self, edge_mask):
+        sources, targets = self.sources[edge_mask], self.targets[edge_mask]
+        is_loop = sources == targets
+        return sparse.csr_matrix((np.ones(len(sources) + int((~is_loop).sum()), dtype=np.int64),
+                                  (np.concatenate([sources, targets[~is_loop]]),
+                                   np.concatenate([targets, sources[~is_loop]]))),
+                                 shape=(len(self.node_ids), len(self.node_ids)))
+
+    @staticmethod
+    def from_graph(graph):
+        """Freezes a ``nx.MultiGraph`` of a ``SurfaceModel`` into a ``SparseSurfaceGraph``.
+
+        Args:
+            graph (nx.MultiGraph):  graph of the ``SurfaceModel`` (i.e. ``SurfaceModel().S_GRAPH``)
+
+        Returns:
+            SparseSurfaceGraph: the frozen graph
+        """
+        node_ids = np.empty(graph.number_of_nodes(), dtype=object)
+        node_types = np.empty(graph.number_of_nodes(), dtype=object)
+        vre_status = np.empty(graph.number_of_nodes(), dtype=object)
+        for node, (node_id, attributes) in enumerate(graph.nodes(data=True)):
+            node_ids[node] = node_id
+            node_types[node] = attributes.get('type', None)
+            vre_status[node] = attributes.get('vre_status', 'neg')
+        node_index = {node_id: node for node, node_id in enumerate(node_ids)}
+
+        nbr_edges = graph.number_of_edges()
+        sources = np.empty(nbr_edges, dtype=np.int64)
+        targets = np.empty(nbr_edges, dtype=np.int64)
+        edge_types = np.empty(nbr_edges, dtype=object)
+        infected = np.zeros(nbr_edges, dtype=bool)
+        from_ts, to_ts = [None] * nbr_edges, [None] * nbr_edges
+        for edge, (source, target, attributes) in enumerate(graph.edges(data=True)):
+            sources[edge] = node_index[source]
+            targets[edge] = node_index[target]
+            edge_types[edge] = attributes.get('type', None)
+            from_ts[edge] = attributes.get('from', None)
+            to_ts[edge] = attributes.get('to', None)
+            infected[edge] = bool(attributes.get('infected', False))
+        return SparseSurfaceGraph(node_ids, node_types, vre_status, sources, targets, edge_types,
+                                  to_datetime64(from_ts), to_datetime64(to_ts), infected)
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.sources)
+
+    def get_edge_type_mask(self, contains):
+        """Returns a boolean mask of the edges whose type contains the string contains, i.e. "Patient"."""
+        type_mask = np.array([contains in str(name) for name in self.edge_type_names], dtype=bool)
+        return type_mask[self.edge_types] if len(type_mask) != 0 else np.zeros(0, dtype=bool)
+
+    def get_degrees(self, edge_mask=None):
+        """Returns the number of edges of every node.
+
+        Args:
+            edge_mask (np.ndarray): boolean mask of the edges to count (all if ``None``)
+
+        Returns:
+            np.ndarray: number of edges per node integer
+        """
+        weights = np.ones(self.number_of_edges(), dtype=np.int64) if edge_mask is None else edge_mask.astype(np.int64)
+        return np.asarray(self.incidence @ weights, dtype=np.int64).ravel()
+
+    @staticmethod
+    def get_ratio(numerator, denominator):
+        """Returns numerator / denominator element-wise, with ``NaN`` where denominator is 0."""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return numerator / denominator
+
+    def get_valid_nodes(self):
+        """Returns a boolean mask of the nodes with a non-missing identifier."""
+        return ~pd.isna(pd.Series(self.node_ids, dtype=object)).to_numpy()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""This script contains the ``StreamingSurfaceModel``, a ``SurfaceModel`` restricted to a sliding time window which is
+updated with new data instead of being rebuilt.
+
+Every call of ``ingest()`` adds the interactions of an ``InteractionTable`` which ended within the window and were not
+ingested before, updates the risk status of the patients, and moves the window to its new end, expiring all edges
+which ended before the window. The graph therefore always equals a model built from the interactions which ended
+within ``[until - window, until]`` with its isolated nodes removed.
+
+Infection flags and degree metrics are maintained incrementally with every added or expired edge:
+
+- an edge is ``infected`` if one of its nodes is a positive patient, and a node is ``infected`` if it has an infected
+  edge (i.e. ``SurfaceModel.add_edge_infection(infection_distance=1)``)
+- the number of (infected) edges and (infected) patient edges of every node is kept in counters, such that
+  ``calculate_degree_metrics()`` only has to read them instead of traversing the graph
+
+-----
+"""
+
+import datetime
+import heapq
+import logging
+from collections import Counter
+
+import pandas as pd
+
+from configuration.basic_configuration import configuration
+from src.features.interaction_table import InteractionTable, NODE_TYPES, EDGE_TYPES, ORIGINS, PATIENT, ROOM, DEVICE, \
+    to_datetime64_bound
+from src.models.networkx_graph import SurfaceModel
+
+DEGREE_COLUMNS = ["Number of Infected Edges", "Number of Infected Patient Edges", "Total Patient Edges", "Total Edges"]
+
+
+class StreamingSurfaceModel(SurfaceModel):
+    """``SurfaceModel`` of the interactions which ended within a sliding time window (see module docstring).
+    """
+
+    def __init__(self, window=None, edge_types=None):
+        """Initiates an empty model.
+
+        Args:
+            window (datetime.timedelta):    length of the window, defaults to ``PARAMETERS['streaming_window_days']``
+            edge_types (tuple):             edge types of appointments to include (see ``SurfaceModel``)
+        """
+        super().__init__(edge_types=edge_types)
+        self.window = window if window is not None \
+            else datetime.timedelta(days=configuration['PARAMETERS'].get('streaming_window_days', 14))
+        self.edges_infected = True
+        self.patient_attributes = dict()  # patient id -> node attributes of the last ingested risk screenings
+        self.edge_signatures = Counter()  # (patient, source, target, type, origin, from, to) -> number of edges
+        self.expiry_queue = []  # heap of (to, sequence number, source, target, key, signature) of all edges
+        self.nbr_queued = 0
+        self.degrees = {column: Counter() for column in DEGREE_COLUMNS}  # column -> node id -> number of edges
+
+    def ingest(self, patient_dict, interaction_table=None, until=None):
+        """Adds new interactions and risk screenings to the model and moves the window to end at until.
+
+        Interactions are identified by their patient, nodes, type, origin and interval, so the same data can be
+        ingested repeatedly (i.e. the interim data of every day) and only the new interactions are added.
+
+        Args:
+            patient_dict (dict):                    Dictionary containing the patients (see ``add_network_data()``)
+            interaction_table (InteractionTable):   Interactions built from the patients in patient_dict, which is
+                                                    built without treatments if ``None``
+            until (dt.dt()):                        new end of the window, defaults to the latest end of an interaction
+
+        Returns:
+            tuple: number of edges added and expired
+        """
+        table = interaction_table if interaction_table is not None \
+            else InteractionTable.from_patients(patient_dict['patients'], patient_dict.get('rooms', None),
+                                                include_treatments=False, is_verbose=False)
+        for patient in patient_dict['patients'].values():
+            if patient.patient_id != '':
+                self.update_patient(str(patient.patient_id), self.get_patient_attributes(patient.risk_screenings))
+
+        if until is None:
+            until = pd.Timestamp(table["to_ts"].max()).to_pydatetime() if len(table) != 0 else self.to_range
+        if until is None:
+            return 0, 0
+
+        # stays of all types and appointments of self.edge_types which ended within the new window
+        edge_mask = table.get_mask(origins=["Stay"]) | table.get_mask(edge_types=self.edge_types, origins=["Appointment"])
+        edge_mask &= (table["to_ts"] >= to_datetime64_bound(until - self.window)) & \
+                     (table["to_ts"] <= to_datetime64_bound(until))
+
+        nbr_added = 0
+        batch_signatures = Counter()
+        for row in edge_mask.nonzero()[0]:
+            source, target = table["source"][row], table["target"][row]
+            source_id, target_id = table.node_ids[source], table.node_ids[target]
+            if source_id == '' or target_id == '':
+                self.edge_add_warnings += 1
+                continue
+            from_ts, to_ts = pd.Timestamp(table["from_ts"][row]), pd.Timestamp(table["to_ts"][row])
+            signature = (table.node_ids[table["patient"][row]], source_id, target_id, EDGE_TYPES[table["edge_type"][row]],
+                         ORIGINS[table["origin"][row]], from_ts, to_ts)
+            batch_signatures[signature] += 1
+            if batch_signatures[signature] <= self.edge_signatures[signature]:
+                continue  # ingested before
+            self._add_node(source_id, table, source)
+            self._add_node(target_id, table, target)
+            self._add_edge(source_id, target_id, signature)
+            nbr_added += 1
+
+        nbr_expired = self.advance(until)
+        logging.info(f"Ingested {nbr_added} new edges, the window ending at {until} contains "
+                     f"{self.S_GRAPH.number_of_nodes()} nodes and {self.S_GRAPH.number_of_edges()} edges")
+        return nbr_added, nbr_expired
+
+    def advance(self, until):
+        """Moves the window to end at until and removes the edges which ended before the window.
+
+        Nodes left without edges are removed from the network.
+
+        Args:
+            until (dt.dt()):    new end of the window
+
+        Returns:
+            int: number of expired edges
+        """
+        self.from_range, self.to_range = until - self.window, until
+        horizon = pd.Timestamp(self.from_range)
+        nbr_expired = 0
+        while len(self.expiry_queue) != 0 and self.expiry_queue[0][0] < horizon:
+            _, _, source_id, target_id, key, signature = heapq.heappop(self.expiry_queue)
+            attributes = self.S_GRAPH.edges[source_id, target_id, key]
+            self._count_edge(source_id, target_id, attributes, -1)
+            self.S_GRAPH.remove_edge(source_id, target_id, key)
+            self.edge_signatures[signature] -= 1
+            if self.edge_signatures[signature] == 0:
+                del self.edge_signatures[signature]
+            for node_id in {source_id, target_id}:
+                if self.S_GRAPH.degree(node_id) == 0:
+                    self._remove_node(node_id)
+            nbr_expired += 1
+        self.invalidate_caches()
+        return nbr_expired
+
+    def update_patient(self, patient_id, attribute_dict):
+        """Sets the attributes of a patient, updating the infection of its edges if its risk status changed.
+
+        Args:
+            patient_id (str):       string identifier of the patient
+            attribute_dict (dict):  node attributes of the patient (see ``get_patient_attributes()``)
+        """
+        self.patient_attributes[patient_id] = attribute_dict
+        if patient_id not in self.S_GRAPH:
+            return
+        node_attributes = self.S_GRAPH.nodes[patient_id]
+        was_positive = node_attributes.get('vre_status', 'neg') != 'neg'
+        node_attributes.update(attribute_dict)
+        if was_positive == (attribute_dict['vre_status'] != 'neg'):
+            return
+        for source_id, target_id, attributes in self.S_GRAPH.edges(patient_id, data=True):
+            self._count_edge(source_id, target_id, attributes, -1)
+            attributes['infected'] = self._is_positive(source_id) or self._is_positive(target_id)
+            self._count_edge(source_id, target_id, attributes, 1)
+        self.invalidate_caches()
+
+    def calculate_degree_metrics(self):
+        """Returns the degree metrics of all nodes from the incrementally updated counters.
+
+        The metrics are the ones of ``calculate_total_degree_ratio()`` and ``calculate_patient_degree_ratio()``.
+
+        Returns:
+            pd.DataFrame: one row per node with the columns "Node ID", "Node Type", "Risk Status", "Total Degree Ratio",
+            "Patient Degree Ratio", "Number of Infected Edges", "Number of Infected Patient Edges",
+            "Total Patient Edges" and "Total Edges", sorted by "Total Degree Ratio"
+        """
+        node_ids = [node_id for node_id in self.S_GRAPH.nodes if not pd.isna(node_id)]
+        degree_df = pd.DataFrame({"Node ID": pd.Series(node_ids, dtype=object),
+                                  "Node Type": [self.S_GRAPH.nodes[node_id]['type'] for node_id in node_ids],
+                                  "Risk Status": [self.S_GRAPH.nodes[node_id].get('vre_status', 'neg') for node_id in node_ids]})
+        for column in DEGREE_COLUMNS:
+            degree_df[column] = pd.Series([self.degrees[column][node_id] for node_id in node_ids], dtype='int64')
+        degree_df.insert(3, "Total Degree Ratio", degree_df["Number of Infected Edges"] / degree_df["Total Edges"])
+        degree_df.insert(4, "Patient Degree Ratio",
+                         degree_df["Number of Infected Patient Edges"] / degree_df["Total Patient Edges"])
+        degree_df.sort_values(by="Total Degree Ratio", ascending=False, inplace=True)
+        return degree_df
+
+    def _is_positive(self, node_id):
+        return self.S_GRAPH.nodes[node_id].get('vre_status', 'neg') != 'neg'
+
+    def _add_node(self, node_id, table, node):
+        """Adds the node of the interaction table to the network if it is not in the network."""
+        if node_id in self.S_GRAPH:
+            return
+        node_type = table.node_types[node]
+        if node_type == PATIENT:
+            attribute_dict = self.patient_attributes.get(node_id, self.get_patient_attributes(dict()))
+        elif node_type == ROOM:
+            attribute_dict = self.get_room_attributes(**table.node_attributes.get(node, dict()))
+        elif node_type == DEVICE:
+            attribute_dict = {'type': 'Device', **table.node_attributes[node]}
+        else:
+            attribute_dict = {'type': 'Employee'}
+        self.S_GRAPH.add_node(node_id, **attribute_dict)
+        self.register_node(node_id, NODE_TYPES[node_type])
+
+    def _remove_node(self, node_id):
+        self.S_GRAPH.remove_node(node_id)
+        self.nodes[self.node_types.pop(node_id)].discard(node_id)
+        for column in DEGREE_COLUMNS:
+            self.degrees[column].pop(node_id, None)
+
+    def _add_edge(self, source_id, target_id, signature):
+        _, _, _, edge_type, origin, from_ts, to_ts = signature
+        attributes = {'from': from_ts, 'to': to_ts, 'type': edge_type, 'origin': origin,
+                      'infected': self._is_positive(source_id) or self._is_positive(target_id)}
+        key = self.S_GRAPH.add_edge(source_id, target_id, **attributes)
+        self._count_edge(source_id, target_id, attributes, 1)
+        self.edge_signatures[signature] += 1
+        heapq.heappush(self.expiry_queue, (to_ts, self.nbr_queued, source_id, target_id, key, signature))
+        self.nbr_queued += 1
+
+    def _count_edge(self, source_id, target_id, attributes, increment):
+        """Adds increment to the degree counters of the nodes of an edge and updates their ``infected`` attribute."""
+        is_patient_edge = 'Patient' in attributes['type']
+        for node_id in {source_id, target_id}:  # the node of a self-loop is only counted once
+            self.degrees["Total Edges"][node_id] += increment
+            self.degrees["Total Patient Edges"][node_id] += increment * is_patient_edge
+            if attributes['infected']:
+                self.degrees["Number of Infected Edges"][node_id] += increment
+                self.degrees["Number of Infected Patient Edges"][node_id] += increment * is_patient_edge
+                node_attributes = self.S_GRAPH.nodes[node_id]
+                if self.degrees["Number of Infected Edges"][node_id] > 0:
+                    node_attributes['infected'] = True
+                else:
+                    node_attributes.pop('infected', None)
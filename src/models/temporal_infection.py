@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""This script contains the earliest-arrival engine used for the time-respecting infection of a ``SurfaceModel``.
+
+Starting from the positive (or already infected) nodes, the infection is passed along an edge from node u to node v
+if u was infected (minus the colonialization time) before the edge ended, and v is then infected on the day the edge
+ended. This is the rule of ``SurfaceModel.add_edge_infection(forward_in_time=True)``, which applies it to all edges once
+per pass. Here, the earliest infection of every node is found in a single Dijkstra-style search instead:
+
+- every node keeps its incident edges sorted by their end, so the edges which can pass on an infection at time t are a
+  suffix found by binary search
+- labels (infection time, number of hops) are processed from a priority queue in order of their time, and a label is
+  only kept if no other label of the node is both earlier and reached with fewer or equal hops. With a hop limit,
+  a later infection over fewer hops may still reach nodes the earlier one cannot, which is why more than one label per
+  node can be kept (a Pareto front).
+
+With ``max_hops=k``, the result equals ``k`` passes of ``add_edge_infection(forward_in_time=True)``.
+
+-----
+"""
+
+import heapq
+
+import numpy as np
+
+_MAX_US = np.iinfo(np.int64).max  # never infected
+
+
+def _day_floor(time_us):
+    day_us = 86400 * 10 ** 6
+    return time_us - time_us % day_us
+
+
+def get_earliest_infections(graph, source_times, colonialization_us=0, max_hops=None):
+    """Computes the earliest time-respecting infection of all nodes.
+
+    Args:
+        graph (SparseSurfaceGraph):     graph whose edges pass on the infection
+        source_times (dict):            node integer of each initially infected node mapped to its infection time in
+                                        microseconds since the epoch
+        colonialization_us (int):       time in microseconds a node is assumed to be colonized before its infection
+        max_hops (int):                 maximum number of edges between a source and an infected node (no limit if
+                                        ``None``)
+
+    Returns:
+        tuple: arrays with one entry per node integer:
+
+        - earliest infection time in microseconds (``_MAX_US`` if never infected)
+        - fewest hops of any infection from a source (-1 if never infected, 0 for the sources)
+        - fewest hops over which the node is infected by another node (-1 if it is never infected by another node)
+    """
+    nbr_nodes = graph.number_of_nodes()
+    is_loop = graph.sources == graph.targets
+    nodes = np.concatenate([graph.sources, graph.targets[~is_loop]])
+    neighbours = np.concatenate([graph.targets, graph.sources[~is_loop]])
+    edge_ends = np.concatenate([graph.to_ts, graph.to_ts[~is_loop]]).astype('datetime64[us]')
+    is_valid = ~np.isnat(edge_ends)
+    nodes, neighbours, edge_ends = nodes[is_valid], neighbours[is_valid], edge_ends[is_valid].astype(np.int64)
+
+    # incident edges of every node, sorted by their end
+    order = np.lexsort((edge_ends, nodes))
+    neighbours, edge_ends = neighbours[order], edge_ends[order]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(nodes, minlength=nbr_nodes))])
+    infection_days = _day_floor(edge_ends)
+
+    earliest_times = np.full(nbr_nodes, _MAX_US, dtype=np.int64)
+    fewest_hops = np.full(nbr_nodes, -1, dtype=np.int64)
+    fewest_infected_hops = np.full(nbr_nodes, -1, dtype=np.int64)
+    labels = [[] for _ in range(nbr_nodes)]  # (hops, time) of the kept labels of every node
+
+    def is_dominated(node, time, hops):
+        return any(label_hops <= hops and label_time <= time for label_hops, label_time in labels[node])
+
+    queue = []
+    for node, time in source_times.items():
+        if not is_dominated(node, time, 0):
+            labels[node] = [(0, time)]
+            heapq.heappush(queue, (time, 0, node))
+
+    while len(queue) != 0:
+        time, hops, node = heapq.heappop(queue)
+        if (hops, time) not in labels[node]:
+            continue  # dominated by a label found after this one was queued
+        if max_hops is not None and hops >= max_hops:
+            continue
+        begin, end = offsets[node], offsets[node + 1]
+        first = begin + np.searchsorted(edge_ends[begin:end], time - colonialization_us, side='right')
+        for neighbour, infection_day in zip(neighbours[first:end].tolist(), infection_days[first:end].tolist()):
+            if fewest_infected_hops[neighbour] == -1 or hops + 1 < fewest_infected_hops[neighbour]:
+                fewest_infected_hops[neighbour] = hops + 1
+            if is_dominated(neighbour, infection_day, hops + 1):
+                continue
+            labels[neighbour] = [(label_hops, label_time) for label_hops, label_time in labels[neighbour]
+                                 if not (hops + 1 <= label_hops and infection_day <= label_time)]
+            labels[neighbour].append((hops + 1, infection_day))
+            heapq.heappush(queue, (infection_day, hops + 1, neighbour))
+
+    for node, node_labels in enumerate(labels):
+        if len(node_labels) != 0:
+            earliest_times[node] = min(label_time for _, label_time in node_labels)
+            fewest_hops[node] = min(label_hops for label_hops, _ in node_labels)
+    return earliest_times, fewest_hops, fewest_infected_hops
@@ -0,0 +1,36 @@
+import pandas as pd
+
+import src.common.compact
+from src.features.model import Appointment, RiskScreening, Stay, Treatment
+
+
+def _create_stay(serial_number):
+    return Stay(serial_number, "0001", "1", "Eintritt", "30", "0", "", "DIAA", "".join(["N ", "NORD"]), "", "BH O 128",
+                "1", None, "", pd.Timestamp("2018-03-01 10:00"), pd.NaT, "BH", "O", "128")
+
+
+def test_entities_have_no_instance_dictionary():
+    entities = [_create_stay("1"),
+                Appointment("1", "0", "Konsultation", "K90", "Patiententermin", pd.Timestamp("2018-03-01 10:00"), "30"),
+                Treatment("13768220", "0301119", pd.Timestamp("2018-03-11"), "Standard Patient", "aktiv", "0006422111",
+                          "Standard Fall", "aktiv", "3", "00026556", "I0301119", "870"),
+                RiskScreening("1", pd.Timestamp("2018-03-01"), pd.Timestamp("2018-03-02"), "Hans", "Muster",
+                              pd.Timestamp("1950-01-01"), "8301433", "nn")]
+    for entity in entities:
+        assert not hasattr(entity, "__dict__")
+
+
+def test_categorical_strings_are_interned():
+    stays = [_create_stay(str(i)) for i in range(2)]
+    assert stays[0].ward_id is stays[1].ward_id
+    assert stays[0].department == "DIAA"
+
+
+def test_unused_fields_are_dropped_in_compact_mode(monkeypatch):
+    monkeypatch.setattr(src.common.compact, "KEEP_UNUSED_FIELDS", False)
+    stay = _create_stay("1")
+    risk_screening = RiskScreening("1", pd.Timestamp("2018-03-01"), pd.Timestamp("2018-03-02"), "Hans", "Muster",
+                                   pd.Timestamp("1950-01-01"), "8301433", "nn")
+
+    assert stay.department is None and stay.ward_id == "N NORD"
+    assert risk_screening.first_name is None and risk_screening.patient_id == "00008301433"
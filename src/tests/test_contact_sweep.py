@@ -0,0 +1,72 @@
+import random
+from datetime import datetime
+
+import pandas as pd
+
+from src.features.contact_sweep import get_contact_frame, sweep_overlaps
+from src.features.model import Case, Patient, RiskScreening, Room, Stay, Ward
+
+
+def _create_patients(nr_patients=40, nr_stays=4):
+    random.seed(11)
+    origin = pd.Timestamp("2018-01-01")
+    rooms = [Room(sap_room_id1=f"BH O {i}") for i in range(5)]
+    wards = [Ward(f"W {i}") for i in range(2)]
+    patients = dict()
+    for i in range(nr_patients):
+        patient = Patient(str(i), "male", datetime(1950, 1, 1), "3000", "Bern", "BE", "de")
+        if i % 4 == 0:
+            patient.add_risk_screening(RiskScreening(str(i), pd.Timestamp("2018-03-01"), pd.Timestamp("2018-03-01"),
+                                                     "", "", None, str(i), "pos"))
+        case = Case(f"C{i}", patient.patient_id, random.choice(["1", "1", "2"]), "open", "in-patient", None, None,
+                    "Standard", "active")
+        patient.add_case(case)
+        case.add_patient(patient)
+        for j in range(nr_stays):
+            room, ward = random.choice(rooms), wards[rooms.index(random.choice(rooms)) % 2]
+            begin = origin + pd.Timedelta(hours=random.randint(0, 24 * 60))
+            end = begin + pd.Timedelta(hours=random.randint(0, 24 * 5))
+            stay = Stay(str(j), case.case_id, random.choice(["1", "2", "4"]), "Eintritt", "30", "0", "", "DIAA",
+                        ward.name, "", room.room_id, "", None, "", begin, end, "BH", "O", "1")
+            stay.add_case(case)
+            stay.add_room(room)
+            stay.add_ward(ward)
+            case.add_stay(stay)
+            room.add_stay(stay)
+            ward.add_stay(stay)
+        patients[patient.patient_id] = patient
+    return patients
+
+
+def _get_contact_patients_nested(patients, with_details):
+    contact_patients = {}
+    for p in patients.values():
+        if p.has_risk():
+            for c in p.cases.values():
+                if c.case_type_id == "1" and c.stays_end is not None:
+                    Patient.get_contact_patients_for_case(c, contact_patients, with_details=with_details)
+    return contact_patients
+
+
+def test_sweep_finds_all_overlapping_pairs():
+    risk = [(0, 10), (20, 30)]
+    contact = [(10, 12), (5, 5), (31, 40), (15, 25)]
+    assert sorted(sweep_overlaps(risk, contact)) == [(0, 0), (0, 1), (1, 3)]
+
+
+def test_contacts_match_nested_loops():
+    patients = _create_patients()
+    for with_details in [True, False]:
+        assert Patient.get_contact_patients(patients, with_details=with_details) \
+               == _get_contact_patients_nested(patients, with_details)
+
+
+def test_contact_frame_filters_stay_types():
+    patients = _create_patients()
+    contact_df = get_contact_frame(patients, stay_type_ids=("4",), is_verbose=False)
+
+    contact_stay_types = {stay.type_id for p in patients.values() for c in p.cases.values() for stay in c.stays.values()
+                          if p.patient_id in set(contact_df["Contact Patient ID"])}
+    assert len(contact_df) > 0 and "4" in contact_stay_types
+    assert set(contact_df["Contact Type"]) <= {"contact_room", "contact_ward"}
+    assert (contact_df["Overlap Start"] <= contact_df["Overlap End"]).all()
@@ -0,0 +1,110 @@
+import os
+import pathlib
+from datetime import date, datetime
+
+import pandas as pd
+
+from configuration.basic_configuration import configuration
+from src.features.dataloader import DataLoader
+from src.features.dataset_cache import DatasetCache, save_snapshot, load_snapshot
+from src.features.model import Case, Room, Stay, Ward
+
+
+def _create_stay(serial_number, case_id, room_id, ward_id):
+    return Stay(serial_number, case_id, "1", "Eintritt", "30", "0", "", "DIAA", ward_id, "", room_id, "1", None, "",
+                pd.Timestamp("2018-03-01 10:00"), pd.NaT, "BH", "O", "128")
+
+
+def _create_dataset():
+    case = Case("0001", "00008301433", "1", "open", "in-patient", datetime(2018, 3, 1), None, "Standard", "active")
+    room = Room(sap_room_id1="BH O 128")
+    ward = Ward("N NORD")
+    for serial_number in ["1", "2"]:
+        stay = _create_stay(serial_number, case.case_id, room.room_id, ward.name)
+        case.add_stay(stay)
+        stay.add_case(case)
+        stay.add_room(room)
+        stay.add_ward(ward)
+        room.add_stay(stay)
+        ward.add_stay(stay)
+    return {"cases": {case.case_id: case}, "rooms": {room.room_id: room}, "wards": {ward.name: ward},
+            "dates": {date(2018, 3, 1): (1, 2.5)}}
+
+
+def test_snapshot_restores_cyclic_references(tmp_path):
+    path = str(tmp_path / "dataset.snapshot")
+    save_snapshot(_create_dataset(), path)
+    dataset = load_snapshot(path)
+
+    case = dataset["cases"]["0001"]
+    room = dataset["rooms"]["BH O 128"]
+    assert len(case.stays) == 2
+    for stay in case.stays.values():
+        assert stay.case is case
+        assert stay.room is room
+        assert stay.ward is dataset["wards"]["N NORD"]
+        assert stay in room.stays
+        assert stay.from_datetime == pd.Timestamp("2018-03-01 10:00")
+        assert stay.to_datetime is pd.NaT
+    assert dataset["dates"] == {date(2018, 3, 1): (1, 2.5)}
+
+
+def test_snapshot_handles_deep_reference_chains(tmp_path):
+    wards = [Ward(str(i)) for i in range(50000)]
+    for ward, next_ward in zip(wards, wards[1:]):
+        ward.stays.append(next_ward)
+    path = str(tmp_path / "chain.snapshot")
+    save_snapshot({"wards": wards[0]}, path)
+
+    ward = load_snapshot(path)["wards"]
+    length = 1
+    while len(ward.stays) != 0:
+        ward = ward.stays[0]
+        length += 1
+    assert length == 50000
+
+
+def test_cache_key_depends_on_file_content_and_arguments(tmp_path):
+    data_file = tmp_path / "DIM_PATIENT.csv"
+    data_file.write_text("Patient ID\n1\n")
+    cache = DatasetCache(str(tmp_path / "cache"))
+
+    key = cache.get_key([str(data_file)], {"from_range": datetime(2018, 3, 1)})
+    assert key == cache.get_key([str(data_file)], {"from_range": datetime(2018, 3, 1)})
+    assert key != cache.get_key([str(data_file)], {"from_range": datetime(2018, 4, 1)})
+    assert cache.load(key) is None
+
+    cache.save(key, {"patients": {}})
+    assert cache.load(key) == {"patients": {}}
+
+    data_file.write_text("Patient ID\n2\n")
+    assert key != cache.get_key([str(data_file)], {"from_range": datetime(2018, 3, 1)})
+
+
+def test_cache_key_of_data_loader(tmp_path, monkeypatch):
+    monkeypatch.setitem(configuration["PATHS"], "interim_data_dir", str(tmp_path) + "/{}_data/")
+    data_loader = DataLoader()
+    os.makedirs(data_loader.base_path)
+    patients_file = pathlib.Path(data_loader.patients_path)
+    patients_file.write_text("Patient ID\n1\n")
+    cache = DatasetCache(str(tmp_path / "cache"))
+
+    assert data_loader.base_path not in data_loader.get_input_paths()
+    key = cache.get_key(data_loader.get_input_paths(), {})
+    patients_file.write_text("Patient ID\n2\n")
+    assert key != cache.get_key(data_loader.get_input_paths(), {})
+
+
+def test_cache_key_depends_on_the_model_code(tmp_path):
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / "room.py").write_text("class Room:\n    pass\n")
+    cache = DatasetCache(str(tmp_path / "cache"), code_paths=[str(model_dir)])
+
+    key = cache.get_key([], {})
+    assert key == cache.get_key([], {})
+    (model_dir / "room.py").write_text("class Room:\n    __slots__ = ['stay_index']\n")
+    changed_key = cache.get_key([], {})
+    assert changed_key != key
+    (model_dir / "ward.py").write_text("class Ward:\n    pass\n")
+    assert cache.get_key([], {}) != changed_key
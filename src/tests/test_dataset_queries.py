@@ -0,0 +1,108 @@
+import gzip
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.data.dataset_queries import ConnectionPool, extract_queries, write_sql_query_results
+
+
+def _create_database(tmp_path):
+    database_path = str(tmp_path / "atelier.db")
+    conn = sqlite3.connect(database_path)
+    conn.execute("CREATE TABLE DIM_RAUM (RAUM_ID TEXT, RAUM_NAME TEXT)")
+    conn.executemany("INSERT INTO DIM_RAUM VALUES (?, ?)", [(str(i), f"BH O {i}") for i in range(25)])
+    conn.execute("CREATE TABLE DIM_GERAET (GERAET_ID TEXT, GERAET_NAME TEXT)")
+    conn.executemany("INSERT INTO DIM_GERAET VALUES (?, ?)", [("1", "Waage"), ("2", None)])
+    conn.commit()
+    conn.close()
+
+    sql_files = []
+    for table, query in [("DIM_RAUM", "SELECT RAUM_ID, RAUM_NAME\nFROM DIM_RAUM\nORDER BY CAST(RAUM_ID AS INTEGER)"),
+                         ("DIM_GERAET", "SELECT GERAET_ID, GERAET_NAME FROM DIM_GERAET"),
+                         ("DIM_FEHLT", "SELECT * FROM DIM_FEHLT")]:
+        sql_path = tmp_path / f"{table}.sql"
+        sql_path.write_text(query)
+        sql_files.append(str(sql_path))
+    return (lambda: sqlite3.connect(database_path, check_same_thread=False)), sql_files
+
+
+def test_extract_queries(tmp_path):
+    connect, sql_files = _create_database(tmp_path)
+
+    metrics_df, exceptions = extract_queries(sql_files, str(tmp_path / "raw"), connect, max_workers=2, fetch_rows=10)
+
+    assert len(exceptions) == 1 and isinstance(exceptions[0], sqlite3.OperationalError)
+    assert metrics_df["Table"].tolist() == ["DIM_RAUM", "DIM_GERAET"]
+    assert metrics_df["Rows"].tolist() == [25, 2]
+    rooms = pd.read_csv(tmp_path / "raw" / "DIM_RAUM.csv", dtype=str)
+    assert rooms["RAUM_NAME"].tolist() == [f"BH O {i}" for i in range(25)]
+    assert pd.read_csv(tmp_path / "raw" / "DIM_GERAET.csv", dtype=str)["GERAET_NAME"].isna().tolist() == [False, True]
+    assert not (tmp_path / "raw" / "DIM_FEHLT.csv").exists()
+
+    # existing files are skipped unless force_overwrite is set
+    metrics_df, _ = extract_queries(sql_files[:2], str(tmp_path / "raw"), connect)
+    assert len(metrics_df) == 0
+
+
+def test_extract_queries_gzip(tmp_path):
+    connect, sql_files = _create_database(tmp_path)
+
+    metrics_df, exceptions = extract_queries(sql_files[:1], str(tmp_path / "raw"), connect, csv_sep=";",
+                                             compression="gzip")
+
+    assert len(exceptions) == 0
+    with gzip.open(tmp_path / "raw" / "DIM_RAUM.csv.gz", "rt") as f:
+        assert f.readline() == "RAUM_ID;RAUM_NAME\n"
+    assert metrics_df["Bytes"][0] == (tmp_path / "raw" / "DIM_RAUM.csv.gz").stat().st_size
+
+
+def test_failing_fetch_leaves_no_partial_file(tmp_path):
+    connect, sql_files = _create_database(tmp_path)
+    conn = connect()
+
+    def fail_late(room_id):
+        if room_id == "20":
+            raise ValueError("connection lost")
+        return room_id
+
+    conn.create_function("fail_late", 1, fail_late)
+    sql_path = tmp_path / "DIM_RAUM_FAILING.sql"
+    sql_path.write_text("SELECT fail_late(RAUM_ID) FROM DIM_RAUM")
+    (tmp_path / "raw").mkdir()
+
+    with pytest.raises(sqlite3.OperationalError):
+        write_sql_query_results(str(sql_path), str(tmp_path / "raw" / "DIM_RAUM.csv"), conn, fetch_rows=5)
+    conn.close()
+
+    assert os.listdir(tmp_path / "raw") == []
+
+
+def test_connection_pool_is_bounded():
+    opened = []
+    in_use = []
+    max_in_use = []
+    lock = threading.Lock()
+    pool = ConnectionPool(lambda: opened.append(sqlite3.connect(":memory:", check_same_thread=False)) or opened[-1], 2)
+
+    def borrow():
+        with pool.connection() as conn:
+            with lock:
+                in_use.append(conn)
+                max_in_use.append(len(in_use))
+            time.sleep(0.01)
+            with lock:
+                in_use.remove(conn)
+
+    threads = [threading.Thread(target=borrow) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    pool.close()
+
+    assert max(max_in_use) <= 2
+    assert len(opened) == 2 and pool.idle_connections.qsize() == 0
@@ -0,0 +1,101 @@
+import os
+import subprocess
+
+import pytest
+
+from configuration.basic_configuration import configuration
+from src.common.line_reader import PipeLineReader
+from src.features.dataloader import DataLoader
+from src.features.dataset_cache import DatasetCache
+
+
+def _write_csv(tmp_path, name, rows):
+    csv_path = tmp_path / name
+    csv_path.write_text("\n".join(["Appointment ID,Device ID"] + [",".join(row) for row in rows]) + "\n", encoding="iso-8859-1")
+    return str(csv_path)
+
+
+def test_pipe_reader_streams_command_output(tmp_path):
+    csv_path = _write_csv(tmp_path, "FAKT_TERMIN_GERAET.csv", [["1", "Waage"], ["2", "Gerät"]])
+    reader = PipeLineReader(["cat", csv_path], chunk_size=4)
+
+    assert list(reader) == [["1", "Waage"], ["2", "Gerät"]]
+    assert reader.get_row_count() is None
+
+
+def test_pipe_reader_raises_on_failing_command(tmp_path):
+    with pytest.raises(subprocess.CalledProcessError):
+        list(PipeLineReader(["cat", str(tmp_path / "missing.csv")]))
+
+
+def test_pipe_reader_stops_early(tmp_path):
+    csv_path = _write_csv(tmp_path, "FAKT_TERMIN_GERAET.csv", [[str(i), "Waage"] for i in range(10000)])
+    for row in PipeLineReader(["cat", csv_path]):
+        break
+    assert row == ["0", "Waage"]
+
+
+def test_data_loader_hdfs_pipe_with_local_stand_in(tmp_path):
+    paths = [_write_csv(tmp_path, f"table_{i}.csv", [[str(i), "Waage"]]) for i in range(3)]
+    loader = DataLoader(hdfs_pipe=True)
+    loader.hdfs_command = ["cat"]
+
+    assert list(loader.get_hdfs_pipe(paths[0])) == [["0", "Waage"]]
+
+    loader.prefetch_hdfs_files(paths, max_workers=3)
+    assert [list(loader.get_hdfs_pipe(path)) for path in paths] == [[["0", "Waage"]], [["1", "Waage"]], [["2", "Waage"]]]
+    assert loader.get_hdfs_pipe(paths[1]).get_row_count() == 1
+
+    loader.release_prefetched_files()
+    assert loader.prefetched_files == {}
+
+
+def test_prefetched_files_are_released_if_loading_fails(tmp_path, monkeypatch):
+    loader = DataLoader(hdfs_pipe=True)
+    loader.hdfs_command = ["cat"]
+    loader.hdfs_prefetch_workers = 2
+    loader.icd_codes_path = _write_csv(tmp_path, "V_LA_ISH_NDIA_NORM.csv", [["1", "A01"]])
+
+    spool_dirs = []
+
+    def fail(*args, **kwargs):
+        spool_dirs.append(loader.spool_dir)
+        raise RuntimeError("parsing failed")
+
+    monkeypatch.setattr(loader, "parse_tables", fail)
+    with pytest.raises(RuntimeError):
+        loader.prepare_dataset(load_patients=False, load_cases=False, load_stays=False, load_medications=False,
+                               load_risks=False, load_chop_codes=False, load_surgeries=False, load_appointments=False,
+                               load_devices=False, load_employees=False, load_care_data=False, load_icd_codes=True,
+                               load_buildings=False, load_rooms=False, load_partners=False, use_cache=False)
+
+    assert len(spool_dirs) == 1 and spool_dirs[0] is not None and not os.path.exists(spool_dirs[0])
+    assert loader.spool_dir is None and loader.prefetched_files == {}
+
+
+def test_dataset_cache_identifies_hdfs_files_by_their_checksums(tmp_path, monkeypatch):
+    monkeypatch.setitem(configuration["PATHS"], "cache_dir", str(tmp_path / "cache"))
+    loader = DataLoader(hdfs_pipe=True)
+    loader.hdfs_command = ["cat"]
+    loader.hdfs_checksum_command = ["md5sum"]
+    loader.icd_codes_path = _write_csv(tmp_path, "V_LA_ISH_NDIA_NORM.csv", [["1", "A01"]])
+    assert loader.icd_codes_path not in loader.get_input_paths()
+
+    checksums = loader.get_hdfs_checksums([loader.icd_codes_path])
+    _write_csv(tmp_path, "V_LA_ISH_NDIA_NORM.csv", [["1", "A02"]])
+    assert loader.get_hdfs_checksums([loader.icd_codes_path]) != checksums
+    assert loader.get_hdfs_checksums([str(tmp_path / "missing.csv")]) is None
+
+    loaded_keys = []
+    monkeypatch.setattr(DatasetCache, "load", lambda cache, key: loaded_keys.append(key))
+    monkeypatch.setattr(loader, "parse_tables", lambda *args, **kwargs: 1 / 0)
+    for checksum_command in [["md5sum"], ["false"]]:
+        loader.hdfs_checksum_command = checksum_command
+        with pytest.raises(ZeroDivisionError):
+            loader.prepare_dataset(load_patients=False, load_cases=False, load_stays=False, load_medications=False,
+                                   load_risks=False, load_chop_codes=False, load_surgeries=False,
+                                   load_appointments=False, load_devices=False, load_employees=False,
+                                   load_care_data=False, load_icd_codes=True, load_buildings=False, load_rooms=False,
+                                   load_partners=False, use_cache=True)
+    # the cache is not used if the HDFS files cannot be identified
+    assert len(loaded_keys) == 1
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+import pandas as pd
+
+from src.features.data_extractions.extract_gnn_data import get_entity_interactions
+from src.features.interaction_table import InteractionTable
+from src.features.model import Appointment, Case, Device, Employee, Patient, Room, Stay, Treatment, Ward
+from src.models.networkx_graph import SurfaceModel
+
+
+def _create_patients():
+    patient = Patient("8301433", "male", datetime(1950, 1, 1), "3000", "Bern", "BE", "de")
+    case = Case("0001", patient.patient_id, "1", "open", "in-patient", datetime(2018, 3, 1), None, "Standard", "active")
+    patient.add_case(case)
+    room = Room(sap_room_id1="BH O 128", ww_building_id="12")
+    ward = Ward("N NORD")
+
+    stay = Stay("1", "0001", "1", "Eintritt", "30", "0", "", "DIAA", ward.name, "", room.room_id, "1", None, "",
+                pd.Timestamp("2018-03-01 10:00"), pd.Timestamp("2018-03-03 10:00"), "BH", "O", "128")
+    stay.add_room(room)
+    stay.add_ward(ward)
+    case.add_stay(stay)
+
+    appointment = Appointment("1", "0", "Konsultation", "K90", "Patiententermin", pd.Timestamp("2018-03-02 10:00"), "30")
+    appointment.add_device(Device("10", "Waage"))
+    appointment.add_employee(Employee("e1"))
+    appointment.add_room(room)
+    case.add_appointment(appointment)
+
+    case.add_care(Treatment("8301433", "e2", pd.Timestamp("2018-03-02"), "Standard Patient", "aktiv", "0001",
+                            "Standard Fall", "aktiv", "3", "00026556", "I0301119", "870"))
+    return {"patients": {patient.patient_id: patient}, "rooms": {room.room_id: room}}
+
+
+def _get_edges(model):
+    return sorted((tuple(sorted([u, v])), d["type"], d["origin"], d["from"], d["to"])
+                  for u, v, d in model.S_GRAPH.edges(data=True))
+
+
+def test_table_contains_all_interactions_once():
+    patient_data = _create_patients()
+    table = InteractionTable.from_patients(patient_data["patients"], patient_data["rooms"], is_verbose=False)
+
+    df = table.to_frame()
+    assert df["origin"].tolist() == ["Stay"] + ["Appointment"] * 6 + ["Treatment"]
+    assert df["type"].tolist()[:4] == ["Patient-Room", "Device-Patient", "Patient-Room", "Employee-Patient"]
+    assert table.node_attributes[table.find_node(1, "BH O 128")]["building_id"] == "12"
+    assert len(table.get_mask(from_range=datetime(2018, 3, 2))) == len(table)
+    assert table.get_mask(from_range=datetime(2018, 3, 2)).sum() == 7
+
+
+def test_surface_model_from_table_matches_object_walk():
+    patient_data = _create_patients()
+    table = InteractionTable.from_patients(patient_data["patients"], patient_data["rooms"], is_verbose=False)
+    legacy_model = SurfaceModel()
+    legacy_model.add_network_data(patient_data, from_range=datetime(2018, 1, 1), to_range=datetime(2019, 1, 1))
+    table_model = SurfaceModel()
+    table_model.add_network_data(patient_data, from_range=datetime(2018, 1, 1), to_range=datetime(2019, 1, 1),
+                                 interaction_table=table)
+
+    assert _get_edges(table_model) == _get_edges(legacy_model)
+    assert len(_get_edges(table_model)) == 7
+    assert dict(table_model.S_GRAPH.nodes(data=True))["BH O 128"] == dict(legacy_model.S_GRAPH.nodes(data=True))["BH O 128"]
+
+
+def test_gnn_interactions_from_table():
+    df = get_entity_interactions(_create_patients()["patients"])
+
+    assert sorted(zip(df["node_0"], df["node_1"])) == [("EMPLOYEE_e1", "DEVICE_10"), ("PATIENT_00008301433", "DEVICE_10"),
+                                                       ("PATIENT_00008301433", "ROOM_BH O 128"), ("ROOM_BH O 128", "DEVICE_10"),
+                                                       ("ROOM_BH O 128", "EMPLOYEE_e1")]
+
+
+def _get_legacy_gnn_interactions(patients):
+    # interactions as exported by walking the objects, before the InteractionTable
+    interactions = []
+    for patient in patients.values():
+        for appointment in patient.get_appointments():
+            times = (appointment.start_datetime, appointment.end_datetime)
+            for device in appointment.devices:
+                interactions.append(("PATIENT_" + str(patient.patient_id), "DEVICE_" + str(device.id), *times))
+                for employee in appointment.employees:
+                    interactions.append(("EMPLOYEE_" + str(employee.id), "DEVICE_" + str(device.id), *times))
+                for room in appointment.rooms:
+                    interactions.append(("ROOM_" + str(room.room_id), "DEVICE_" + str(device.id), *times))
+            for employee in appointment.employees:
+                for room in appointment.rooms:
+                    interactions.append(("ROOM_" + str(room.room_id), "EMPLOYEE_" + str(employee.id), *times))
+    for patient in patients.values():
+        for stay in patient.get_stays():
+            interactions.append(("PATIENT_" + str(patient.patient_id), "ROOM_" + str(stay.room.room_id),
+                                 stay.from_datetime, stay.to_datetime))
+    return sorted(interactions)
+
+
+def test_exports_identify_rooms_with_two_sap_ids_like_before():
+    patient_data = _create_patients()
+    room = Room(sap_room_id1="BH O 130", sap_room_id2="BH O 130.1", ww_building_id="12")
+    case = next(iter(patient_data["patients"].values())).cases["0001"]
+    stay = Stay("2", "0001", "1", "Versetzung", "30", "0", "", "DIAA", "N NORD", "", "BH O 130", "1", None, "",
+                pd.Timestamp("2018-03-03 10:00"), pd.Timestamp("2018-03-04 10:00"), "BH", "O", "130")
+    stay.add_room(room)
+    case.add_stay(stay)
+    table = InteractionTable.from_patients(patient_data["patients"], include_treatments=False, is_verbose=False)
+
+    # the model keys the stay by its SAP room id, the exports by the id of the room
+    assert table.find_node(1, "BH O 130") is not None
+    assert table.export_ids[table.find_node(1, "BH O 130")] == "BH O 130.1"
+    df = get_entity_interactions(patient_data["patients"], table)
+    assert sorted(zip(df["node_0"], df["node_1"], df["timestamp_begin"], df["timestamp_end"])) == \
+           _get_legacy_gnn_interactions(patient_data["patients"])
@@ -0,0 +1,82 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from src.common.interim_store import InterimTableWriter, write_interim_table, read_interim_table, date_range_filters, get_parquet_path
+
+pytest.importorskip("pyarrow")
+
+
+def _stays_df():
+    df = pd.DataFrame({"Case ID": ["0001", "0002", "0003"],
+                       "Ward": ["N NORD", None, "E 121"],
+                       "Begin Datetime": pd.to_datetime(["2018-01-01 10:00", "2018-03-02 08:00", "2018-05-01 12:00"]),
+                       "End Datetime": pd.to_datetime(["2018-01-03 10:00", "2018-03-04 08:00", "2018-06-01 12:00"])})
+    return df
+
+
+def test_parquet_matches_csv(tmp_path):
+    csv_path = str(tmp_path / "LA_ISH_NBEW.csv")
+    write_interim_table(_stays_df(), csv_path, date_columns=["Begin Datetime", "End Datetime"], interim_format="parquet")
+
+    from_csv = pd.read_csv(csv_path, parse_dates=["Begin Datetime", "End Datetime"], dtype=str)
+    from_parquet = read_interim_table(csv_path, "iso-8859-1", parse_dates=["Begin Datetime", "End Datetime"])
+
+    assert list(from_parquet.columns) == list(from_csv.columns)
+    assert from_parquet.values.tolist()[0] == from_csv.values.tolist()[0]
+    assert pd.isna(from_parquet["Ward"].iloc[1])
+
+
+def test_parquet_date_range_pushdown(tmp_path):
+    csv_path = str(tmp_path / "LA_ISH_NBEW.csv")
+    write_interim_table(_stays_df(), csv_path, date_columns=["Begin Datetime", "End Datetime"], interim_format="parquet")
+
+    filters = date_range_filters("Begin Datetime", "End Datetime", datetime(2018, 2, 1), datetime(2018, 5, 31))
+    df = read_interim_table(csv_path, "iso-8859-1", parse_dates=["Begin Datetime", "End Datetime"], filters=filters,
+                            columns=["Case ID", "Begin Datetime", "End Datetime"])
+
+    assert df["Case ID"].tolist() == ["0002"]
+    assert list(df.columns) == ["Case ID", "Begin Datetime", "End Datetime"]
+
+
+def test_csv_only_format(tmp_path):
+    csv_path = str(tmp_path / "DIM_GERAET.csv")
+    write_interim_table(pd.DataFrame({"Device ID": ["1"], "Device Name": ["Waage"]}).set_index("Device ID"), csv_path,
+                        interim_format="csv")
+
+    assert not (tmp_path / "DIM_GERAET.parquet").exists()
+    assert get_parquet_path(csv_path).endswith("DIM_GERAET.parquet")
+    assert read_interim_table(csv_path, "iso-8859-1", index_col=0).index.tolist() == ["1"]
+
+
+def test_csv_run_removes_stale_parquet(tmp_path):
+    csv_path = str(tmp_path / "LA_ISH_NBEW.csv")
+    write_interim_table(_stays_df(), csv_path, date_columns=["Begin Datetime", "End Datetime"], interim_format="parquet")
+    assert (tmp_path / "LA_ISH_NBEW.parquet").exists()
+
+    write_interim_table(_stays_df().iloc[:1], csv_path, interim_format="csv")
+
+    assert not (tmp_path / "LA_ISH_NBEW.parquet").exists()
+    assert read_interim_table(csv_path, "iso-8859-1")["Case ID"].tolist() == ["0001"]
+
+
+def test_failed_chunked_write_keeps_previous_table(tmp_path):
+    csv_path = str(tmp_path / "LA_ISH_NBEW.csv")
+    write_interim_table(_stays_df(), csv_path, date_columns=["Begin Datetime", "End Datetime"], interim_format="parquet")
+
+    with pytest.raises(ValueError):
+        with InterimTableWriter(csv_path, date_columns=["Begin Datetime", "End Datetime"],
+                                interim_format="parquet") as writer:
+            writer.write(_stays_df().iloc[:1])
+            raise ValueError("failing chunk")
+
+    assert sorted(os.listdir(tmp_path)) == ["LA_ISH_NBEW.csv", "LA_ISH_NBEW.parquet"]
+    assert len(read_interim_table(csv_path, "iso-8859-1")) == 3
+
+    with InterimTableWriter(csv_path, date_columns=["Begin Datetime", "End Datetime"], interim_format="csv") as writer:
+        writer.write(_stays_df().iloc[:1])
+        writer.write(_stays_df().iloc[1:2])
+    assert sorted(os.listdir(tmp_path)) == ["LA_ISH_NBEW.csv"]
+    assert read_interim_table(csv_path, "iso-8859-1")["Case ID"].tolist() == ["0001", "0002"]
@@ -0,0 +1,73 @@
+import random
+from datetime import datetime
+
+import pandas as pd
+
+from src.common.interval_index import IntervalIndex
+from src.features.model import Room, Stay, Ward
+
+
+def _create_stay(serial_number, begin, end):
+    return Stay(serial_number, "0001", "1", "Eintritt", "30", "0", "", "DIAA", "N NORD", "", "BH O 128", "", None, "",
+                begin, end, "BH", "O", "128")
+
+
+def _get_stays_during_linear(stays, start_dt, end_dt):
+    return [stay for stay in stays if stay.to_datetime >= start_dt and stay.from_datetime <= end_dt]
+
+
+def test_index_matches_linear_scan():
+    random.seed(7)
+    origin = pd.Timestamp("2018-01-01")
+    stays = []
+    for i in range(500):
+        begin = origin + pd.Timedelta(hours=random.randint(0, 24 * 365))
+        stays.append(_create_stay(str(i), begin, begin + pd.Timedelta(hours=random.randint(0, 24 * 30))))
+    ward = Ward("N NORD")
+    for stay in stays:
+        ward.add_stay(stay)
+
+    for _ in range(200):
+        start_dt = origin + pd.Timedelta(hours=random.randint(-24 * 30, 24 * 400))
+        end_dt = start_dt + pd.Timedelta(hours=random.randint(0, 24 * 10))
+        assert ward.get_stays_during(start_dt, end_dt) == _get_stays_during_linear(stays, start_dt, end_dt)
+
+
+def test_open_and_missing_ends():
+    stays = [_create_stay("1", pd.Timestamp("2018-03-01"), None),  # ongoing
+             _create_stay("2", pd.Timestamp("2018-03-01"), pd.NaT),
+             _create_stay("3", pd.Timestamp("2018-03-02"), datetime(9999, 12, 31))]
+    room = Room(sap_room_id1="BH O 128")
+    for stay in stays:
+        room.add_stay(stay)
+
+    assert [stay.serial_number for stay in room.get_stays_during(pd.Timestamp("2018-04-01"), pd.Timestamp("2018-04-02"))] == ["1", "3"]
+    room.add_stay(_create_stay("4", pd.Timestamp("2018-04-01"), pd.Timestamp("2018-04-01 12:00")))
+    assert len(room.get_stays_during(pd.Timestamp("2018-04-01"), pd.Timestamp("2018-04-02"))) == 3
+    assert room.get_stays_during(pd.NaT, pd.Timestamp("2018-04-02")) == []
+
+
+def test_out_of_bounds_dates_are_clipped():
+    index = IntervalIndex([(datetime(1753, 1, 1), datetime(9999, 12, 31)), (datetime(2018, 1, 1), datetime(2018, 1, 2))])
+    assert index.query(datetime(2018, 1, 1, 12), datetime(2018, 1, 1, 13)).tolist() == [0, 1]
+    assert index.query(datetime.min, datetime(1900, 1, 1)).tolist() == [0]
+
+
+def test_long_intervals_do_not_widen_the_queries_of_short_ones():
+    random.seed(11)
+    origin = datetime(2018, 1, 1)
+    intervals = [(origin + pd.Timedelta(hours=i), origin + pd.Timedelta(hours=i + random.randint(1, 3)))
+                 for i in range(2000)]
+    intervals += [(datetime(1753, 1, 1), datetime(9999, 12, 31)), (origin, None)]
+    index = IntervalIndex(intervals)
+
+    for _ in range(100):
+        start = origin + pd.Timedelta(hours=random.randint(-10, 2010))
+        end = start + pd.Timedelta(hours=random.randint(0, 5))
+        expected = [position for position, (begin, stop) in enumerate(intervals)
+                    if begin <= end and (stop is None or stop >= start)]
+        assert index.query(start, end).tolist() == expected
+
+    # the windows of the short intervals only reach back by their own durations
+    assert all(max_duration <= pd.Timedelta(hours=3).value
+               for max_duration, positions, _, _ in index.classes if len(positions) > 1)
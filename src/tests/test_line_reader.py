@@ -0,0 +1,28 @@
+import os
+
+from src.common.line_reader import CsvLineReader, count_lines, get_row_count
+
+
+def test_csv_line_reader_streams_rows_without_header(tmp_path):
+    csv_path = tmp_path / "FAKT_TERMIN_MITARBEITER.csv"
+    csv_path.write_text("Appointment ID,Employee ID\n1,e1\n2,\"e,2\"\n3,e3")
+    reader = CsvLineReader(str(csv_path))
+
+    assert list(reader) == [["1", "e1"], ["2", "e,2"], ["3", "e3"]]
+    assert list(reader) == [["1", "e1"], ["2", "e,2"], ["3", "e3"]]  # every iteration reopens the file
+    assert count_lines(str(csv_path)) == 4
+
+
+def test_row_count_is_cached_in_sidecar(tmp_path):
+    csv_path = tmp_path / "DIM_GERAET.csv"
+    csv_path.write_text("Device ID,Device Name\n1,Waage\n2,ANS-Fix\n")
+    reader = CsvLineReader(str(csv_path))
+
+    assert get_row_count(reader) == 2
+    assert os.path.exists(str(csv_path) + ".rows")
+    assert get_row_count(reader, is_verbose=False) is None
+    assert get_row_count(iter([["1"]])) is None
+
+    csv_path.write_text("Device ID,Device Name\n1,Waage\n2,ANS-Fix\n3,Pumpe\n")
+    os.utime(csv_path, ns=(0, 0))
+    assert get_row_count(reader) == 3
@@ -0,0 +1,47 @@
+import pandas as pd
+
+from src.common.linking import resolve_foreign_keys, get_missing_keys
+from src.features.model import Appointment, Case, Device, Employee
+
+
+def _create_appointment(appointment_id):
+    return Appointment(appointment_id, "0", "Konsultation", "K90", "Patiententermin", pd.Timestamp("2018-03-01 10:00"), "30")
+
+
+def _create_case(case_id):
+    return Case(case_id, "00008301433", "1", "open", "in-patient", None, None, "Standard", "active")
+
+
+def test_resolve_foreign_keys_counts_orphans_in_order():
+    df = pd.DataFrame({"Appointment ID": ["1", "2", "3", "4"], "Case ID": ["a", "x", "b", "y"]})
+    linked_df, orphan_counts = resolve_foreign_keys(df, [("Appointment ID", {"1": 1, "2": 2, "3": 3}), ("Case ID", {"a": 1, "b": 2})])
+
+    assert linked_df["Appointment ID"].tolist() == ["1", "3"]
+    assert orphan_counts == [1, 1]
+    assert get_missing_keys(pd.Series(["d", "a", "d", "c"]), {"a": 1}) == ["d", "c"]
+
+
+def test_appointments_linked_to_cases():
+    appointments = {a: _create_appointment(a) for a in ["1", "2", "3"]}
+    cases = {c: _create_case(c) for c in ["a", "b"]}
+    lines = [["1", "p", "a"], ["2", "p", "b"], ["4", "p", "a"], ["3", "p", "z"]]
+
+    Appointment.add_appointment_to_case(iter(lines), cases, appointments, is_verbose=False)
+
+    assert appointments["1"].case is cases["a"]
+    assert cases["b"].appointments == [appointments["2"]]
+    assert "3" not in appointments  # deleted without case
+
+
+def test_devices_and_employees_linked_to_appointments():
+    appointments = {a: _create_appointment(a) for a in ["1", "2"]}
+    devices = {"10": Device("10", "Waage")}
+    employees = {"e1": Employee("e1")}
+
+    Device.add_device_to_appointment(iter([["1", "10"], ["2", "11"], ["2", "11"], ["3", "10"]]), appointments, devices, is_verbose=False)
+    Employee.add_employees_to_appointment(iter([["1", "e1"], ["2", "e2"], ["3", "e1"]]), appointments, employees, is_verbose=False)
+
+    assert [d.id for d in appointments["2"].devices] == ["11", "11"]
+    assert devices["11"].name == "11"
+    assert appointments["1"].employees == [employees["e1"]]
+    assert appointments["2"].employees == []
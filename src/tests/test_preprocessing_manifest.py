@@ -0,0 +1,141 @@
+import os
+
+import pandas as pd
+import pytest
+
+from configuration.basic_configuration import configuration
+from src.common.interim_store import get_parquet_path
+from src.data.dataset_preprocessor import cleanup_dataset, INTERIM_DATE_COLUMNS
+from src.data.preprocessing_manifest import PreprocessingManifest, get_file_entry
+
+
+def _write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+    return str(path)
+
+
+def test_file_entry(tmp_path):
+    entry = get_file_entry(_write(tmp_path / "a.csv", "x,y\n1,2\n3,4\n"))
+    assert entry["columns"] == ["x", "y"] and entry["rows"] == 2 and entry["size"] == 12
+
+
+def test_dependent_steps_are_reprocessed(tmp_path):
+    raw_path, interim_path, derived_path = _write(tmp_path / "raw.csv", "x\n1\n"), str(tmp_path / "interim.csv"), \
+        str(tmp_path / "derived.csv")
+    manifest = PreprocessingManifest(str(tmp_path / "manifest.json"))
+    assert not manifest.is_up_to_date("cleanup", [raw_path], [interim_path])
+    _write(interim_path, "x\n1\n")
+    manifest.record("cleanup", [raw_path], [interim_path])
+    _write(derived_path, "y\n1\n")
+    manifest.record("improve", [interim_path], [derived_path])
+
+    manifest = PreprocessingManifest(str(tmp_path / "manifest.json"))
+    assert manifest.is_up_to_date("cleanup", [raw_path], [interim_path])
+    assert manifest.is_up_to_date("improve", [interim_path], [derived_path])
+    assert not manifest.is_up_to_date("improve", [interim_path, raw_path], [derived_path])
+
+    # the raw file changed, but the cleaned file is the same -> the dependent step stays up to date
+    _write(raw_path, "x\n1 \n")
+    assert not manifest.is_up_to_date("cleanup", [raw_path], [interim_path])
+    _write(interim_path, "x\n1\n")
+    manifest.record("cleanup", [raw_path], [interim_path])
+    assert manifest.is_up_to_date("improve", [interim_path], [derived_path])
+
+    _write(interim_path, "x\n2\n")
+    manifest.record("cleanup", [raw_path], [interim_path])
+    assert not manifest.is_up_to_date("improve", [interim_path], [derived_path])
+    os.remove(derived_path)
+    assert not manifest.is_up_to_date("improve", [interim_path], [derived_path])
+
+
+def test_cleanup_skips_unchanged_files(tmp_path, monkeypatch):
+    raw_dir, interim_dir = tmp_path / "raw", tmp_path / "interim"
+    raw_dir.mkdir()
+    monkeypatch.setitem(configuration["PATHS"], "raw_data_dir", str(raw_dir) + "/")
+    monkeypatch.setitem(configuration["PATHS"], "interim_data_dir", str(interim_dir) + "/")
+    monkeypatch.setitem(configuration["PARAMETERS"], "interim_format", "csv")
+    _write(raw_dir / "DIM_GERAET.csv", "GERAET_ID,GERAET_NAME\n1,Waage\n")
+    _write(raw_dir / "DIM_RAUM.csv", "RAUM_ID,RAUM_NAME\n1,BH O 1\n")
+    manifest = PreprocessingManifest(str(tmp_path / "manifest.json"))
+
+    cleanup_dataset(manifest=manifest)
+    mtimes = {name: os.stat(interim_dir / name).st_mtime_ns for name in ["DIM_GERAET.csv", "DIM_RAUM.csv"]}
+
+    _write(raw_dir / "DIM_GERAET.csv", "GERAET_ID,GERAET_NAME\n1,Waage\n2,Bett\n")
+    cleanup_dataset(manifest=PreprocessingManifest(str(tmp_path / "manifest.json")))
+    assert os.stat(interim_dir / "DIM_RAUM.csv").st_mtime_ns == mtimes["DIM_RAUM.csv"]
+    assert os.stat(interim_dir / "DIM_GERAET.csv").st_mtime_ns != mtimes["DIM_GERAET.csv"]
+    assert pd.read_csv(interim_dir / "DIM_GERAET.csv")["Device Name"].tolist() == ["Waage", "Bett"]
+
+
+def test_parallel_cleanup_matches_serial(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    _write(raw_dir / "DIM_GERAET.csv", "GERAET_ID,GERAET_NAME\n1,Waage\n2,Bett\n")
+    _write(raw_dir / "DIM_RAUM.csv", "RAUM_ID,RAUM_NAME\n1,BH O 1\n")
+    _write(raw_dir / "DIM_FALL.csv", "a,b,c,d,e,f,g,h,i\n1,2,1,Fall ist aktuell,ambulanter Fall,2018-01-01,,Standard,aktiv\n")
+    _write(raw_dir / "UNKNOWN.csv", "x\n1\n")
+    monkeypatch.setitem(configuration["PATHS"], "raw_data_dir", str(raw_dir) + "/")
+    monkeypatch.setitem(configuration["PARAMETERS"], "interim_format", "csv")
+
+    contents = []
+    for max_workers in [1, 2]:
+        interim_dir = tmp_path / f"interim_{max_workers}"
+        monkeypatch.setitem(configuration["PATHS"], "interim_data_dir", str(interim_dir) + "/")
+        manifest = PreprocessingManifest(str(tmp_path / f"manifest_{max_workers}.json"))
+        cleanup_dataset(manifest=manifest, max_workers=max_workers)
+        assert sorted(manifest.steps.keys()) == ["DIM_FALL.csv", "DIM_GERAET.csv", "DIM_RAUM.csv"]
+        contents.append({name: (interim_dir / name).read_text() for name in sorted(os.listdir(interim_dir))})
+    assert contents[0] == contents[1]
+    assert sorted(contents[0].keys()) == ["DIM_FALL.csv", "DIM_GERAET.csv", "DIM_RAUM.csv"]
+
+
+def test_chunked_cleanup_matches_whole(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    stays = ["FALNR,LFDNR,BEWTY,BWART,BWIDT,BWIZT,STATU,BWEDT,BWEZT,LFDREF,BEWTXT,FACHAE,ORGPF,ORGAU,ZIMMR,BETT,STORN,EXTKH"]
+    for row, room_id in enumerate(["BH O 1 N 12", "PH7 N-12", None, "BH O 1 N 12", "12345", "INO B 2.3"]):
+        stays.append(f"{row},{row},1,Aufnahme,2018-01-0{row + 1},10:00:00.000,,2018-01-0{row + 2},00:00:00,,,KARD,"
+                     f"N NORD,N NORD,{room_id or ''},,,")
+    _write(raw_dir / "LA_ISH_NBEW.csv", "\n".join(stays) + "\n")
+    _write(raw_dir / "FAKT_TERMIN_MITARBEITER.csv",
+           "a,b,c,d,e\n" + "".join(f"{i},E{i % 2},2018-01-01 10:00,2018-01-01 11:00,60\n" for i in range(5)))
+    _write(raw_dir / "TACS_DATEN.csv",
+           "a,b,c,d,e,f,g,h,i,j,k,l\n" + "".join(f"{i},p,a,{i},c,o,2018-01-0{i + 1},10,S{i},1,l,1\n" for i in range(5)))
+    monkeypatch.setitem(configuration["PATHS"], "raw_data_dir", str(raw_dir) + "/")
+    monkeypatch.setitem(configuration["PARAMETERS"], "interim_format", "parquet")
+
+    tables = []
+    for chunk_rows in [0, 2]:
+        interim_dir = tmp_path / f"interim_{chunk_rows}"
+        monkeypatch.setitem(configuration["PATHS"], "interim_data_dir", str(interim_dir) + "/")
+        monkeypatch.setitem(configuration["PARAMETERS"], "preprocess_chunk_rows", chunk_rows)
+        cleanup_dataset(max_workers=1)
+        tables.append({name: (pd.read_csv(interim_dir / name, dtype=str, parse_dates=INTERIM_DATE_COLUMNS.get(name)),
+                              pd.read_parquet(get_parquet_path(str(interim_dir / name))))
+                       for name in ["FAKT_TERMIN_MITARBEITER.csv", "LA_ISH_NBEW.csv", "TACS_DATEN.csv"]})
+
+    for name, (whole_csv, whole_parquet) in tables[0].items():
+        chunked_csv, chunked_parquet = tables[1][name]
+        pd.testing.assert_frame_equal(chunked_csv, whole_csv)
+        pd.testing.assert_frame_equal(chunked_parquet, whole_parquet, check_dtype=False)
+    stays = tables[1]["LA_ISH_NBEW.csv"][0]
+    assert stays["Unnamed: 0"].tolist() == [str(row) for row in range(6)]
+    assert stays["Waveware Room ID"].tolist()[:2] == ["12", "12"] and pd.isna(stays["Waveware Room ID"][4])
+
+
+def test_failing_file_keeps_records_of_finished_files(tmp_path, monkeypatch):
+    raw_dir = tmp_path / "raw"
+    raw_dir.mkdir()
+    _write(raw_dir / "DIM_FALL.csv", "a,b,c,d,e,f,g,h,i\n1,2,1,Fall ist aktuell,ambulanter Fall,2018-01-01,,Standard,aktiv\n")
+    _write(raw_dir / "DIM_RAUM.csv", "RAUM_ID,RAUM_NAME,UNEXPECTED\n1,BH O 1,x\n")
+    monkeypatch.setitem(configuration["PATHS"], "raw_data_dir", str(raw_dir) + "/")
+    monkeypatch.setitem(configuration["PATHS"], "interim_data_dir", str(tmp_path / "interim") + "/")
+    monkeypatch.setitem(configuration["PARAMETERS"], "interim_format", "csv")
+
+    with pytest.raises(ValueError):
+        cleanup_dataset(manifest=PreprocessingManifest(str(tmp_path / "manifest.json")), max_workers=1)
+
+    assert list(PreprocessingManifest(str(tmp_path / "manifest.json")).steps.keys()) == ["DIM_FALL.csv"]
@@ -0,0 +1,41 @@
+import pandas as pd
+
+from src.data.dataset_preprocessor import extract_nbew_room_ids, extract_tokens, fix_nbau_room_ids
+
+
+def test_extract_tokens_falls_back_to_later_patterns():
+    values = pd.Series(["a1", "b", "a2", None, "a1"], index=[10, 11, 12, 13, 14], dtype=object)
+    token_df = extract_tokens(values, ["(a)([0-9])", "([a-z])()"], ["Letter", "Digit"])
+    assert list(token_df.index) == [10, 11, 12, 13, 14]
+    assert token_df.fillna("-").values.tolist() == [["a", "1"], ["b", ""], ["a", "2"], ["-", "-"], ["a", "1"]]
+
+
+def test_extract_nbew_room_ids():
+    sap_room_ids = pd.Series(["INO E 114", "PH7 N-12", "12345", None, "Aarberg"], dtype=object)
+    token_df = extract_nbew_room_ids(sap_room_ids)
+    assert list(token_df.columns) == ["SAP Building Abbreviation", "Waveware Floor ID", "Waveware Room ID"]
+    assert token_df.fillna("-").values.tolist() == [["INO", "E", "114"], ["PH7", "N", "12"], ["-", "-", "-"],
+                                                    ["-", "-", "-"], ["-", "-", "-"]]
+
+
+def test_fix_nbau_room_ids():
+    df = pd.DataFrame({"SAP Room ID": ["INO E 114", "A 12", "BH"],
+                       "Unit Name": ["Zimmer 114", "Aarberg 12", "Belp"],
+                       "SAP Room ID 1": ["INO E114", None, "BH 1"],
+                       "SAP Room ID 2": ["INO E 114", "Aarberg A 12", "BH"],
+                       "Waveware Campus": ["ISB", None, None],
+                       "Waveware Building ID": [None, None, None],
+                       "Waveware Floor ID": [None, None, None],
+                       "Waveware Room ID": [None, None, "7"],
+                       "SAP Building Abbreviation 1": pd.NA,
+                       "SAP Building Abbreviation 2": pd.NA}, dtype=object)
+    fixed_df = fix_nbau_room_ids(df)
+    assert list(fixed_df.columns) == ["SAP Room ID", "Unit Name", "SAP Room ID 2", "Waveware Campus",
+                                      "Waveware Building ID", "Waveware Floor ID", "Waveware Room ID", "SAP Room ID 1",
+                                      "SAP Building Abbreviation 1", "SAP Building Abbreviation 2"]
+    assert fixed_df["Waveware Campus"].tolist() == ["ISB", "AARB", "BELP"]
+    assert fixed_df[["Waveware Building ID", "Waveware Floor ID", "Waveware Room ID"]].fillna("-").values.tolist() == \
+           [["INO", "E", "114"], ["Aarberg", "A", "12"], ["-", "-", "7"]]
+    assert fixed_df["SAP Room ID 1"].tolist() == ["INO E114", "A 12", "BH 1"]
+    assert fixed_df["SAP Building Abbreviation 1"].fillna("-").tolist() == ["INO", "A", "BH"]
+    assert fixed_df["SAP Building Abbreviation 2"].fillna("-").tolist() == ["INO", "Aarberg", "-"]
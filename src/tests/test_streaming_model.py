@@ -0,0 +1,66 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from src.features.interaction_table import InteractionTable
+from src.models.networkx_graph import SurfaceModel
+from src.models.streaming_model import StreamingSurfaceModel
+from src.tests.test_surface_model import _create_patient_data
+
+
+def _get_window_edges(table, from_dt, to_dt):
+    interaction_df = table.to_frame()
+    interaction_df = interaction_df[interaction_df["origin"].isin(["Stay", "Appointment"])
+                                    & (interaction_df["to"] >= from_dt) & (interaction_df["to"] <= to_dt)]
+    return sorted((tuple(sorted([source_id, target_id])), edge_type, from_ts, to_ts)
+                  for source_id, target_id, edge_type, from_ts, to_ts in zip(interaction_df["source"], interaction_df["target"],
+                                                                             interaction_df["type"], interaction_df["from"],
+                                                                             interaction_df["to"]))
+
+
+def _rebuild_model(streaming_model):
+    # the model built from scratch on the nodes and edges in the window
+    model = SurfaceModel()
+    model.S_GRAPH.add_nodes_from((node_id, {key: value for key, value in attributes.items() if key != 'infected'})
+                                 for node_id, attributes in streaming_model.S_GRAPH.nodes(data=True))
+    model.S_GRAPH.add_edges_from((source_id, target_id, {key: value for key, value in attributes.items() if key != 'infected'})
+                                 for source_id, target_id, attributes in streaming_model.S_GRAPH.edges(data=True))
+    model.add_edge_infection(infection_distance=1)
+    return model
+
+
+def test_streaming_model_matches_rebuilt_window():
+    patient_data = _create_patient_data()
+    screened_data = _create_patient_data()
+    for patient in patient_data["patients"].values():
+        patient.risk_screenings = dict()  # screening results only become available on 01.03.
+    table = InteractionTable.from_patients(patient_data["patients"], patient_data["rooms"], include_treatments=False)
+
+    model = StreamingSurfaceModel(window=datetime.timedelta(days=10))
+    nbr_infected_edges = 0
+    for until in pd.date_range("2018-01-05", "2018-04-05", freq="5D").to_pydatetime():
+        data = screened_data if until >= datetime.datetime(2018, 3, 1) else patient_data
+        model.ingest(data, interaction_table=table, until=until)
+
+        expected_edges = _get_window_edges(table, until - datetime.timedelta(days=10), until)
+        assert sorted((tuple(sorted([source_id, target_id])), attributes["type"], attributes["from"], attributes["to"])
+                      for source_id, target_id, attributes in model.S_GRAPH.edges(data=True)) == expected_edges
+        assert all(model.S_GRAPH.degree(node_id) > 0 for node_id in model.S_GRAPH.nodes)
+        assert set(model.node_types.keys()) == set(model.S_GRAPH.nodes)
+
+        rebuilt_model = _rebuild_model(model)
+        assert dict(model.S_GRAPH.nodes(data='infected')) == dict(rebuilt_model.S_GRAPH.nodes(data='infected'))
+        degree_df = model.calculate_degree_metrics().set_index("Node ID")
+        total_degree_df = rebuilt_model.calculate_total_degree_ratio(use_sparse=True).set_index("Node ID")
+        patient_degree_df = rebuilt_model.calculate_patient_degree_ratio(use_sparse=True).set_index("Node ID")
+        assert sorted(degree_df.index) == sorted(total_degree_df.index)
+        for column in ["Total Degree Ratio", "Number of Infected Edges", "Total Edges"]:
+            assert degree_df[column].to_dict() == pytest.approx(total_degree_df[column].to_dict(), nan_ok=True)
+        assert degree_df["Total Patient Edges"].to_dict() == patient_degree_df["Total Patient Edges"].to_dict()
+        assert degree_df["Number of Infected Patient Edges"].to_dict() == \
+               patient_degree_df["Number of Infected Edges"].to_dict()
+        nbr_infected_edges += sum(infected for _, _, infected in model.S_GRAPH.edges(data='infected'))
+
+    assert nbr_infected_edges > 0
+    assert model.ingest(screened_data, interaction_table=table, until=until) == (0, 0)
@@ -0,0 +1,342 @@
+import datetime
+import itertools
+import logging
+import random
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features.interaction_table import InteractionTable
+from src.features.model import Appointment, Case, Device, Employee, Patient, RiskScreening, Room, Stay, Ward
+from src.models.networkx_graph import SurfaceModel, create_model_snapshots
+
+
+def _create_model():
+    model = SurfaceModel()
+    model.new_patient_node("1", risk_dict=dict())
+    model.new_room_node("BH O 1", ward_id="W 1")
+    model.new_employee_node("E1")
+    model.new_device_node("D1", name="Waage")
+    return model
+
+
+def test_node_type_registry():
+    model = _create_model()
+    assert [model.identify_id(node) for node in ["1", "BH O 1", "E1", "D1", "X"]] == \
+           ["Patient", "Room", "Employee", "Device", None]
+    assert model.identify_node("E1", "Employee") and not model.identify_node("E1", "Device")
+
+
+def test_bulk_edges_match_single_edges():
+    dt = datetime.datetime(2018, 1, 1)
+    edges = [("1", "BH O 1", {"from": dt, "to": dt, "type": "Patient-Room", "origin": "Stay"}),
+             ("E1", "D1", {"from": dt, "to": dt, "type": "Device-Employee", "origin": "Appointment"}),
+             ("1", "X", {"from": dt, "to": dt, "type": "Patient-Room", "origin": "Stay"}),
+             ("Y", "D1", {"from": dt, "to": dt, "type": "Device-Patient", "origin": "Appointment"}),
+             ("1", "BH O 1", {"from": dt, "to": dt, "type": "Patient-Room", "origin": "Stay"})]
+
+    single_model = _create_model()
+    for source, target, att_dict in edges:
+        single_model.new_edge(source, None, target, None, att_dict=att_dict)
+    bulk_model = _create_model()
+    nbr_added = bulk_model.new_edges(*zip(*edges))
+
+    assert nbr_added == 3
+    assert list(bulk_model.S_GRAPH.edges(keys=True, data=True)) == list(single_model.S_GRAPH.edges(keys=True, data=True))
+    assert bulk_model.edge_add_warnings == single_model.edge_add_warnings == 2
+    assert bulk_model.new_edges([], [], []) == 0
+
+
+def _create_patient_data(nr_patients=20):
+    random.seed(12)
+    rooms = [Room(sap_room_id1=f"BH O {i}", ww_building_id="12") for i in range(4)]
+    ward = Ward("N NORD")
+    patients = dict()
+    for i in range(nr_patients):
+        patient = Patient(str(i), "male", datetime.datetime(1950, 1, 1), "3000", "Bern", "BE", "de")
+        if i % 5 == 0:
+            patient.add_risk_screening(RiskScreening(str(i), pd.Timestamp("2018-03-01"), pd.Timestamp("2018-03-01"),
+                                                     "", "", None, str(i), "pos"))
+        case = Case(f"C{i}", patient.patient_id, "1", "open", "in-patient", None, None, "Standard", "active")
+        patient.add_case(case)
+        for j in range(3):
+            room = random.choice(rooms + [None])
+            begin = pd.Timestamp("2018-01-01") + pd.Timedelta(hours=random.randint(0, 24 * 90))
+            stay = Stay(str(j), case.case_id, "1", "Eintritt", "30", "0", "", "DIAA", ward.name, "",
+                        room.room_id if room is not None else None, "", None, "", begin,
+                        begin + pd.Timedelta(hours=random.randint(1, 48)), "BH", "O", "1")
+            if room is not None:
+                stay.add_room(room)
+            stay.add_ward(ward)
+            case.add_stay(stay)
+        for j in range(2):
+            appointment = Appointment(str(j), "0", "Konsultation", "K90", "Patiententermin",
+                                      pd.Timestamp("2018-01-01") + pd.Timedelta(hours=random.randint(0, 24 * 90)), "30")
+            appointment.add_device(Device(str(random.randint(0, 3)), "Waage"))
+            appointment.add_employee(Employee(f"e{random.randint(0, 5)}"))
+            appointment.add_room(random.choice(rooms))
+            case.add_appointment(appointment)
+        patients[patient.patient_id] = patient
+    return {"patients": patients, "rooms": {room.room_id: room for room in rooms}}
+
+
+def _get_edges(model):
+    return sorted((tuple(sorted([u, v])), d["type"], d["origin"], d["from"], d["to"])
+                  for u, v, d in model.S_GRAPH.edges(data=True))
+
+
+def test_bulk_construction_matches_object_walk():
+    patient_data = _create_patient_data()
+    patient_ids = list(patient_data["patients"].keys())
+    for edge_types, patient_subset in [(None, None), (("Patient-Room", "Device-Employee"), patient_ids[:6])]:
+        kwargs = dict(patient_subset=patient_subset, from_range=datetime.datetime(2018, 2, 1),
+                      to_range=datetime.datetime(2018, 3, 15))
+        legacy_model = SurfaceModel(edge_types=edge_types)
+        legacy_model.add_network_data(patient_data, **kwargs)
+        bulk_model = SurfaceModel(edge_types=edge_types)
+        bulk_model.add_network_data(patient_data, bulk=True, **kwargs)
+
+        assert len(_get_edges(bulk_model)) > 0
+        assert _get_edges(bulk_model) == _get_edges(legacy_model)
+        assert dict(bulk_model.S_GRAPH.nodes(data=True)) == dict(legacy_model.S_GRAPH.nodes(data=True))
+        assert bulk_model.node_types == legacy_model.node_types
+
+
+def test_stays_ending_after_the_datetime64_range_are_clipped():
+    patient_data = _create_patient_data()
+    stay = next(stay for patient in patient_data["patients"].values() for case in patient.cases.values()
+                for stay in case.stays.values() if stay.room is not None)
+    stay.to_datetime = datetime.datetime(9999, 12, 31)
+    kwargs = dict(from_range=datetime.datetime(2018, 1, 1), to_range=datetime.datetime(2018, 12, 31))
+    legacy_model = SurfaceModel()
+    legacy_model.add_network_data(patient_data, **kwargs)
+    bulk_model = SurfaceModel()
+    bulk_model.add_network_data(patient_data, bulk=True, **kwargs)
+
+    assert _get_edges(bulk_model) == _get_edges(legacy_model)
+    table = InteractionTable.from_patients(patient_data["patients"], include_treatments=False, is_verbose=False)
+    assert table["to_ts"].max() == np.datetime64(pd.Timestamp.max.to_datetime64(), "ns")
+
+
+def test_sparse_metrics_match_networkx():
+    patient_data = _create_patient_data()
+    model = SurfaceModel()
+    model.add_network_data(patient_data, from_range=datetime.datetime(2018, 1, 1), to_range=datetime.datetime(2019, 1, 1))
+    model.remove_isolated_nodes(silent=True)
+    model.add_edge_infection(infection_distance=2)
+
+    for metric in [model.calculate_infection_degree, model.calculate_patient_degree_ratio,
+                   model.calculate_total_degree_ratio]:
+        pd.testing.assert_frame_equal(metric(use_sparse=True), metric())
+
+    sparse_graph = model.get_sparse_graph()
+    assert sparse_graph.number_of_edges() == model.S_GRAPH.number_of_edges()
+    assert sparse_graph.adjacency[None].sum() == 2 * model.S_GRAPH.number_of_edges()
+    assert sparse_graph.adjacency["Patient-Room"].sum() == \
+           2 * sum(1 for _, _, edge_type in model.S_GRAPH.edges(data="type") if edge_type == "Patient-Room")
+    model.new_employee_node("new")
+    assert model.sparse_graph is None
+
+
+def _create_chain_model():
+    # positive patient 1 (screened on 01.03.) - room R1 - patient 2 - device D1, edges ending on the given days
+    model = SurfaceModel()
+    model.from_range, model.to_range = datetime.datetime(2018, 1, 1), datetime.datetime(2019, 1, 1)
+    risk = RiskScreening("1", pd.Timestamp("2018-03-01"), pd.Timestamp("2018-03-01"), "", "", None, "1", "pos")
+    model.new_patient_node("1", risk_dict={pd.Timestamp("2018-03-01"): risk})
+    model.new_patient_node("2", risk_dict=dict())
+    model.new_room_node("R1")
+    model.new_device_node("D1", name="Waage")
+    for source, target, edge_type, day in [("1", "R1", "Patient-Room", 5), ("2", "R1", "Patient-Room", 3),
+                                           ("2", "R1", "Patient-Room", 10), ("2", "D1", "Device-Patient", 12),
+                                           ("2", "D1", "Device-Patient", 8)]:
+        end = datetime.datetime(2018, 3, day, 12)
+        model.new_edge(source, None, target, None, att_dict={"from": end - datetime.timedelta(hours=2), "to": end,
+                                                             "type": edge_type, "origin": "Stay"})
+    return model
+
+
+def test_edge_infection_spreads_one_edge_per_pass():
+    model = _create_chain_model()
+    model.add_edge_infection(infection_distance=1)
+    assert sorted((u, v, infected) for u, v, infected in model.S_GRAPH.edges(data="infected")) == \
+           [("1", "R1", True), ("2", "D1", False), ("2", "D1", False), ("2", "R1", False), ("2", "R1", False)]
+    assert [node for node, infected in model.S_GRAPH.nodes(data="infected") if infected] == ["1", "R1"]
+
+    model.add_edge_infection(infection_distance=1)
+    assert sum(infected for _, _, infected in model.S_GRAPH.edges(data="infected")) == 3
+    assert sorted(node for node, infected in model.S_GRAPH.nodes(data="infected") if infected) == ["1", "2", "R1"]
+
+
+def test_edge_infection_forward_in_time():
+    model = _create_chain_model()
+    model.add_edge_infection(infection_distance=3, forward_in_time=True)
+    infection_dates = dict(model.S_GRAPH.nodes(data="infection_date"))
+    # R1 is infected by the stay ending 05.03., patient 2 only by the stay in R1 ending after that
+    assert infection_dates["R1"] == datetime.date(2018, 3, 5)
+    assert infection_dates["2"] == datetime.date(2018, 3, 10)
+    assert infection_dates["D1"] == datetime.date(2018, 3, 12)
+
+    model = _create_chain_model()
+    model.add_edge_infection(infection_distance=3, forward_in_time=True,
+                             colonialization_timedelta=datetime.timedelta(days=7))
+    infection_dates = dict(model.S_GRAPH.nodes(data="infection_date"))
+    assert infection_dates["R1"] == datetime.date(2018, 3, 5)
+    assert infection_dates["2"] == datetime.date(2018, 3, 3)
+    assert infection_dates["D1"] == datetime.date(2018, 3, 8)
+
+
+def test_temporal_infection_matches_forward_passes():
+    patient_data = _create_patient_data(60)
+    for max_hops in [1, 2, 4]:
+        models = []
+        for _ in range(2):
+            model = SurfaceModel()
+            model.add_network_data(patient_data, from_range=datetime.datetime(2018, 1, 1),
+                                   to_range=datetime.datetime(2019, 1, 1))
+            model.remove_isolated_nodes(silent=True)
+            models.append(model)
+        models[0].add_edge_infection(infection_distance=max_hops, forward_in_time=True)
+        models[1].add_temporal_infection(max_hops=max_hops)
+
+        for attribute in ["infected", "infection_date"]:
+            assert dict(models[1].S_GRAPH.nodes(data=attribute)) == dict(models[0].S_GRAPH.nodes(data=attribute))
+        assert list(models[1].S_GRAPH.edges(data="infected")) == list(models[0].S_GRAPH.edges(data="infected"))
+
+
+def test_temporal_infection_without_hop_limit():
+    model = _create_chain_model()
+    model.add_temporal_infection()
+    assert dict(model.S_GRAPH.nodes(data="infection_hops")) == {"1": 0, "2": 2, "R1": 1, "D1": 3}
+    assert dict(model.S_GRAPH.nodes(data="infection_date"))["D1"] == datetime.date(2018, 3, 12)
+
+    model = _create_chain_model()
+    model.add_temporal_infection(colonialization_timedelta=datetime.timedelta(days=7))
+    infection_dates = dict(model.S_GRAPH.nodes(data="infection_date"))
+    assert infection_dates["2"] == datetime.date(2018, 3, 3)
+    assert infection_dates["D1"] == datetime.date(2018, 3, 8)
+
+
+def test_focus_betweenness_matches_path_enumeration():
+    model = SurfaceModel()
+    model.add_network_data(_create_patient_data(), from_range=datetime.datetime(2018, 1, 1),
+                           to_range=datetime.datetime(2019, 1, 1))
+    focus_nodes = model.get_patients()[:12] + ["e1", "BH O 0"]
+
+    for max_path_length in [None, 3, 4]:
+        expected = dict.fromkeys(model.S_GRAPH.nodes, 0.0)
+        for source, target in itertools.combinations(focus_nodes, 2):
+            if not nx.has_path(model.S_GRAPH, source, target):
+                continue
+            paths = list(nx.all_shortest_paths(model.S_GRAPH, source, target))
+            if max_path_length is not None and len(paths[0]) > max_path_length:
+                continue
+            for path in paths:
+                for node in path[1:-1]:
+                    expected[node] += 1 / len(paths)
+
+        for max_workers in [1, 2]:
+            model.update_shortest_path_statistics(focus_nodes, max_path_length=max_path_length, max_workers=max_workers)
+            assert model.betweenness_centrality == pytest.approx(expected)
+
+    betweenness_df = model.calculate_node_betweenness()
+    assert betweenness_df["Centrality"].tolist() == pytest.approx(sorted(expected.values(), reverse=True))
+    assert not any(key.startswith("SP-") for _, attributes in model.S_GRAPH.nodes(data=True) for key in attributes)
+
+
+def test_subset_betweenness_and_pagerank_match_networkx():
+    model = SurfaceModel()
+    model.add_network_data(_create_patient_data(), from_range=datetime.datetime(2018, 1, 1),
+                           to_range=datetime.datetime(2019, 1, 1))
+    model.remove_isolated_nodes(silent=True)
+
+    expected = nx.betweenness_centrality_subset(model.S_GRAPH, sources=model.get_positive_patients(),
+                                                targets=model.get_patients())
+    for max_workers in [1, 2]:
+        betweenness_df = model.calculate_subset_betweenness(max_workers=max_workers)
+        assert list(betweenness_df.columns) == ["Node ID", "Node Type", "Risk Status", "Centrality"]
+        assert dict(zip(betweenness_df["Node ID"], betweenness_df["Centrality"])) == pytest.approx(expected)
+
+    personalization = {node: 1 if status == "pos" else 0 for node, status in model.S_GRAPH.nodes(data="vre_status")}
+    expected = nx.pagerank(model.S_GRAPH, personalization=personalization, tol=1.0e-10)
+    pagerank_df = model.calculate_pagerank_centrality(tol=1.0e-10)
+    assert list(pagerank_df.columns) == ["Node ID", "Node Type", "Risk Status", "Centrality"]
+    assert dict(zip(pagerank_df["Node ID"], pagerank_df["Centrality"])) == pytest.approx(expected, abs=1.0e-8)
+
+
+def test_snapshot_series_matches_trimmed_models():
+    model = SurfaceModel()
+    model.add_network_data(_create_patient_data(), from_range=datetime.datetime(2018, 1, 1),
+                           to_range=datetime.datetime(2019, 1, 1))
+    model.add_edge_infection(infection_distance=2)
+    snapshot_dts = [datetime.datetime(2018, 3, 1), datetime.datetime(2018, 2, 1), datetime.datetime(2018, 4, 15)]
+
+    snapshots = create_model_snapshots(model, snapshot_dts)
+    metrics_df = model.get_snapshot_series().calculate_degree_metrics(snapshot_dts)
+    assert len(snapshots) == 4 and snapshots[-1] is model
+    for snapshot_dt, snapshot in zip(sorted(snapshot_dts), snapshots):
+        expected_edges = sorted((u, v, k) for u, v, k, to in model.S_GRAPH.edges(keys=True, data="to") if to <= snapshot_dt)
+        assert sorted(snapshot.S_GRAPH.edges(keys=True)) == expected_edges
+        assert len(expected_edges) > 0
+        assert all(snapshot.S_GRAPH.degree(node) > 0 for node in snapshot.S_GRAPH.nodes)
+
+        snapshot_df = metrics_df[metrics_df["Snapshot"] == snapshot_dt].set_index("Node ID")
+        total_degree_df = snapshot.calculate_total_degree_ratio(use_sparse=True).set_index("Node ID")
+        patient_degree_df = snapshot.calculate_patient_degree_ratio(use_sparse=True).set_index("Node ID")
+        assert sorted(snapshot_df.index) == sorted(total_degree_df.index)
+        for column in ["Total Degree Ratio", "Number of Infected Edges", "Total Edges"]:
+            assert snapshot_df[column].to_dict() == pytest.approx(total_degree_df[column].to_dict(), nan_ok=True)
+        assert snapshot_df["Total Patient Edges"].to_dict() == patient_degree_df["Total Patient Edges"].to_dict()
+        assert snapshot_df["Number of Infected Patient Edges"].to_dict() == \
+               patient_degree_df["Number of Infected Edges"].to_dict()
+
+
+def test_snapshots_are_independent_of_the_model():
+    model = SurfaceModel()
+    model.add_network_data(_create_patient_data(), from_range=datetime.datetime(2018, 1, 1),
+                           to_range=datetime.datetime(2019, 1, 1))
+    infected = {(u, v, k): is_infected for u, v, k, is_infected in model.S_GRAPH.edges(keys=True, data="infected")}
+    nbr_nodes = model.S_GRAPH.number_of_nodes()
+    sparse_graph = model.get_sparse_graph()
+
+    snapshot = create_model_snapshots(model, [datetime.datetime(2018, 4, 15)])[0]
+    snapshot.add_temporal_infection(max_hops=3)
+    snapshot.remove_isolated_nodes()
+    snapshot.S_GRAPH.remove_edges_from(list(snapshot.S_GRAPH.edges(keys=True)))
+
+    assert {(u, v, k): is_infected for u, v, k, is_infected in model.S_GRAPH.edges(keys=True, data="infected")} == infected
+    assert model.S_GRAPH.number_of_nodes() == nbr_nodes
+    assert model.get_sparse_graph() is sparse_graph
+
+
+def test_graph_summary(caplog):
+    model = SurfaceModel()
+    model.add_network_data(_create_patient_data(), from_range=datetime.datetime(2018, 2, 1),
+                           to_range=datetime.datetime(2018, 3, 1))
+    nodes = list(model.S_GRAPH.nodes(data=True))
+    assert model.get_patients() == [node_id for node_id, attributes in nodes if attributes['type'] == 'Patient']
+    assert model.get_positive_patients() == [node_id for node_id, attributes in nodes
+                                             if attributes['type'] == 'Patient' and attributes['vre_status'] == 'pos']
+    assert len(model.get_positive_patients()) > 0
+
+    node_df, edge_df = model.get_graph_summary()
+    assert node_df['degree'].tolist() == [model.S_GRAPH.degree(node_id) for node_id, _ in nodes]
+    assert len(edge_df) == model.S_GRAPH.number_of_edges() and edge_df['has_attributes'].all()
+    nbr_isolated = int((node_df['degree'] == 0).sum())
+    assert nbr_isolated > 0
+
+    model.S_GRAPH.add_edge('', 'BH O 1', type='Patient-Room')
+    model.invalidate_caches()
+    with caplog.at_level(logging.INFO):
+        model.inspect_network()
+    assert f"--> Total {len(nodes) + 1} nodes, out of which {nbr_isolated} are isolated" in caplog.text
+    assert "--> 1 edges with a faulty source or target id" in caplog.text
+    assert f"--> {len(edge_df)} edges ok:" in caplog.text
+    assert f"--> {len(model.get_positive_patients())} VRE-positive Patients in the network" in caplog.text
+
+    model.remove_isolated_nodes()
+    assert model.graph_summary is None
+    assert model.S_GRAPH.number_of_nodes() == len(nodes) + 1 - nbr_isolated
+    assert (model.get_graph_summary()[0]['degree'] > 0).all()
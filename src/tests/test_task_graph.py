@@ -0,0 +1,57 @@
+import pytest
+
+from src.common.task_graph import TaskGraph, TaskResult
+from src.features.dataloader import DataLoader
+
+
+def _add(a, b):
+    return a + b
+
+
+def _create_graph():
+    graph = TaskGraph()
+    graph.add_task("sum", _add, TaskResult("a"), b=TaskResult("b"))
+    graph.add_task("a", _add, 1, 2)
+    graph.add_task("b", _add, 10, 20)
+    return graph
+
+
+def test_tasks_run_after_their_dependencies():
+    assert _create_graph().run(max_workers=1) == {"a": 3, "b": 30, "sum": 33}
+    assert _create_graph().run(max_workers=2) == {"a": 3, "b": 30, "sum": 33}
+
+
+def test_results_are_reported_as_tasks_finish():
+    for max_workers in [1, 2]:
+        graph = _create_graph()
+        # too many arguments; runs only after "a" and "b" finished, so both must have been reported when it fails
+        graph.add_task("fails", _add, TaskResult("a"), TaskResult("b"), "x")
+        finished = []
+        with pytest.raises(TypeError):
+            graph.run(max_workers=max_workers, on_result=lambda name, result: finished.append((name, result)))
+        assert ("a", 3) in finished and ("b", 30) in finished
+
+
+def test_unknown_and_cyclic_dependencies_raise():
+    graph = TaskGraph()
+    graph.add_task("a", _add, TaskResult("b"), 1)
+    with pytest.raises(ValueError):
+        graph.run()
+
+    graph.add_task("b", _add, TaskResult("a"), 1)
+    with pytest.raises(ValueError):
+        graph.run()
+
+
+def test_tables_parsed_in_worker_processes(tmp_path):
+    devices_path = tmp_path / "DIM_GERAET.csv"
+    devices_path.write_text("Device ID,Device Name\n82250,ANS-Fix\n162101,Waage\n", encoding="iso-8859-1")
+    loader = DataLoader()
+    loader.devices_path = str(devices_path)
+
+    parsed = loader.parse_tables(load_patients=False, load_buildings=False, load_rooms=False, load_partners=False,
+                                 load_appointments=False, load_employees=False, load_chop_codes=False,
+                                 load_icd_codes=False, max_workers=2, is_verbose=False)
+
+    assert list(parsed.keys()) == ["devices"]
+    assert parsed["devices"]["162101"].name == "Waage"